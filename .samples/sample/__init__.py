@@ -0,0 +1,3 @@
+from sample.version import __version__
+
+__all__ = ['__version__']
@@ -0,0 +1,84 @@
+from cmdbox.app import common, feature
+from cmdbox.app.commons import validator
+from cmdbox.app.options import Options
+from typing import Dict, Any, Tuple, Union, List
+import argparse
+import datetime
+import logging
+
+
+class ClientTime(feature.Feature, validator.Validator):
+    def get_mode(self) -> Union[str, List[str]]:
+        """
+        この機能のモードを返します
+
+        Returns:
+            Union[str, List[str]]: モード
+        """
+        return "client"
+
+    def get_cmd(self):
+        """
+        この機能のコマンドを返します
+
+        Returns:
+            str: コマンド
+        """
+        return 'time'
+
+    def get_option(self):
+        """
+        この機能のオプションを返します
+
+        Returns:
+            Dict[str, Any]: オプション
+        """
+        return dict(
+            use_redis=self.USE_REDIS_FALSE, nouse_webmode=False, use_agent=False,
+            description_ja="クライアント側の現在時刻を表示します。",
+            description_en="Displays the current time at the client side.",
+            choice=[
+                dict(opt="timedelta", type=Options.T_INT, default=9, required=False, multi=False, hide=False, choice=None,
+                        description_ja="時差の時間数を指定します。",
+                        description_en="Specify the number of hours of time difference."),
+            ])
+
+    @validator.apprun_check
+    def apprun(self, logger:logging.Logger, args:argparse.Namespace, tm:float, pf:List[Dict[str, float]]=[]) -> Tuple[int, Dict[str, Any], Any]:
+        """
+        この機能の実行を行います
+
+        Args:
+            logger (logging.Logger): ロガー
+            args (argparse.Namespace): 引数
+            tm (float): 実行開始時間
+            pf (List[Dict[str, float]]): 呼出元のパフォーマンス情報
+
+        Returns:
+            Tuple[int, Dict[str, Any], Any]: 終了コード, 結果, オブジェクト
+        """
+        tz = datetime.timezone(datetime.timedelta(hours=args.timedelta))
+        dt = datetime.datetime.now(tz)
+        ret = dict(success=dict(data=dt.strftime('%Y-%m-%d %H:%M:%S')))
+        common.print_format(ret, args.format, tm, args.output_json, args.output_json_append, pf=pf)
+        if 'success' not in ret:
+            return self.RESP_WARN, ret, None
+        return self.RESP_SUCCESS, ret, None
+
+    def edgerun(self, opt, tool, logger, timeout, prevres = None):
+        """
+        この機能のエッジ側の実行を行います
+
+        Args:
+            opt (Dict[str, Any]): オプション
+            tool (edge.Tool): 通知関数などedge側のUI操作を行うためのクラス
+            logger (logging.Logger): ロガー
+            timeout (int): タイムアウト時間
+            prevres (Any): 前コマンドの結果。pipeline実行の実行結果を参照する時に使用します。
+
+        Yields:
+            Tuple[int, Dict[str, Any]]: 終了コード, 結果
+        """
+        status, res = tool.exec_cmd(opt, logger, timeout, prevres)
+        tool.notify(res)
+        yield 1, res
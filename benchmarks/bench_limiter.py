@@ -0,0 +1,124 @@
+"""
+Limiter のチェックとカウンタ更新のベンチマークです。
+
+一時ディレクトリに ``--limiters`` 件の制限設定を保存し、``Limiter.check`` と ``Limiter.update`` を
+1コマンド分として繰り返し実行した時のスループットを計測します。
+制限設定のうち ``--matched`` 件が計測するコマンドに適合し、残りは別のコマンドを対象とします。
+制限値は十分に大きくし、計測中に実行が拒否されないようにします。
+
+計測するケースは次のとおりです。
+
+- ``file``: Redis を使用しない場合（ファイルのみ）
+- ``redis-unbatched``: Redis を使用し、設定のバージョン確認・カウンタの同期・デルタの送信を毎回行う場合
+- ``redis``: Redis を使用し、スナップショットとデルタの一括送信を行う場合（既定の動作）
+
+Redis のケースは ``--host`` を指定した場合のみ計測します。
+また ``redis`` のケースでは、最後の ``update`` から溜めたデルタが Redis に送信されるまでの時間も計測します。
+
+使い方::
+
+    python benchmarks/bench_limiter.py
+    python benchmarks/bench_limiter.py --host localhost --port 6379 --password password --svname bench
+"""
+from cmdbox.app.commons import limiter, redis_client
+from pathlib import Path
+from typing import Dict, Optional
+import argparse
+import json
+import logging
+import shutil
+import tempfile
+import time
+
+
+MODE = 'bench'
+CMD = 'target'
+
+
+def _save_configs(data_dir:Path, limiters:int, matched:int) -> None:
+    """制限設定をファイルに保存します"""
+    limiter_dir = data_dir / limiter.Limiter.LIMITER_DIR
+    limiter_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(limiters):
+        configure = dict(scope='server', limiter_name=f"bench{i:03d}", limiter_title=f"bench {i}",
+                         target_mode=MODE, target_cmd=CMD if i < matched else f"other{i:03d}",
+                         max_total_count=10**12, max_total_time=10**12, max_total_output=10**15)
+        with (limiter_dir / f"{limiter.Limiter.CONFIG_PREFIX}{configure['limiter_name']}.json").open('w', encoding='utf-8') as f:
+            json.dump(configure, f, indent=4)
+
+def bench(lmt:limiter.Limiter, data_dir:Path, count:int, logger:logging.Logger) -> Dict[str, float]:
+    """
+    check と update を count 回実行します。
+
+    Args:
+        lmt (limiter.Limiter): 計測する Limiter
+        data_dir (Path): データディレクトリ
+        count (int): 実行回数
+        logger (logging.Logger): ロガー
+
+    Returns:
+        Dict[str, float]: 計測結果
+    """
+    opt = dict(mode=MODE, cmd=CMD)
+    # 1回目は設定とカウンタの読込みを含むため計測から除く
+    lmt.check(feat=None, data_dir=data_dir, logger=logger, command_options=opt, current_registrations=0)
+    start = time.perf_counter()
+    for _ in range(count):
+        st, _, deny = lmt.check(feat=None, data_dir=data_dir, logger=logger, command_options=opt, current_registrations=0)
+        if st == limiter.Limiter.CHECK_DENY:
+            raise RuntimeError(f"Denied by {deny}")
+        lmt.update(feat=None, deny_limiter_names=deny, data_dir=data_dir, logger=logger, command_options=opt,
+                   exec_time=0.01, output_bytes=100)
+    elapsed = time.perf_counter() - start
+    ret = dict(ops=count / elapsed, us=elapsed / count * 1e6, flush_ms=None)
+    if lmt.redis_client is not None:
+        # 溜めたデルタが update() を呼ばずに Redis に送信されるまでの時間
+        redis_key = f"{lmt.redis_client.lmtname}_server_limiter:counter"
+        start = time.perf_counter()
+        while time.perf_counter() - start < 10:
+            raw = lmt.redis_client.redis_cli.hget(redis_key, 'bench000')
+            if raw is not None and json.loads(raw).get('total_count') == count:
+                break
+            time.sleep(0.001)
+        ret['flush_ms'] = (time.perf_counter() - start) * 1000
+    return ret
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Limiter.check + Limiter.update throughput.')
+    parser.add_argument('--limiters', type=int, default=100, help='number of limiter configurations')
+    parser.add_argument('--matched', type=int, default=10, help='number of configurations matching the command')
+    parser.add_argument('--count', type=int, default=2000, help='number of check+update calls')
+    parser.add_argument('--host', default=None, help='Redis host. Redis cases are skipped if omitted')
+    parser.add_argument('--port', type=int, default=6379, help='Redis port')
+    parser.add_argument('--password', default='password', help='Redis password')
+    parser.add_argument('--svname', default='bench', help='server name used for the Redis keys')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger('bench_limiter')
+    cases = [('file', None, False)]
+    redis_cli: Optional[redis_client.RedisClient] = None
+    if args.host:
+        redis_cli = redis_client.RedisClient(logger, host=args.host, port=args.port, password=args.password, svname=args.svname)
+        cases += [('redis-unbatched', redis_cli, True), ('redis', redis_cli, False)]
+
+    print(f"limiters={args.limiters} matched={args.matched} count={args.count}")
+    print(f"{'case':<16} {'ops/s':>10} {'us/op':>9} {'flush_ms':>9}")
+    for name, cli, unbatched in cases:
+        data_dir = Path(tempfile.mkdtemp(prefix='bench_limiter_'))
+        try:
+            _save_configs(data_dir, args.limiters, args.matched)
+            lmt = limiter.Limiter(redis_client=cli, flush_interval=60, reload_interval=60)
+            if unbatched:
+                lmt.VERSION_CHECK_INTERVAL = lmt.COUNTER_SYNC_INTERVAL = lmt.COUNTER_BATCH_INTERVAL = 0.0
+            if cli is not None:
+                for scope in ('server', 'client'):
+                    cli.redis_cli.delete(f"{cli.lmtname}_{scope}_limiter:counter", f"{cli.lmtname}_{scope}_limiter:config")
+            r = bench(lmt, data_dir, args.count, logger)
+            flush_ms = '-' if r['flush_ms'] is None else format(r['flush_ms'], '.1f')
+            print(f"{name:<16} {r['ops']:>10.1f} {r['us']:>9.1f} {flush_ms:>9}", flush=True)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+MCP の ``list_tools`` で返すツールリストの生成時間のベンチマークです。
+
+一時ディレクトリの ``.cmds`` に ``--cmds`` 件のユーザーコマンドを保存し、``list_tools`` と同じく
+``ToolList`` を反復してツールを取得する時間を次のケースごとに計測します。
+
+- ``cold``: 登録簿が空の状態。全てのコマンドファイルを読み込み、関数の生成とスキーマの作成を行います
+- ``warm``: 登録簿がある状態。コマンドファイルの更新日時とサイズのみを確認し、生成済みのツールを返します
+- ``touch-1``: 1件のコマンドファイルの更新日時のみを変えた状態。内容のハッシュが同じため生成済みのツールを返します
+- ``modify-1``: 1件のコマンドファイルの内容を変えた状態。そのコマンドのみツールを生成し直します
+
+``ToolList`` は ``Web`` のサインインファイルデータを参照するため、 ``--host`` の Redis サーバーが必要です。
+また、ツールの生成には ``fastmcp`` が必要です。
+
+使い方::
+
+    python benchmarks/bench_mcp_tools.py --host localhost --port 6379 --password password
+    python benchmarks/bench_mcp_tools.py --cmds 200 --runs 10
+"""
+from cmdbox import version
+from cmdbox.app import app, common, mcp, options
+from cmdbox.app.web import Web
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+
+def _save_cmds(data_dir:Path, cmds:int) -> List[Path]:
+    """ユーザーコマンドを保存し、コマンドファイルのリストを返します"""
+    cmds_dir = data_dir / ".cmds"
+    cmds_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(cmds):
+        opt = dict(mode='client', cmd='time', title=f"bench{i:04d}", timedelta=9, tag=['bench'], description=f"bench command {i}")
+        path = cmds_dir / f"cmd-{opt['title']}.json"
+        with path.open('w', encoding='utf-8') as f:
+            json.dump(opt, f, indent=4)
+        paths.append(path)
+    return paths
+
+def _median_ms(func:Callable[[], Any], runs:int, before:Callable[[], None]=None) -> Dict[str, Any]:
+    """関数をruns回実行し、実行時間の中央値と最後の戻り値を返します"""
+    times, ret = [], None
+    for _ in range(runs):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        ret = func()
+        times.append(time.perf_counter() - start)
+    return dict(ms=statistics.median(times) * 1000, max_ms=max(times) * 1000, ret=ret)
+
+def bench(data_dir:Path, paths:List[Path], runs:int, logger:logging.Logger) -> List[Dict[str, Any]]:
+    """
+    ケースごとにツールリストの取得時間を計測します。
+
+    Args:
+        data_dir (Path): データフォルダ
+        paths (List[Path]): コマンドファイルのリスト
+        runs (int): 計測回数
+        logger (logging.Logger): ロガー
+
+    Returns:
+        List[Dict[str, Any]]: 計測結果
+    """
+    tools = mcp.ToolList(logger, data_dir, appcls=app.CmdBoxApp, ver=version)
+    list_tools = lambda: [tool for tool in tools]
+    def _clear():
+        mcp.ToolList._registry.clear()
+    def _touch():
+        st = paths[0].stat()
+        os.utime(paths[0], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    def _modify():
+        opt = common.loadopt(paths[0])
+        opt['description'] = f"bench command {time.perf_counter_ns()}"
+        with paths[0].open('w', encoding='utf-8') as f:
+            json.dump(opt, f, indent=4)
+
+    ret = []
+    for name, before in (('cold', _clear), ('warm', None), ('touch-1', _touch), ('modify-1', _modify)):
+        # 直前のケースで登録簿を作成しておく
+        list_tools()
+        r = _median_ms(list_tools, runs, before)
+        ret.append(dict(name=name, ms=r['ms'], max_ms=r['max_ms'], tools=len(r['ret'])))
+    return ret
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MCP list_tools with a cold and a warm tool registry.')
+    parser.add_argument('--cmds', type=int, default=100, help='number of user commands')
+    parser.add_argument('--runs', type=int, default=5, help='number of runs for each case')
+    parser.add_argument('--host', default='localhost', help='Redis host')
+    parser.add_argument('--port', type=int, default=6379, help='Redis port')
+    parser.add_argument('--password', default='password', help='Redis password')
+    parser.add_argument('--svname', default='benchmcp', help='server name used for the Redis keys')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger('bench_mcp_tools')
+    opts = options.Options.getInstance(app.CmdBoxApp, version)
+    opts._load_features_yml(version, logger=logger)
+    opts.load_features_file('cli', opts.load_svcmd, app.CmdBoxApp, version, 'en_US', logger)
+
+    data_dir = Path(tempfile.mkdtemp(prefix='bench_mcp_tools_'))
+    try:
+        paths = _save_cmds(data_dir, args.cmds)
+        signin_file = Path(app.__file__).parent.parent / 'extensions' / 'user_list.yml'
+        Web.getInstance(logger, data_dir, appcls=app.CmdBoxApp, ver=version, signin_file=str(signin_file),
+                        redis_host=args.host, redis_port=args.port, redis_password=args.password, svname=args.svname)
+        print(f"cmds={args.cmds} (median of {args.runs} runs)")
+        print(f"{'case':<9} {'list_tools_ms':>13} {'max_ms':>8} {'tools':>6}")
+        for r in bench(data_dir, paths, args.runs, logger):
+            print(f"{r['name']:<9} {r['ms']:>13.2f} {r['max_ms']:>8.2f} {r['tools']:>6}", flush=True)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+サーバーとの間で送受信するメッセージの形式のベンチマークです。
+
+ファイルのアップロード（コマンド）とダウンロード（応答）を想定し、ペイロードの大きさごとに次の形式を比較します。
+
+- ``base64-json``: 従来の形式。ファイルをBase64にしてJSONに格納し、コマンドの場合はさらにJSONをBase64にして
+  ``"<cmd> <reskey> <params...>"`` の文字列にします
+- ``frame``: ``msgframe`` のバイナリフレーム。ファイルはBase64にせずにそのまま添付します
+
+計測する項目は次のとおりです。
+
+- 変換（encode）と復元（decode）の時間（中央値）
+- Redis に送信するメッセージの大きさ（wire）とペイロードに対する比率
+
+Redis サーバーは使用せず、このプロセス内で変換と復元のみを計測します。
+
+使い方::
+
+    python benchmarks/bench_msgframe.py
+    python benchmarks/bench_msgframe.py --sizes 1024 1048576 52428800 --runs 5
+"""
+from cmdbox.app.commons import convert, msgframe
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import json
+import os
+import statistics
+import time
+
+
+CMD = 'client_file_upload'
+RESKEY = 'cl-BENCHRESKEY0000-0'
+
+
+def _upload_base64_json(data:bytes) -> Tuple[Callable[[], Any], Callable[[Any], bytes]]:
+    """従来の形式のコマンドの変換と復元の関数を返します"""
+    def encode():
+        payload = dict(svpath='/bench', file_name='bench.bin', mkdir=False, overwrite=True, file_data=convert.bytes2b64str(data))
+        return msgframe.pack_text_cmd(CMD, RESKEY, [convert.str2b64str(json.dumps(payload))]).encode('utf-8')
+    def decode(raw:bytes):
+        msg = msgframe.parse_cmd(raw)
+        payload = json.loads(convert.b64str2str(msg[2]))
+        return convert.b64str2bytes(payload['file_data'])
+    return encode, decode
+
+def _upload_frame(data:bytes) -> Tuple[Callable[[], Any], Callable[[Any], bytes]]:
+    """バイナリフレームのコマンドの変換と復元の関数を返します"""
+    def encode():
+        payload = dict(svpath='/bench', file_name='bench.bin', mkdir=False, overwrite=True)
+        return msgframe.pack_cmd(CMD, RESKEY, [convert.str2b64str(json.dumps(payload))], data)
+    def decode(raw:bytes):
+        msg = msgframe.parse_cmd(raw)
+        json.loads(convert.b64str2str(msg[2]))
+        return msg[-1]
+    return encode, decode
+
+def _download_base64_json(data:bytes) -> Tuple[Callable[[], Any], Callable[[Any], bytes]]:
+    """従来の形式の応答の変換と復元の関数を返します"""
+    def encode():
+        res = dict(success=dict(name='bench.bin', mime_type='application/octet-stream', data=convert.bytes2b64str(data)))
+        return json.dumps(res).encode('utf-8')
+    def decode(raw:bytes):
+        res, _ = msgframe.parse_res(raw)
+        return convert.b64str2bytes(res['success']['data'])
+    return encode, decode
+
+def _download_frame(data:bytes) -> Tuple[Callable[[], Any], Callable[[Any], bytes]]:
+    """バイナリフレームの応答の変換と復元の関数を返します"""
+    def encode():
+        res = dict(success=dict(name='bench.bin', mime_type='application/octet-stream'))
+        return msgframe.pack_res(res, data)
+    def decode(raw:bytes):
+        _, body = msgframe.parse_res(raw)
+        return body
+    return encode, decode
+
+CASES = [
+    ('upload', 'base64-json', _upload_base64_json),
+    ('upload', 'frame', _upload_frame),
+    ('download', 'base64-json', _download_base64_json),
+    ('download', 'frame', _download_frame),
+]
+
+def bench(size:int, runs:int) -> List[Dict[str, Any]]:
+    """
+    指定した大きさのペイロードで各形式の変換と復元を計測します。
+
+    Args:
+        size (int): ペイロードのバイト数
+        runs (int): 計測回数
+
+    Returns:
+        List[Dict[str, Any]]: 計測結果
+    """
+    data = os.urandom(size)
+    ret = []
+    for direction, name, factory in CASES:
+        encode, decode = factory(data)
+        enc_times, dec_times = [], []
+        for _ in range(runs):
+            start = time.perf_counter()
+            raw = encode()
+            enc_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            body = decode(raw)
+            dec_times.append(time.perf_counter() - start)
+            if body != data:
+                raise RuntimeError(f"Decoded payload does not match. case={direction}/{name}, size={size}")
+        ret.append(dict(size=size, direction=direction, name=name, wire=len(raw),
+                        enc_ms=statistics.median(enc_times) * 1000, dec_ms=statistics.median(dec_times) * 1000))
+        del raw, body
+    return ret
+
+def _fmt_size(size:int) -> str:
+    for unit, scale in (('MB', 1024 * 1024), ('KB', 1024)):
+        if size >= scale:
+            return f"{size / scale:g}{unit}"
+    return f"{size}B"
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark msgframe binary frames against base64-in-JSON messages.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 1024 * 1024, 50 * 1024 * 1024], help='payload sizes in bytes')
+    parser.add_argument('--runs', type=int, default=5, help='number of runs for each case')
+    args = parser.parse_args()
+
+    print(f"{'payload':>8} {'direction':<9} {'format':<12} {'wire_bytes':>12} {'wire/payload':>12} {'encode_ms':>10} {'decode_ms':>10}")
+    for size in args.sizes:
+        for r in bench(size, args.runs):
+            print(f"{_fmt_size(r['size']):>8} {r['direction']:<9} {r['name']:<12} {r['wire']:>12} {r['wire'] / r['size']:>12.3f} "
+                  f"{r['enc_ms']:>10.3f} {r['dec_ms']:>10.3f}", flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+fwpaths及びrjpathsによるパスの判定のベンチマークです。
+
+``--files`` 件のファイルを ``--dirs`` 個のディレクトリに分けて作成し、``--rules`` 件のルール
+（半分をfwpaths、残りをrjpathsとします）で次の2つの判定方法を比較します。
+
+- ``per-entry``: 従来の判定。エントリごとに ``any(fwpath.startswith(...))`` と ``any(re.match(rjpath, ...))`` を評価し、
+  ``re.search(r'\\.meta/')`` を実行します
+- ``matcher``: ``PathMatcher`` による判定。fwpathsのプレフィックス木と結合してコンパイルした正規表現を使用します
+
+計測する項目は次のとおりです。
+
+- ``check``: 全ファイルのパスを判定する時間（判定のみ）
+- ``file_list``: ``Filer.file_list`` でデータフォルダ全体を再帰的に取得する時間（ディレクトリの一覧はキャッシュ済み）
+
+使い方::
+
+    python benchmarks/bench_pathmatcher.py
+    python benchmarks/bench_pathmatcher.py --files 100000 --dirs 100 --rules 50 --runs 3
+"""
+from cmdbox.app import filer
+from cmdbox.app.commons import pathmatcher
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import logging
+import re
+import shutil
+import statistics
+import tempfile
+import time
+
+
+class _PerEntryMatcher:
+    """従来の判定をエントリごとに行う、 ``PathMatcher`` と同じインターフェースのクラス"""
+    def __init__(self, fwpaths:List[str], rjpaths:List[str]):
+        self.fwpaths = tuple(fwpaths) if fwpaths is not None else None
+        self.rjpaths = list(rjpaths or [])
+
+    def in_bounds(self, path:str) -> bool:
+        return any(fwpath.startswith(path) or path.startswith(fwpath) for fwpath in self.fwpaths or [])
+
+    def is_rejected(self, path:str) -> bool:
+        return any(re.match(rjpath, path) for rjpath in self.rjpaths)
+
+    def is_meta(self, path:str, dir_only:bool=False) -> bool:
+        if dir_only:
+            return re.search(r'\.meta/', path) is not None
+        return re.search(r'\.meta/', path) is not None or re.search(r'\.meta$', path) is not None
+
+    def allowed(self, path:str) -> bool:
+        return self.in_bounds(path) and not self.is_rejected(path) and not self.is_meta(path)
+
+def _rules(dirs:int, rules:int) -> Tuple[List[str], List[str]]:
+    """ベンチマークに使用するfwpathsとrjpathsを返します"""
+    nfw = max(1, rules // 2)
+    fwpaths = [f"/d{i:03d}/" for i in range(min(nfw, dirs))]
+    fwpaths += [f"/notexist{i:03d}/" for i in range(nfw - len(fwpaths))]
+    rjpaths = [rf"^/d{i:03d}/secret\d*\.txt$" for i in range(rules - nfw)]
+    return fwpaths, rjpaths
+
+def _make_files(data_dir:Path, files:int, dirs:int) -> List[str]:
+    """ファイルを作成し、データフォルダからのパスのリストを返します"""
+    paths = []
+    for i in range(files):
+        d = data_dir / f"d{i % dirs:03d}"
+        d.mkdir(exist_ok=True)
+        name = f"secret{i}.txt" if i % 10 == 0 else f"file{i}.txt"
+        (d / name).touch()
+        paths.append(f"/{d.name}/{name}")
+    return paths
+
+def _median_sec(func:Callable[[], Any], runs:int) -> Tuple[float, Any]:
+    """関数をruns回実行し、実行時間の中央値と最後の戻り値を返します"""
+    times, ret = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        ret = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), ret
+
+def _count_allowed(matcher:Any, paths:List[str]) -> int:
+    """判定で許可されたパスの数を返します"""
+    return sum(1 for p in paths if matcher.allowed(p))
+
+def _count_files(tree:Dict[str, Any]) -> int:
+    """file_list の結果に含まれるファイルの数を返します"""
+    count = 0
+    for node in tree.values():
+        if node.get('is_dir'):
+            count += _count_files(node.get('children', {}))
+        else:
+            count += 1
+    return count
+
+def bench(data_dir:Path, paths:List[str], fwpaths:List[str], rjpaths:List[str], runs:int,
+          logger:logging.Logger) -> List[Dict[str, Any]]:
+    """
+    判定方法ごとに判定のみの時間と file_list の時間を計測します。
+
+    Args:
+        data_dir (Path): データフォルダ
+        paths (List[str]): 判定するパスのリスト
+        fwpaths (List[str]): 範囲内かどうかを示すパスのリスト
+        rjpaths (List[str]): 範囲外かどうかを示す正規表現のリスト
+        runs (int): 計測回数
+        logger (logging.Logger): ロガー
+
+    Returns:
+        List[Dict[str, Any]]: 計測結果
+    """
+    org_get = pathmatcher.PathMatcher.get
+    cases = [('per-entry', lambda fw, rj=None: _PerEntryMatcher(fw, rj)),
+             ('matcher', org_get)]
+    fi = filer.Filer(data_dir, logger)
+    ret = []
+    try:
+        for name, get in cases:
+            # Filer の判定方法を差し替える。従来の判定ではリクエストごとにルールを評価し直す
+            pathmatcher.PathMatcher.get = staticmethod(get)
+            # ディレクトリの一覧をキャッシュに読み込み、判定以外の差を小さくする
+            fi.file_list('/', recursive=True, fwpaths=fwpaths, rjpaths=rjpaths)
+            check_sec, allowed = _median_sec(lambda: _count_allowed(get(fwpaths, rjpaths), paths), runs)
+            list_sec, res = _median_sec(lambda: fi.file_list('/', recursive=True, fwpaths=fwpaths, rjpaths=rjpaths), runs)
+            listed = _count_files(res[1]['success'])
+            ret.append(dict(name=name, check_ms=check_sec * 1000, list_ms=list_sec * 1000, allowed=allowed, listed=listed))
+    finally:
+        pathmatcher.PathMatcher.get = org_get
+    return ret
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fwpaths/rjpaths checks: PathMatcher against per-entry checks.')
+    parser.add_argument('--files', type=int, default=100000, help='number of files')
+    parser.add_argument('--dirs', type=int, default=100, help='number of directories')
+    parser.add_argument('--rules', type=int, default=50, help='number of rules (half fwpaths, half rjpaths)')
+    parser.add_argument('--runs', type=int, default=3, help='number of runs for each case')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger('bench_pathmatcher')
+    data_dir = Path(tempfile.mkdtemp(prefix='bench_pathmatcher_'))
+    try:
+        paths = _make_files(data_dir, args.files, args.dirs)
+        fwpaths, rjpaths = _rules(args.dirs, args.rules)
+        print(f"files={args.files} dirs={args.dirs} fwpaths={len(fwpaths)} rjpaths={len(rjpaths)} (median of {args.runs} runs)")
+        print(f"{'case':<10} {'check_ms':>9} {'us/path':>8} {'file_list_ms':>12} {'allowed':>8} {'listed':>8}")
+        for r in bench(data_dir, paths, fwpaths, rjpaths, args.runs, logger):
+            print(f"{r['name']:<10} {r['check_ms']:>9.1f} {r['check_ms'] * 1000 / len(paths):>8.2f} {r['list_ms']:>12.1f} "
+                  f"{r['allowed']:>8} {r['listed']:>8}", flush=True)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+RagSqliteのベクトル検索のベンチマークです。
+
+件数ごとにSQLiteのRAGストアを作成し、次の項目を計測します。
+
+- 登録時間（ ``insert_docs`` ）
+- 総当たり検索（IVFインデックスなし）の1クエリあたりの時間と recall@k
+- IVFインデックスの作成時間（ ``build_index`` ）
+- IVFインデックスを使用した検索の1クエリあたりの時間と recall@k
+
+recall@k は、NumPyで全件の距離を計算した総当たりの結果を正解として算出します。
+ベクトルは埋め込みベクトルに近い分布となるよう、クラスタ中心の周りに正規分布で生成します。
+正解の計算時は同じ乱数の種からブロックごとにベクトルを再生成するため、全件をメモリに保持しません。
+
+使い方::
+
+    python benchmarks/bench_rag_sqlite.py --sizes 10000 100000 1000000 --dim 768
+    python benchmarks/bench_rag_sqlite.py --sizes 10000 --queries 20 --probes 4 8 16
+
+1,000,000件・768次元ではデータベースファイルが約3GBになります。 ``--workdir`` で十分な空きがある場所を指定してください。
+"""
+from cmdbox import version
+from cmdbox.app import app
+from cmdbox.app.features.cli.rag import rag_store
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+import argparse
+import json
+import logging
+import numpy as np
+import shutil
+import tempfile
+import time
+
+
+SERVICENAME = 'bench'
+VEC_MODEL = 'bench-model'
+# ベクトルを生成・登録する1ブロックの行数
+BLOCK_SIZE = 10000
+# 生成するベクトルのクラスタ数
+CLUSTERS = 256
+# クラスタ中心からのばらつき。大きいほどクラスタ同士が重なり、IVFインデックスの recall が下がります
+NOISE = 2.0
+
+
+def _centers(dim:int, seed:int) -> np.ndarray:
+    """ベクトルを生成する際のクラスタ中心を返します"""
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(CLUSTERS, dim)).astype(np.float32)
+
+def _blocks(size:int, dim:int, seed:int) -> Iterator[Tuple[int, np.ndarray]]:
+    """先頭からの位置とベクトルの行列をブロックごとに返します。同じ引数であれば常に同じベクトルを返します"""
+    centers = _centers(dim, seed)
+    for start in range(0, size, BLOCK_SIZE):
+        rng = np.random.default_rng((seed, 0, start))
+        n = min(BLOCK_SIZE, size - start)
+        labels = rng.integers(0, CLUSTERS, n)
+        yield start, centers[labels] + rng.normal(scale=NOISE, size=(n, dim)).astype(np.float32)
+
+def _queries(count:int, dim:int, seed:int) -> np.ndarray:
+    """問い合わせベクトルを返します"""
+    centers = _centers(dim, seed)
+    rng = np.random.default_rng((seed, 1, 0))
+    labels = rng.integers(0, CLUSTERS, count)
+    return centers[labels] + rng.normal(scale=NOISE, size=(count, dim)).astype(np.float32)
+
+def _ground_truth(size:int, dim:int, seed:int, queries:np.ndarray, kcount:int) -> List[set]:
+    """NumPyの総当たりでL2距離が近い上位kcount件のvec_idを返します"""
+    best_d = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_i = np.zeros((len(queries), 0), dtype=np.int64)
+    qq = np.einsum('ij,ij->i', queries, queries)[:, np.newaxis]
+    for start, mat in _blocks(size, dim, seed):
+        d2 = qq - 2.0 * (queries @ mat.T) + np.einsum('ij,ij->i', mat, mat)[np.newaxis, :]
+        d = np.concatenate([best_d, d2], axis=1)
+        i = np.concatenate([best_i, np.broadcast_to(np.arange(start, start + len(mat)), d2.shape)], axis=1)
+        top = np.argpartition(d, min(kcount, d.shape[1]) - 1, axis=1)[:, :kcount]
+        best_d = np.take_along_axis(d, top, axis=1)
+        best_i = np.take_along_axis(i, top, axis=1)
+    return [set(f"v{i}" for i in row) for row in best_i]
+
+def _search(store:rag_store.RagStore, queries:np.ndarray, kcount:int, probes:int=None) -> Tuple[float, List[set]]:
+    """問い合わせベクトルごとに検索し、1クエリあたりの秒数と検索結果のvec_idを返します"""
+    results = []
+    with store.connect() as conn:
+        start = time.perf_counter()
+        for q in queries:
+            res = store.select_doc(connection=conn, select=['vec_id'], servicename=SERVICENAME,
+                                   vec_data=json.dumps(q.tolist()), kcount=kcount, probes=probes)
+            results.append(set(r['vec_id'] for r in res))
+        elapsed = time.perf_counter() - start
+    return elapsed / len(queries), results
+
+def _recall(results:List[set], truth:List[set], kcount:int) -> float:
+    """recall@k の平均を返します"""
+    return float(np.mean([len(r & t) / kcount for r, t in zip(results, truth)]))
+
+def bench(size:int, dim:int, workdir:Path, queries:int, kcount:int, probes:List[int], lists:int,
+          seed:int, logger:logging.Logger) -> List[Dict[str, float]]:
+    """
+    指定した件数でベンチマークを実行します。
+
+    Args:
+        size (int): 登録するベクトルの件数
+        dim (int): ベクトルの次元数
+        workdir (Path): データベースファイルを作成するディレクトリ
+        queries (int): 問い合わせの数
+        kcount (int): 検索結果件数
+        probes (List[int]): IVFインデックスで検索するリストの数
+        lists (int): IVFインデックスのリストの数。0の場合はドキュメント数の平方根
+        seed (int): 乱数の種
+        logger (logging.Logger): ロガー
+
+    Returns:
+        List[Dict[str, float]]: 計測結果
+    """
+    db_path = workdir / f"bench-{size}-{dim}.db"
+    for p in workdir.glob(f"{db_path.name}*"):
+        p.unlink()
+    ds_conf = dict(dsname='bench', dbtype='sqlite', db_path=str(db_path), db_fullpath=str(db_path), db_timeout=120)
+    store = rag_store.RagStore.create(ds_conf, logger, appcls=app.CmdBoxApp, ver=version)
+    store.create_tables(SERVICENAME, embed_vector_dim=dim)
+
+    start = time.perf_counter()
+    with store.connect() as conn:
+        for pos, mat in _blocks(size, dim, seed):
+            store.insert_docs(connection=conn, servicename=SERVICENAME,
+                              docs=[dict(vec_id=f"v{pos + i}", content_text=f"doc {pos + i}", metadata=dict(),
+                                         vec_model=VEC_MODEL, vec_data=v)
+                                    for i, v in enumerate(mat)])
+            conn.commit()
+    insert_sec = time.perf_counter() - start
+
+    qmat = _queries(queries, dim, seed)
+    truth = _ground_truth(size, dim, seed, qmat, kcount)
+    ret = []
+    exact_sec, results = _search(store, qmat, kcount)
+    ret.append(dict(size=size, dim=dim, mode='exact', probes=None, insert_sec=insert_sec, index_sec=None,
+                    query_ms=exact_sec * 1000, recall=_recall(results, truth, kcount)))
+
+    start = time.perf_counter()
+    with store.connect() as conn:
+        nlists = store.build_index(connection=conn, servicename=SERVICENAME, lists=lists if lists > 0 else None)
+    index_sec = time.perf_counter() - start
+    for p in probes:
+        ivf_sec, results = _search(store, qmat, kcount, probes=p)
+        ret.append(dict(size=size, dim=dim, mode=f'ivf(lists={nlists})', probes=p, insert_sec=insert_sec, index_sec=index_sec,
+                        query_ms=ivf_sec * 1000, recall=_recall(results, truth, kcount)))
+    return ret
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RagSqlite vector search (exact and IVF) with recall@k.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='number of vectors')
+    parser.add_argument('--dim', type=int, default=768, help='vector dimension')
+    parser.add_argument('--queries', type=int, default=50, help='number of queries')
+    parser.add_argument('--kcount', type=int, default=10, help='k of recall@k')
+    parser.add_argument('--probes', type=int, nargs='+', default=[8], help='IVF lists to probe')
+    parser.add_argument('--lists', type=int, default=0, help='IVF lists. 0 means sqrt(number of vectors)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--workdir', type=Path, default=None, help='directory for the database files (default: temporary)')
+    parser.add_argument('--keep', action='store_true', help='keep the database files')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger('bench_rag_sqlite')
+    workdir = args.workdir if args.workdir is not None else Path(tempfile.mkdtemp(prefix='bench_rag_sqlite_'))
+    workdir.mkdir(parents=True, exist_ok=True)
+    print(f"{'size':>9} {'dim':>5} {'mode':<18} {'probes':>6} {'insert_s':>9} {'index_s':>8} {'query_ms':>9} {'recall@'+str(args.kcount):>9}")
+    try:
+        for size in args.sizes:
+            for r in bench(size, args.dim, workdir, args.queries, args.kcount, args.probes, args.lists, args.seed, logger):
+                print(f"{r['size']:>9} {r['dim']:>5} {r['mode']:<18} {str(r['probes'] or '-'):>6} {r['insert_sec']:>9.2f} "
+                      f"{'-' if r['index_sec'] is None else format(r['index_sec'], '.2f'):>8} {r['query_ms']:>9.2f} {r['recall']:>9.3f}",
+                      flush=True)
+    finally:
+        if not args.keep and args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+コマンドの応答待ちのベンチマークです。
+
+cmdbox のサーバーを子プロセスで起動し、``Client.file_list`` を ``--concurrency`` 本のスレッドから同時に実行して、
+応答の待ち方ごとに次の項目を比較します。
+
+- ``blpop``: ``RedisClient.send_cmd_sse`` の既定の動作（BLPOP で応答をブロックして待つ）
+- ``polling``: 従来の動作（1ms間隔で LPOP を繰り返して応答を待つ）
+
+計測する項目は次のとおりです。
+
+- クライアントが発行した Redis コマンドの数（ops/s）
+- クライアントの CPU 時間（このプロセスの CPU 時間。サーバーは別プロセスのため含まない）
+- ``file_list`` 1回あたりの応答時間（中央値と最大値）
+
+Redis サーバーが ``INFO`` に対応している場合は、サーバーも含めた Redis 全体の処理コマンド数も表示します。
+
+使い方::
+
+    python benchmarks/bench_redis_wait.py --host localhost --port 6379 --password password
+    python benchmarks/bench_redis_wait.py --concurrency 100 --calls 5 --files 100
+"""
+from cmdbox.app import client
+from cmdbox.app.commons import redis_client
+from pathlib import Path
+from typing import Any, Dict, List
+import argparse
+import logging
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+class _CountingRedis:
+    """
+    redis.Redis を包み、発行したコマンドの数を数えます。
+    ``polling`` の場合は ``blpop`` を従来の 1ms 間隔の ``lpop`` の繰り返しに置き換えます。
+    """
+    def __init__(self, redis_cli:Any, counter:Dict[str, int], lock:threading.Lock, polling:bool):
+        self._redis_cli = redis_cli
+        self._counter = counter
+        self._lock = lock
+        self._polling = polling
+
+    def _count(self) -> None:
+        with self._lock:
+            self._counter['ops'] += 1
+
+    def blpop(self, name:str, timeout:float=0):
+        if not self._polling:
+            self._count()
+            return self._redis_cli.blpop(name, timeout=timeout)
+        end = time.time() + timeout
+        while True:
+            self._count()
+            res = self._redis_cli.lpop(name)
+            if res is not None:
+                return (name, res)
+            if time.time() >= end:
+                return None
+            time.sleep(0.001)
+
+    def __getattr__(self, name:str):
+        attr = getattr(self._redis_cli, name)
+        if not callable(attr):
+            return attr
+        def _wrap(*args, **kwargs):
+            self._count()
+            return attr(*args, **kwargs)
+        return _wrap
+
+def _start_server(args:argparse.Namespace, data_dir:Path, logger:logging.Logger) -> subprocess.Popen:
+    """cmdbox のサーバーを子プロセスで起動し、応答できるようになるまで待ちます"""
+    cmd = [sys.executable, '-m', 'cmdbox', '-m', 'server', '-c', 'start', '--host', args.host, '--port', str(args.port),
+           '--password', args.password, '--svname', args.svname, '--data', str(data_dir)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    cli = redis_client.RedisClient(logger, host=args.host, port=args.port, password=args.password, svname=args.svname)
+    # check_server はサーバー名が見つからない場合にリトライしないため、起動するまでここで繰り返す
+    start = time.time()
+    while not cli.check_server(find_svname=True, retry_count=1, retry_interval=1):
+        if proc.poll() is not None or time.time() - start > 120:
+            proc.terminate()
+            raise RuntimeError(f"Server did not start. svname={args.svname}")
+        time.sleep(1)
+    return proc
+
+def _redis_total_commands(args:argparse.Namespace, logger:logging.Logger) -> int:
+    """Redis サーバー全体の処理コマンド数を返します。INFO に対応していない場合は None を返します"""
+    cli = redis_client.RedisClient(logger, host=args.host, port=args.port, password=args.password, svname=args.svname)
+    try:
+        return int(cli.redis_cli.info('stats')['total_commands_processed'])
+    except Exception:
+        return None
+
+def bench(args:argparse.Namespace, polling:bool, logger:logging.Logger) -> Dict[str, Any]:
+    """
+    ``--concurrency`` 本のスレッドから ``file_list`` を ``--calls`` 回ずつ実行します。
+
+    Args:
+        args (argparse.Namespace): コマンドライン引数
+        polling (bool): Trueの場合は従来の LPOP のポーリングで応答を待つ
+        logger (logging.Logger): ロガー
+
+    Returns:
+        Dict[str, Any]: 計測結果
+    """
+    counter = dict(ops=0)
+    lock = threading.Lock()
+    clients: List[client.Client] = []
+    for _ in range(args.concurrency):
+        cl = client.Client(logger, redis_host=args.host, redis_port=args.port, redis_password=args.password, svname=args.svname)
+        cl.redis_cli.redis_cli = _CountingRedis(cl.redis_cli.redis_cli, counter, lock, polling)
+        clients.append(cl)
+    latencies, errors = [], []
+    barrier = threading.Barrier(args.concurrency + 1)
+    def _run(cl:client.Client):
+        barrier.wait()
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            res = cl.file_list('/', False, scope='server', fwpaths=['/'], rjpaths=[], listregs='.*', timeout=args.timeout)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                if 'success' not in res:
+                    errors.append(res)
+    threads = [threading.Thread(target=_run, args=(cl,)) for cl in clients]
+    for th in threads:
+        th.start()
+    total_start = _redis_total_commands(args, logger)
+    counter['ops'] = 0
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    barrier.wait()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    total_end = _redis_total_commands(args, logger)
+    if errors:
+        logger.warning(f"{len(errors)} calls failed. {errors[0]}")
+    return dict(elapsed=elapsed, ops=counter['ops'] / elapsed, cpu=cpu, cpu_pct=cpu / elapsed * 100,
+                redis_ops=None if total_start is None or total_end is None else (total_end - total_start) / elapsed,
+                p50_ms=statistics.median(latencies) * 1000, max_ms=max(latencies) * 1000, errors=len(errors))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Redis ops and client CPU while waiting for client_file_list replies.')
+    parser.add_argument('--host', default='localhost', help='Redis host')
+    parser.add_argument('--port', type=int, default=6379, help='Redis port')
+    parser.add_argument('--password', default='password', help='Redis password')
+    parser.add_argument('--svname', default='benchwait', help='server name of the benchmark server')
+    parser.add_argument('--concurrency', type=int, default=100, help='number of concurrent clients')
+    parser.add_argument('--calls', type=int, default=5, help='number of file_list calls per client')
+    parser.add_argument('--files', type=int, default=100, help='number of files in the listed directory')
+    parser.add_argument('--timeout', type=int, default=120, help='timeout of each file_list call')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    logger = logging.getLogger('bench_redis_wait')
+    data_dir = Path(tempfile.mkdtemp(prefix='bench_redis_wait_'))
+    proc = None
+    try:
+        for i in range(args.files):
+            (data_dir / f"file{i:05d}.txt").write_text('x')
+        proc = _start_server(args, data_dir, logger)
+        print(f"concurrency={args.concurrency} calls={args.calls} files={args.files}")
+        print(f"{'case':<8} {'elapsed_s':>9} {'client_ops/s':>12} {'redis_ops/s':>11} {'cpu_s':>7} {'cpu_%':>6} {'p50_ms':>8} {'max_ms':>8} {'errors':>6}")
+        for name, polling in (('blpop', False), ('polling', True)):
+            r = bench(args, polling, logger)
+            redis_ops = '-' if r['redis_ops'] is None else format(r['redis_ops'], '.0f')
+            print(f"{name:<8} {r['elapsed']:>9.2f} {r['ops']:>12.0f} {redis_ops:>11} {r['cpu']:>7.2f} {r['cpu_pct']:>6.1f} "
+                  f"{r['p50_ms']:>8.1f} {r['max_ms']:>8.1f} {r['errors']:>6}", flush=True)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+コマンド起動時間のベンチマークです。
+
+``python -X importtime -m cmdbox ...`` を子プロセスで繰り返し実行し、
+フィーチャーのマニフェストが無い場合（cold）と有効なマニフェストがある場合（warm）の次の項目を比較します。
+
+- 起動から終了までの時間（中央値）
+- インポートされたモジュール数
+- インポートの self 時間の合計（中央値）
+- self 時間が長いモジュール
+
+マニフェストは ``~/.{appid}/.features`` に保存されるため、子プロセスの ``HOME`` には一時ディレクトリを指定し、
+利用者のマニフェストには影響を与えません。cold の計測では実行の前に毎回マニフェストを削除します。
+
+使い方::
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --top 20 -- -m rag -c search --help
+"""
+from pathlib import Path
+from typing import Dict, List, Tuple
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# -X importtime の出力行。 "import time: self [us] | cumulative | imported package"
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(.*)$')
+
+
+def _run(cmd:List[str], env:Dict[str, str]) -> Tuple[float, Dict[str, int]]:
+    """
+    コマンドを実行し、経過秒数とモジュールごとのインポートの self 時間（マイクロ秒）を返します。
+
+    Args:
+        cmd (List[str]): 実行するコマンド
+        env (Dict[str, str]): 環境変数
+
+    Returns:
+        Tuple[float, Dict[str, int]]: 経過秒数とモジュールごとの self 時間
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Command failed ({proc.returncode}): {' '.join(cmd)}\n{proc.stderr[-2000:]}")
+    imports = dict()
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if m:
+            imports[m.group(3).strip()] = int(m.group(1))
+    return elapsed, imports
+
+def bench(args:List[str], runs:int, home:Path, cold:bool) -> Dict[str, object]:
+    """
+    起動時間を計測します。
+
+    Args:
+        args (List[str]): cmdbox に渡す引数
+        runs (int): 計測回数
+        home (Path): 子プロセスの HOME に指定するディレクトリ
+        cold (bool): Trueの場合は実行の前に毎回マニフェストを削除する
+
+    Returns:
+        Dict[str, object]: 計測結果
+    """
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+    cmd = [sys.executable, '-X', 'importtime', '-m', 'cmdbox'] + args
+    walls, selfs, modules, last = [], [], [], dict()
+    for _ in range(runs):
+        if cold:
+            for d in home.glob('.*/.features'):
+                shutil.rmtree(d, ignore_errors=True)
+        elapsed, imports = _run(cmd, env)
+        walls.append(elapsed)
+        selfs.append(sum(imports.values()) / 1e6)
+        modules.append(len(imports))
+        last = imports
+    return dict(wall=statistics.median(walls), self=statistics.median(selfs), modules=statistics.median(modules), imports=last)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cmdbox startup with a cold and a warm feature manifest.')
+    parser.add_argument('--runs', type=int, default=5, help='number of runs for each case')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest imports to show')
+    parser.add_argument('cmdargs', nargs='*', default=['-m', 'rag', '-c', 'search', '--help'],
+                        help='arguments passed to cmdbox (put them after "--")')
+    args = parser.parse_args()
+
+    home = Path(tempfile.mkdtemp(prefix='bench_startup_'))
+    try:
+        # 1回目でマニフェストを作成し、以降の warm の計測で使用する
+        bench(args.cmdargs, 1, home, cold=False)
+        results = dict(cold=bench(args.cmdargs, args.runs, home, cold=True),
+                       warm=bench(args.cmdargs, args.runs, home, cold=False))
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    print(f"command: python -X importtime -m cmdbox {' '.join(args.cmdargs)} (median of {args.runs} runs)")
+    print(f"{'case':<6} {'wall_s':>8} {'import_self_s':>14} {'modules':>8}")
+    for name, r in results.items():
+        print(f"{name:<6} {r['wall']:>8.3f} {r['self']:>14.3f} {int(r['modules']):>8}")
+    cold, warm = results['cold'], results['warm']
+    print(f"warm/cold wall: {warm['wall'] / cold['wall']:.2f}, modules not imported when warm: {len(set(cold['imports']) - set(warm['imports']))}")
+    for name, r in results.items():
+        print(f"\nslowest imports ({name}, self us):")
+        for mod, us in sorted(r['imports'].items(), key=lambda x: x[1], reverse=True)[:args.top]:
+            print(f"{us:>10} {mod}")
+
+if __name__ == '__main__':
+    main()
@@ -70,24 +70,7 @@ class CmdBoxApp:
 
         # プラグイン読込み
         sfeatureloadtime = common.perf_counter()
-        common.copy_sample(Path.cwd(), ver=self.ver)
-        self.options._load_features_yml(self.ver, logger=self.default_logger)
-        self.options.load_features_agentrule(self.default_logger)
-        #self.options.load_svcmd('cmdbox.app.features.cli', prefix="cmdbox_", excludes=[],
-        #                        appcls=self.appcls, ver=self.ver, language=self.default_language,
-        #                        logger=self.default_logger, isloaded=self.options.is_features_loaded('cli'))
-        if self.cli_features_packages is not None:
-            if self.cli_features_prefix is None:
-                raise ValueError(f"cli_features_prefix is None. cli_features_packages={self.cli_features_packages}")
-            if len(self.cli_features_prefix) != len(self.cli_features_packages):
-                raise ValueError(f"cli_features_prefix is not match. cli_features_packages={self.cli_features_packages}, cli_features_prefix={self.cli_features_prefix}")
-            for i, pn in enumerate(self.cli_features_packages):
-                self.options.load_svcmd(pn, prefix=self.cli_features_prefix[i], excludes=[],
-                                        appcls=self.appcls, ver=self.ver, language=self.default_language,
-                                        logger=self.default_logger)
-        self.options.load_features_file('cli', self.options.load_svcmd, self.appcls, self.ver, self.default_language, self.default_logger)
-        self.options.load_features_aliases_cli(self.default_logger)
-        self.options.load_features_audit(self.default_logger)
+        self.load_features()
         efeatureloadtime = common.perf_counter()
 
         # コマンド引数の生成
@@ -203,6 +186,110 @@ class CmdBoxApp:
             # ログの状態をwebcallから戻す
             self.load_config(args, webcall=False)
 
+    def load_features(self):
+        """
+        プラグインのフィーチャーとfeatures.ymlの設定を読み込みます。
+        """
+        common.copy_sample(Path.cwd(), ver=self.ver)
+        self.options._load_features_yml(self.ver, logger=self.default_logger)
+        self.options.load_features_agentrule(self.default_logger)
+        #self.options.load_svcmd('cmdbox.app.features.cli', prefix="cmdbox_", excludes=[],
+        #                        appcls=self.appcls, ver=self.ver, language=self.default_language,
+        #                        logger=self.default_logger, isloaded=self.options.is_features_loaded('cli'))
+        if self.cli_features_packages is not None:
+            if self.cli_features_prefix is None:
+                raise ValueError(f"cli_features_prefix is None. cli_features_packages={self.cli_features_packages}")
+            if len(self.cli_features_prefix) != len(self.cli_features_packages):
+                raise ValueError(f"cli_features_prefix is not match. cli_features_packages={self.cli_features_packages}, cli_features_prefix={self.cli_features_prefix}")
+            for i, pn in enumerate(self.cli_features_packages):
+                self.options.load_svcmd(pn, prefix=self.cli_features_prefix[i], excludes=[],
+                                        appcls=self.appcls, ver=self.ver, language=self.default_language,
+                                        logger=self.default_logger)
+        self.options.load_features_file('cli', self.options.load_svcmd, self.appcls, self.ver, self.default_language, self.default_logger)
+        self.options.load_features_aliases_cli(self.default_logger)
+        self.options.load_features_audit(self.default_logger)
+
+    def dispatch(self, opt:dict, resqueue:queue.Queue=None):
+        """
+        Webから指定されたオプションの辞書でコマンドを実行します。
+        ``main`` と異なり、引数リストの作成と解析、ロガーの設定を毎回行わずにフィーチャーの ``apprun`` を呼び出します。
+        フィーチャーは ``main`` で読込み済みである必要があります。
+        コマンドの標準出力を取得する場合は ``common.redirect_stdio`` と組み合わせて使用します。
+
+        Args:
+            opt (dict): オプションの辞書。modeとcmdを含む
+            resqueue (queue.Queue, optional): コマンド実行結果を格納するキュー. Defaults to None.
+
+        Returns:
+            Tuple[int, Dict[str, Any], Any]: 戻り値のタプル。0は成功、1は失敗、2はキャンセル
+        """
+        smaintime = common.perf_counter()
+        if not hasattr(self, 'default_language'):
+            # mainを経由せずに呼び出された場合はフィーチャーを読み込む
+            self.default_logger = common.default_logger(False, ver=self.ver, webcall=True)
+            self.default_language = 'ja_JP' if common.is_japan() else 'en_US'
+            self.load_features()
+        language = self.default_language
+        sargsparsetime = common.perf_counter()
+        try:
+            args = self.options.mk_args(opt, language=language)
+        except argparse.ArgumentError as e:
+            msg = dict(warn=f"ArgumentError: {e}")
+            common.print_format(msg, False, 0, None, False)
+            if resqueue is not None: resqueue.put(msg)
+            return feature.Feature.RESP_WARN, msg, None
+        eargsparsetime = common.perf_counter()
+
+        if not hasattr(args, 'data') or args.data is None:
+            args.data = str(Path.home() / f".{self.ver.__appid__}")
+
+        if args.mode is None:
+            msg = dict(warn=f"mode is None. Please specify the --help option.")
+            common.print_format(msg, args.format, smaintime, args.output_json, args.output_json_append)
+            if resqueue is not None: resqueue.put(msg)
+            return feature.Feature.RESP_WARN, msg, None
+
+        sloggerinittime = common.perf_counter()
+        logger = self.dispatch_logger(args)
+        eloggerinittime = common.perf_counter()
+
+        feat = self.options.get_cmd_attr(args.mode, args.cmd, 'feature')
+        if feat is not None and isinstance(feat, feature.Feature):
+            pf = []
+            pf.append(dict(key="argsparse", val=f"{eargsparsetime-sargsparsetime:.03f}s"))
+            pf.append(dict(key="loggerinit", val=f"{eloggerinittime-sloggerinittime:.03f}s"))
+            self.options.audit_exec(args, logger, feat, audit_type=options.Options.AT_EVENT)
+            args._resqueue = resqueue # コマンド実行結果を格納するキューを引数に追加
+            return common.exec_sync(feat.apprun, logger, args, smaintime, pf, True)
+        msg = dict(warn=f"Unkown mode or cmd. mode={args.mode}, cmd={args.cmd}")
+        if resqueue is not None: resqueue.put(msg)
+        common.print_format(msg, args.format, smaintime, args.output_json, args.output_json_append)
+        return feature.Feature.RESP_WARN, msg, None
+
+    def dispatch_logger(self, args:argparse.Namespace) -> logging.Logger:
+        """
+        ``dispatch`` で使用するロガーを返します。
+        ロガーの設定はモードとデータディレクトリごとに一度だけ読み込み、
+        ``main`` によりwebcallの状態から戻された場合は読み込み直します。
+
+        Args:
+            args (argparse.Namespace): コマンドの引数
+
+        Returns:
+            logging.Logger: ロガー
+        """
+        if not hasattr(self, '_dispatch_loggers'):
+            self._dispatch_loggers = dict()
+        key = (args.mode, args.data)
+        logger = self._dispatch_loggers.get(key)
+        if logger is None or not common.get_common_value('webcall', False):
+            common.mklogdir(args.data)
+            logger = self.load_config(args, webcall=True)
+            self._dispatch_loggers[key] = logger
+        elif (logger.level == logging.DEBUG) != bool(args.debug):
+            common.set_debug(logger, args.debug)
+        return logger
+
     def load_config(self, args:argparse.Namespace, webcall:bool=False) -> logging.Logger:
         """
         アプリケーションの設定を読み込みます。
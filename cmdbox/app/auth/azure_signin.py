@@ -3,7 +3,6 @@ from fastapi import Request, Response, HTTPException
 from typing import Any, Dict, Tuple
 import requests
 import urllib
-import copy
 
 
 class AzureSignin(Signin):
@@ -53,8 +52,8 @@ class AzureSignin(Signin):
         groups_info_json = groups_info_resp.json()
         if isinstance(groups_info_json, dict) and isinstance(groups_info_json.get('value'), list):
             gids = [row['id'] for row in groups_info_json.get('value', [])]
-            copy_signin_data = copy.deepcopy(self.signin_file_data)
-            groups = [g for g in copy_signin_data['groups'] if g['gid'] in gids]
+            signin_data = self.signin_file_data
+            groups = [g for g in signin_data['groups'] if g['gid'] in gids]
             group_names = [g["name"] for g in groups]
             group_homes = [g["home"] for g in groups]
             name = email.split('@')[0] if email and '@' in email else user['displayName']
@@ -3,7 +3,6 @@ from fastapi import Request, Response
 from typing import Any, Dict, Tuple, Union
 from fastapi.responses import RedirectResponse
 import requests
-import copy
 import logging
 
 
@@ -66,8 +65,8 @@ class AzureSigninProxy(signin.Signin):
         if not isinstance(groups_info_json, dict) or not isinstance(groups_info_json.get('value'), list):
             return RedirectResponse(url=f'/signin{req.url.path}?error=invalid')
         gids = [row['id'] for row in groups_info_json.get('value', [])]
-        copy_signin_data = copy.deepcopy(self.signin_file_data)
-        groups = [g for g in copy_signin_data['groups'] if g['gid'] in gids]
+        signin_data = self.signin_file_data
+        groups = [g for g in signin_data['groups'] if g['gid'] in gids]
         group_names = [g["name"] for g in groups]
         group_homes = [g["home"] for g in groups]
         user = dict(uid=uid, name=name, home=f'.users/{name}', password='', email=email,
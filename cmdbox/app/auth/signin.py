@@ -1,5 +1,5 @@
 from cmdbox.app import common, options
-from cmdbox.app.commons import convert, redis_client
+from cmdbox.app.commons import convert, frozen, redis_client
 from cryptography import x509
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
@@ -11,6 +11,7 @@ import argparse
 import copy
 import contextvars
 import datetime
+import hashlib
 import importlib
 import inspect
 import logging
@@ -18,6 +19,7 @@ import json
 import jwt
 import re
 import string
+import uuid
 
 def getDefaultInstance(logger:logging.Logger, signin_file:Path, signin_file_data:Dict[str, Any],
                        redis_cli:redis_client.RedisClient, appcls, ver, language:str):
@@ -38,7 +40,204 @@ def getDefaultInstance(logger:logging.Logger, signin_file:Path, signin_file_data
         logger.error(f'Failed to load signin. {e}', exc_info=True)
         raise e
 
+class SigninIndex(object):
+    """
+    サインインデータの検索用インデックス。
+    ユーザー名、メールアドレス、ApiKeyのハッシュからユーザーを引く辞書と、
+    グループの組合せごとのグループ情報、パスルール、コマンドルールの判定表を、初めて参照された時に作成して保持します。
+    インデックスはサインインデータを変更しない前提で作成するため、 ``Signin.get_index`` から取得してください。
+    """
+    def __init__(self, signin_file_data:Dict[str, Any]):
+        """
+        コンストラクタ
+
+        Args:
+            signin_file_data (Dict[str, Any]): サインインファイルデータ（変更不可）
+        """
+        self.signin_file_data = signin_file_data
+        self._users_by_name:Dict[str, List[Dict[str, Any]]] = None
+        self._users_by_email:Dict[str, List[Dict[str, Any]]] = None
+        self._apikeys:Dict[bytes, Tuple[Dict[str, Any], Dict[str, str]]] = None
+        self._apikeys_webcls = None
+        self._parents:Dict[Tuple[str, ...], List[str]] = dict()
+        self._group_info:Dict[frozenset, Tuple[List[int], List[str]]] = dict()
+        self._pathrules:Dict[frozenset, List[Tuple[List[str], str]]] = dict()
+        self._cmdrules:Dict[frozenset, List[Dict[str, Any]]] = dict()
+        self._cmd_decisions:Dict[Tuple[frozenset, str, str], Tuple[str, List[Dict[str, str]]]] = dict()
+
+    def users_by_name(self, name:str) -> List[Dict[str, Any]]:
+        """
+        ユーザー名が一致するユーザーをサインインファイルの順に返します
+
+        Args:
+            name (str): ユーザー名
+
+        Returns:
+            List[Dict[str, Any]]: ユーザーデータのリスト
+        """
+        if self._users_by_name is None:
+            users_by_name = dict()
+            for u in self.signin_file_data['users']:
+                users_by_name.setdefault(u.get('name'), []).append(u)
+            self._users_by_name = users_by_name
+        return self._users_by_name.get(name, [])
+
+    def users_by_email(self, email:str) -> List[Dict[str, Any]]:
+        """
+        メールアドレスが一致するユーザーをサインインファイルの順に返します
+
+        Args:
+            email (str): メールアドレス
+
+        Returns:
+            List[Dict[str, Any]]: ユーザーデータのリスト
+        """
+        if self._users_by_email is None:
+            users_by_email = dict()
+            for u in self.signin_file_data['users']:
+                users_by_email.setdefault(u.get('email'), []).append(u)
+            self._users_by_email = users_by_email
+        return self._users_by_email.get(email, [])
+
+    def find_apikey(self, apikey:str) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        ApiKeyを持つユーザーを返します。
+        複数のユーザーが同じApiKeyを持つ場合は、サインインファイルの後ろのユーザーを返します。
+
+        Args:
+            apikey (str): ApiKey
+
+        Returns:
+            Tuple[Dict[str, Any], Dict[str, str]]: (ユーザーデータ, ユーザーのApiKey一覧)。見つからない場合は(None, None)
+        """
+        webcls = getattr(Signin, 'web_cls', None)
+        if self._apikeys is None or self._apikeys_webcls is not webcls:
+            # ApiKeyはユーザーデータからも読み込むため、Webクラスが設定された時に作り直す
+            apikeys_index = dict()
+            for u in self.signin_file_data['users']:
+                apikeys = Signin._resolve_user_apikeys(self.signin_file_data, u)
+                for key in apikeys.values():
+                    if isinstance(key, str):
+                        apikeys_index[hashlib.sha256(key.encode('utf-8')).digest()] = (u, apikeys)
+            self._apikeys = apikeys_index
+            self._apikeys_webcls = webcls
+        found = self._apikeys.get(hashlib.sha256(apikey.encode('utf-8')).digest())
+        if found is None:
+            return None, None
+        return found[0], copy.deepcopy(found[1])
+
+    def parent_group(self, group_names:List[str]) -> List[str]:
+        """
+        ``Signin.parent_group`` の結果をグループ名リストごとにキャッシュして返します
+
+        Args:
+            group_names (List[str]): グループ名リスト
+
+        Returns:
+            List[str]: グループ名と親グループ名のリスト
+        """
+        key = tuple(group_names)
+        gns = self._parents.get(key)
+        if gns is None:
+            gns = Signin.parent_group(self.signin_file_data, list(group_names))
+            self._parents[key] = gns
+        return gns.copy()
+
+    def group_info(self, group_names:List[str]) -> Tuple[List[int], List[str]]:
+        """
+        グループ名に一致するグループのIDとホームをサインインファイルの順に返します
+
+        Args:
+            group_names (List[str]): グループ名リスト
+
+        Returns:
+            Tuple[List[int], List[str]]: (グループID, グループホーム)
+        """
+        key = frozenset(group_names)
+        info = self._group_info.get(key)
+        if info is None:
+            groups = [g for g in self.signin_file_data['groups'] if g['name'] in key]
+            info = ([g['gid'] for g in groups], [g['home'] for g in groups])
+            self._group_info[key] = info
+        return info[0].copy(), info[1].copy()
+
+    def path_jadge(self, user_groups:List[str], path:str) -> str:
+        """
+        パスルールの判定結果を返します。
+        ユーザーグループの組合せごとに該当するルールを絞り込んだ判定表を作成し、後ろのルールから照合します。
+
+        Args:
+            user_groups (List[str]): ユーザーグループ
+            path (str): リクエストパス
+
+        Returns:
+            str: allow 又は deny
+        """
+        key = frozenset(user_groups)
+        rules = self._pathrules.get(key)
+        if rules is None:
+            rules = [(rule['paths'], rule['rule']) for rule in reversed(self.signin_file_data['pathrule']['rules'])
+                     if len([g for g in rule['groups'] if g in key]) > 0]
+            self._pathrules[key] = rules
+        for paths, rule in rules:
+            if len([p for p in paths if path.startswith(p)]) > 0:
+                return rule
+        return self.signin_file_data['pathrule']['policy']
+
+    def cmd_rules(self, user_groups:List[str]) -> List[Dict[str, Any]]:
+        """
+        ユーザーグループに該当するコマンドルールをサインインファイルの順に返します
+
+        Args:
+            user_groups (List[str]): ユーザーグループ
+
+        Returns:
+            List[Dict[str, Any]]: コマンドルールのリスト
+        """
+        key = frozenset(user_groups)
+        rules = self._cmdrules.get(key)
+        if rules is None:
+            rules = [rule for rule in self.signin_file_data['cmdrule']['rules']
+                     if len([g for g in rule['groups'] if g in key]) > 0]
+            self._cmdrules[key] = rules
+        return rules
+
+    def cmd_decision(self, user_groups:List[str], mode:str, cmd:str) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        コマンドルールの判定結果と、適用するコマンドオプションの強制設定を返します
+
+        Args:
+            user_groups (List[str]): ユーザーグループ
+            mode (str): モード
+            cmd (str): コマンド
+
+        Returns:
+            Tuple[str, List[Dict[str, str]]]: (allow 又は deny, 適用する順の強制設定のリスト)
+        """
+        key = (frozenset(user_groups), mode, cmd)
+        decision = self._cmd_decisions.get(key)
+        if decision is None:
+            jadge = self.signin_file_data['cmdrule']['policy']
+            coercions = []
+            for rule in self.cmd_rules(user_groups):
+                if rule['mode'] is not None:
+                    if rule['mode'] != mode:
+                        continue
+                    if rule['cmds'] and len([c for c in rule['cmds'] if cmd == c]) <= 0:
+                        continue
+                if 'coercion' in rule:
+                    coercions.append(rule['coercion'])
+                jadge = rule['rule']
+            decision = (jadge, coercions)
+            self._cmd_decisions[key] = decision
+        return decision
+
 class Signin(object):
+    # Redisのキーごとにキャッシュしたサインインデータの世代と変更できないビュー
+    _data_cache:Dict[Tuple[Any, Any, str], Tuple[bytes, Dict[str, Any]]] = dict()
+    # 変更できないサインインデータごとの検索用インデックス
+    _index_cache:Dict[int, Tuple[Dict[str, Any], SigninIndex]] = dict()
+    _index_cache_size:int = 4
 
     @classmethod
     def getInstance(cls, logger:logging.Logger, signin_file:Path, signin_file_data:Dict[str, Any],
@@ -64,17 +263,30 @@ class Signin(object):
     @property
     def signin_file_data(self) -> Dict[str, Any]:
         """
-        サインインデータを返します
+        サインインデータを返します。
+        データはRedisの世代が変わった時だけ読み込み直し、プロセス内でキャッシュした変更できないビューを返します。
+        変更する場合は ``copy.deepcopy`` で変更可能なコピーを作成し、変更後にこのプロパティに設定してください。
 
         Returns:
             Dict[str, Any]: サインインデータ
         """
-        json_str = self.redis_cli.hget(self.redis_cli.memname, "signin_file_data")
+        key = (self.redis_cli.host, self.redis_cli.port, self.redis_cli.memname)
+        gen = self.redis_cli.hget(self.redis_cli.memname, "signin_file_gen")
+        cached = Signin._data_cache.get(key)
+        if gen is not None and cached is not None and cached[0] == gen:
+            return cached[1]
+        pipe = self.redis_cli.pipeline()
+        pipe.hget(self.redis_cli.memname, "signin_file_gen")
+        pipe.hget(self.redis_cli.memname, "signin_file_data")
+        gen, json_str = pipe.execute()
         try:
-            return json.loads(json_str)
+            data = frozen.freeze(json.loads(json_str))
         except Exception as e:
             self.logger.error(f"Failed to load signin_file_data from redis. data={json_str}, error={e}")
             return None
+        if gen is not None:
+            Signin._data_cache[key] = (gen, data)
+        return data
 
     @signin_file_data.setter
     def signin_file_data(self, signin_file_data) -> None:
@@ -87,7 +299,40 @@ class Signin(object):
         if signin_file_data is None:
             self.logger.warning("Since you attempted to set signin_file_data to none, the configuration will be skipped.", exc_info=True)
             return
-        self.redis_cli.hset(self.redis_cli.memname, "signin_file_data", common.to_str(signin_file_data))
+        # 世代は書込みごとに一意な値とし、Redisが初期化された場合も古いキャッシュと一致しないようにする
+        json_str = json.dumps(signin_file_data, default=common.default_json_enc)
+        gen = uuid.uuid4().hex
+        pipe = self.redis_cli.pipeline()
+        pipe.hset(self.redis_cli.memname, "signin_file_data", json_str)
+        pipe.hset(self.redis_cli.memname, "signin_file_gen", gen)
+        pipe.execute()
+        Signin._data_cache[(self.redis_cli.host, self.redis_cli.port, self.redis_cli.memname)] = \
+            (gen.encode('utf-8'), frozen.freeze(json.loads(json_str)))
+
+    @classmethod
+    def get_index(cls, signin_file_data:Dict[str, Any]) -> SigninIndex:
+        """
+        サインインデータの検索用インデックスを返します。
+        変更できないサインインデータのインデックスは世代ごとに1度だけ作成して共有し、
+        変更可能なサインインデータの場合は呼び出しごとに作成します。
+
+        Args:
+            signin_file_data (Dict[str, Any]): サインインファイルデータ
+
+        Returns:
+            SigninIndex: 検索用インデックス
+        """
+        if not isinstance(signin_file_data, frozen.FrozenDict):
+            return SigninIndex(signin_file_data)
+        cached = Signin._index_cache.get(id(signin_file_data))
+        if cached is not None and cached[0] is signin_file_data:
+            return cached[1]
+        index = SigninIndex(signin_file_data)
+        while len(Signin._index_cache) >= Signin._index_cache_size:
+            Signin._index_cache.pop(next(iter(Signin._index_cache)), None)
+        # キャッシュがサインインデータを保持するため、idが別のデータに再利用されることはない
+        Signin._index_cache[id(signin_file_data)] = (signin_file_data, index)
+        return index
 
     def jadge(self, data:Any, email:str) -> Tuple[bool, Dict[str, Any]]:
         """
@@ -101,9 +346,9 @@ class Signin(object):
         Returns:
             Tuple[bool, Dict[str, Any]]: (成功かどうか, ユーザーデータ)
         """
-        copy_signin_data = copy.deepcopy(self.signin_file_data)
-        users = [u for u in copy_signin_data['users'] if u['email'] == email and u['hash'] == 'oauth2']
-        return len(users) > 0, users[0] if len(users) > 0 else None
+        signin_data = self.signin_file_data
+        users = [u for u in Signin.get_index(signin_data).users_by_email(email) if u['hash'] == 'oauth2']
+        return len(users) > 0, copy.deepcopy(users[0]) if len(users) > 0 else None
 
     def get_groups(self, access_token:str, user:Dict[str, Any]) -> Tuple[List[str], List[int]]:
         """
@@ -116,9 +361,9 @@ class Signin(object):
         Returns:
             Tuple[List[str], List[int]]: (グループ名, グループID)
         """
-        copy_signin_data = copy.deepcopy(self.signin_file_data)
-        group_names = list(set(self.__class__.parent_group(copy_signin_data, user['groups'])))
-        gids = [g['gid'] for g in copy_signin_data['groups'] if g['name'] in group_names]
+        index = Signin.get_index(self.signin_file_data)
+        group_names = list(set(index.parent_group(user['groups'])))
+        gids, _ = index.group_info(group_names)
         return group_names, gids
 
     @classmethod
@@ -140,7 +385,7 @@ class Signin(object):
         """
         if req is None or not 'Origin' in req.headers.keys():
             return
-        res.headers['Access-Control-Allow-Origin'] = res.headers['Origin']
+        res.headers['Access-Control-Allow-Origin'] = req.headers['Origin']
 
     def check_signin(self, req:Request, res:Response) -> Union[None, RedirectResponse]:
         """
@@ -219,45 +464,40 @@ class Signin(object):
         if not auth.startswith('Bearer '):
             return RedirectResponse(url=f'/signin{req.url.path}?error=apikeyfail')
         apikey = auth.replace('Bearer ', '').strip()
+        index = Signin.get_index(signin_file_data)
         find_user = None
-        jwt_enabled = signin_file_data['apikey']['verify_jwt']['enabled']
-        for user in signin_file_data['users']:
-            apikeys = Signin._resolve_user_apikeys(signin_file_data, user)
-            if not apikeys:
-                continue
-            for ak, key in apikeys.items():
-                if apikey == key:
-                    if jwt_enabled:
-                        publickey = None
-                        if hasattr(self, 'verify_jwt_certificate') and self.verify_jwt_certificate is not None:
-                            publickey = self.verify_jwt_certificate.public_key()
-                        if hasattr(self, 'verify_jwt_publickey') and self.verify_jwt_publickey is not None:
-                            publickey = self.verify_jwt_publickey
-                        algorithm = signin_file_data['apikey']['verify_jwt']['algorithm']
-                        issuer = signin_file_data['apikey']['verify_jwt']['issuer']
-                        audience = signin_file_data['apikey']['verify_jwt']['audience']
-                        claims:Dict = jwt.decode(apikey, publickey, algorithms=[algorithm],
-                                            issuer=issuer, audience=audience,
-                                            options={'verify_iss': issuer is not None,
-                                                     'verify_aud': audience is not None},)
-                        claims.update(user)
-                        claims['apikeys'] = apikeys
-                        find_user = claims
-                        find_user['uid'] = find_user['uid'] if 'uid' in find_user else -1
-                        find_user['name'] = find_user['name'] if 'name' in find_user else None
-                        find_user['groups'] = find_user['groups'] if 'groups' in find_user else None
-                        find_user['email'] = find_user['email'] if 'email' in find_user else None
-                        find_user['apikey_name'] = find_user['apikey_name'] if 'apikey_name' in find_user else None
-                    else:
-                        find_user = copy.deepcopy(user)
-                        find_user['apikeys'] = apikeys
+        user, apikeys = index.find_apikey(apikey)
+        if user is not None:
+            if signin_file_data['apikey']['verify_jwt']['enabled']:
+                publickey = None
+                if hasattr(self, 'verify_jwt_certificate') and self.verify_jwt_certificate is not None:
+                    publickey = self.verify_jwt_certificate.public_key()
+                if hasattr(self, 'verify_jwt_publickey') and self.verify_jwt_publickey is not None:
+                    publickey = self.verify_jwt_publickey
+                algorithm = signin_file_data['apikey']['verify_jwt']['algorithm']
+                issuer = signin_file_data['apikey']['verify_jwt']['issuer']
+                audience = signin_file_data['apikey']['verify_jwt']['audience']
+                claims:Dict = jwt.decode(apikey, publickey, algorithms=[algorithm],
+                                    issuer=issuer, audience=audience,
+                                    options={'verify_iss': issuer is not None,
+                                             'verify_aud': audience is not None},)
+                claims.update(copy.deepcopy(user))
+                claims['apikeys'] = apikeys
+                find_user = claims
+                find_user['uid'] = find_user['uid'] if 'uid' in find_user else -1
+                find_user['name'] = find_user['name'] if 'name' in find_user else None
+                find_user['groups'] = find_user['groups'] if 'groups' in find_user else None
+                find_user['email'] = find_user['email'] if 'email' in find_user else None
+                find_user['apikey_name'] = find_user['apikey_name'] if 'apikey_name' in find_user else None
+            else:
+                find_user = copy.deepcopy(user)
+                find_user['apikeys'] = apikeys
         if find_user is None:
             logger.warning(f"No matching user found for apikey.")
             return RedirectResponse(url=f'/signin{req.url.path}?error=apikeyfail')
 
-        group_names = list(set(Signin.parent_group(signin_file_data, find_user['groups'])))
-        gids = [g['gid'] for g in signin_file_data['groups'] if g['name'] in group_names]
-        group_homes = [g["home"] for g in signin_file_data['groups'] if g['name'] in group_names]
+        group_names = list(set(index.parent_group(find_user['groups'])))
+        gids, group_homes = index.group_info(group_names)
         req.session['signin'] = dict(uid=find_user['uid'], name=find_user['name'], password=find_user['password'],
                                      gids=gids, groups=group_names, group_homes=group_homes, apikey=apikey)
         req.session['apikeys'] = find_user.get('apikeys', None)
@@ -283,13 +523,7 @@ class Signin(object):
         # パスルールチェック
         user_groups = find_user['groups']
         path = path if path.startswith('/') else f'/{path}'
-        jadge = signin_file_data['pathrule']['policy']
-        for rule in signin_file_data['pathrule']['rules']:
-            if len([g for g in rule['groups'] if g in user_groups]) <= 0:
-                continue
-            if len([p for p in rule['paths'] if path.startswith(p)]) <= 0:
-                continue
-            jadge = rule['rule']
+        jadge = Signin.get_index(signin_file_data).path_jadge(user_groups, path)
         if logger.level == logging.DEBUG:
             logger.debug(f"path rule: {path}: {jadge}")
         if jadge == 'allow':
@@ -309,8 +543,7 @@ class Signin(object):
         Returns:
             Dict[str, Any]: ユーザーデータ
         """
-        copy_signin_data = copy.deepcopy(signin_file_data)
-        users = [u for u in copy_signin_data['users'] if u['name'] == name]
+        users = Signin.get_index(signin_file_data).users_by_name(name)
         return users[0] if len(users) > 0 else None
 
     @classmethod
@@ -757,12 +990,11 @@ class Signin(object):
             group_names (List[str]): グループ名リスト
             master_groups (List[Dict[str, Any]], optional): 親グループ名. Defaults to None.
         """
-        copy_signin_data = copy.deepcopy(dict(groups=signin_file_data['groups']))
-        master_groups = copy_signin_data['groups'] if master_groups is None else master_groups
+        master_groups = signin_file_data['groups'] if master_groups is None else master_groups
         gns = []
         for gn in group_names.copy():
             gns = [gr['name'] for gr in master_groups if 'parent' in gr and gr['parent']==gn]
-            gns += cls.correct_group(copy_signin_data, gns, master_groups)
+            gns += cls.correct_group(signin_file_data, gns, master_groups)
         return group_names + gns
 
     @classmethod
@@ -775,12 +1007,11 @@ class Signin(object):
             group_names (List[str]): グループ名リスト
             master_groups (List[Dict[str, Any]], optional): 親グループ名. Defaults to None.
         """
-        copy_signin_data = copy.deepcopy(dict(groups=signin_file_data['groups']))
-        master_groups = copy_signin_data['groups'] if master_groups is None else master_groups
+        master_groups = signin_file_data['groups'] if master_groups is None else master_groups
         gns = []
         for gn in group_names.copy():
             gns = [gr['parent'] for gr in master_groups if 'parent' in gr and gr['name']==gn]
-            gns += cls.parent_group(copy_signin_data, gns, master_groups)
+            gns += cls.parent_group(signin_file_data, gns, master_groups)
         return group_names + gns
 
     @classmethod
@@ -848,19 +1079,13 @@ class Signin(object):
         apikey = common.hash_password(apikey.strip(), 'sha1')
         if logger.level == logging.DEBUG:
             logger.debug(f"hashed apikey: {apikey}")
-        find_user = None
-        for user in signin_file_data['users']:
-            apikeys = cls._resolve_user_apikeys(signin_file_data, user)
-            if not apikeys:
-                continue
-            for ak, key in apikeys.items():
-                if apikey == key:
-                    find_user = user
+        index = Signin.get_index(signin_file_data)
+        find_user, _ = index.find_apikey(apikey)
         if find_user is None:
             logger.warning(f"No matching user found for apikey.")
             return dict(warn='No matching user found for apikey.')
 
-        group_names = list(set(Signin.parent_group(signin_file_data, find_user['groups'])))
+        group_names = list(set(index.parent_group(find_user['groups'])))
         return dict(success=group_names)
 
     @classmethod
@@ -896,22 +1121,13 @@ class Signin(object):
         if not ref_opt.get_cmd_attr(mode, cmd, 'opt'):
             return False
         # コマンドチェック
-        jadge = signin_file_data['cmdrule']['policy']
-        for rule in signin_file_data['cmdrule']['rules']:
-            if len([g for g in rule['groups'] if g in user_groups]) <= 0:
-                continue
-            if rule['mode'] is not None:
-                if rule['mode'] != mode:
-                    continue
-                if rule['cmds'] and len([c for c in rule['cmds'] if cmd == c]) <= 0:
-                    continue
-            # コマンドオプションの強制設定
-            if 'coercion' in rule:
-                for key, value in rule['coercion'].items():
-                    opt[key] = eval(value, {}, dict(user_name=user_name, groups=user_groups,
-                                                    mode=mode, cmd=cmd, opt=opt, user_session=user_session,
-                                                    appcls=appcls, ver=ver, language=language))
-            jadge = rule['rule']
+        jadge, coercions = cls.get_index(signin_file_data).cmd_decision(user_groups, mode, cmd)
+        # コマンドオプションの強制設定
+        for coercion in coercions:
+            for key, value in coercion.items():
+                opt[key] = eval(value, {}, dict(user_name=user_name, groups=user_groups,
+                                                mode=mode, cmd=cmd, opt=opt, user_session=user_session,
+                                                appcls=appcls, ver=ver, language=language))
         if logger.level == logging.DEBUG:
             logger.debug(f"cmd rule: mode={mode}, cmd={cmd}: {jadge}")
         return jadge == 'allow'
@@ -939,9 +1155,7 @@ class Signin(object):
         if jadge == 'allow':
             for m in modes:
                 jadge_modes += list(m.keys()) if type(m) is dict else [m]
-        for rule in data['cmdrule']['rules']:
-            if len([g for g in rule['groups'] if g in user_groups]) <= 0:
-                continue
+        for rule in Signin.get_index(data).cmd_rules(user_groups):
             if 'mode' not in rule:
                 continue
             if rule['mode'] is not None:
@@ -984,9 +1198,7 @@ class Signin(object):
         if jadge == 'allow':
             for c in cmds:
                 jadge_cmds += list(c.keys()) if type(c) is dict else [c]
-        for rule in data['cmdrule']['rules']:
-            if len([g for g in rule['groups'] if g in user_groups]) <= 0:
-                continue
+        for rule in Signin.get_index(data).cmd_rules(user_groups):
             if 'mode' not in rule:
                 continue
             if 'cmds' not in rule:
@@ -1224,3 +1436,22 @@ def set_request_scope(scope: Dict[str, Any]) -> None:
         scope (Dict[str, Any]): リクエストスコープ
     """
     request_scope.set(scope)
+
+def get_request_user(req:Union[Request, WebSocket]=None) -> Union[str, None]:
+    """
+    リクエストのサインインユーザー名を取得します。
+    リクエストを省略した場合は、リクエストスコープのリクエスト又はWebSocket接続を使用します。
+
+    Args:
+        req (Union[Request, WebSocket], optional): リクエスト又はWebSocket接続. Defaults to None.
+
+    Returns:
+        Union[str, None]: サインインユーザー名。サインインしていない場合はNone
+    """
+    if req is None:
+        scope = get_request_scope()
+        req = scope.get('req') if scope.get('req') is not None else scope.get('websocket')
+    if req is None or 'session' not in req.scope:
+        return None
+    sess = req.session.get('signin', None)
+    return sess.get('name', None) if isinstance(sess, dict) else None
@@ -19,9 +19,9 @@ class SigninSAML(Signin):
         Returns:
             Tuple[bool, Dict[str, Any]]: (成功かどうか, ユーザーデータ)
         """
-        copy_signin_data = copy.deepcopy(self.signin_file_data)
-        users = [u for u in copy_signin_data['users'] if u['email'] == email and u['hash'] == 'saml']
-        return len(users) > 0, users[0] if len(users) > 0 else None
+        signin_data = self.signin_file_data
+        users = [u for u in Signin.get_index(signin_data).users_by_email(email) if u['hash'] == 'saml']
+        return len(users) > 0, copy.deepcopy(users[0]) if len(users) > 0 else None
 
     async def make_saml(self, prov:str, next:str, form_data:Dict[str, Any], req:Request, res:Response) -> Any:
         """
@@ -3,11 +3,17 @@ from cmdbox.app import common, filer
 from cmdbox.app.commons import convert, redis_client
 from typing import Dict, Any, List, Tuple
 import base64
+import hashlib
 import logging
 import json
+import os
+import platform
 
 
 class Client(object):
+    # ファイル転送時の分割サイズのデフォルト値
+    CHUNK_SIZE:int = 4 * 1024 * 1024
+
     def __init__(self, logger:logging.Logger, redis_host:str = "localhost", redis_port:int = 6379, redis_password:str = None, svname:str = 'server'):
         """
         Redisサーバーとの通信を行うクラス
@@ -47,7 +53,8 @@ class Client(object):
         return res_json
     
     def file_list(self, svpath:str, recursive:bool, scope:str="client", client_data:Path=None,
-                  fwpaths:List[str]=None, rjpaths:List[str]=None, listregs:str="*", retry_count:int=3, retry_interval:int=5, timeout:int=60):
+                  fwpaths:List[str]=None, rjpaths:List[str]=None, listregs:str="*", offset:int=0, limit:int=0,
+                  retry_count:int=3, retry_interval:int=5, timeout:int=60):
         """
         サーバー上のファイルリストを取得する
 
@@ -59,6 +66,8 @@ class Client(object):
             fwpaths (List[str], optional): 範囲内かどうかを示すパスのリスト. Defaults to None.
             rjpaths (List[str], optional): 範囲外かどうかを示すパスのリスト. Defaults to None.
             listregs (str, optional): リストアップするgrep条件. Defaults to "*".
+            offset (int, optional): 指定したパス直下のエントリを何件目から返すか. Defaults to 0.
+            limit (int, optional): 指定したパス直下のエントリを返す最大件数。0以下の場合は全件. Defaults to 0.
             retry_count (int, optional): リトライ回数. Defaults to 3.
             retry_interval (int, optional): リトライ間隔. Defaults to 5.
             timeout (int, optional): タイムアウト時間. Defaults to 60.
@@ -69,17 +78,18 @@ class Client(object):
         if scope == "client":
             if client_data is not None:
                 f = filer.Filer(client_data, self.logger)
-                _, res_json = f.file_list(svpath, recursive, fwpaths, rjpaths, listregs)
+                _, res_json = f.file_list(svpath, recursive, fwpaths, rjpaths, listregs, offset=offset, limit=limit)
                 return res_json
             else:
                 self.logger.warning(f"client_data is empty.")
                 return dict(warn=f"client_data is empty.")
         elif scope == "current":
             f = filer.Filer(Path.cwd(), self.logger)
-            _, res_json = f.file_list(svpath, recursive, fwpaths, rjpaths, listregs)
+            _, res_json = f.file_list(svpath, recursive, fwpaths, rjpaths, listregs, offset=offset, limit=limit)
             return res_json
         elif scope == "server":
-            payload = dict(svpath=svpath, recursive=recursive, fwpaths=fwpaths, rjpaths=rjpaths, listregs=listregs)
+            payload = dict(svpath=svpath, recursive=recursive, fwpaths=fwpaths, rjpaths=rjpaths, listregs=listregs,
+                           offset=offset, limit=limit)
             payload_b64 = convert.str2b64str(json.dumps(payload, default=common.default_json_enc))
             res_json = self.redis_cli.send_cmd('client_file_list', [payload_b64],
                                                retry_count=retry_count, retry_interval=retry_interval, timeout=timeout)
@@ -174,7 +184,7 @@ class Client(object):
     
     def file_download(self, svpath:str, download_file:Path, scope:str="client", client_data:Path=None,
                       fwpaths:List[str]=None, rjpaths:List[str]=None, meta:Dict[str, Any]=None,
-                      etag:str=None, rpath:str="", img_thumbnail:float=0.0,
+                      etag:str=None, rpath:str="", img_thumbnail:float=0.0, chunk_size:int=CHUNK_SIZE, resume:bool=False,
                       retry_count:int=3, retry_interval:int=5, timeout:int=60):
         """
         サーバー上のファイルをダウンロードする
@@ -190,6 +200,8 @@ class Client(object):
             etag (str, optional): ETag. Defaults to None.
             rpath (str, optional): リクエストパス. Defaults to "".
             img_thumbnail (float, optional): サムネイル画像のサイズ. Defaults to 0.0.
+            chunk_size (int, optional): 分割ダウンロードするサイズ。0以下の場合は一括でダウンロードする. Defaults to CHUNK_SIZE.
+            resume (bool, optional): 前回中断したダウンロードを再開するかどうか. Defaults to False.
             retry_count (int, optional): リトライ回数. Defaults to 3.
             retry_interval (int, optional): リトライ間隔. Defaults to 5.
             timeout (int, optional): タイムアウト時間. Defaults to 60.
@@ -197,6 +209,10 @@ class Client(object):
         Returns:
             bytes: ダウンロードファイルの内容
         """
+        if download_file is not None and etag is None and (img_thumbnail is None or img_thumbnail <= 0) \
+            and chunk_size is not None and chunk_size > 0:
+            return self._file_download_chunked(svpath, download_file, scope, client_data, fwpaths, rjpaths, meta, rpath,
+                                               chunk_size, resume, retry_count, retry_interval, timeout)
         if scope == "client":
             if client_data is not None:
                 f = filer.Filer(client_data, self.logger)
@@ -219,6 +235,7 @@ class Client(object):
         if "success" in res_json:
             res_json["success"]["rpath"] = rpath
             res_json["success"]["svpath"] = svpath
+            data = res_json["success"].get("data")
             if download_file is not None:
                 if download_file.is_dir():
                     download_file = download_file / res_json["success"]["name"]
@@ -226,15 +243,137 @@ class Client(object):
                     self.logger.warning(f"download_file {download_file} already exists.")
                     return dict(warn=f"download_file {download_file} already exists.")
                 def _wd(f):
-                    f.write(base64.b64decode(res_json["success"]["data"]))
+                    # バイナリフレームで受信した場合はbytesのまま書き込む
+                    f.write(data if isinstance(data, bytes) else base64.b64decode(data))
                     del res_json["success"]["data"]
                     res_json["success"]["download_file"] = str(download_file.absolute())
                 common.save_file(download_file, _wd, mode='wb', nolock=False)
+            elif isinstance(data, bytes):
+                res_json["success"]["data"] = convert.bytes2b64str(data)
         return res_json
 
+    def _file_download_chunked(self, svpath:str, download_file:Path, scope:str, client_data:Path,
+                               fwpaths:List[str], rjpaths:List[str], meta:Dict[str, Any], rpath:str,
+                               chunk_size:int, resume:bool, retry_count:int, retry_interval:int, timeout:int) -> Dict[str, Any]:
+        """
+        サーバー上のファイルを分割してダウンロードする。
+        受信したチャンクは `<保存先>.part` に追記し、最後にサイズとハッシュ値を検証してファイル名を変更する。
+        分割ダウンロードに対応していないサーバーの場合は一括でダウンロードする。
+
+        Args:
+            svpath (Path): サーバー上のファイルパス
+            download_file (Path): ローカルのファイルパス
+            scope (str): 参照先のスコープ
+            client_data (Path): ローカルを参照させる場合のデータフォルダ
+            fwpaths (List[str]): 範囲内かどうかを示すパスのリスト
+            rjpaths (List[str]): 範囲外かどうかを示すパスのリスト
+            meta (Dict[str, Any]): メタデータ
+            rpath (str): リクエストパス
+            chunk_size (int): 分割ダウンロードするサイズ
+            resume (bool): 前回中断したダウンロードを再開するかどうか
+            retry_count (int): リトライ回数
+            retry_interval (int): リトライ間隔
+            timeout (int): タイムアウト時間
+
+        Returns:
+            dict: Redisサーバーからの応答
+        """
+        if scope == "client":
+            if client_data is None:
+                self.logger.warning(f"client_data is empty.")
+                return dict(warn=f"client_data is empty.")
+            fi = filer.Filer(client_data, self.logger)
+        elif scope == "current":
+            fi = filer.Filer(Path.cwd(), self.logger)
+        elif scope == "server":
+            fi = None
+        else:
+            self.logger.warning(f"scope is invalid. {scope}")
+            return dict(warn=f"scope is invalid. {scope}")
+        if download_file.is_dir():
+            download_file = download_file / Path(svpath).name
+        if download_file.exists():
+            self.logger.warning(f"download_file {download_file} already exists.")
+            return dict(warn=f"download_file {download_file} already exists.")
+        part_file = download_file.with_name(f"{download_file.name}.part")
+        hasher = hashlib.sha256()
+        offset = 0
+        if resume and part_file.exists():
+            offset = part_file.stat().st_size
+            with open(part_file, 'rb') as pf:
+                for block in iter(lambda: pf.read(chunk_size), b''):
+                    hasher.update(block)
+        file_etag = None
+        first = None
+        fallback = False
+        # サーバーがチャンクごとにハッシュ値を計算できるよう、このダウンロードを識別する転送IDを付ける
+        transfer_id = common.random_string(size=16)
+        with open(part_file, 'ab' if offset > 0 else 'wb') as pf:
+            while True:
+                if fi is not None:
+                    _, res_json = fi.file_download_chunk(svpath, offset, chunk_size, fwpaths, rjpaths,
+                                                         meta if offset == 0 else None, etag=file_etag, transfer_id=transfer_id)
+                else:
+                    payload = dict(svpath=svpath, fwpaths=fwpaths, rjpaths=rjpaths, meta=meta if offset == 0 else None,
+                                   etag=file_etag, chunked=True, offset=offset, chunk_size=chunk_size, transfer_id=transfer_id)
+                    payload_b64 = convert.str2b64str(json.dumps(payload, default=common.default_json_enc))
+                    # 最初の要求は分割ダウンロードに対応していないサーバーでも解析できる旧形式のテキストで送る
+                    res_json = self.redis_cli.send_cmd('client_file_download', [payload_b64],
+                                                       retry_count=retry_count, retry_interval=retry_interval, timeout=timeout,
+                                                       frame=first is not None)
+                if "success" not in res_json:
+                    return res_json
+                res = res_json["success"]
+                if first is None and "total_size" not in res:
+                    # 分割ダウンロードに対応していないサーバーの応答にはtotal_sizeが含まれず、ファイル全体が含まれる
+                    fallback = True
+                    break
+                if file_etag is None and resume and offset > 0 and res.get("total_size", 0) < offset:
+                    # 再開前の途中ファイルよりサーバー上のファイルが小さい場合は変更されているため中断する
+                    return dict(warn=f"File {svpath} was modified since the previous download. Remove {part_file} and retry.")
+                file_etag = res.get("etag")
+                if first is None:
+                    first = res
+                data = res.get("data")
+                if isinstance(data, str):
+                    data = base64.b64decode(data)
+                if data:
+                    pf.write(data)
+                    hasher.update(data)
+                    offset += len(data)
+                if res.get("eof") or not data:
+                    break
+        if fallback:
+            # 受信済みのファイル全体のうち、途中ファイルに無い範囲だけを追記する
+            self.logger.info(f"Server does not support chunked download. Use the whole file in the response. {svpath}")
+            data = res.get("data")
+            data = data if isinstance(data, bytes) else base64.b64decode(data) if data else b''
+            if offset > len(data):
+                part_file.unlink(missing_ok=True)
+                return dict(warn=f"File {svpath} was modified since the previous download. Remove {part_file} and retry.")
+            with open(part_file, 'ab') as pf:
+                pf.write(data[offset:])
+            os.replace(part_file, download_file)
+            ret = dict(name=res.get("name"), mime_type=res.get("mime_type"), etag=res.get("etag"), not_modified=False,
+                       meta=res.get("meta"), rpath=rpath, svpath=svpath, download_file=str(download_file.absolute()))
+            return dict(success=ret)
+        if offset != res["total_size"]:
+            if offset > res["total_size"]:
+                part_file.unlink(missing_ok=True)
+            self.logger.warning(f"Downloaded size mismatch. {svpath} ({offset} != {res['total_size']})")
+            return dict(warn=f"Downloaded size mismatch. {svpath} ({offset} != {res['total_size']})")
+        if res.get("hash") is not None and res["hash"] != hasher.hexdigest():
+            part_file.unlink(missing_ok=True)
+            self.logger.warning(f"File hash mismatch. {svpath}")
+            return dict(warn=f"File hash mismatch. {svpath}")
+        os.replace(part_file, download_file)
+        ret = dict(name=first.get("name"), mime_type=first.get("mime_type"), etag=file_etag, not_modified=False,
+                   meta=first.get("meta"), rpath=rpath, svpath=svpath, download_file=str(download_file.absolute()))
+        return dict(success=ret)
+
     def file_upload(self, svpath:str, upload_file:Path, scope:str="client", client_data:Path=None,
                     fwpaths:List[str]=None, rjpaths:List[str]=None, meta:Dict[str, Any]=None,
-                    mkdir:bool=False, overwrite:bool=False,
+                    mkdir:bool=False, overwrite:bool=False, chunk_size:int=CHUNK_SIZE, resume:bool=False,
                     retry_count:int=3, retry_interval:int=5, timeout:int=60):
         """
         サーバー上にファイルをアップロードする
@@ -249,6 +388,8 @@ class Client(object):
             fwpaths (List[str], optional): 範囲内かどうかを示すパスのリスト. Defaults to None.
             rjpaths (List[str], optional): 範囲外かどうかを示すパスのリスト. Defaults to None.
             meta (Dict[str, Any], optional): メタデータ. Defaults to None.
+            chunk_size (int, optional): 分割アップロードするサイズ。0以下の場合は一括でアップロードする. Defaults to CHUNK_SIZE.
+            resume (bool, optional): 前回中断したアップロードを再開するかどうか. Defaults to False.
             retry_count (int, optional): リトライ回数. Defaults to 3.
             retry_interval (int, optional): リトライ間隔. Defaults to 5.
             timeout (int, optional): タイムアウト時間. Defaults to 60.
@@ -265,6 +406,9 @@ class Client(object):
         if upload_file.is_dir():
             self.logger.warning(f"input_file {upload_file} is directory.")
             return dict(warn=f"input_file {upload_file} is directory.")
+        if chunk_size is not None and chunk_size > 0:
+            return self._file_upload_chunked(svpath, upload_file, scope, client_data, fwpaths, rjpaths, meta,
+                                             mkdir, overwrite, chunk_size, resume, retry_count, retry_interval, timeout)
         with open(upload_file, "rb") as f:
             if scope == "client":
                 if client_data is not None:
@@ -281,16 +425,107 @@ class Client(object):
                                              fwpaths, rjpaths, meta)
                 return res_json
             elif scope == "server":
-                payload = dict(svpath=svpath, file_name=upload_file.name, file_data=convert.bytes2b64str(f.read()),
+                payload = dict(svpath=svpath, file_name=upload_file.name,
                                mkdir=mkdir, overwrite=overwrite, fwpaths=fwpaths, rjpaths=rjpaths, meta=meta)
                 payload_b64 = convert.str2b64str(json.dumps(payload, default=common.default_json_enc))
+                # ファイルデータはBase64にせずバイナリフレームに添付して送る
                 res_json = self.redis_cli.send_cmd('client_file_upload', [payload_b64,],
-                                    retry_count=retry_count, retry_interval=retry_interval, timeout=timeout)
+                                    retry_count=retry_count, retry_interval=retry_interval, timeout=timeout, data=f.read())
                 return res_json
             else:
                 self.logger.warning(f"scope is invalid. {scope}")
                 return dict(warn=f"scope is invalid. {scope}")
 
+    def _file_upload_chunked(self, svpath:str, upload_file:Path, scope:str, client_data:Path,
+                             fwpaths:List[str], rjpaths:List[str], meta:Dict[str, Any], mkdir:bool, overwrite:bool,
+                             chunk_size:int, resume:bool, retry_count:int, retry_interval:int, timeout:int) -> Dict[str, Any]:
+        """
+        サーバー上にファイルを分割してアップロードする。
+        ファイル全体を読み込まずにchunk_sizeずつ送信し、最後のチャンクでファイル全体のハッシュ値を送信して検証させる。
+        最初に再開位置を問い合わせ、分割アップロードに対応していないサーバーの場合は一括でアップロードする。
+
+        Args:
+            svpath (Path): サーバー上のファイルパス
+            upload_file (Path): ローカルのファイルパス
+            scope (str): 参照先のスコープ
+            client_data (Path): ローカルを参照させる場合のデータフォルダ
+            fwpaths (List[str]): 範囲内かどうかを示すパスのリスト
+            rjpaths (List[str]): 範囲外かどうかを示すパスのリスト
+            meta (Dict[str, Any]): メタデータ
+            mkdir (bool): ディレクトリを作成するかどうか
+            overwrite (bool): 上書きするかどうか
+            chunk_size (int): 分割アップロードするサイズ
+            resume (bool): 前回中断したアップロードを再開するかどうか
+            retry_count (int): リトライ回数
+            retry_interval (int): リトライ間隔
+            timeout (int): タイムアウト時間
+
+        Returns:
+            dict: Redisサーバーからの応答
+        """
+        if scope == "client":
+            if client_data is None:
+                self.logger.warning(f"client_data is empty.")
+                return dict(warn=f"client_data is empty.")
+            fi = filer.Filer(client_data, self.logger)
+        elif scope == "current":
+            fi = filer.Filer(Path.cwd(), self.logger)
+        elif scope == "server":
+            fi = None
+        else:
+            self.logger.warning(f"scope is invalid. {scope}")
+            return dict(warn=f"scope is invalid. {scope}")
+        stat = upload_file.stat()
+        total_size = stat.st_size
+        # 同じファイルへの同時アップロードと途中ファイルを分けるための転送ID。
+        # 中断したアップロードを再開できるよう、送信元のファイルと送信先から決める
+        transfer_id = hashlib.sha256(f"{platform.node()}:{upload_file.resolve()}:{stat.st_mtime_ns}:{total_size}:{scope}:{svpath}"
+                                     .encode('utf-8')).hexdigest()[:16]
+        def _send(chunk:bytes, offset:int, file_hash:str) -> Dict[str, Any]:
+            if fi is not None:
+                _, res_json = fi.file_upload_chunk(svpath, upload_file.name, chunk, offset, total_size, file_hash,
+                                                   mkdir, overwrite, fwpaths, rjpaths, meta, transfer_id=transfer_id)
+                return res_json
+            payload = dict(svpath=svpath, file_name=upload_file.name, mkdir=mkdir, overwrite=overwrite,
+                           fwpaths=fwpaths, rjpaths=rjpaths, meta=meta, chunked=True, offset=offset,
+                           total_size=total_size, file_hash=file_hash, transfer_id=transfer_id)
+            payload_b64 = convert.str2b64str(json.dumps(payload, default=common.default_json_enc))
+            if offset < 0:
+                # 再開位置の問い合わせは分割アップロードに対応していないサーバーでも解析できる旧形式のテキストで送る
+                return self.redis_cli.send_cmd('client_file_upload', [payload_b64,],
+                                               retry_count=retry_count, retry_interval=retry_interval, timeout=timeout, frame=False)
+            return self.redis_cli.send_cmd('client_file_upload', [payload_b64,],
+                                           retry_count=retry_count, retry_interval=retry_interval, timeout=timeout, data=chunk)
+        hasher = hashlib.sha256()
+        offset = 0
+        with open(upload_file, "rb") as f:
+            res_json = _send(b'', -1, None)
+            if "error" in res_json:
+                return res_json
+            if fi is None and not res_json.get("chunked"):
+                # 分割アップロードに対応していないサーバーの応答には印が無いため、一括でアップロードする
+                self.logger.info(f"Server does not support chunked upload. Fallback to single upload. {upload_file}")
+                payload = dict(svpath=svpath, file_name=upload_file.name, file_data=convert.bytes2b64str(f.read()),
+                               mkdir=mkdir, overwrite=overwrite, fwpaths=fwpaths, rjpaths=rjpaths, meta=meta)
+                payload_b64 = convert.str2b64str(json.dumps(payload, default=common.default_json_enc))
+                return self.redis_cli.send_cmd('client_file_upload', [payload_b64,],
+                                               retry_count=retry_count, retry_interval=retry_interval, timeout=timeout, frame=False)
+            if "success" not in res_json:
+                return res_json
+            if resume:
+                offset = min(int(res_json["success"].get("offset", 0)), total_size)
+                # 送信済みの範囲もハッシュ値の計算に含める
+                while f.tell() < offset:
+                    hasher.update(f.read(min(chunk_size, offset - f.tell())))
+            while True:
+                chunk = f.read(chunk_size)
+                hasher.update(chunk)
+                last = offset + len(chunk) >= total_size
+                res_json = _send(chunk, offset, hasher.hexdigest() if last else None)
+                if "success" not in res_json or last:
+                    return res_json
+                offset += len(chunk)
+
     def file_remove(self, svpath:str, scope:str="client", client_data:Path = None,
                     fwpaths:List[str]=None, rjpaths:List[str]=None, notexist_ok:bool=False,
                     retry_count:int=3, retry_interval:int=5, timeout:int=60):
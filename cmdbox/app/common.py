@@ -1,15 +1,18 @@
 from cmdbox import version
 from cmdbox.app import feature, options
 from cmdbox.app.commons import convert, module, loghandler
+from concurrent.futures import Executor, Future
 from cryptography.fernet import Fernet
 from fastapi.responses import RedirectResponse
 from importlib import resources
 from pathlib import Path
 from rich.console import Console
 from tabulate import tabulate
-from typing import List, Tuple, Dict, Any, Union
+from typing import Callable, List, Tuple, Dict, Any, Union
 import argparse
 import asyncio
+import contextlib
+import contextvars
 import datetime
 import logging
 import logging.config
@@ -316,6 +319,114 @@ def get_common_value(key:str, default:Any=None) -> Any:
     """
     return CommonValue._map.get(key, default)
 
+class ContextStdio:
+    """
+    標準入出力の代理クラス。
+    ``redirect_stdio`` で現在のコンテキストに入出力先が設定されている場合はそちらに、
+    設定されていない場合は元の標準入出力に処理を委譲します。
+    ``sys.stdout`` を入れ替えないため、同時に実行されるコマンドの出力が混ざりません。
+    入出力先はコンテキスト変数で保持するため、 ``threading.Thread`` や ``Executor.submit`` で直接起動したスレッドには引き継がれず、
+    そのスレッドの出力は元の標準出力に書き込まれます。コマンドの中でスレッドを起動する場合は
+    ``context_thread`` 又は ``submit_with_context`` を使用してください。
+    """
+    def __init__(self, stream, var:contextvars.ContextVar):
+        """
+        コンストラクタ
+
+        Args:
+            stream (Any): 元の標準入出力
+            var (contextvars.ContextVar): コンテキストごとの入出力先
+        """
+        object.__setattr__(self, '_stream', stream)
+        object.__setattr__(self, '_var', var)
+
+    def _target(self):
+        target = object.__getattribute__(self, '_var').get()
+        return target if target is not None else object.__getattribute__(self, '_stream')
+
+    def __getattr__(self, name:str) -> Any:
+        return getattr(self._target(), name)
+
+    def __setattr__(self, name:str, value:Any) -> None:
+        setattr(self._target(), name, value)
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        return self._target().flush()
+
+_stdout_var:contextvars.ContextVar = contextvars.ContextVar('cmdbox_stdout', default=None)
+_stdin_var:contextvars.ContextVar = contextvars.ContextVar('cmdbox_stdin', default=None)
+_stdio_lock = threading.Lock()
+
+def install_context_stdio() -> None:
+    """
+    ``sys.stdout`` と ``sys.stdin`` をコンテキストごとに切り替えられる代理に置き換えます。
+    既に置き換えている場合は何もしません。
+    """
+    with _stdio_lock:
+        if not isinstance(sys.stdout, ContextStdio):
+            sys.stdout = ContextStdio(sys.stdout, _stdout_var)
+        if not isinstance(sys.stdin, ContextStdio):
+            sys.stdin = ContextStdio(sys.stdin, _stdin_var)
+
+@contextlib.contextmanager
+def redirect_stdio(stdout=None, stdin=None):
+    """
+    現在のコンテキストの標準出力と標準入力を切り替えます。
+    他のスレッドやタスクの標準入出力には影響しません。
+    この中で起動したスレッドに切替えを引き継ぐ場合は ``context_thread`` 又は ``submit_with_context`` を使用してください。
+
+    Args:
+        stdout (Any, optional): 標準出力の出力先. Noneの場合は切り替えません. Defaults to None.
+        stdin (Any, optional): 標準入力の入力元. Noneの場合は切り替えません. Defaults to None.
+    """
+    install_context_stdio()
+    out_token = _stdout_var.set(stdout) if stdout is not None else None
+    in_token = _stdin_var.set(stdin) if stdin is not None else None
+    try:
+        yield
+    finally:
+        if in_token is not None:
+            _stdin_var.reset(in_token)
+        if out_token is not None:
+            _stdout_var.reset(out_token)
+
+def context_thread(target:Callable, args:tuple=(), kwargs:Dict[str, Any]=None, **thread_kwargs) -> threading.Thread:
+    """
+    現在のコンテキストを引き継いで関数を実行するスレッドを作成します。
+    標準入出力の切替えやサインイン情報などのコンテキスト変数がスレッド内でも参照できます。
+
+    Args:
+        target (Callable): スレッドで実行する関数
+        args (tuple, optional): 関数の位置引数. Defaults to ().
+        kwargs (Dict[str, Any], optional): 関数のキーワード引数. Defaults to None.
+        **thread_kwargs: ``threading.Thread`` に渡す引数（name、daemon など）
+
+    Returns:
+        threading.Thread: 開始前のスレッド
+    """
+    return threading.Thread(target=contextvars.copy_context().run, args=(target, *args), kwargs=kwargs or {}, **thread_kwargs)
+
+def submit_with_context(executor:Executor, fn:Callable, *args, **kwargs) -> Future:
+    """
+    現在のコンテキストを引き継いで関数をスレッドプールに投入します。
+
+    Args:
+        executor (Executor): スレッドプール
+        fn (Callable): 実行する関数
+        *args: 関数の位置引数
+        **kwargs: 関数のキーワード引数
+
+    Returns:
+        Future: 実行結果
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
 def reset_logger(name:str, stderr:bool=False, fmt:str='[%(asctime)s] %(levelname)s - %(message)s', datefmt:str='%Y-%m-%d %H:%M:%S', level:int=logging.INFO) -> None:
     """
     指定されたロガーのハンドラをクリアし、新しいハンドラを追加します。
@@ -862,6 +973,25 @@ def hash_password(password:str, hash:str) -> str:
     passwd = h.hexdigest()
     return passwd
 
+def hash_file(file_path:Path, hash:str='sha256', block_size:int=1024*1024) -> str:
+    """
+    ファイルのハッシュ値を計算します。
+    ファイルはblock_sizeずつ読み込むため、ファイルサイズに関わらずメモリ使用量は一定です。
+
+    Args:
+        file_path (Path): ファイルのパス
+        hash (str, optional): ハッシュアルゴリズム. Defaults to 'sha256'.
+        block_size (int, optional): 一度に読み込むサイズ. Defaults to 1024*1024.
+
+    Returns:
+        str: ハッシュ値
+    """
+    h = hashlib.new(hash)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
 def encrypt(message:str, password:str) -> str:
     """
     メッセージを暗号化します。
@@ -1037,7 +1167,8 @@ def exec_sync(apprun, logger:logging.Logger, args:argparse.Namespace, tm:float,
             res = result_format(res, logger, pf)
             update_performance("apprun", apprun_tm, res)
             return st, res, o
-        th = threading.Thread(target=_run, args=(apprun, ctx, logger, args, scope, tm, pf))
+        # 標準入出力の切替え等のコンテキストをスレッドに引き継ぐ
+        th = context_thread(_run, args=(apprun, ctx, logger, args, scope, tm, pf))
         th.start()
         th.join()
         st, res, o = ctx[0] if ctx else None
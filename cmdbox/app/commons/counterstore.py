@@ -0,0 +1,221 @@
+from cmdbox.app.commons import dbpool
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import sqlite3
+import threading
+import time
+
+
+class CounterStore:
+    """
+    リミッターのカウンタ履歴を保存するクラス。
+    履歴は data_dir/.limiter/counter.db のSQLiteに (limiter_name, ts) の索引付きで保存され、
+    最新のカウンタは別テーブルに保持するため、履歴の件数に関わらず一定の時間で参照できます。
+    従来の data_dir/.limiter/counter-{name}.jsonl は初回参照時に取り込み、
+    counter-{name}.jsonl.imported に名前を変更します。
+    """
+    DB_NAME = "counter.db"
+    # 1回の削除で削除する履歴の最大件数
+    PRUNE_BATCH = 10000
+
+    _stores:Dict[str, 'CounterStore'] = dict()
+    _stores_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, limiter_dir:Path, valkeys:List[str]) -> 'CounterStore':
+        """
+        リミッターのディレクトリごとのインスタンスを返します。
+
+        Args:
+            limiter_dir (Path): リミッターのディレクトリ
+            valkeys (List[str]): カウンタの値を示すキーのリスト。いずれかが0以外のカウンタを有効とします
+
+        Returns:
+            CounterStore: インスタンス
+        """
+        key = str(limiter_dir)
+        with cls._stores_lock:
+            store = cls._stores.get(key)
+            if store is None:
+                store = cls(limiter_dir, valkeys)
+                cls._stores[key] = store
+            return store
+
+    def __init__(self, limiter_dir:Path, valkeys:List[str]):
+        """
+        コンストラクタ
+
+        Args:
+            limiter_dir (Path): リミッターのディレクトリ
+            valkeys (List[str]): カウンタの値を示すキーのリスト。いずれかが0以外のカウンタを有効とします
+        """
+        self.limiter_dir = Path(limiter_dir)
+        self.valkeys = list(valkeys)
+        self.db_path = self.limiter_dir / self.DB_NAME
+        self.lock = threading.Lock()
+        self.imported = set()
+
+    def _init_db(self, conn:sqlite3.Connection) -> None:
+        """
+        テーブルを作成します。
+
+        Args:
+            conn (sqlite3.Connection): 接続
+        """
+        conn.execute("CREATE TABLE IF NOT EXISTS counter_history (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "limiter_name TEXT NOT NULL, ts REAL NOT NULL, valid INTEGER NOT NULL, counter TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS counter_history_name_ts ON counter_history (limiter_name, ts)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counter_latest (limiter_name TEXT PRIMARY KEY, counter TEXT NOT NULL)")
+        conn.commit()
+
+    def _connection(self):
+        """
+        スレッドごとにキャッシュしたSQLiteの接続を返します。
+
+        Returns:
+            Iterator[sqlite3.Connection]: 接続を返すコンテキストマネージャー
+        """
+        return dbpool.sqlite_connection(self.db_path, init=self._init_db)
+
+    def _timestamp(self, counter:Dict[str, Any]) -> float:
+        """
+        カウンタの最終更新日時をタイムスタンプに変換します。
+
+        Args:
+            counter (Dict[str, Any]): カウンタ
+
+        Returns:
+            float: タイムスタンプ。最終更新日時がない場合は現在時刻
+        """
+        try:
+            return datetime.fromisoformat(str(counter['last_update'])).timestamp()
+        except (KeyError, ValueError, TypeError):
+            return time.time()
+
+    def _is_valid(self, counter:Dict[str, Any]) -> bool:
+        """
+        カウンタの値のいずれかが0以外かどうかを返します。
+
+        Args:
+            counter (Dict[str, Any]): カウンタ
+
+        Returns:
+            bool: 有効なカウンタの場合はTrue
+        """
+        return any(counter.get(k) for k in self.valkeys)
+
+    def _import_legacy(self, limiter_name:str) -> None:
+        """
+        従来のJSONL形式の履歴ファイルがあれば取り込みます。
+
+        Args:
+            limiter_name (str): 制限設定の識別名
+        """
+        if limiter_name in self.imported:
+            return
+        with self.lock:
+            if limiter_name in self.imported:
+                return
+            jsonl_path = self.limiter_dir / f"counter-{limiter_name}.jsonl"
+            if jsonl_path.exists():
+                rows = []
+                latest = None
+                with jsonl_path.open('r', encoding='utf-8') as f:
+                    for line in f:
+                        stripped = line.strip()
+                        if not stripped:
+                            continue
+                        try:
+                            counter = json.loads(stripped)
+                        except Exception:
+                            continue
+                        is_valid = self._is_valid(counter)
+                        rows.append((limiter_name, self._timestamp(counter), 1 if is_valid else 0, stripped))
+                        if is_valid:
+                            latest = stripped
+                with self._connection() as conn:
+                    conn.executemany("INSERT INTO counter_history (limiter_name, ts, valid, counter) VALUES (?, ?, ?, ?)", rows)
+                    if latest is not None:
+                        conn.execute("INSERT OR REPLACE INTO counter_latest (limiter_name, counter) VALUES (?, ?)", (limiter_name, latest))
+                jsonl_path.replace(jsonl_path.with_name(jsonl_path.name + '.imported'))
+            self.imported.add(limiter_name)
+
+    def append(self, limiter_name:str, counter:Dict[str, Any]) -> None:
+        """
+        カウンタを履歴に追加します。有効なカウンタは最新のカウンタとしても保存します。
+
+        Args:
+            limiter_name (str): 制限設定の識別名
+            counter (Dict[str, Any]): カウンタ
+        """
+        self._import_legacy(limiter_name)
+        valid = self._is_valid(counter)
+        line = json.dumps(counter, ensure_ascii=False)
+        with self._connection() as conn:
+            conn.execute("INSERT INTO counter_history (limiter_name, ts, valid, counter) VALUES (?, ?, ?, ?)",
+                         (limiter_name, self._timestamp(counter), 1 if valid else 0, line))
+            if valid:
+                conn.execute("INSERT OR REPLACE INTO counter_latest (limiter_name, counter) VALUES (?, ?)", (limiter_name, line))
+
+    def latest(self, limiter_name:str) -> Optional[Dict[str, Any]]:
+        """
+        最新の有効なカウンタを返します。
+
+        Args:
+            limiter_name (str): 制限設定の識別名
+
+        Returns:
+            Optional[Dict[str, Any]]: カウンタ。履歴がない場合はNone
+        """
+        self._import_legacy(limiter_name)
+        with self._connection() as conn:
+            row = conn.execute("SELECT counter FROM counter_latest WHERE limiter_name=?", (limiter_name,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def history(self, limiter_name:str, start:Optional[float]=None, end:Optional[float]=None) -> List[Dict[str, Any]]:
+        """
+        有効なカウンタの履歴を最終更新日時の順に返します。
+
+        Args:
+            limiter_name (str): 制限設定の識別名
+            start (Optional[float], optional): このタイムスタンプ以降の履歴のみを返します. Defaults to None.
+            end (Optional[float], optional): このタイムスタンプより前の履歴のみを返します. Defaults to None.
+
+        Returns:
+            List[Dict[str, Any]]: カウンタのリスト
+        """
+        self._import_legacy(limiter_name)
+        sql = "SELECT counter FROM counter_history WHERE limiter_name=? AND valid=1"
+        params = [limiter_name]
+        if start is not None:
+            sql += " AND ts>=?"
+            params.append(start)
+        if end is not None:
+            sql += " AND ts<?"
+            params.append(end)
+        sql += " ORDER BY ts, id"
+        with self._connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def prune(self, limiter_name:str, before:float) -> int:
+        """
+        指定したタイムスタンプより前の履歴を削除します。
+        1回の呼び出しで削除するのは ``PRUNE_BATCH`` 件までのため、
+        残りは次回以降の呼び出しで削除されます。
+
+        Args:
+            limiter_name (str): 制限設定の識別名
+            before (float): このタイムスタンプより前の履歴を削除します
+
+        Returns:
+            int: 削除した件数
+        """
+        self._import_legacy(limiter_name)
+        with self._connection() as conn:
+            cur = conn.execute("DELETE FROM counter_history WHERE id IN "
+                               "(SELECT id FROM counter_history WHERE limiter_name=? AND ts<? LIMIT ?)",
+                               (limiter_name, before, self.PRUNE_BATCH))
+            return cur.rowcount
@@ -0,0 +1,160 @@
+from contextlib import contextmanager
+from pathlib import Path
+from psycopg_pool import ConnectionPool
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import os
+import re
+import sqlite3
+import threading
+import weakref
+
+
+# PostgreSQLの接続プールのデフォルト値
+POOL_MIN_SIZE:int = 1
+POOL_MAX_SIZE:int = 10
+# 使用されていない接続を閉じるまでの秒数
+POOL_MAX_IDLE:float = 300.0
+
+_pg_pools:Dict[Tuple[str, int, int, float], ConnectionPool] = dict()
+_pg_lock = threading.Lock()
+_sqlite_local = threading.local()
+_sqlite_conns:Dict[str, int] = dict()
+_sqlite_lock = threading.Lock()
+_PASSWORD_PATTERN = re.compile(r'password=\S*')
+
+
+class _SqliteConns:
+    """
+    スレッドごとのSQLite接続を保持するクラスです。
+    entriesにはデータベースファイルのパスごとに、接続と接続を開いた時のファイルの(デバイス番号, inode番号)を保持します。
+    スレッドが終了してこのインスタンスが破棄されると、保持している接続を閉じて接続数から差し引きます。
+    """
+    def __init__(self):
+        self.entries:Dict[str, Tuple[sqlite3.Connection, Optional[Tuple[int, int]]]] = dict()
+        weakref.finalize(self, _discard_sqlite_all, self.entries)
+
+def _discard_sqlite(key:str, conn:sqlite3.Connection) -> None:
+    try:
+        conn.close()
+    except sqlite3.ProgrammingError:
+        # 別スレッドからは閉じられないため、参照が外れた時点で閉じられるのに任せる
+        pass
+    with _sqlite_lock:
+        cnt = _sqlite_conns.get(key, 0) - 1
+        if cnt > 0:
+            _sqlite_conns[key] = cnt
+        else:
+            _sqlite_conns.pop(key, None)
+
+def _discard_sqlite_all(entries:Dict[str, Tuple[sqlite3.Connection, Optional[Tuple[int, int]]]]) -> None:
+    for key, (conn, _) in list(entries.items()):
+        _discard_sqlite(key, conn)
+    entries.clear()
+
+def _file_ident(path:str) -> Optional[Tuple[int, int]]:
+    """
+    ファイルの(デバイス番号, inode番号)を返します。ファイルが存在しない場合はNoneを返します。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+def pg_connection(constr:str, min_size:int=None, max_size:int=None, max_idle:float=None) -> Any:
+    """
+    接続文字列ごとの接続プールからPostgreSQLの接続を取得します。
+    接続プールは接続文字列と接続数などの設定の組み合わせごとに作成されるため、
+    異なる接続先や異なる設定で同じプールを使用することはありません。
+    取得時には接続の死活確認を行い、使用されていない接続はmax_idle秒後に閉じられます。
+
+    Args:
+        constr (str): 接続文字列
+        min_size (int, optional): 接続プールの最小接続数. Defaults to POOL_MIN_SIZE.
+        max_size (int, optional): 接続プールの最大接続数. Defaults to POOL_MAX_SIZE.
+        max_idle (float, optional): 使用されていない接続を閉じるまでの秒数. Defaults to POOL_MAX_IDLE.
+
+    Returns:
+        Any: コンテキストマネージャーとして使用できる接続
+    """
+    min_size = POOL_MIN_SIZE if min_size is None else int(min_size)
+    max_size = max(min_size, POOL_MAX_SIZE if max_size is None else int(max_size))
+    max_idle = POOL_MAX_IDLE if max_idle is None else float(max_idle)
+    key = (constr, min_size, max_size, max_idle)
+    pool = _pg_pools.get(key)
+    if pool is None:
+        with _pg_lock:
+            pool = _pg_pools.get(key)
+            if pool is None:
+                kwargs = dict(min_size=min_size, max_size=max_size, max_idle=max_idle,
+                              name=_PASSWORD_PATTERN.sub('password=****', constr))
+                if hasattr(ConnectionPool, 'check_connection'):
+                    kwargs['check'] = ConnectionPool.check_connection
+                pool = ConnectionPool(constr, open=True, **kwargs)
+                _pg_pools[key] = pool
+    return pool.connection()
+
+@contextmanager
+def sqlite_connection(db_path:Path, init:Callable[[sqlite3.Connection], None]=None) -> Iterator[sqlite3.Connection]:
+    """
+    スレッドごとにキャッシュしたSQLiteの接続を返します。
+    接続はWALモード及び `synchronous=NORMAL` で開かれ、スレッド内で再利用されるため閉じません。
+    ただし、データベースファイルが削除又は置き換えられた場合（inode番号が変わった場合）は、古い接続を閉じて開き直します。
+    スレッドが終了すると接続は閉じられ、 `stats` の接続数からも差し引かれます。
+    `sqlite3.Connection` をコンテキストマネージャーとして使用した場合と同様に、
+    正常終了時はコミットし、例外発生時はロールバックします。
+
+    Args:
+        db_path (Path): データベースファイルのパス
+        init (Callable[[sqlite3.Connection], None], optional): 接続を新たに開いた時に実行する初期化処理. Defaults to None.
+
+    Yields:
+        sqlite3.Connection: 接続
+    """
+    key = str(db_path)
+    conns = getattr(_sqlite_local, 'conns', None)
+    if conns is None:
+        conns = _sqlite_local.conns = _SqliteConns()
+    conn, ident = conns.entries.get(key, (None, None))
+    if conn is not None and _file_ident(key) != ident:
+        # ファイルが削除又は置き換えられた場合は、古いファイルを参照し続けないよう開き直す
+        del conns.entries[key]
+        _discard_sqlite(key, conn)
+        conn = None
+    if conn is None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(key)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if init is not None:
+            init(conn)
+        conns.entries[key] = (conn, _file_ident(key))
+        with _sqlite_lock:
+            _sqlite_conns[key] = _sqlite_conns.get(key, 0) + 1
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+def stats() -> List[Dict[str, Any]]:
+    """
+    接続プールの統計情報を返します。
+
+    Returns:
+        List[Dict[str, Any]]: 接続先ごとの統計情報
+    """
+    ret = []
+    for pool in list(_pg_pools.values()):
+        st = pool.get_stats()
+        ret.append(dict(dbtype='postgresql', name=pool.name, min_size=pool.min_size, max_size=pool.max_size,
+                        pool_size=st.get('pool_size', 0), pool_available=st.get('pool_available', 0),
+                        requests_waiting=st.get('requests_waiting', 0), requests_num=st.get('requests_num', 0),
+                        connections_errors=st.get('connections_errors', 0)))
+    with _sqlite_lock:
+        for key, cnt in _sqlite_conns.items():
+            # 現在生存しているスレッドが保持している接続数
+            ret.append(dict(dbtype='sqlite', name=key, pool_size=cnt))
+    return ret
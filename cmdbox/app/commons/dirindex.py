@@ -0,0 +1,304 @@
+from cmdbox.app import common
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple, Union
+import json
+import mimetypes
+import os
+import sqlite3
+import threading
+
+
+class DirIndex:
+    """
+    ディレクトリ配下のエントリ情報(stat結果とメタデータ)をキャッシュするクラス。
+    キャッシュはディレクトリと `.meta` ディレクトリのmtimeをキーに管理され、
+    エントリの追加・削除・名前変更があった場合は次回参照時に自動で再構築されます。
+    ファイルの内容の上書きはディレクトリのmtimeに反映されないため、参照時にエントリごとのstat結果と比較して
+    サイズ又は更新日時が変わったエントリのみを更新します。
+    メタデータの上書きは検知できないため、Filerの更新系操作から `invalidate` を呼び出して破棄します。
+    db_pathを指定した場合は、プロセスの再起動後もSQLiteに保存したインデックスを再利用します。
+    """
+    _indexes:Dict[str, 'DirIndex'] = dict()
+    _indexes_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, data_dir:Path, db_path:Path=None, max_dirs:int=10000) -> 'DirIndex':
+        """
+        データディレクトリごとのインスタンスを返します。
+        同じデータディレクトリを参照するFilerの間でキャッシュを共有するため、インスタンスはプロセス内で一つだけ作成されます。
+
+        Args:
+            data_dir (Path): データディレクトリ
+            db_path (Path, optional): インデックスを保存するSQLiteファイルのパス. Defaults to None.
+            max_dirs (int, optional): メモリ上に保持するディレクトリ数の上限. Defaults to 10000.
+
+        Returns:
+            DirIndex: インスタンス
+        """
+        key = str(data_dir)
+        with cls._indexes_lock:
+            index = cls._indexes.get(key)
+            if index is None:
+                index = cls(data_dir, db_path=db_path, max_dirs=max_dirs)
+                cls._indexes[key] = index
+            elif db_path is not None and index.db_path is None:
+                index._open_db(db_path)
+            return index
+
+    def __init__(self, data_dir:Path, db_path:Path=None, max_dirs:int=10000):
+        """
+        コンストラクタ
+
+        Args:
+            data_dir (Path): データディレクトリ
+            db_path (Path, optional): インデックスを保存するSQLiteファイルのパス. Defaults to None.
+            max_dirs (int, optional): メモリ上に保持するディレクトリ数の上限. Defaults to 10000.
+        """
+        self.data_dir = Path(data_dir)
+        self.max_dirs = max_dirs
+        self.lock = threading.RLock()
+        self.dirs:OrderedDict[str, Tuple[Tuple[int, int], List[Dict[str, Any]]]] = OrderedDict()
+        # 親ディレクトリのパスごとの、キャッシュしている子孫ディレクトリへ辿るための子ディレクトリのパスの集合
+        self.children:Dict[str, Set[str]] = dict()
+        self.db_path = None
+        self.db = None
+        if db_path is not None:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path:Path) -> None:
+        """
+        インデックスを保存するSQLiteファイルを開きます。
+
+        Args:
+            db_path (Path): SQLiteファイルのパス
+        """
+        with self.lock:
+            self.db_path = Path(db_path)
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS dirindex (path TEXT PRIMARY KEY, dir_mtime INTEGER, meta_mtime INTEGER, entries TEXT)")
+            self.db.commit()
+
+    def _mtimes(self, dir_path:Path) -> Union[Tuple[int, int], None]:
+        """
+        ディレクトリと `.meta` ディレクトリのmtimeを返します。
+
+        Args:
+            dir_path (Path): ディレクトリのパス
+
+        Returns:
+            Tuple[int, int]: ディレクトリのmtime, `.meta` ディレクトリのmtime。ディレクトリが存在しない場合はNone
+        """
+        try:
+            dir_mtime = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            return None
+        try:
+            meta_mtime = os.stat(os.path.join(dir_path, '.meta')).st_mtime_ns
+        except OSError:
+            meta_mtime = 0
+        return dir_mtime, meta_mtime
+
+    def _scan(self, dir_path:Path) -> List[Dict[str, Any]]:
+        """
+        ディレクトリを走査してエントリ情報のリストを作成します。
+
+        Args:
+            dir_path (Path): ディレクトリのパス
+
+        Returns:
+            List[Dict[str, Any]]: 名前順にソートされたエントリ情報のリスト
+        """
+        meta_names = set()
+        meta_dir = os.path.join(dir_path, '.meta')
+        if os.path.isdir(meta_dir):
+            with os.scandir(meta_dir) as it:
+                meta_names = {e.name[:-5] for e in it if e.name.endswith('.json')}
+        entries = []
+        with os.scandir(dir_path) as it:
+            for e in it:
+                try:
+                    st = e.stat()
+                    is_dir = e.is_dir()
+                except OSError:
+                    # リンク切れなど存在しないエントリは除外する
+                    continue
+                mime_type, _ = mimetypes.guess_type(e.path)
+                meta = common.load_meta(Path(e.path)) if e.name in meta_names else {}
+                entries.append(dict(name=e.name, is_dir=is_dir, mime_type=mime_type,
+                                    size=st.st_size, mtime=st.st_mtime, mtime_ns=st.st_mtime_ns, meta=meta))
+        entries.sort(key=lambda e: e['name'])
+        return entries
+
+    def _validate(self, dir_path:str, entries:List[Dict[str, Any]]) -> Union[List[Dict[str, Any]], None]:
+        """
+        エントリごとにstatを取得し、サイズ又は更新日時が変わったエントリのstat結果を更新します。
+        ディレクトリの走査やメタデータの読み込みは行いません。
+
+        Args:
+            dir_path (str): ディレクトリのパス
+            entries (List[Dict[str, Any]]): キャッシュされたエントリ情報のリスト
+
+        Returns:
+            List[Dict[str, Any]]: 変更がない場合はentries、変更がある場合は更新したエントリ情報の新しいリスト。
+                                  存在しないエントリがある場合はNone
+        """
+        ret = None
+        for i, ent in enumerate(entries):
+            try:
+                st = os.stat(os.path.join(dir_path, ent['name']))
+            except OSError:
+                return None
+            if ent.get('mtime_ns') == st.st_mtime_ns and ent.get('size') == st.st_size:
+                continue
+            if ret is None:
+                # 返却済みのリストは呼び出し元が参照しているため、変更せずに複製する
+                ret = list(entries)
+            ret[i] = dict(ent, size=st.st_size, mtime=st.st_mtime, mtime_ns=st.st_mtime_ns)
+        return entries if ret is None else ret
+
+    def list_dir(self, dir_path:Path) -> List[Dict[str, Any]]:
+        """
+        ディレクトリ配下のエントリ情報のリストを返します。
+        キャッシュが有効な場合はディレクトリを走査せず、エントリごとのstat結果のみを確認してキャッシュを返します。
+
+        Args:
+            dir_path (Path): ディレクトリのパス
+
+        Returns:
+            List[Dict[str, Any]]: 名前順にソートされたエントリ情報のリスト。返されたリストは変更しないでください
+        """
+        key = str(dir_path)
+        mtimes = self._mtimes(dir_path)
+        if mtimes is None:
+            self.invalidate(dir_path)
+            return []
+        entries = None
+        with self.lock:
+            cached = self.dirs.get(key)
+            if cached is not None and cached[0] == mtimes:
+                self.dirs.move_to_end(key)
+                entries = cached[1]
+            elif self.db is not None:
+                row = self.db.execute("SELECT entries FROM dirindex WHERE path=? AND dir_mtime=? AND meta_mtime=?",
+                                      (key, mtimes[0], mtimes[1])).fetchone()
+                if row is not None:
+                    entries = json.loads(row[0])
+                    self._put(key, mtimes, entries)
+        if entries is not None:
+            validated = self._validate(key, entries)
+            if validated is entries:
+                return entries
+            if validated is not None:
+                self._save(key, mtimes, validated)
+                return validated
+        entries = self._scan(dir_path)
+        self._save(key, mtimes, entries)
+        return entries
+
+    def _save(self, key:str, mtimes:Tuple[int, int], entries:List[Dict[str, Any]]) -> None:
+        """
+        メモリ上のキャッシュとSQLiteに保存します。
+
+        Args:
+            key (str): ディレクトリのパス
+            mtimes (Tuple[int, int]): ディレクトリと `.meta` ディレクトリのmtime
+            entries (List[Dict[str, Any]]): エントリ情報のリスト
+        """
+        with self.lock:
+            self._put(key, mtimes, entries)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO dirindex (path, dir_mtime, meta_mtime, entries) VALUES (?, ?, ?, ?)",
+                                (key, mtimes[0], mtimes[1], json.dumps(entries, default=common.default_json_enc)))
+                self.db.commit()
+
+    def _put(self, key:str, mtimes:Tuple[int, int], entries:List[Dict[str, Any]]) -> None:
+        """
+        メモリ上のキャッシュに保存し、上限を超えた場合は古いものから破棄します。
+
+        Args:
+            key (str): ディレクトリのパス
+            mtimes (Tuple[int, int]): ディレクトリと `.meta` ディレクトリのmtime
+            entries (List[Dict[str, Any]]): エントリ情報のリスト
+        """
+        self.dirs[key] = (mtimes, entries)
+        self.dirs.move_to_end(key)
+        self._link(key)
+        while len(self.dirs) > self.max_dirs:
+            old, _ = self.dirs.popitem(last=False)
+            self._prune(old)
+
+    def _link(self, key:str) -> None:
+        """
+        キャッシュしたディレクトリを、祖先ディレクトリから辿れるように `children` に登録します。
+
+        Args:
+            key (str): ディレクトリのパス
+        """
+        while True:
+            parent = os.path.dirname(key)
+            if parent == key:
+                break
+            siblings = self.children.setdefault(parent, set())
+            if key in siblings:
+                break
+            siblings.add(key)
+            key = parent
+
+    def _prune(self, key:str) -> None:
+        """
+        キャッシュされておらず、子孫ディレクトリもキャッシュされていないディレクトリを `children` から取り除きます。
+
+        Args:
+            key (str): ディレクトリのパス
+        """
+        while key not in self.dirs and not self.children.get(key):
+            self.children.pop(key, None)
+            parent = os.path.dirname(key)
+            siblings = self.children.get(parent)
+            if parent == key or siblings is None:
+                break
+            siblings.discard(key)
+            key = parent
+
+    def invalidate(self, path:Path) -> None:
+        """
+        指定したパスに関係するキャッシュを破棄します。
+        パス自身、親ディレクトリ、及びパス配下のディレクトリのキャッシュが対象です。
+
+        Args:
+            path (Path): 更新されたファイル又はディレクトリのパス
+        """
+        if path is None:
+            return
+        key = str(path)
+        parent = str(Path(path).parent)
+        prefix = key.rstrip(os.sep) + os.sep
+        with self.lock:
+            # 全てのキャッシュを調べずに、childrenから配下のディレクトリのみを辿って破棄する
+            stack = [key]
+            while stack:
+                k = stack.pop()
+                stack.extend(self.children.pop(k, ()))
+                self.dirs.pop(k, None)
+            self.dirs.pop(parent, None)
+            self._prune(key)
+            self._prune(parent)
+            if self.db is not None:
+                # 主キーの索引を使用できるよう、配下のパスは範囲で指定する
+                upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+                self.db.execute("DELETE FROM dirindex WHERE path=? OR path=? OR (path>=? AND path<?)", (key, parent, prefix, upper))
+                self.db.commit()
+
+    def clear(self) -> None:
+        """
+        全てのキャッシュを破棄します。
+        """
+        with self.lock:
+            self.dirs.clear()
+            self.children.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM dirindex")
+                self.db.commit()
@@ -0,0 +1,168 @@
+from array import array
+from cmdbox.app.commons import dbpool
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+class EmbedCache:
+    """
+    エンベディング結果をキャッシュするクラス。
+    キャッシュは data_dir/.agent/embed_cache.db のSQLiteに保存され、
+    LLM設定のモデルを識別する項目と正規化したテキストのハッシュをキーとします。
+    ベクトルはfloat64のバイト列で保存するため、プロバイダーの応答と同じ値を返します。
+    件数が ``max_entries`` を超えた場合は、最後に参照された日時が古いものから削除します。
+    """
+    DB_NAME = "embed_cache.db"
+    # キャッシュの最大件数
+    MAX_ENTRIES = 100000
+    # キーに含めるLLM設定の項目
+    CONFIG_KEYS = ['llmprov', 'llmmodel', 'llmendpoint', 'llmapiversion', 'llmprojectid', 'llmlocation']
+
+    _caches:Dict[str, 'EmbedCache'] = dict()
+    _caches_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, cache_dir:Path, max_entries:int=None) -> 'EmbedCache':
+        """
+        キャッシュのディレクトリごとのインスタンスを返します。
+
+        Args:
+            cache_dir (Path): キャッシュのディレクトリ
+            max_entries (int, optional): キャッシュの最大件数. Defaults to MAX_ENTRIES.
+
+        Returns:
+            EmbedCache: インスタンス
+        """
+        key = str(cache_dir)
+        with cls._caches_lock:
+            cache = cls._caches.get(key)
+            if cache is None:
+                cache = cls(cache_dir, max_entries=max_entries)
+                cls._caches[key] = cache
+            return cache
+
+    def __init__(self, cache_dir:Path, max_entries:int=None):
+        """
+        コンストラクタ
+
+        Args:
+            cache_dir (Path): キャッシュのディレクトリ
+            max_entries (int, optional): キャッシュの最大件数. Defaults to MAX_ENTRIES.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.db_path = self.cache_dir / self.DB_NAME
+        self.max_entries = int(max_entries) if max_entries else self.MAX_ENTRIES
+        self.lock = threading.Lock()
+        self.count = None
+
+    def _init_db(self, conn:sqlite3.Connection) -> None:
+        """
+        テーブルを作成します。
+
+        Args:
+            conn (sqlite3.Connection): 接続
+        """
+        conn.execute("CREATE TABLE IF NOT EXISTS embed_cache (cache_key TEXT PRIMARY KEY, "
+                     "embedding BLOB NOT NULL, last_used REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS embed_cache_last_used ON embed_cache (last_used)")
+        conn.commit()
+
+    def _connection(self):
+        """
+        スレッドごとにキャッシュしたSQLiteの接続を返します。
+
+        Returns:
+            Iterator[sqlite3.Connection]: 接続を返すコンテキストマネージャー
+        """
+        return dbpool.sqlite_connection(self.db_path, init=self._init_db)
+
+    def namespace(self, llmname:str, configure:Dict[str, Any]) -> str:
+        """
+        LLM設定からキャッシュの名前空間を作成します。
+        モデルを識別する項目のみを使用するため、APIキーの変更ではキャッシュは無効になりません。
+
+        Args:
+            llmname (str): LLM設定の名前
+            configure (Dict[str, Any]): LLM設定
+
+        Returns:
+            str: 名前空間
+        """
+        conf = {k: configure.get(k) for k in self.CONFIG_KEYS}
+        conf['llmname'] = llmname
+        return hashlib.sha256(json.dumps(conf, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def key(self, namespace:str, text:str) -> str:
+        """
+        テキストを正規化してキャッシュのキーを作成します。
+
+        Args:
+            namespace (str): 名前空間
+            text (str): テキスト
+
+        Returns:
+            str: キー
+        """
+        text = unicodedata.normalize('NFC', str(text)).strip()
+        return namespace + ':' + hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys:List[str]) -> List[Optional[List[float]]]:
+        """
+        キーに対応するエンベディングを返します。見つかったものは最終参照日時を更新します。
+
+        Args:
+            keys (List[str]): キーのリスト
+
+        Returns:
+            List[Optional[List[float]]]: キーと同じ順序のエンベディングのリスト。見つからない場合はNone
+        """
+        found:Dict[str, List[float]] = dict()
+        uniq = list(dict.fromkeys(keys))
+        with self._connection() as conn:
+            for i in range(0, len(uniq), 500):
+                chunk = uniq[i:i+500]
+                rows = conn.execute(f"SELECT cache_key, embedding FROM embed_cache WHERE cache_key IN ({','.join('?' * len(chunk))})",
+                                    chunk).fetchall()
+                for cache_key, data in rows:
+                    found[cache_key] = array('d', data).tolist()
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE embed_cache SET last_used=? WHERE cache_key=?", [(now, k) for k in found.keys()])
+        return [found.get(k) for k in keys]
+
+    def put_many(self, items:Dict[str, List[float]]) -> None:
+        """
+        エンベディングを保存し、最大件数を超えた場合は古いものから削除します。
+
+        Args:
+            items (Dict[str, List[float]]): キーとエンベディングの辞書
+        """
+        if not items:
+            return
+        now = time.time()
+        with self.lock, self._connection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO embed_cache (cache_key, embedding, last_used) VALUES (?, ?, ?)",
+                             [(k, array('d', v).tobytes(), now) for k, v in items.items()])
+            # 件数は上書きも加算した見積りで管理し、上限を超えた時だけ数え直す
+            self.count = len(items) + (self.count if self.count is not None else 0)
+            if self.count > self.max_entries:
+                self.count = conn.execute("SELECT COUNT(*) FROM embed_cache").fetchone()[0]
+                if self.count > self.max_entries:
+                    conn.execute("DELETE FROM embed_cache WHERE cache_key IN "
+                                 "(SELECT cache_key FROM embed_cache ORDER BY last_used LIMIT ?)",
+                                 (self.count - self.max_entries,))
+                    self.count = self.max_entries
+
+    def clear(self) -> None:
+        """
+        全てのキャッシュを削除します。
+        """
+        with self.lock, self._connection() as conn:
+            conn.execute("DELETE FROM embed_cache")
+            self.count = 0
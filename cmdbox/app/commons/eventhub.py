@@ -0,0 +1,253 @@
+from cmdbox.app import common
+from collections import deque
+from typing import Any, Dict, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import queue
+import redis
+import redis.asyncio
+import threading
+import time
+import uuid
+
+
+class Subscription:
+    """
+    EventHubの接続ごとの購読。
+    イベントは購読したイベントループ上のバッファに格納され、 ``get`` で取り出します。
+    購読の所有者と異なる所有者のイベントは格納しません。
+    取り出される前に同じコマンドとタイトルのログが続いた場合は1つにまとめ、
+    バッファが上限に達した場合は古いイベントから捨てます。
+    """
+    # まとめるログのコマンドと連結文字列
+    COALESCE_CMDS:Dict[str, str] = {'js_console_modal_log_func': '', 'js_return_stream_log_func': '<br/>'}
+
+    def __init__(self, loop:asyncio.AbstractEventLoop, maxsize:int, owner:str=None):
+        """
+        コンストラクタ
+
+        Args:
+            loop (asyncio.AbstractEventLoop): 購読したイベントループ
+            maxsize (int): バッファの上限
+            owner (str, optional): 購読の所有者. サインインしていない場合はNone. Defaults to None.
+        """
+        self.loop = loop
+        self.maxsize = maxsize
+        self.owner = owner
+        self.items:deque = deque()
+        self.ready = asyncio.Event()
+        self.coalesced = 0
+        self.dropped = 0
+
+    def push(self, item:Tuple[str, str, Any], owner:str=None) -> None:
+        """
+        イベントをバッファに格納します。イベントループのスレッドから呼び出します。
+
+        Args:
+            item (Tuple[str, str, Any]): コマンド、タイトル、出力
+            owner (str, optional): イベントの所有者. Defaults to None.
+        """
+        if owner != self.owner:
+            return
+        cmd, title, output = item
+        if self.items and cmd in self.COALESCE_CMDS and isinstance(output, str):
+            last_cmd, last_title, last_output = self.items[-1]
+            if last_cmd == cmd and last_title == title and isinstance(last_output, str):
+                self.items[-1] = (cmd, title, last_output + self.COALESCE_CMDS[cmd] + output)
+                self.coalesced += 1
+                return
+        if len(self.items) >= self.maxsize:
+            self.items.popleft()
+            self.dropped += 1
+        self.items.append(item)
+        self.ready.set()
+
+    async def get(self) -> Tuple[str, str, Any]:
+        """
+        イベントを取り出します。イベントが無い場合は格納されるまで待ちます。
+
+        Returns:
+            Tuple[str, str, Any]: コマンド、タイトル、出力
+        """
+        while not self.items:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.items.popleft()
+
+
+class EventHub:
+    """
+    コマンドの実行結果をWebSocketの接続ごとに配信するクラス。
+    ``publish`` されたイベントは同じプロセスの同じ所有者の購読に直ちに配信され、
+    Redisのpub/subを経由して他のワーカープロセスの購読にも配信されます。
+    Redisに接続できない場合は同じプロセスの購読にのみ配信します。
+    """
+    # Redisの接続に失敗した時に再接続を待つ秒数
+    RETRY_INTERVAL:int = 30
+
+    def __init__(self, logger:logging.Logger, redis_host:str=None, redis_port:int=None, redis_password:str=None,
+                 channel:str=None, maxsize:int=1000):
+        """
+        コンストラクタ
+
+        Args:
+            logger (logging.Logger): ロガー
+            redis_host (str, optional): Redisのホスト名. Noneの場合はRedisを使用しません. Defaults to None.
+            redis_port (int, optional): Redisのポート番号. Defaults to None.
+            redis_password (str, optional): Redisのパスワード. Defaults to None.
+            channel (str, optional): Redisのチャンネル名. Defaults to None.
+            maxsize (int, optional): 購読ごとのバッファの上限. Defaults to 1000.
+        """
+        self.logger = logger
+        self.redis_host = redis_host
+        self.redis_port = redis_port
+        self.redis_password = redis_password
+        self.channel = channel
+        self.maxsize = maxsize
+        self.origin = uuid.uuid4().hex
+        self.subs:Set[Subscription] = set()
+        self.lock = threading.Lock()
+        self.listeners:Dict[asyncio.AbstractEventLoop, asyncio.Task] = dict()
+        self.pubq:queue.Queue = queue.Queue(maxsize)
+        self.pub_th:Optional[threading.Thread] = None
+
+    @property
+    def use_redis(self) -> bool:
+        return self.redis_host is not None and self.channel is not None
+
+    def subscribe(self, owner:str=None) -> Subscription:
+        """
+        実行中のイベントループで購読を開始します。
+
+        Args:
+            owner (str, optional): 購読の所有者. サインインしていない場合はNone. Defaults to None.
+
+        Returns:
+            Subscription: 購読
+        """
+        loop = asyncio.get_running_loop()
+        sub = Subscription(loop, self.maxsize, owner)
+        with self.lock:
+            self.subs.add(sub)
+            if self.use_redis and (loop not in self.listeners or self.listeners[loop].done()):
+                self.listeners[loop] = loop.create_task(self._listen())
+        return sub
+
+    def unsubscribe(self, sub:Subscription) -> None:
+        """
+        購読を終了します。イベントループの購読が無くなった場合はRedisの受信も終了します。
+
+        Args:
+            sub (Subscription): 購読
+        """
+        with self.lock:
+            self.subs.discard(sub)
+            if any(s.loop is sub.loop for s in self.subs):
+                return
+            task = self.listeners.pop(sub.loop, None)
+        if task is not None:
+            task.cancel()
+
+    def publish(self, cmd:str, title:str, output:Any, owner:str=None) -> None:
+        """
+        イベントを配信します。どのスレッドからでも呼び出せます。
+
+        Args:
+            cmd (str): ブラウザで実行する関数名
+            title (str): タイトル
+            output (Any): 出力
+            owner (str, optional): イベントの所有者. 同じ所有者の購読にだけ配信します. Defaults to None.
+        """
+        self._deliver((cmd, title, output), owner)
+        if not self.use_redis:
+            return
+        self._start_publisher()
+        try:
+            self.pubq.put_nowait((cmd, title, output, owner))
+        except queue.Full:
+            self.logger.warning(f"EventHub: publish queue is full. event dropped. cmd={cmd}, title={title}")
+
+    def put(self, item:Tuple[str, str, Any], block:bool=True, timeout:float=None) -> None:
+        """
+        queue.Queueと同じ形式でイベントを配信します。
+        所有者は実行中のリクエストのサインインユーザーです。
+
+        Args:
+            item (Tuple[str, str, Any]): コマンド、タイトル、出力
+            block (bool, optional): 未使用. Defaults to True.
+            timeout (float, optional): 未使用. Defaults to None.
+        """
+        from cmdbox.app.auth import signin
+        self.publish(*item, owner=signin.get_request_user())
+
+    def _deliver(self, item:Tuple[str, str, Any], owner:str) -> None:
+        with self.lock:
+            subs = list(self.subs)
+        for sub in subs:
+            if sub.owner != owner:
+                continue
+            try:
+                sub.loop.call_soon_threadsafe(sub.push, item, owner)
+            except RuntimeError:
+                # イベントループが終了している購読は破棄する
+                with self.lock:
+                    self.subs.discard(sub)
+
+    def _start_publisher(self) -> None:
+        if self.pub_th is not None:
+            return
+        with self.lock:
+            if self.pub_th is None:
+                self.pub_th = threading.Thread(target=self._publisher, daemon=True, name="eventhub_publisher")
+                self.pub_th.start()
+
+    def _publisher(self) -> None:
+        """
+        キューに格納されたイベントをRedisに送信します。
+        接続に失敗した場合は ``RETRY_INTERVAL`` 秒の間、他のプロセスへの配信を止めます。
+        """
+        client = None
+        retry_at = 0.0
+        while True:
+            cmd, title, output, owner = self.pubq.get()
+            if time.time() < retry_at:
+                continue
+            try:
+                if client is None:
+                    client = redis.Redis(host=self.redis_host, port=self.redis_port, password=self.redis_password,
+                                         protocol=2, socket_connect_timeout=2, socket_timeout=2)
+                data = json.dumps(dict(origin=self.origin, owner=owner, cmd=cmd, title=title, output=output), default=common.default_json_enc)
+                client.publish(self.channel, data)
+            except Exception as e:
+                self.logger.warning(f"EventHub: failed to publish to redis. channel={self.channel}, {e}")
+                retry_at = time.time() + self.RETRY_INTERVAL
+                client = None
+
+    async def _listen(self) -> None:
+        """
+        Redisのチャンネルを購読し、他のプロセスのイベントを配信します。
+        """
+        while True:
+            client = None
+            try:
+                client = redis.asyncio.Redis(host=self.redis_host, port=self.redis_port, password=self.redis_password,
+                                             protocol=2, socket_connect_timeout=2)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    while True:
+                        msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if msg is None or msg.get('type') != 'message':
+                            continue
+                        event = json.loads(msg['data'])
+                        if event.get('origin') == self.origin:
+                            continue
+                        self._deliver((event.get('cmd'), event.get('title'), event.get('output')), event.get('owner'))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"EventHub: failed to subscribe to redis. channel={self.channel}, {e}")
+                await asyncio.sleep(self.RETRY_INTERVAL)
+            finally:
+                if client is not None:
+                    await client.aclose()
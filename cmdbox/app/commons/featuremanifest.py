@@ -0,0 +1,296 @@
+from cmdbox.app import common, feature
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+
+
+class LazyFeature:
+    """
+    マニフェストから生成したフィーチャーの代理クラス。
+    モード、コマンド、サーバー側のコマンドはマニフェストの値を返し、
+    それ以外の属性が参照された時に初めてモジュールを読み込んでフィーチャーを生成します。
+    ``__class__`` は実体のクラスを返すため、 ``isinstance`` による判定はそのまま使用できます。
+    """
+    _instances:Dict[str, 'feature.Feature'] = dict()
+    _instances_lock = threading.RLock()
+
+    def __init__(self, module_name:str, class_name:str, mode:Any, cmd:str, svcmd:Optional[str], appcls=None, ver=None, language:str=None):
+        """
+        コンストラクタ
+
+        Args:
+            module_name (str): モジュール名
+            class_name (str): クラス名
+            mode (Any): モード
+            cmd (str): コマンド
+            svcmd (Optional[str]): サーバー側のコマンド
+            appcls ([type], optional): アプリケーションクラス. Defaults to None.
+            ver ([type], optional): バージョンモジュール. Defaults to None.
+            language (str, optional): 言語設定. Defaults to None.
+        """
+        object.__setattr__(self, '_lazy_args', (module_name, class_name, mode, cmd, svcmd, appcls, ver, language))
+
+    def _lazy_resolve(self) -> 'feature.Feature':
+        """
+        フィーチャーの実体を返します。初回はモジュールを読み込んでフィーチャーを生成します。
+
+        Returns:
+            feature.Feature: フィーチャー
+        """
+        module_name, class_name, _, _, _, appcls, ver, language = object.__getattribute__(self, '_lazy_args')
+        key = f"{module_name}.{class_name}"
+        fobj = LazyFeature._instances.get(key)
+        if fobj is not None:
+            return fobj
+        with LazyFeature._instances_lock:
+            fobj = LazyFeature._instances.get(key)
+            if fobj is None:
+                cls = getattr(importlib.import_module(module_name), class_name)
+                fobj = cls(appcls, ver, language=language)
+                LazyFeature._instances[key] = fobj
+            return fobj
+
+    @property
+    def __class__(self):
+        return self._lazy_resolve().__class__
+
+    def get_mode(self) -> Any:
+        return object.__getattribute__(self, '_lazy_args')[2]
+
+    def get_cmd(self) -> str:
+        return object.__getattribute__(self, '_lazy_args')[3]
+
+    def get_svcmd(self) -> Optional[str]:
+        return object.__getattribute__(self, '_lazy_args')[4]
+
+    def __getattr__(self, name:str) -> Any:
+        return getattr(self._lazy_resolve(), name)
+
+    def __setattr__(self, name:str, value:Any) -> None:
+        setattr(self._lazy_resolve(), name, value)
+
+    def __repr__(self) -> str:
+        module_name, class_name = object.__getattribute__(self, '_lazy_args')[:2]
+        return f"<LazyFeature {module_name}.{class_name}>"
+
+
+class LazyCallable:
+    """
+    マニフェストに保存できない ``choice_fn`` 等の関数の代理クラス。
+    呼び出された時にフィーチャーの実体から同じオプションの関数を取得して実行します。
+    """
+
+    def __init__(self, fobj:LazyFeature, opt:str, key:str):
+        """
+        コンストラクタ
+
+        Args:
+            fobj (LazyFeature): フィーチャーの代理
+            opt (str): 関数を持つオプション名
+            key (str): 関数のキー名
+        """
+        self.fobj = fobj
+        self.opt = opt
+        self.key = key
+        self.func = None
+
+    def _find(self, val:Any) -> Optional[Callable]:
+        if isinstance(val, dict):
+            if val.get('opt') == self.opt and callable(val.get(self.key)):
+                return val[self.key]
+            val = list(val.values())
+        if isinstance(val, (list, tuple)):
+            for v in val:
+                func = self._find(v)
+                if func is not None:
+                    return func
+        return None
+
+    def __call__(self, *args, **kwargs) -> Any:
+        if self.func is None:
+            self.func = self._find(self.fobj._lazy_resolve().get_option())
+            if self.func is None:
+                raise ValueError(f'LazyCallable: "{self.key}" of option "{self.opt}" is not found in {self.fobj}.')
+        return self.func(*args, **kwargs)
+
+
+class FeatureManifest:
+    """
+    フィーチャーのモード、コマンド、オプション、サーバー側のコマンドを保存するマニフェストのクラス。
+    マニフェストは ~/.{appid}/.features/{パッケージ名}.json に保存され、
+    パッケージ内のソースファイル、バージョン、言語、オプションの初期値に影響する環境変数が変わると作り直されます。
+    """
+    # オプションの初期値に影響する環境変数
+    ENV_KEYS = ['REDIS_HOST', 'REDIS_PORT', 'REDIS_PASSWORD', 'SVNAME', 'DATA_DIR', 'LANG', 'LC_ALL']
+
+    def __init__(self, package_name:str, prefix:str, excludes:list, appcls=None, ver=None, language:str=None):
+        """
+        コンストラクタ
+
+        Args:
+            package_name (str): パッケージ名
+            prefix (str): プレフィックス
+            excludes (list): 除外するモジュール名のリスト
+            appcls ([type], optional): アプリケーションクラス. Defaults to None.
+            ver ([type], optional): バージョンモジュール. Defaults to None.
+            language (str, optional): 言語設定. Defaults to None.
+        """
+        self.package_name = package_name
+        self.appcls = appcls
+        self.ver = ver
+        self.language = language
+        appid = ver.__appid__ if ver is not None else 'cmdbox'
+        self.path = common.HOME_DIR / f'.{appid}' / '.features' / f'{package_name}.json'
+        self.key = self._fingerprint(prefix, excludes)
+
+    def _fingerprint(self, prefix:str, excludes:list) -> Optional[str]:
+        """
+        マニフェストが有効かどうかを判定するためのキーを作成します。
+
+        Args:
+            prefix (str): プレフィックス
+            excludes (list): 除外するモジュール名のリスト
+
+        Returns:
+            Optional[str]: キー。作成できない場合はNone
+        """
+        try:
+            package = __import__(self.package_name, fromlist=[''])
+            files = []
+            for pkg_dir in list(package.__path__) + [Path(feature.__file__).parent]:
+                for root, dirs, names in os.walk(pkg_dir):
+                    dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+                    for name in sorted(names):
+                        if name.endswith('.py'):
+                            st = os.stat(os.path.join(root, name))
+                            files.append((os.path.join(root, name), st.st_mtime_ns, st.st_size))
+            appcls = f"{self.appcls.__module__}.{self.appcls.__qualname__}" if self.appcls is not None else None
+            ver = (self.ver.__appid__, self.ver.__version__, self.ver.__file__) if self.ver is not None else None
+            data = dict(package=self.package_name, prefix=prefix, excludes=list(excludes), appcls=appcls, ver=ver,
+                        language=self.language, python=sys.version, cpu=multiprocessing.cpu_count(),
+                        env={k: os.environ.get(k) for k in self.ENV_KEYS}, files=files)
+            return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        except Exception:
+            return None
+
+    def load(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        有効なマニフェストのエントリーを返します。
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: エントリーのリスト。マニフェストが無い又は古い場合はNone
+        """
+        if self.key is None or not self.path.is_file():
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        if not isinstance(data, dict) or data.get('key') != self.key:
+            return None
+        return data.get('features')
+
+    def save(self, entries:List[Dict[str, Any]]) -> None:
+        """
+        マニフェストを保存します。保存に失敗した場合は何もしません。
+
+        Args:
+            entries (List[Dict[str, Any]]): エントリーのリスト
+        """
+        if self.key is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(dict(key=self.key, features=entries), f, ensure_ascii=False)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def entry(self, module_name:str, class_name:str, fobj:'feature.Feature', mode:Any, cmd:str, opt:Dict[str, Any]) -> Dict[str, Any]:
+        """
+        フィーチャーのマニフェストのエントリーを作成します。
+        オプションにJSONに変換できない値がある場合は、読込み時にモジュールを読み込むエントリーにします。
+
+        Args:
+            module_name (str): モジュール名
+            class_name (str): クラス名
+            fobj (feature.Feature): フィーチャー
+            mode (Any): モード
+            cmd (str): コマンド
+            opt (Dict[str, Any]): get_option()の戻り値
+
+        Returns:
+            Dict[str, Any]: エントリー
+        """
+        ent = dict(module=module_name, cls=class_name, mode=mode, cmd=cmd)
+        try:
+            ent['svcmd'] = fobj.get_svcmd()
+            ent['option'] = self._encode({k: v for k, v in opt.items() if k != 'feature'}, None)
+            json.dumps(ent)
+        except Exception:
+            ent = dict(module=module_name, cls=class_name, mode=mode, cmd=cmd, eager=True)
+        return ent
+
+    def _encode(self, val:Any, opt:Optional[str]) -> Any:
+        if isinstance(val, Path):
+            return {'__path__': str(val)}
+        if isinstance(val, dict):
+            ret = dict()
+            for k, v in val.items():
+                if callable(v) and not isinstance(v, type):
+                    if val.get('opt') is None:
+                        raise TypeError(f'Cannot save the callable "{k}" outside of an option.')
+                    ret[k] = {'__callable__': val['opt']}
+                else:
+                    ret[k] = self._encode(v, val.get('opt', opt))
+            return ret
+        if isinstance(val, (list, tuple)):
+            return [self._encode(v, opt) for v in val]
+        if val is None or isinstance(val, (str, int, float, bool)):
+            return val
+        raise TypeError(f'Cannot save the value to the manifest. ({type(val)})')
+
+    def lazy_feature(self, ent:Dict[str, Any]) -> LazyFeature:
+        """
+        エントリーからフィーチャーの代理を作成します。
+
+        Args:
+            ent (Dict[str, Any]): エントリー
+
+        Returns:
+            LazyFeature: フィーチャーの代理
+        """
+        return LazyFeature(ent['module'], ent['cls'], ent['mode'], ent['cmd'], ent.get('svcmd'),
+                           appcls=self.appcls, ver=self.ver, language=self.language)
+
+    def decode(self, val:Any, fobj:LazyFeature, key:str=None) -> Any:
+        """
+        エントリーのオプションを復元します。
+
+        Args:
+            val (Any): エントリーのオプション
+            fobj (LazyFeature): フィーチャーの代理
+            key (str, optional): 値のキー名. Defaults to None.
+
+        Returns:
+            Any: オプション
+        """
+        if isinstance(val, dict):
+            if len(val) == 1 and '__path__' in val:
+                return Path(val['__path__'])
+            if len(val) == 1 and '__callable__' in val:
+                return LazyCallable(fobj, val['__callable__'], key)
+            return {k: self.decode(v, fobj, k) for k, v in val.items()}
+        if isinstance(val, list):
+            return [self.decode(v, fobj) for v in val]
+        return val
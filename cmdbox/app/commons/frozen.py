@@ -0,0 +1,101 @@
+from typing import Any
+
+
+class FrozenDict(dict):
+    """
+    変更できない辞書クラス。
+    ``dict`` のサブクラスのため、JSONへの変換や ``isinstance`` による判定はそのまま使用できます。
+    ``copy.deepcopy`` は変更可能な ``dict`` を返します。
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"'{self.__class__.__name__}' object is immutable. Use copy.deepcopy() to get a mutable copy.")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo) -> dict:
+        return thaw(self)
+
+    def __reduce__(self):
+        return (dict, (thaw(self),))
+
+
+class FrozenList(list):
+    """
+    変更できないリストクラス。
+    ``list`` のサブクラスのため、JSONへの変換や ``isinstance`` による判定はそのまま使用できます。
+    ``copy.deepcopy`` は変更可能な ``list`` を返します。
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"'{self.__class__.__name__}' object is immutable. Use copy.deepcopy() to get a mutable copy.")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __iadd__ = _readonly
+    __imul__ = _readonly
+    append = _readonly
+    clear = _readonly
+    extend = _readonly
+    insert = _readonly
+    pop = _readonly
+    remove = _readonly
+    reverse = _readonly
+    sort = _readonly
+
+    def copy(self) -> list:
+        return list(self)
+
+    def __copy__(self) -> list:
+        return list(self)
+
+    def __deepcopy__(self, memo) -> list:
+        return thaw(self)
+
+    def __reduce__(self):
+        return (list, (thaw(self),))
+
+
+def freeze(obj:Any) -> Any:
+    """
+    辞書とリストを再帰的に変更できないオブジェクトに変換します。
+
+    Args:
+        obj (Any): 変換するオブジェクト
+
+    Returns:
+        Any: 変換したオブジェクト
+    """
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return FrozenList(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj:Any) -> Any:
+    """
+    ``freeze`` で変換したオブジェクトを再帰的に変更可能な辞書とリストに変換します。
+
+    Args:
+        obj (Any): 変換するオブジェクト
+
+    Returns:
+        Any: 変換したオブジェクト
+    """
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [thaw(v) for v in obj]
+    return obj
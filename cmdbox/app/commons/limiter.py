@@ -1,13 +1,15 @@
 from cmdbox.app import common, feature
-from cmdbox.app.commons import redis_client
+from cmdbox.app.commons import counterstore, redis_client
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import argparse
+import atexit
 import calendar
 import functools
 import json
 import logging
+import threading
 import time
 
 
@@ -42,6 +44,33 @@ def _apprun_pre(self:'LimitedFeature', logger:logging.Logger, args:argparse.Name
                                               scope='client')
     return st, msg, deny_limiter_names, limit
 
+def notify_client_config_changed(logger:logging.Logger, args:argparse.Namespace) -> None:
+    """
+    クライアント側の制限設定が変更されたことを通知します。
+    Redis サーバーの接続情報が揃っている場合は Redis 上の設定のバージョンを更新し、
+    揃っていない場合はこのプロセスの Limiter のみに通知します。
+
+    Args:
+        logger (logging.Logger): ロガー
+        args (argparse.Namespace): コマンドの引数を含むNamespaceオブジェクト
+    """
+    host = getattr(args, 'host', None)
+    port = getattr(args, 'port', None)
+    password = getattr(args, 'password', None)
+    svname = getattr(args, 'svname', None)
+    redis_cli = None
+    try:
+        if host and port and password and svname:
+            redis_cli = redis_client.RedisClient(logger, host=host, port=port, password=password, svname=svname)
+        Limiter.notify_config_changed(redis_cli)
+    except Exception as e:
+        # 設定ファイルは保存済みのため、通知に失敗した場合は reload_interval 秒後の再ロードに任せる
+        logger.warning(f"Failed to notify the limiter configuration change: {e}")
+        Limiter.notify_config_changed(None)
+    finally:
+        if redis_cli is not None:
+            redis_cli.close()
+
 def _apprun_post(self:'LimitedFeature', stime:float, msg:Dict[str, Any], deny_limiter_names:List[str],
                  data_dir:Path, logger:logging.Logger, args:argparse.Namespace, limit:'Limiter'):
     """
@@ -407,7 +436,8 @@ class LimitedFeature(feature.Feature):
         Returns:
             int: 入力バイト数
         """
-        input_bytes = len(' '.join(msg)) if msg else 0
+        # バイナリデータが添付されたmsgもあるため、結合せずに長さを合計する
+        input_bytes = sum(len(m) for m in msg) + len(msg) - 1 if msg else 0
         return input_bytes
     
     def svrun_output_bytes(self, data_dir:Path, logger:logging.Logger, opt:Dict[str, Any], msg:List[str], msg_size:int) -> int:
@@ -491,6 +521,72 @@ class LimitedFeature(feature.Feature):
         """
         return 0
 
+class ConfigIndex:
+    """
+    制限設定を scope・target_mode・target_cmd ごとに索引化するクラス。
+
+    ``target_option`` の比較条件は索引の作成時に一度だけ文字列化するため、
+    コマンドごとの判定コストは制限設定の総数ではなく、適合する可能性のある制限設定の数に比例します。
+    判定結果は :meth:`Limiter.matches` と同じです。
+    """
+    def __init__(self, configs: List[Dict[str, Any]]) -> None:
+        """
+        制限設定のリストから索引を作成します。
+
+        Args:
+            configs (List[Dict[str, Any]]): 制限設定のリスト
+        """
+        self.configs = configs
+        # {scope: {(target_mode, target_cmd): [(位置, 制限設定, target_option の比較条件)]}}
+        # target_mode 又は target_cmd が未設定の場合は None をキーとし、すべてのコマンドに適合させる
+        self.index: Dict[Optional[str], Dict[Tuple[Optional[str], Optional[str]], List[Tuple[int, Dict[str, Any], Tuple[Tuple[str, str], ...]]]]] = {}
+        for pos, config in enumerate(configs):
+            target_mode = config.get('target_mode')
+            target_cmd = config.get('target_cmd')
+            key = (str(target_mode) if target_mode else None, str(target_cmd) if target_cmd else None)
+            entry = (pos, config, self._compile_options(config.get('target_option')))
+            self.index.setdefault(config.get('scope'), {}).setdefault(key, []).append(entry)
+
+    def _compile_options(self, target_option: Any) -> Tuple[Tuple[str, str], ...]:
+        """
+        ``target_option`` を (オプション名, 比較する文字列) のタプルに変換します（内部用）。
+
+        Args:
+            target_option (Any): 制限設定の target_option
+        Returns:
+            Tuple[Tuple[str, str], ...]: 比較条件のタプル
+        """
+        if not target_option:
+            return ()
+        # list[dict] 形式（multi=True で複数指定された場合）
+        option_dicts = target_option if isinstance(target_option, list) else [target_option]
+        return tuple((key, str(val)) for opt_dict in option_dicts if isinstance(opt_dict, dict)
+                     for key, val in opt_dict.items())
+
+    def lookup(self, command_options: Dict[str, Any], scope: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        コマンドに適合する制限設定を、元のリストの順序で返します。
+
+        Args:
+            command_options (Dict[str, Any]): 実行コマンドのオプション
+            scope (Optional[str]): 対象とする制限設定のスコープ。None の場合はすべてのスコープが対象
+        Returns:
+            List[Dict[str, Any]]: 適合する制限設定のリスト
+        """
+        mode_val = command_options.get('mode')
+        modes = {str(m) for m in mode_val} if isinstance(mode_val, list) else {str(mode_val)}
+        cmd = str(command_options.get('cmd', ''))
+        keys = [(None, None), (None, cmd)] + [(m, None) for m in modes] + [(m, cmd) for m in modes]
+        tables = [self.index.get(scope, {})] if scope is not None else list(self.index.values())
+        matched: List[Tuple[int, Dict[str, Any]]] = []
+        for table in tables:
+            for key in keys:
+                for pos, config, options in table.get(key, ()):
+                    if all(str(command_options.get(k, '')) == v for k, v in options):
+                        matched.append((pos, config))
+        matched.sort(key=lambda m: m[0])
+        return [config for _, config in matched]
+
 class Limiter:
     """
     コマンド実行に対する量的制限をチェックするクラス。
@@ -499,7 +595,13 @@ class Limiter:
     コマンド実行前の制限チェックおよび実行後のカウンタ更新を行います。
 
     制限設定は data_dir/.limiter/limiter-{name}.json に保存されており、
-    カウンタは data_dir/.limiter/counter-{name}.json に保存されます。
+    カウンタの履歴は data_dir/.limiter/counter.db に保存されます（:class:`counterstore.CounterStore`）。
+
+    Redis が有効な場合、制限設定とカウンタはプロセス内のスナップショットを参照し、
+    カウンタの加算はプロセス内に溜めてから ``COUNTER_BATCH_INTERVAL`` 秒ごとにまとめて Redis に送信します。
+    送信は update() の呼び出し時に加えてデーモンスレッドでも行うため、コマンドの実行が途絶えても
+    溜めたデルタは ``COUNTER_BATCH_INTERVAL`` 秒以内に送信されます。
+    カウンタが制限値の ``NEAR_LIMIT_RATIO`` 以上に達した場合は、溜めたデルタを即時に送信して Redis の最新値で判定します。
     """
 
     LIMITER_DIR = ".limiter"
@@ -509,11 +611,27 @@ class Limiter:
     # Redis キーの定数
     REDIS_CONFIG_HASH = "limiter:config"
     REDIS_COUNTER_HASH = "limiter:counter"
+    REDIS_VERSION_KEY = "limiter:version"
+
+    # 設定のバージョンを Redis に確認する間隔（秒）
+    VERSION_CHECK_INTERVAL = 1.0
+    # カウンタのスナップショットを Redis と同期する間隔（秒）
+    COUNTER_SYNC_INTERVAL = 1.0
+    # 溜めたカウンタのデルタを Redis に送信する間隔（秒）
+    COUNTER_BATCH_INTERVAL = 1.0
+    # カウンタが制限値に対してこの割合以上になった場合は、スナップショットではなく Redis の最新値で判定する
+    NEAR_LIMIT_RATIO = 0.9
 
     CHECK_ALLOW = 0 # 制限なしでコマンド実行を許可
     CHECK_DENY = 1  # 制限によりコマンド実行を拒否
     CHECK_NOT_APPLICABLE = 2  # 制限が適用されない場合
     COUNTER_VALKEYS = ['total_count', 'total_time', 'total_input', 'total_process', 'total_output', 'total_credits', 'total_registrations']
+    # update() のデルタ名とカウンタのキーの対応
+    DELTA_KEYS = dict(count='total_count', exec_time='total_time', input_bytes='total_input', process_bytes='total_process',
+                      output_bytes='total_output', credits='total_credits')
+    # 制限設定のキーとカウンタのキーの対応（クレジットは service_credits を加算するため別に判定する）
+    LIMIT_KEYS = dict(max_total_count='total_count', max_total_time='total_time', max_total_input='total_input',
+                      max_total_process='total_process', max_total_output='total_output')
 
     # Redis Lua スクリプト: カウンタのアトミックインクリメント
     # KEYS[1]: hash key, ARGV[1]: limiter_name, ARGV[2]: JSON deltas,
@@ -564,6 +682,8 @@ return cjson.encode(c)
         """
         if not hasattr(cls, '_instance'):
             cls._instance = cls(redis_client=redis_client, flush_interval=flush_interval, reload_interval=reload_interval)
+            # プロセス終了時に未送信のデルタを送信する。登録はプロセスで1回だけ行う
+            atexit.register(cls._instance.flush_counters)
         return cls._instance
 
     def __init__(self,
@@ -589,10 +709,26 @@ return cjson.encode(c)
         self._reload_interval = reload_interval
         # カウンターの最終更新タイムスタンプを保持する辞書
         self._last_counter_flush: Dict[str, float] = {}
-        # 設定の最終読込みタイムスタンプ
-        self._last_config_loaded: float = 0.0
         # カウンターの最終読込みタイムスタンプ
         self._last_counter_loaded: float = 0.0
+        # 設定のスナップショット。キーは (data_dir, scope)
+        self._config_snapshots: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        # 設定のスナップショットごとの索引。キーは (data_dir, scope)
+        self._config_indexes: Dict[Tuple[str, str], ConfigIndex] = {}
+        # スナップショットを読込んだ時刻と設定のバージョン。キーは (data_dir, scope)
+        self._config_loaded: Dict[Tuple[str, str], Tuple[float, Optional[int]]] = {}
+        # 最後に確認した設定のバージョン
+        self._config_version: int = 0
+        self._last_version_checked: float = 0.0
+        # カウンタのスナップショット。キーは (scope, limiter_name)、値は (同期時刻, カウンタ)
+        self._counter_snapshots: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        # Redis に未送信のカウンタのデルタ。キーは (scope, limiter_name)
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._last_batch_flush: float = time.time()
+        # 溜めたデルタを COUNTER_BATCH_INTERVAL 秒ごとに送信するスレッド
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_logger: Optional[logging.Logger] = None
 
     # ------------------------------------------------------------------
     # 設定 / カウンタの入出力
@@ -602,24 +738,28 @@ return cjson.encode(c)
         """
         data_dir 以下のすべての制限設定をロードします。
 
-        Redis が有効な場合はまず Redis キャッシュを参照します。
-        キャッシュが期限切れまたは未登録の場合はファイルから読み込み、
-        ``reload_interval`` 秒間有効なキャッシュとして Redis に保存します。
+        Redis が有効な場合はプロセス内のスナップショットを返します。
+        ``reload_interval`` 秒が経過した場合、又は :meth:`notify_config_changed` で
+        設定のバージョンが更新された場合はファイルから読み込み、Redis キャッシュも更新します。
+        スナップショットがない場合は Redis キャッシュから作成します。
 
         Args:
             data_dir (Path): データディレクトリ
             scope (str): スコープ。'server' または 'client'（デフォルト: 'server'）
         Returns:
-            List[Dict[str, Any]]: 制限設定のリスト
+            List[Dict[str, Any]]: 制限設定のリスト。返されたリストは変更しないでください
         """
         if self.redis_client is not None:
             try:
                 now = time.time()
                 redis_key = f"{self.redis_client.lmtname}_{scope}_limiter:config"
-                if now - self._last_config_loaded >= self._reload_interval:
+                cache_key = (str(data_dir), scope)
+                version = self._check_config_version(now)
+                loaded_time, loaded_version = self._config_loaded.get(cache_key, (0.0, None))
+                if version != loaded_version or now - loaded_time >= self._reload_interval:
                     configs = self._load_configs_from_file(data_dir)
                     configs = sorted(configs, key=lambda c: c.get('limiter_name', ''))
-                    self._last_config_loaded = now
+                    self._config_loaded[cache_key] = (now, version)
                     pipe = self.redis_client.pipeline()
                     pipe.delete(redis_key)
                     for cfg in configs:
@@ -627,6 +767,10 @@ return cjson.encode(c)
                         if name:
                             pipe.hset(redis_key, name, json.dumps(cfg))
                     pipe.execute()
+                    self._config_snapshots[cache_key] = configs
+                    return configs
+                configs = self._config_snapshots.get(cache_key)
+                if configs is not None:
                     return configs
                 if self.redis_client.exists(redis_key):
                     raw = self.redis_client.hgetall(redis_key)
@@ -638,13 +782,50 @@ return cjson.encode(c)
                                 configs.append(json.loads(text))
                             except Exception:
                                 pass
-                        return sorted(configs, key=lambda c: c.get('limiter_name', ''))
+                        configs = sorted(configs, key=lambda c: c.get('limiter_name', ''))
+                        self._config_snapshots[cache_key] = configs
+                        return configs
             except Exception as e:
                 pass
 
         configs = self._load_configs_from_file(data_dir)
         return configs
 
+    def _check_config_version(self, now: float) -> int:
+        """
+        Redis 上の設定のバージョンを返します（内部用）。
+        Redis への問い合わせは ``VERSION_CHECK_INTERVAL`` 秒に 1 回だけ行います。
+
+        Args:
+            now (float): 現在時刻
+        Returns:
+            int: 設定のバージョン
+        """
+        if now - self._last_version_checked < self.VERSION_CHECK_INTERVAL:
+            return self._config_version
+        raw = self.redis_client.redis_cli.get(f"{self.redis_client.lmtname}_{self.REDIS_VERSION_KEY}")
+        self._config_version = int(raw) if raw is not None else 0
+        self._last_version_checked = now
+        return self._config_version
+
+    @classmethod
+    def notify_config_changed(cls, redis_cli: Optional[redis_client.RedisClient]) -> None:
+        """
+        制限設定が変更されたことを通知します。
+        Redis 上の設定のバージョンを更新し、各プロセスの Limiter は
+        ``VERSION_CHECK_INTERVAL`` 秒以内に設定をファイルから再ロードします。
+        このプロセスの Limiter は次回の load_configs() で設定をファイルから再ロードします。
+
+        Args:
+            redis_cli (Optional[redis_client.RedisClient]): Redis クライアント。
+                None の場合はこのプロセスの Limiter のみに通知します。
+        """
+        if redis_cli is not None:
+            redis_cli.redis_cli.incr(f"{redis_cli.lmtname}_{cls.REDIS_VERSION_KEY}")
+        if hasattr(cls, '_instance'):
+            cls._instance._last_version_checked = 0.0
+            cls._instance._config_loaded.clear()
+
     def _load_configs_from_file(self, data_dir: Path) -> List[Dict[str, Any]]:
         """
         ファイルからすべての制限設定をロードします（内部用）。
@@ -677,6 +858,9 @@ return cjson.encode(c)
         Returns:
             Dict[str, Any]: カウンタ
         """
+        if (scope, limiter_name) in self._pending:
+            # 未送信のデルタを反映してから読み込む
+            self.flush_counters()
         now = time.time()
         redis_key = f"{self.redis_client.lmtname}_{scope}_limiter:counter" if self.redis_client is not None else None
         if now - self._last_counter_loaded < self._reload_interval:
@@ -727,8 +911,7 @@ return cjson.encode(c)
 
     def _load_counter_from_file(self, data_dir: Path, limiter_name: str, load_history: bool = False) -> Dict[str, Any]:
         """
-        ファイルからカウンタをロードします（内部用）。
-        JSONL 形式のファイルから最終行のみを読み込みます。
+        カウンタ履歴から最新のカウンタをロードします（内部用）。
 
         Args:
             data_dir (Path): データディレクトリ
@@ -737,41 +920,25 @@ return cjson.encode(c)
         Returns:
             Dict[str, Any]: カウンタ
         """
-        counter_path = Path(data_dir) / self.LIMITER_DIR / f"{self.COUNTER_PREFIX}{limiter_name}.jsonl"
-        if not counter_path.exists():
-            return self._init_counter(limiter_name)
         try:
-            with counter_path.open('r', encoding='utf-8') as f:
-                lines = f.readlines()
+            store = self._counter_store(data_dir)
             if load_history:
-                counters = []
-                for line in lines:
-                    stripped = line.strip()
-                    if stripped:
-                        last = stripped
-                        try:
-                            last_json:Dict[str, Any] = json.loads(stripped)
-                            enable = any(last_json.get(k) for k in self.COUNTER_VALKEYS)
-                            if not enable: continue
-                            last = last_json
-                            counters.append(last_json)
-                        except Exception:
-                            pass
-                return counters
-            else:
-                for line in reversed(lines):
-                    stripped = line.strip()
-                    if stripped:
-                        try:
-                            last_json:Dict[str, Any] = json.loads(stripped)
-                            enable = any(last_json.get(k) for k in self.COUNTER_VALKEYS)
-                            if not enable: continue
-                            return last_json
-                        except Exception:
-                            pass
-                return self._init_counter(limiter_name)
+                return store.history(limiter_name)
+            counter = store.latest(limiter_name)
+            return counter if counter is not None else self._init_counter(limiter_name)
         except Exception:
-            return self._init_counter(limiter_name)
+            return [] if load_history else self._init_counter(limiter_name)
+
+    def _counter_store(self, data_dir: Path) -> counterstore.CounterStore:
+        """
+        データディレクトリのカウンタ履歴を返します（内部用）。
+
+        Args:
+            data_dir (Path): データディレクトリ
+        Returns:
+            counterstore.CounterStore: カウンタ履歴
+        """
+        return counterstore.CounterStore.get(Path(data_dir) / self.LIMITER_DIR, self.COUNTER_VALKEYS)
 
     def save_counter(self, data_dir: Path, limiter_name: str, counter: Dict[str, Any],
                      scope: str = 'server', max_history_interval: Optional[int] = None) -> None:
@@ -820,15 +987,11 @@ return cjson.encode(c)
 
     def _save_counter_to_file(self, data_dir: Path, limiter_name: str, counter: Dict[str, Any]) -> None:
         """
-        カウンタを JSONL ファイルに追記します（内部用）。
-        flush_interval ごとに 1 行追加します。
+        カウンタをカウンタ履歴に追加します（内部用）。
+        flush_interval ごとに 1 件追加します。
         """
-        counter_path = Path(data_dir) / self.LIMITER_DIR / f"{self.COUNTER_PREFIX}{limiter_name}.jsonl"
-        counter_path.parent.mkdir(parents=True, exist_ok=True)
         counter = {k: counter[k] for k in sorted(counter.keys())}
-        line = json.dumps(counter, ensure_ascii=False)
-        common.save_file(counter_path, lambda f: f.write(line + '\n'),
-                         mode='a', encoding='utf-8', nolock=False)
+        self._counter_store(data_dir).append(limiter_name, counter)
 
     def _atomic_increment_redis(self, data_dir: Path, limiter_name: str,
                                 deltas: Dict[str, Any], last_update: str,
@@ -863,15 +1026,183 @@ return cjson.encode(c)
         )
         text = result_raw.decode('utf-8') if isinstance(result_raw, bytes) else result_raw
         counter = json.loads(text)
-        # flush_interval 秒ごとにファイルへ永続化
+        self._persist_counter(data_dir, limiter_name, counter, max_history_interval=max_history_interval)
+        return counter
+
+    def _persist_counter(self, data_dir: Path, limiter_name: str, counter: Dict[str, Any],
+                         max_history_interval: Optional[int] = None) -> None:
+        """
+        ``flush_interval`` 秒ごとにカウンタをファイルへ永続化します（内部用）。
+
+        Args:
+            data_dir (Path): データディレクトリ
+            limiter_name (str): 制限設定の識別名
+            counter (Dict[str, Any]): Redis 上のカウンタ
+            max_history_interval (Optional[int]): 履歴保持最大期間（秒）
+        """
         now = time.time()
         if now - self._last_counter_flush.get(limiter_name, 0.0) >= self._flush_interval:
             self._save_counter_to_file(data_dir, limiter_name, counter)
             self._last_counter_flush[limiter_name] = now
             if max_history_interval is not None:
                 self._prune_counter_history(data_dir, limiter_name, max_history_interval)
+
+    # ------------------------------------------------------------------
+    # カウンタのスナップショット
+    # ------------------------------------------------------------------
+    def _sync_counter(self, data_dir: Path, limiter_name: str, scope: str) -> Dict[str, Any]:
+        """
+        未送信のデルタを送信してから Redis のカウンタを読み込み、スナップショットを更新します（内部用）。
+
+        Args:
+            data_dir (Path): データディレクトリ
+            limiter_name (str): 制限設定の識別名
+            scope (str): スコープ
+        Returns:
+            Dict[str, Any]: Redis 上のカウンタ
+        """
+        counter = self.load_counter(data_dir, limiter_name, scope=scope)
+        self._counter_snapshots[(scope, limiter_name)] = (time.time(), counter)
+        return counter
+
+    def _apply_pending(self, counter: Dict[str, Any], pending: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        カウンタに未送信のデルタを加算したカウンタを返します（内部用）。
+
+        Args:
+            counter (Dict[str, Any]): カウンタ
+            pending (Optional[Dict[str, Any]]): 未送信のデルタ
+        Returns:
+            Dict[str, Any]: デルタを加算したカウンタ
+        """
+        if not pending:
+            return counter
+        counter = dict(counter)
+        deltas = pending['deltas']
+        for dkey, ckey in self.DELTA_KEYS.items():
+            counter[ckey] = counter.get(ckey, 0) + deltas.get(dkey, 0)
+        counter['total_registrations'] = deltas.get('registrations', 0)
+        return counter
+
+    def _cached_counter(self, data_dir: Path, config: Dict[str, Any], limiter_name: str, scope: str) -> Dict[str, Any]:
+        """
+        スナップショットに未送信のデルタを加算したカウンタを返します（内部用）。
+        スナップショットが ``COUNTER_SYNC_INTERVAL`` 秒より古い場合、
+        又はカウンタが制限値に近い場合は Redis の最新値を返します。
+
+        Args:
+            data_dir (Path): データディレクトリ
+            config (Dict[str, Any]): 制限設定
+            limiter_name (str): 制限設定の識別名
+            scope (str): スコープ
+        Returns:
+            Dict[str, Any]: カウンタ
+        """
+        if self.redis_client is None:
+            return self.load_counter(data_dir, limiter_name, scope=scope)
+        key = (scope, limiter_name)
+        snapshot = self._counter_snapshots.get(key)
+        if snapshot is None or time.time() - snapshot[0] >= self.COUNTER_SYNC_INTERVAL:
+            return self._apply_pending(self._sync_counter(data_dir, limiter_name, scope), self._pending.get(key))
+        counter = self._apply_pending(snapshot[1], self._pending.get(key))
+        if self.near_limit(config, counter):
+            # 他プロセスの加算を含めた最新値で判定する
+            counter = self._apply_pending(self._sync_counter(data_dir, limiter_name, scope), self._pending.get(key))
         return counter
 
+    def near_limit(self, config: Dict[str, Any], counter: Dict[str, Any]) -> bool:
+        """
+        カウンタが制限値の ``NEAR_LIMIT_RATIO`` 以上に達しているかどうかを判定します。
+
+        Args:
+            config (Dict[str, Any]): 制限設定
+            counter (Dict[str, Any]): カウンタ
+        Returns:
+            bool: いずれかの制限値に近い場合は True
+        """
+        def _over(val: Any, limit: Any) -> bool:
+            try:
+                return float(val or 0) >= float(limit) * self.NEAR_LIMIT_RATIO
+            except (ValueError, TypeError):
+                return False
+        for lkey, ckey in self.LIMIT_KEYS.items():
+            limit = config.get(lkey)
+            if limit is not None and _over(counter.get(ckey, 0), limit):
+                return True
+        max_total_credits = config.get('max_total_credits')
+        if max_total_credits is not None:
+            try:
+                limit = int(max_total_credits) + int(config.get('service_credits') or 0)
+            except (ValueError, TypeError):
+                limit = 0
+            if _over(counter.get('total_credits', 0), limit):
+                return True
+        return False
+
+    def _add_pending(self, key: Tuple[str, str], pending: Dict[str, Any]) -> None:
+        """
+        未送信のデルタを加算します（内部用）。呼び出し元で ``_pending_lock`` を取得してください。
+
+        Args:
+            key (Tuple[str, str]): (scope, limiter_name)
+            pending (Dict[str, Any]): data_dir, max_history_interval, deltas を持つ辞書
+        """
+        current = self._pending.get(key)
+        if current is None:
+            self._pending[key] = dict(pending, deltas=dict(pending['deltas']))
+            return
+        deltas = current['deltas']
+        for dkey in self.DELTA_KEYS.keys():
+            deltas[dkey] = deltas.get(dkey, 0) + pending['deltas'].get(dkey, 0)
+        deltas['registrations'] = pending['deltas'].get('registrations', 0)
+
+    def flush_counters(self, logger: Optional[logging.Logger] = None) -> None:
+        """
+        未送信のカウンタのデルタを Redis のパイプラインでまとめて送信し、スナップショットを更新します。
+        送信に失敗したデルタは次回の送信時に再送します。
+
+        Args:
+            logger (Optional[logging.Logger]): ロガー
+        """
+        if self.redis_client is None:
+            return
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._last_batch_flush = time.time()
+        if not pending:
+            return
+        items = list(pending.items())
+        last_update = datetime.now().isoformat()
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for (scope, limiter_name), p in items:
+                redis_key = f"{self.redis_client.lmtname}_{scope}_limiter:counter"
+                pipe.eval(self._COUNTER_INCREMENT_LUA, 1, redis_key, limiter_name,
+                          json.dumps(p['deltas']), last_update, '0')
+            results = pipe.execute()
+        except Exception as e:
+            with self._pending_lock:
+                # 送信中に加算されたデルタの登録数の方が新しいため、再送分の登録数は上書きしない
+                for key, p in items:
+                    current = self._pending.get(key)
+                    registrations = current['deltas'].get('registrations') if current is not None else None
+                    self._add_pending(key, p)
+                    if registrations is not None:
+                        self._pending[key]['deltas']['registrations'] = registrations
+            if logger is not None:
+                logger.warning(f"Limiter.flush_counters failed: {e}", exc_info=True)
+            return
+        now = time.time()
+        for ((scope, limiter_name), p), result_raw in zip(items, results):
+            try:
+                text = result_raw.decode('utf-8') if isinstance(result_raw, bytes) else result_raw
+                counter = json.loads(text)
+                self._counter_snapshots[(scope, limiter_name)] = (now, counter)
+                self._persist_counter(p['data_dir'], limiter_name, counter, max_history_interval=p['max_history_interval'])
+            except Exception as e:
+                if logger is not None:
+                    logger.warning(f"Limiter.flush_counters failed for '{limiter_name}': {e}", exc_info=True)
+
     def _init_counter(self, limiter_name: str) -> Dict[str, Any]:
         """
         カウンタの初期値を返します。
@@ -1089,6 +1420,28 @@ return cjson.encode(c)
                         return False
         return True
 
+    def matched_configs(self, data_dir: Path, command_options: Dict[str, Any],
+                        scope: str = 'server', all_scopes: bool = False) -> List[Dict[str, Any]]:
+        """
+        コマンドに適合する制限設定を返します。
+        索引は設定のスナップショットが再ロードされた場合にのみ作成し直します。
+
+        Args:
+            data_dir (Path): データディレクトリ
+            command_options (Dict[str, Any]): 実行コマンドのオプション
+            scope (str): スコープ。'server' または 'client'（デフォルト: 'server'）
+            all_scopes (bool): True の場合は scope 以外のスコープの制限設定も対象にします
+        Returns:
+            List[Dict[str, Any]]: 適合する制限設定のリスト
+        """
+        configs = self.load_configs(data_dir, scope=scope)
+        cache_key = (str(data_dir), scope)
+        index = self._config_indexes.get(cache_key)
+        if index is None or index.configs is not configs:
+            index = ConfigIndex(configs)
+            self._config_indexes[cache_key] = index
+        return index.lookup(command_options, scope=None if all_scopes else scope)
+
     # ------------------------------------------------------------------
     # チェック / 更新
     # ------------------------------------------------------------------
@@ -1123,7 +1476,7 @@ return cjson.encode(c)
         if scope not in ('server', 'client'):
             raise ValueError(f"Limiter.check: invalid scope '{scope}'. Must be 'server' or 'client'.")
 
-        configs = self.load_configs(data_dir, scope=scope)
+        configs = self.matched_configs(data_dir, command_options, scope=scope)
         now = datetime.now()
 
         checkfg = self.CHECK_NOT_APPLICABLE
@@ -1137,16 +1490,12 @@ return cjson.encode(c)
                 return 0
 
         for config in configs:
-            if config.get('scope') != scope:
-                continue
             limiter_name = config.get('limiter_name')
             if not limiter_name:
                 continue
-            if not self.matches(config, command_options):
-                continue
 
             matched_configs.append(limiter_name)
-            counter = self.load_counter(data_dir, limiter_name, scope=scope)
+            counter = self._cached_counter(data_dir, config, limiter_name, scope)
             if self.needs_reset(config, counter):
                 counter = self.reset_counter(limiter_name)
 
@@ -1293,6 +1642,7 @@ return cjson.encode(c)
 
         マッチするすべての制限設定のカウンタに対して、
         実行回数・実行時間・入出力バイト数を加算して保存します。
+        Redis が有効な場合、加算はプロセス内に溜めて :meth:`flush_counters` でまとめて送信します。
 
         Args:
             feat (LimitedFeature): 対象の機能
@@ -1309,14 +1659,14 @@ return cjson.encode(c)
             registrations (int): 登録数（又は登録サイズ）
             scope (str): スコープ。'server' または 'client'（デフォルト: 'server'）
         """
-        configs = self.load_configs(data_dir, scope=scope)
+        # カウンタの更新は従来どおりスコープを問わず適合する制限設定が対象
+        configs = self.matched_configs(data_dir, command_options, scope=scope, all_scopes=True)
+        flush = False
 
         for config in configs:
             limiter_name = config.get('limiter_name')
             if not limiter_name:
                 continue
-            if not self.matches(config, command_options):
-                continue
             if limiter_name in deny_limiter_names:
                 # 違反した制限設定はカウンタ更新をスキップ
                 continue
@@ -1330,21 +1680,33 @@ return cjson.encode(c)
                     except (ValueError, TypeError):
                         pass
 
-                counter = self.load_counter(data_dir, limiter_name, scope=scope)
+                counter = self._cached_counter(data_dir, config, limiter_name, scope)
                 needs_reset = self.needs_reset(config, counter)
                 max_history_interval = config.get('max_history_interval')
+                max_history_interval = int(max_history_interval) if max_history_interval is not None else None
                 last_update = datetime.now().isoformat()
                 if self.redis_client is not None:
-                    # Redis が有効な場合は Lua スクリプトでアトミックにインクリメント
-                    if needs_reset:
-                        self._save_evidence_file(data_dir, limiter_name, config, counter, scope=scope)
                     deltas = dict(count=count, exec_time=exec_time, input_bytes=input_bytes,
                                   process_bytes=process_bytes, output_bytes=output_bytes,
                                   credits=credits, registrations=registrations)
-                    self._atomic_increment_redis(
-                        data_dir, limiter_name, deltas, last_update, scope=scope, reset=needs_reset,
-                        max_history_interval=int(max_history_interval) if max_history_interval is not None else None
-                    )
+                    if needs_reset:
+                        # 他プロセスがリセット済みの場合があるため、Redis の最新値で判定し直す
+                        counter = self._sync_counter(data_dir, limiter_name, scope)
+                        needs_reset = self.needs_reset(config, counter)
+                    if needs_reset:
+                        # リセットは Lua スクリプトでアトミックに即時反映する
+                        self._save_evidence_file(data_dir, limiter_name, config, counter, scope=scope)
+                        counter = self._atomic_increment_redis(
+                            data_dir, limiter_name, deltas, last_update, scope=scope, reset=True,
+                            max_history_interval=max_history_interval
+                        )
+                        self._counter_snapshots[(scope, limiter_name)] = (time.time(), counter)
+                    else:
+                        # デルタはプロセス内に溜めて、まとめて Redis に送信する
+                        with self._pending_lock:
+                            self._add_pending((scope, limiter_name), dict(data_dir=data_dir, deltas=deltas,
+                                                                          max_history_interval=max_history_interval))
+                        flush = flush or self.near_limit(config, self._apply_pending(counter, dict(deltas=deltas)))
                 else:
                     # Redis なし: ファイルのみ（従来動作）
                     if needs_reset:
@@ -1360,45 +1722,64 @@ return cjson.encode(c)
                     counter['last_update'] = last_update
                     self._save_counter_to_file(data_dir, limiter_name, counter)
                     if max_history_interval is not None:
-                        self._prune_counter_history(data_dir, limiter_name, int(max_history_interval))
+                        self._prune_counter_history(data_dir, limiter_name, max_history_interval)
             except Exception as e:
                 logger.warning(f"Limiter.update failed for '{limiter_name}': {e}", exc_info=True)
             except Exception as e:
                 logger.warning(f"Limiter.update failed for '{limiter_name}': {e}", exc_info=True)
 
+        # 制限値に近いカウンタがある場合、又は送信間隔を過ぎた場合は溜めたデルタを送信する
+        if flush or time.time() - self._last_batch_flush >= self.COUNTER_BATCH_INTERVAL:
+            self.flush_counters(logger)
+        if self._pending:
+            # 以降に update() が呼ばれない場合でも、送信間隔内に溜めたデルタを送信する
+            self._start_flusher(logger)
+
+    def _start_flusher(self, logger: Optional[logging.Logger] = None) -> None:
+        """
+        溜めたデルタを ``COUNTER_BATCH_INTERVAL`` 秒ごとに送信するデーモンスレッドを開始します（内部用）。
+        スレッドが動作中の場合は何もしません。fork 後の子プロセスではスレッドを開始し直します。
+
+        Args:
+            logger (Optional[logging.Logger]): ロガー
+        """
+        self._flusher_logger = logger
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._pending_lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='limiter-flusher', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        """
+        溜めたデルタを ``COUNTER_BATCH_INTERVAL`` 秒ごとに送信します（内部用）。
+        """
+        while True:
+            if self._pending:
+                time.sleep(max(self._last_batch_flush + self.COUNTER_BATCH_INTERVAL - time.time(), 0.01))
+            else:
+                time.sleep(max(self.COUNTER_BATCH_INTERVAL, 0.01))
+            if not self._pending or time.time() - self._last_batch_flush < self.COUNTER_BATCH_INTERVAL:
+                continue
+            try:
+                self.flush_counters(self._flusher_logger)
+            except Exception as e:
+                if self._flusher_logger is not None:
+                    self._flusher_logger.warning(f"Limiter flusher failed: {e}", exc_info=True)
+
     def _prune_counter_history(self, data_dir: Path, limiter_name: str, max_history_interval: int) -> None:
         """
-        max_history_interval 秒を超えた古い履歴エントリを JSONL ファイルから削除します。
+        max_history_interval 秒を超えた古い履歴エントリをカウンタ履歴から削除します。
+        1 回の呼び出しで削除する件数には上限があり、残りは次回以降に削除されます。
 
         Args:
             data_dir (Path): データディレクトリ
             limiter_name (str): 制限設定の識別名
             max_history_interval (int): 保持する最大期間（秒）
         """
-        counter_path = Path(data_dir) / self.LIMITER_DIR / f"{self.COUNTER_PREFIX}{limiter_name}.jsonl"
-        if not counter_path.exists():
-            return
-        now = datetime.now()
-        cutoff = now.timestamp() - max_history_interval
-        lines_to_keep = []
         try:
-            with counter_path.open('r', encoding='utf-8') as f:
-                for line in f:
-                    stripped = line.strip()
-                    if not stripped:
-                        continue
-                    try:
-                        entry = json.loads(stripped)
-                        last_update_str = entry.get('last_update')
-                        if last_update_str:
-                            last_update = datetime.fromisoformat(last_update_str)
-                            if last_update.timestamp() >= cutoff:
-                                lines_to_keep.append(stripped)
-                        else:
-                            lines_to_keep.append(stripped)
-                    except Exception:
-                        lines_to_keep.append(stripped)
-            common.save_file(counter_path, lambda f: f.write('\n'.join(lines_to_keep) + ('\n' if lines_to_keep else '')),
-                             mode='w', encoding='utf-8', nolock=False)
+            self._counter_store(data_dir).prune(limiter_name, time.time() - max_history_interval)
         except Exception:
             pass
@@ -1,4 +1,5 @@
 from cmdbox.app import feature
+from cmdbox.app.commons import featuremanifest
 from typing import List, Dict, Any
 import importlib.util
 import inspect
@@ -22,6 +23,9 @@ def get_module_list(package_name) -> List[str]:
 def load_features(package_name:str, prefix:str="cmdbox_", excludes:list=[], ref_options=None, appcls=None, ver=None, language:str=None) -> Dict[str, Any]:
     """
     フィーチャーを読み込みます。
+    有効なマニフェストがある場合はモジュールを読み込まずにマニフェストからオプションを作成し、
+    フィーチャーのモジュールは最初に使用された時に読み込みます。
+    マニフェストが無い又は古い場合は全てのモジュールを読み込み、マニフェストを作り直します。
 
     Args:
         package_name (str): パッケージ名
@@ -45,6 +49,42 @@ def load_features(package_name:str, prefix:str="cmdbox_", excludes:list=[], ref_
             ret += [k for k in c.keys() if 'feature' in c[k]]
         return ret
 
+    def _add(fobj, cls_name, mode, cmd, opt):
+        if mode not in features:
+            features[mode] = dict()
+        _cls,_ref_cls = cls_name, None
+        if cmd in features[mode]:
+            _ref_cls = features[mode][cmd]['feature'].__class__
+        elif ref_options is not None and cmd in _cmd(ref_options, mode):
+            _ref_cls = ref_options.get_cmd_attr(mode, cmd, 'feature').__class__
+        if _ref_cls is not None:
+            raise ValueError(f'load_features: Duplicate feature for cmd "{cmd}" of mode "{mode}". ({_cls} is overwriting {_ref_cls})')
+        if opt is None:
+            raise ValueError(f'load_features: Cannot get options from {fobj}. The get_option() method returns None.')
+        features[mode][cmd] = opt
+        features[mode][cmd]['feature'] = fobj
+
+    manifest = featuremanifest.FeatureManifest(package_name, prefix, excludes, appcls=appcls, ver=ver, language=language)
+    entries = manifest.load()
+    if entries is not None:
+        eager_objs = dict()
+        for ent in entries:
+            mode = ent['mode']
+            if ent.get('eager'):
+                # オプションをマニフェストに保存できなかったフィーチャーはモジュールを読み込む
+                key = f"{ent['module']}.{ent['cls']}"
+                if key not in eager_objs:
+                    eager_objs[key] = getattr(importlib.import_module(ent['module']), ent['cls'])(appcls, ver, language=language)
+                fobj = eager_objs[key]
+                for m in (mode if type(mode) is list else [mode]):
+                    _add(fobj, fobj.__class__, m, ent['cmd'], fobj.get_option())
+            else:
+                fobj = manifest.lazy_feature(ent)
+                for m in (mode if type(mode) is list else [mode]):
+                    _add(fobj, f"<class '{ent['module']}.{ent['cls']}'>", m, ent['cmd'], manifest.decode(ent['option'], fobj))
+        return features
+
+    entries = []
     for finder, name, ispkg in pkgutil.iter_modules(package.__path__):
         if name.startswith(prefix):
             if name in excludes:
@@ -56,37 +96,17 @@ def load_features(package_name:str, prefix:str="cmdbox_", excludes:list=[], ref_
                     continue
                 fobj = cls(appcls, ver, language=language)
                 mode = fobj.get_mode()
+                cmd = fobj.get_cmd()
                 if type(mode) is str:
-                    cmd = fobj.get_cmd()
-                    if mode not in features:
-                        features[mode] = dict()
-                    _cls,_ref_cls = fobj.__class__, None
-                    if cmd in features[mode]:
-                        _ref_cls = features[mode][cmd]['feature'].__class__
-                    elif ref_options is not None and cmd in _cmd(ref_options, mode):
-                        _ref_cls = ref_options.get_cmd_attr(mode, cmd, 'feature').__class__
-                    if _ref_cls is not None:
-                        raise ValueError(f'load_features: Duplicate feature for cmd "{cmd}" of mode "{mode}". ({_cls} is overwriting {_ref_cls})')
-                    features[mode][cmd] = fobj.get_option()
-                    if features[mode][cmd] is None:
-                        raise ValueError(f'load_features: Cannot get options from {fobj}. The get_option() method returns None.')
-                    features[mode][cmd]['feature'] = fobj
+                    opt = fobj.get_option()
+                    _add(fobj, fobj.__class__, mode, cmd, opt)
+                    entries.append(manifest.entry(mod.__name__, name, fobj, mode, cmd, opt))
                 elif type(mode) is list:
                     for m in mode:
-                        cmd = fobj.get_cmd()
-                        if m not in features:
-                            features[m] = dict()
-                        _cls,_ref_cls = fobj.__class__, None
-                        if cmd in features[m]:
-                            _ref_cls = features[m][cmd]['feature'].__class__
-                        elif ref_options is not None and cmd in _cmd(ref_options, m):
-                            _ref_cls = ref_options.get_cmd_attr(m, cmd, 'feature').__class__
-                        if _ref_cls is not None:
-                            raise ValueError(f'load_features: Duplicate feature for  cmd "{cmd}" of mode "{m}". ({_cls} is overwriting {_ref_cls})')
-                        features[m][cmd] = fobj.get_option()
-                        if features[m][cmd] is None:
-                            raise ValueError(f'load_features: Cannot get options from {fobj}. The get_option() method returns None.')
-                        features[m][cmd]['feature'] = fobj
+                        opt = fobj.get_option()
+                        _add(fobj, fobj.__class__, m, cmd, opt)
+                    entries.append(manifest.entry(mod.__name__, name, fobj, mode, cmd, fobj.get_option()))
+    manifest.save(entries)
     return features
 
 def load_webfeatures(package_name:str, prefix:str="cmdbox_web_", excludes:list=[],
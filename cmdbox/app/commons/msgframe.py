@@ -0,0 +1,152 @@
+from cmdbox.app import common
+from typing import Dict, Any, List, Tuple
+import json
+import struct
+
+# バイナリフレームの先頭を示すマジックナンバー。テキスト形式のメッセージはNULで始まらないため区別できる
+MAGIC:bytes = b'\x00CBF'
+# バイナリフレームのバージョン
+VERSION:int = 1
+# マジックナンバー, バージョン, ヘッダー長
+_PREFIX = struct.Struct('>4sBI')
+
+
+def pack(header:Dict[str, Any], body:bytes=None) -> bytes:
+    """
+    ヘッダーとバイナリデータをバイナリフレームに変換します。
+
+    Args:
+        header (Dict[str, Any]): ヘッダー。JSONに変換できる値
+        body (bytes, optional): バイナリデータ. Defaults to None.
+
+    Returns:
+        bytes: バイナリフレーム
+    """
+    hb = json.dumps(header, default=common.default_json_enc).encode('utf-8')
+    if body is None:
+        return b''.join((_PREFIX.pack(MAGIC, VERSION, len(hb)), hb))
+    return b''.join((_PREFIX.pack(MAGIC, VERSION, len(hb)), hb, body))
+
+def is_frame(raw:bytes) -> bool:
+    """
+    受信したメッセージがバイナリフレームかどうかを返します。
+
+    Args:
+        raw (bytes): 受信したメッセージ
+
+    Returns:
+        bool: バイナリフレームの場合はTrue
+    """
+    return isinstance(raw, (bytes, bytearray)) and raw[:len(MAGIC)] == MAGIC
+
+def unpack(raw:bytes) -> Tuple[Dict[str, Any], bytes]:
+    """
+    バイナリフレームをヘッダーとバイナリデータに変換します。
+
+    Args:
+        raw (bytes): バイナリフレーム
+
+    Returns:
+        Tuple[Dict[str, Any], bytes]: ヘッダー, バイナリデータ。バイナリデータがない場合はNone
+    """
+    magic, ver, hlen = _PREFIX.unpack_from(raw, 0)
+    if magic != MAGIC:
+        raise ValueError(f"Not a binary frame.")
+    if ver != VERSION:
+        raise ValueError(f"Unsupported frame version. version={ver}")
+    hstart = _PREFIX.size
+    header = json.loads(raw[hstart:hstart+hlen].decode('utf-8'))
+    body = raw[hstart+hlen:] if len(raw) > hstart+hlen else None
+    return header, body
+
+def pack_cmd(cmd:str, reskey:str, params:List[str], data:bytes=None) -> bytes:
+    """
+    サーバーに送信するコマンドをバイナリフレームに変換します。
+
+    Args:
+        cmd (str): コマンド
+        reskey (str): 応答を受け取るキー
+        params (List[str]): コマンドのパラメータ
+        data (bytes, optional): コマンドに添付するバイナリデータ. Defaults to None.
+
+    Returns:
+        bytes: バイナリフレーム
+    """
+    return pack(dict(cmd=cmd, reskey=reskey, params=[str(p) for p in params]), data)
+
+def pack_text_cmd(cmd:str, reskey:str, params:List[str]) -> str:
+    """
+    サーバーに送信するコマンドを旧形式の `"<cmd> <reskey> <params...>"` 形式に変換します。
+    バイナリフレームに対応していないサーバーとの互換性を確認する場合に使用します。
+
+    Args:
+        cmd (str): コマンド
+        reskey (str): 応答を受け取るキー
+        params (List[str]): コマンドのパラメータ
+
+    Returns:
+        str: テキスト形式のメッセージ
+    """
+    return f"{cmd} {reskey} {' '.join([str(p) for p in params])}"
+
+def parse_cmd(raw:bytes) -> List[Any]:
+    """
+    サーバーが受信したメッセージをコマンドのリストに変換します。
+    旧形式の `"<cmd> <reskey> <params...>"` 形式のメッセージも受け付けます。
+    バイナリデータが添付されている場合はリストの末尾にbytesで格納されます。
+
+    Args:
+        raw (bytes): 受信したメッセージ
+
+    Returns:
+        List[Any]: [コマンド, 応答キー, パラメータ..., (バイナリデータ)]
+    """
+    if not is_frame(raw):
+        msg_str = raw.decode() if isinstance(raw, (bytes, bytearray)) else raw
+        return msg_str.split(' ')
+    header, body = unpack(raw)
+    msg = [header['cmd'], header['reskey']] + header.get('params', [])
+    if body is not None:
+        msg.append(body)
+    return msg
+
+def pack_res(res:Dict[str, Any], data:bytes) -> bytes:
+    """
+    クライアントに返す応答をバイナリフレームに変換します。
+
+    Args:
+        res (Dict[str, Any]): 応答
+        data (bytes): 応答に添付するバイナリデータ
+
+    Returns:
+        bytes: バイナリフレーム
+    """
+    return pack(res, data)
+
+def parse_res(raw:bytes) -> Tuple[Dict[str, Any], bytes]:
+    """
+    クライアントが受信した応答を変換します。旧形式のJSON文字列も受け付けます。
+
+    Args:
+        raw (bytes): 受信した応答
+
+    Returns:
+        Tuple[Dict[str, Any], bytes]: 応答, バイナリデータ。バイナリデータがない場合はNone
+    """
+    if not is_frame(raw):
+        return json.loads(raw.decode('utf-8')), None
+    return unpack(raw)
+
+def to_logstr(msg:List[Any]) -> str:
+    """
+    コマンドのリストをログ出力用の文字列に変換します。バイナリデータはサイズのみを出力します。
+
+    Args:
+        msg (List[Any]): コマンドのリスト
+
+    Returns:
+        str: ログ出力用の文字列
+    """
+    if msg is None:
+        return str(msg)
+    return str([m if isinstance(m, str) else f'<{len(m)} bytes>' for m in msg])
@@ -0,0 +1,133 @@
+from typing import Any, Dict, List, Tuple, Union
+import functools
+import re
+
+
+# `.meta` ディレクトリ及びその配下を示すパスにマッチする正規表現
+META_PATTERN = re.compile(r'\.meta(?:/|$)')
+# `.meta` ディレクトリの配下を示すパスにマッチする正規表現
+META_DIR_PATTERN = re.compile(r'\.meta/')
+# 複数の正規表現を1つに結合すると意味が変わる後方参照
+_BACKREF_PATTERN = re.compile(r'\\[1-9]|\(\?P=')
+
+
+class PathMatcher:
+    """
+    fwpaths及びrjpathsによるパスのアクセス可否を判定するクラス。
+    fwpathsは文字単位のプレフィックス木に、rjpathsは1つの正規表現に結合してコンパイルするため、
+    エントリごとにルールの数だけ文字列比較や正規表現のコンパイルを行う必要がありません。
+    同じルールのインスタンスは `get` で共有されます。
+    """
+    _END = ''
+
+    @classmethod
+    def get(cls, fwpaths:List[str], rjpaths:Union[List[str], str]=None) -> 'PathMatcher':
+        """
+        ルールに対応するインスタンスを返します。同じルールに対してはコンパイル済みのインスタンスを再利用します。
+
+        Args:
+            fwpaths (List[str]): 範囲内かどうかを示すパスのリスト
+            rjpaths (Union[List[str], str], optional): 範囲外かどうかを示す正規表現のリスト. Defaults to None.
+
+        Returns:
+            PathMatcher: インスタンス
+        """
+        fwpaths = tuple(fwpaths) if fwpaths is not None else None
+        rjpaths = rjpaths if isinstance(rjpaths, list) else [rjpaths] if rjpaths is not None and rjpaths != "********" else []
+        return cls._get(fwpaths, tuple(rjpaths))
+
+    @classmethod
+    @functools.lru_cache(maxsize=256)
+    def _get(cls, fwpaths:Tuple[str], rjpaths:Tuple[str]) -> 'PathMatcher':
+        return cls(fwpaths, rjpaths)
+
+    def __init__(self, fwpaths:Tuple[str], rjpaths:Tuple[str]):
+        """
+        コンストラクタ
+
+        Args:
+            fwpaths (Tuple[str]): 範囲内かどうかを示すパスのリスト。Noneの場合は全てのパスを範囲外とします
+            rjpaths (Tuple[str]): 範囲外かどうかを示す正規表現のリスト
+        """
+        self.fwpaths = fwpaths
+        self.rjpaths = rjpaths
+        self.trie:Dict[str, Any] = dict()
+        for fwpath in fwpaths or []:
+            node = self.trie
+            for c in fwpath:
+                node = node.setdefault(c, dict())
+            node[self._END] = True
+        self.rj_patterns = [re.compile(rjpath) for rjpath in rjpaths]
+        self.rj_pattern = None
+        if len(self.rj_patterns) > 0 and not any(_BACKREF_PATTERN.search(rjpath) for rjpath in rjpaths):
+            try:
+                self.rj_pattern = re.compile('|'.join(f'(?:{rjpath})' for rjpath in rjpaths))
+            except re.error:
+                # インラインフラグなど結合できないパターンが含まれる場合は個別に判定する
+                self.rj_pattern = None
+
+    def in_bounds(self, path:str) -> bool:
+        """
+        パスがfwpathsのいずれかの配下、又はfwpathsのいずれかの親であるかどうかを返します。
+        `any(fwpath.startswith(path) or path.startswith(fwpath) for fwpath in fwpaths)` と同じ結果を返します。
+
+        Args:
+            path (str): パス
+
+        Returns:
+            bool: 範囲内の場合はTrue
+        """
+        if not self.fwpaths:
+            return False
+        node = self.trie
+        if self._END in node:
+            return True
+        for c in path:
+            node = node.get(c)
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        # パスを読み切った場合は、パスがいずれかのfwpathのプレフィックスである
+        return True
+
+    def is_rejected(self, path:str) -> bool:
+        """
+        パスがrjpathsのいずれかにマッチするかどうかを返します。
+
+        Args:
+            path (str): パス
+
+        Returns:
+            bool: マッチする場合はTrue
+        """
+        if self.rj_pattern is not None:
+            return self.rj_pattern.match(path) is not None
+        return any(p.match(path) for p in self.rj_patterns)
+
+    def is_meta(self, path:str, dir_only:bool=False) -> bool:
+        """
+        パスが `.meta` ディレクトリ又はその配下であるかどうかを返します。
+
+        Args:
+            path (str): パス
+            dir_only (bool, optional): Trueの場合は `.meta/` を含むパスのみを対象とします. Defaults to False.
+
+        Returns:
+            bool: `.meta` ディレクトリ又はその配下の場合はTrue
+        """
+        if dir_only:
+            return META_DIR_PATTERN.search(path) is not None
+        return META_PATTERN.search(path) is not None
+
+    def allowed(self, path:str) -> bool:
+        """
+        ファイルリストにパスを含めてよいかどうかを返します。
+
+        Args:
+            path (str): パス
+
+        Returns:
+            bool: 含めてよい場合はTrue
+        """
+        return self.in_bounds(path) and not self.is_rejected(path) and not self.is_meta(path)
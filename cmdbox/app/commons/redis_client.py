@@ -1,7 +1,7 @@
 from cmdbox.app import common
-from cmdbox.app.commons import convert
+from cmdbox.app.commons import convert, msgframe
 from PIL import Image
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set, Union
 import datetime
 import logging
 import json
@@ -11,6 +11,28 @@ import threading
 
 
 class RedisClient(object):
+    # 応答待ちでBLPOPを1回あたりにブロックする最大秒数
+    RES_WAIT_INTERVAL:float = 1.0
+    # 起動中のサーバー名(suffixなし)を保持するSETのキー
+    SVREG_NAME:str = "svreg"
+    # 最後のハートビートからこの秒数を過ぎたサーバーは停止済みとみなす
+    SVREG_TTL:int = 60
+    # Redis Luaスクリプト: ハートビートの更新とサーバーレジストリへの登録を1回の呼出しで行う
+    # KEYS[1]: hash key, KEYS[2]: server list, KEYS[3]: cluster list, KEYS[4]: registry zset, KEYS[5]: registry set
+    # ARGV[1]: ctime, ARGV[2]: pool active, ARGV[3]: pool max, ARGV[4]: svname, ARGV[5]: org svname
+    _HEARTBEAT_LUA = """
+local depth = redis.call('LLEN', KEYS[2]) + redis.call('LLEN', KEYS[3])
+local active = tonumber(ARGV[2])
+local status = 'ready'
+if active > 0 then status = 'processing' end
+redis.call('HSET', KEYS[1], 'ctime', ARGV[1], 'status', status, 'queue_depth', depth,
+           'pool_active', active, 'pool_max', ARGV[3], 'pool_util', string.format('%.3f', active / tonumber(ARGV[3])))
+if ARGV[6] then redis.call('HSET', KEYS[1], 'db_pools', ARGV[6]) end
+redis.call('ZADD', KEYS[4], ARGV[1], ARGV[4])
+redis.call('SADD', KEYS[5], ARGV[5])
+return depth
+"""
+
     def __init__(self, logger:logging.Logger, host:str = "localhost", port:int = 6379,
                  password:str = None, svname:str="server", org_svname:str=None):
         """
@@ -34,6 +56,9 @@ class RedisClient(object):
         self.siname = f"showimg-{svname}"
         self.memname = f"mem-{self.org_svname}"
         self.lmtname = f"lmt-{self.org_svname}"
+        self.regname = f"{self.SVREG_NAME}-{self.org_svname}"
+        # バイナリフレームで届いたコマンドの応答キー。これ以外の応答キーにはバイナリフレームで返さない
+        self.frame_reskeys:Set[str] = set()
         self.redis_cli = self.connect()
 
     def connect(self):
@@ -47,15 +72,28 @@ class RedisClient(object):
             self.redis_cli.close()
             self.redis_cli = None
     
-    def rpush(self, name:str, value:dict, pfkey:str='svrun', tm:float=0.0):
-        if type(value) is dict or type(value) is list:
+    def rpush(self, name:str, value:dict, pfkey:str='svrun', tm:float=0.0, data:bytes=None):
+        if data is not None and type(value) is dict and name not in self.frame_reskeys:
+            # 旧形式のテキストで届いたコマンドの応答は、旧クライアントが解析できるようBase64にしてsuccess.dataに格納する
+            value = dict(value)
+            value['success'] = dict(value.get('success') or {}, data=convert.bytes2b64str(data))
+            data = None
+        if data is not None and type(value) is dict:
+            # バイナリデータはBase64にせずバイナリフレームのまま送る。受信側ではsuccess.dataに格納される
+            if pfkey and tm > 0:
+                common.update_performance(pfkey, tm, value)
+            res_bytes = msgframe.pack_res(value, data)
+            self.redis_cli.rpush(name, res_bytes)
+            self.last_ressize = len(res_bytes)
+            self.last_resval = value
+        elif type(value) is dict or type(value) is list:
             if pfkey and tm > 0:
                 common.update_performance(pfkey, tm, value)
             res_str = json.dumps(value, default=common.default_json_enc)
             self.redis_cli.rpush(name, res_str)
             self.last_ressize = len(res_str)
             self.last_resval = value
-        elif type(value) is str:
+        elif type(value) is str or type(value) is bytes:
             self.redis_cli.rpush(name, value)
             self.last_ressize = len(value)
             self.last_resval = value
@@ -69,12 +107,15 @@ class RedisClient(object):
     def pipeline(self, transaction:bool=True, shard_hint=None):
         return self.redis_cli.pipeline(transaction=transaction, shard_hint=shard_hint)
 
-    def blpop(self, name:str, timeout:int=1):
+    def blpop(self, name:Union[str, List[str]], timeout:int=1):
         return self.redis_cli.blpop(name, timeout=timeout)
 
     def lpop(self, name:str):
         return self.redis_cli.lpop(name)
 
+    def llen(self, name:str):
+        return self.redis_cli.llen(name)
+
     def hset(self, name:str, key:str, value):
         self.redis_cli.hset(name, key, str(value))
 
@@ -93,6 +134,65 @@ class RedisClient(object):
     def keys(self, pattern:str):
         return self.redis_cli.keys(pattern)
 
+    def scan_iter(self, match:str, count:int=1000):
+        return self.redis_cli.scan_iter(match=match, count=count)
+
+    def heartbeat(self, ctime:float, pool_active:int, pool_max:int, db_pools:List[Dict[str, Any]]=None) -> int:
+        """
+        ハートビートとワーカーの利用状況を更新し、サーバーをサーバーレジストリに登録する
+
+        Args:
+            ctime (float): ハートビートの時刻
+            pool_active (int): 実行中のワーカー数
+            pool_max (int): ワーカーの最大数
+            db_pools (List[Dict[str, Any]], optional): データベース接続プールの統計情報. Defaults to None.
+
+        Returns:
+            int: 待ち行列の長さ
+        """
+        argv = [ctime, pool_active, pool_max, self.hbname[3:], self.org_svname]
+        if db_pools is not None:
+            argv.append(json.dumps(db_pools, default=common.default_json_enc))
+        return self.redis_cli.eval(self._HEARTBEAT_LUA, 5, self.hbname, self.svname, f"sv-{self.org_svname}",
+                                   self.regname, self.SVREG_NAME, *argv)
+
+    def unregist_server(self) -> None:
+        """
+        サーバーをサーバーレジストリから削除する
+        """
+        self.redis_cli.zrem(self.regname, self.hbname[3:])
+
+    def live_servers(self, org_svname:str=None) -> List[str]:
+        """
+        サーバーレジストリから起動中のサーバー名(suffix付き)を取得する
+
+        Args:
+            org_svname (str, optional): suffixなしのサーバー名. 省略時は全てのサーバーを対象にする
+
+        Returns:
+            List[str]: サーバー名のリスト
+        """
+        org_svnames = [org_svname] if org_svname else [o.decode() for o in self.redis_cli.smembers(self.SVREG_NAME)]
+        min_score = time.time() - self.SVREG_TTL
+        svnames = []
+        for org in org_svnames:
+            svnames += [sv.decode() for sv in self.redis_cli.zrangebyscore(f"{self.SVREG_NAME}-{org}", min_score, '+inf')]
+        return svnames
+
+    def stale_servers(self) -> Dict[str, List[str]]:
+        """
+        サーバーレジストリからハートビートが途絶えたサーバー名(suffix付き)を取得する
+
+        Returns:
+            Dict[str, List[str]]: suffixなしのサーバー名ごとのサーバー名のリスト
+        """
+        max_score = time.time() - self.SVREG_TTL
+        stale = dict()
+        for org in self.redis_cli.smembers(self.SVREG_NAME):
+            org = org.decode()
+            stale[org] = [sv.decode() for sv in self.redis_cli.zrangebyscore(f"{self.SVREG_NAME}-{org}", '-inf', f"({max_score}")]
+        return stale
+
     def check_server(self, find_svname:bool=False, retry_count:int=20, retry_interval:int=5, outstatus:bool=False):
         """
         Redisサーバーにpingを送信し、応答があるか確認する
@@ -117,9 +217,13 @@ class RedisClient(object):
                     self.logger.info(f"({i+1}/{retry_count if retry_count>0 else '-'}) connecting to the redis server. {self.host}:{self.port}")
                 self.redis_cli.ping()
                 if find_svname:
-                    _hbname = f"{self.hbname}-*" if len(self.hbname.split('-')) < 3 else self.hbname
-                    found = self.redis_cli.keys(_hbname)
-                    if len(found) <= 0:
+                    min_score = time.time() - self.SVREG_TTL
+                    if len(self.hbname.split('-')) < 3:
+                        found = self.redis_cli.zcount(self.regname, min_score, '+inf') > 0
+                    else:
+                        score = self.redis_cli.zscore(self.regname, self.hbname[3:])
+                        found = score is not None and score >= min_score
+                    if not found:
                         self.logger.warning(f"Server not found. svname={self.svname.split('-')[1]}")
                         return False
                 i = 0
@@ -134,7 +238,7 @@ class RedisClient(object):
                 return False
 
     def send_cmd(self, cmd:str, params:List[str], retry_count:int=20, retry_interval:int=5,
-                 outstatus:bool=False, timeout:int=60, nowait:bool=False):
+                 outstatus:bool=False, timeout:int=60, nowait:bool=False, data:bytes=None, frame:bool=True):
         """
         コマンドをRedisサーバーに送信し、応答を取得します。
         nowait=Trueの場合は、応答を待たずにスレッドで実行します。
@@ -148,15 +252,17 @@ class RedisClient(object):
             outstatus (bool, optional): ステータスを出力する. Defaults to False.
             timeout (int, optional): タイムアウト時間. Defaults to 60.
             nowait (bool, optional): 応答を待たない. Defaults to False.
+            data (bytes, optional): コマンドに添付するバイナリデータ. Defaults to None.
+            frame (bool, optional): Falseの場合はバイナリフレームではなく旧形式のテキストで送信する. Defaults to True.
 
         Returns:
             dict: Redisサーバーからの応答
         """
         return next(self.send_cmd_sse(cmd, params, retry_count, retry_interval,
-                                      outstatus, timeout, nowait, sse=False))
+                                      outstatus, timeout, nowait, sse=False, data=data, frame=frame))
 
     def send_cmd_sse(self, cmd:str, params:List[str], retry_count:int=20, retry_interval:int=5,
-                 outstatus:bool=False, timeout:int=60, nowait:bool=False, sse:bool=True):
+                 outstatus:bool=False, timeout:int=60, nowait:bool=False, sse:bool=True, data:bytes=None, frame:bool=True):
         """
         コマンドをRedisサーバーに送信し、応答を取得します。
         nowait=Trueの場合は、応答を待たずにスレッドで実行します。
@@ -171,10 +277,14 @@ class RedisClient(object):
             timeout (int, optional): タイムアウト時間. Defaults to 60.
             nowait (bool, optional): 応答を待たない. Defaults to False.
             sse (bool, optional): サーバーサイドからの終了メッセージを受けるまで連続してレスポンスを受け取る. Defaults to False.
+            data (bytes, optional): コマンドに添付するバイナリデータ. Defaults to None.
+            frame (bool, optional): Falseの場合はバイナリフレームではなく旧形式のテキストで送信する。dataは指定できません. Defaults to True.
 
         Returns:
             dict: Redisサーバーからの応答
         """
+        if not frame and data is not None:
+            raise ValueError(f"data cannot be sent without a binary frame. cmd={cmd}")
         def send(nowait:bool=False, timeout:int=60):
             try:
                 if isinstance(timeout, str):
@@ -186,18 +296,22 @@ class RedisClient(object):
                     return
                 reskey = common.random_string()
                 reskey = f"cl-{reskey}-{int(time.time())}"
-                self.redis_cli.rpush(self.svname, f"{cmd} {reskey} {' '.join([str(p) for p in params])}")
+                if frame:
+                    self.redis_cli.rpush(self.svname, msgframe.pack_cmd(cmd, reskey, params, data))
+                else:
+                    self.redis_cli.rpush(self.svname, msgframe.pack_text_cmd(cmd, reskey, params))
                 if nowait: return
                 self.is_running = True
                 stime = time.time()
                 while self.is_running:
-                    ctime = time.time()
-                    if ctime - stime > timeout:
+                    remain = timeout - (time.time() - stime)
+                    if remain <= 0:
                         raise Exception(f"Response timed out.")
-                    res = self.redis_cli.lpop(reskey)
-                    if res is None or len(res) <= 0:
-                        time.sleep(0.001)
+                    # 応答が届くまでRedis側でブロックして待つ。停止要求を検知できるよう待ち時間は区切る
+                    res = self.redis_cli.blpop(reskey, timeout=min(max(remain, 0.01), self.RES_WAIT_INTERVAL))
+                    if res is None or len(res) <= 1 or res[1] is None or len(res[1]) <= 0:
                         continue
+                    res = res[1]
                     stime = time.time()
                     if sse:
                         msg = self._res_cmd(reskey, res, True)
@@ -240,8 +354,9 @@ class RedisClient(object):
             dict: 解析された応答
         """
         reskbyte = len(res_msg) / 1024
-        msg = res_msg.decode('utf-8')
-        res_json = json.loads(msg)
+        res_json, body = msgframe.parse_res(res_msg)
+        if body is not None and isinstance(res_json, dict) and isinstance(res_json.get('success'), dict):
+            res_json['success']['data'] = body
         if not sse or (sse and 'end' in res_json):
             self.redis_cli.delete(reskey)
         res_json = common.result_format(res_json, self.logger, pf=[
@@ -336,26 +451,22 @@ class RedisClient(object):
         Returns:
             List[Dict[str, Any]]: サーバーのリスト
         """
-        hblist = self.keys("hb-*")
+        svnames = self.live_servers()
+        pipe = self.redis_cli.pipeline(transaction=False)
+        for svname in svnames:
+            pipe.hgetall(f"hb-{svname}")
+        hbvals = pipe.execute(raise_on_error=False)
         svlist = []
-        for hb in hblist:
-            hb = hb.decode()
-            svname = hb.replace("hb-", "")
-            try:
-                val = self.hget(hb, 'receive_cnt')
-                receive_cnt = int(val.decode()) if val is not None else 0
-                val = self.hget(hb, 'success_cnt')
-                success_cnt = int(val.decode()) if val is not None else 0
-                val = self.hget(hb, 'warn_cnt')
-                warn_cnt = int(val.decode()) if val is not None else 0
-                val = self.hget(hb, 'error_cnt')
-                error_cnt = int(val.decode()) if val is not None else 0
-                val = self.hget(hb, 'status')
-                status = val.decode() if val is not None else "unknown"
-                val = self.hget(hb, 'ctime')
-                ctime = time.strftime('%Y/%m/%d %H:%M:%S', time.localtime(float(val.decode()))) if val is not None else "-"
-            except redis.exceptions.ResponseError:
-                self.logger.warn(f"ResponseError. {hb}", exc_info=True)
-            svlist.append(dict(svname=svname, status=status, ctime=ctime,
-                               receive_cnt=receive_cnt, success_cnt=success_cnt, warn_cnt=warn_cnt, error_cnt=error_cnt))
+        for svname, hbval in zip(svnames, hbvals):
+            if isinstance(hbval, redis.exceptions.ResponseError):
+                self.logger.warning(f"ResponseError. hb-{svname}", exc_info=hbval)
+                continue
+            hbval = {k.decode(): v.decode() for k, v in hbval.items()}
+            _int = lambda key: int(float(hbval[key])) if key in hbval else 0
+            ctime = time.strftime('%Y/%m/%d %H:%M:%S', time.localtime(float(hbval['ctime']))) if 'ctime' in hbval else "-"
+            svlist.append(dict(svname=svname, status=hbval.get('status', "unknown"), ctime=ctime,
+                               receive_cnt=_int('receive_cnt'), success_cnt=_int('success_cnt'),
+                               warn_cnt=_int('warn_cnt'), error_cnt=_int('error_cnt'),
+                               queue_depth=_int('queue_depth'), pool_active=_int('pool_active'), pool_max=_int('pool_max'),
+                               db_pools=json.loads(hbval['db_pools']) if 'db_pools' in hbval else []))
         return svlist
\ No newline at end of file
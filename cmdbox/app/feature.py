@@ -168,6 +168,20 @@ class Feature(object):
         except:
             pass
 
+    def is_cancelled(self, args:argparse.Namespace) -> bool:
+        """
+        コマンド実行結果を受け取る側が切断され、処理を中断してよいかどうかを返します。
+        時間のかかる処理は区切りごとにこのメソッドを確認し、Trueの場合は処理を打ち切ります。
+
+        Args:
+            args (argparse.Namespace): 引数
+
+        Returns:
+            bool: 処理を中断してよい場合はTrue
+        """
+        q = getattr(args, '_resqueue', None)
+        return bool(getattr(q, 'closed', False))
+
     def check_save_mode(self, name, configure:Dict[str, Any], configure_path:Path,) -> Tuple[bool, Dict[str, Any]]:
         """
         設定の保存モードをチェックします
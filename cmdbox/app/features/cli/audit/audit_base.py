@@ -1,16 +1,17 @@
 from cmdbox.app import feature
+from cmdbox.app.commons import dbpool
 from cmdbox.app.options import Options
 from pathlib import Path
-from psycopg_pool import ConnectionPool
 from typing import Any
 import logging
-import sqlite3
+import threading
 
 
 class AuditBase(feature.ResultEdgeFeature):
     TBL_COLS = ['audit_type', 'clmsg_id', 'clmsg_date', 'clmsg_src', 'clmsg_title', 'clmsg_user', 'clmsg_body', 'clmsg_tag', 'svmsg_id', 'svmsg_date']
     DT_FMT = ['%Y/%m/%d %H:%M', '%Y/%m/%d %H', '%Y/%m/%d', '%Y/%m', '%Y', '%m', '%u']
-    _pg_pool = None
+    _initdb_keys = set()
+    _initdb_lock = threading.Lock()
 
     def get_option(self):
         """
@@ -69,21 +70,33 @@ class AuditBase(feature.ResultEdgeFeature):
         )
     
     def get_context(self, data_dir:Path, logger:logging.Logger, pg_enabled:bool, pg_host:str, pg_port:int, pg_user:str, pg_password:str, pg_dbname:str) -> Any:
+        """
+        データベース接続を取得します。
+        PostgreSQLの場合は接続先ごとの接続プールから、SQLiteの場合はスレッドごとにキャッシュした接続を返します。
+
+        Args:
+            data_dir (Path): データディレクトリ
+            logger (logging.Logger): ロガー
+            pg_enabled (bool): PostgreSQLを使用するかどうか
+            pg_host (str): PostgreSQLホスト
+            pg_port (int): PostgreSQLポート
+            pg_user (str): PostgreSQLユーザー名
+            pg_password (str): PostgreSQLパスワード
+            pg_dbname (str): PostgreSQLデータベース名
+
+        Returns:
+            Any: コンテキストマネージャーとして使用できるデータベース接続
+        """
         if pg_enabled:
             #if logger.level == logging.DEBUG:
             #    logger.debug(f"Initializing database with pg_enabled={pg_enabled}, pg_host={pg_host}, pg_port={pg_port}, pg_user={pg_user}, pg_dbname={pg_dbname}")
             constr = f"host={pg_host} port={pg_port} user={pg_user} password={pg_password} dbname={pg_dbname} connect_timeout=60"
-            
-            if AuditBase._pg_pool is None:
-                AuditBase._pg_pool = ConnectionPool(constr, min_size=1, max_size=2)
-            return AuditBase._pg_pool.connection()
+            return dbpool.pg_connection(constr)
         else:
             db_path = data_dir / '.audit' / 'audit.db'
             #if logger.level == logging.DEBUG:
             #    logger.debug(f"Initializing database with db_path={db_path}")
-            db_path.parent.mkdir(parents=True, exist_ok=True)
-            conn = sqlite3.connect(db_path)
-            return conn
+            return dbpool.sqlite_connection(db_path)
 
     def initdb(self, data_dir:Path, logger:logging.Logger, pg_enabled:bool, pg_host:str, pg_port:int, pg_user:str, pg_password:str, pg_dbname:str) -> None:
         """
@@ -155,3 +168,26 @@ class AuditBase(feature.ResultEdgeFeature):
                         ''')
                 finally:
                     cursor.close()
+
+    def initdb_once(self, data_dir:Path, logger:logging.Logger, pg_enabled:bool, pg_host:str, pg_port:int, pg_user:str, pg_password:str, pg_dbname:str) -> None:
+        """
+        データベースを初期化します。同じデータベースに対してはプロセス内で一度だけ初期化を行います。
+
+        Args:
+            data_dir (Path): データディレクトリ
+            logger (logging.Logger): ロガー
+            pg_enabled (bool): PostgreSQLを使用するかどうか
+            pg_host (str): PostgreSQLホスト
+            pg_port (int): PostgreSQLポート
+            pg_user (str): PostgreSQLユーザー名
+            pg_password (str): PostgreSQLパスワード
+            pg_dbname (str): PostgreSQLデータベース名
+        """
+        key = (pg_host, pg_port, pg_user, pg_dbname) if pg_enabled else str(data_dir)
+        if key in AuditBase._initdb_keys:
+            return
+        with AuditBase._initdb_lock:
+            if key in AuditBase._initdb_keys:
+                return
+            self.initdb(data_dir, logger, pg_enabled, pg_host, pg_port, pg_user, pg_password, pg_dbname)
+            AuditBase._initdb_keys.add(key)
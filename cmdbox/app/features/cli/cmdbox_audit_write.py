@@ -9,11 +9,18 @@ import argparse
 import logging
 import json
 import pydantic
+import threading
 import uuid
 import time
 
 
 class AuditWrite(audit_base.AuditBase, validator.Validator):
+    # 保存期間を過ぎた監査ログを削除する間隔(秒)
+    PURGE_INTERVAL:int = 60
+    _purge_targets:Dict[Tuple, Tuple[Path, logging.Logger, int]] = dict()
+    _purge_lock = threading.Lock()
+    _purge_thread:threading.Thread = None
+
     def __init__(self, appcls, ver, language = None):
         super().__init__(appcls, ver, language)
         self.buffer = []
@@ -175,87 +182,107 @@ class AuditWrite(audit_base.AuditBase, validator.Validator):
             int: 終了コード
         """
         chunks = json.loads(convert.b64str2str(msg[2]))
+        # 書き込み先のデータベースごとにまとめて、1つのトランザクションで書き込む
+        groups:Dict[Tuple, List[Dict[str, Any]]] = dict()
         for payload in chunks:
-            audit_type = payload.get("audit_type")
-            clmsg_id = payload.get("clmsg_id")
-            clmsg_date = payload.get("clmsg_date")
-            clmsg_src = payload.get("clmsg_src")
-            clmsg_title = payload.get("clmsg_title")
-            clmsg_user = payload.get("clmsg_user")
-            clmsg_body = payload.get("clmsg_body")
-            clmsg_tags = payload.get("clmsg_tags")
-            pg_enabled = payload.get("pg_enabled")
-            pg_host = payload.get("pg_host")
-            pg_port = payload.get("pg_port")
-            pg_user = payload.get("pg_user")
-            pg_password = payload.get("pg_password")
-            pg_dbname = payload.get("pg_dbname")
-            retention_period_days = payload.get("retention_period_days")
-            svmsg_id = str(uuid.uuid4())
-            self.initdb(data_dir, logger, pg_enabled, pg_host, pg_port, pg_user, pg_password, pg_dbname)
-            with self.get_context(data_dir, logger, pg_enabled, pg_host, pg_port, pg_user, pg_password, pg_dbname) as conn:
-                st = self.write(conn, reskey=msg[1], audit_type=audit_type, clmsg_id=clmsg_id, clmsg_date=clmsg_date, clmsg_src=clmsg_src,
-                                clmsg_title=clmsg_title, clmsg_user=clmsg_user, clmsg_body=clmsg_body, clmsg_tags=clmsg_tags,
-                                svmsg_id=svmsg_id, pg_enabled=pg_enabled, retention_period_days=retention_period_days,
-                                logger=logger, redis_cli=redis_cli)
-        return st
+            dbkey = (payload.get("pg_enabled"), payload.get("pg_host"), payload.get("pg_port"), payload.get("pg_user"),
+                     payload.get("pg_password"), payload.get("pg_dbname"))
+            groups.setdefault(dbkey, []).append(payload)
+        try:
+            for dbkey, payloads in groups.items():
+                pg_enabled, pg_host, pg_port, pg_user, pg_password, pg_dbname = dbkey
+                self.initdb_once(data_dir, logger, pg_enabled, pg_host, pg_port, pg_user, pg_password, pg_dbname)
+                with self.get_context(data_dir, logger, pg_enabled, pg_host, pg_port, pg_user, pg_password, pg_dbname) as conn:
+                    self.write(conn, payloads, pg_enabled=pg_enabled)
+                retention_period_days = max([p.get("retention_period_days") or 0 for p in payloads])
+                self.schedule_purge(data_dir, logger, dbkey, retention_period_days)
+        except Exception as e:
+            logger.warning(f"Failed to write: {e}", exc_info=True)
+            redis_cli.rpush(msg[1], dict(warn=f"Failed to write: {e}"))
+            return self.RESP_WARN
+        redis_cli.rpush(msg[1], dict(success=True))
+        return self.RESP_SUCCESS
 
-    def write(self, conn, *, reskey:str, audit_type:str, clmsg_id:str, clmsg_date:str, clmsg_src:str, clmsg_title:str,
-              clmsg_user:str, clmsg_body:str, clmsg_tags:str, svmsg_id:str,
-              pg_enabled:bool, retention_period_days:int,
-              logger:logging.Logger, redis_cli:redis_client.RedisClient) -> int:
+    def write(self, conn, payloads:List[Dict[str, Any]], *, pg_enabled:bool) -> None:
         """
-        監査ログを書き込む
+        監査ログをまとめて書き込む
 
         Args:
             conn: データベース接続
-            reskey (str): レスポンスキー
-            audit_type (str): 監査の種類
-            clmsg_id (str): クライアントメッセージID
-            clmsg_date (str): クライアントメッセージ発生日時
-            clmsg_src (str): クライアントメッセージの発生源
-            clmsg_title (str): クライアントメッセージのタイトル
-            clmsg_user (str): クライアントメッセージの発生させたユーザー
-            clmsg_body (str): クライアントメッセージの本文
-            clmsg_tags (str): クライアントメッセージのタグ
-            svmsg_id (str): サーバーメッセージID
+            payloads (List[Dict[str, Any]]): 監査ログのリスト
             pg_enabled (bool): PostgreSQLを使用する場合はTrue
-            retention_period_days (int): 監査を保存する日数
+        """
+        svmsg_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S') + common.get_tzoffset_str()
+        rows = [(p.get("audit_type"), p.get("clmsg_id"), p.get("clmsg_date"), p.get("clmsg_src"), p.get("clmsg_title"),
+                 p.get("clmsg_user"), p.get("clmsg_body"), p.get("clmsg_tags"), str(uuid.uuid4()), svmsg_date) for p in payloads]
+        ph = '%s' if pg_enabled else '?'
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(f'''
+                INSERT INTO audit (audit_type, clmsg_id, clmsg_date, clmsg_src, clmsg_title, clmsg_user, clmsg_body, clmsg_tag, 
+                                svmsg_id, svmsg_date)
+                VALUES ({", ".join([ph]*10)})
+            ''', rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def schedule_purge(self, data_dir:Path, logger:logging.Logger, dbkey:Tuple, retention_period_days:int) -> None:
+        """
+        保存期間を過ぎた監査ログを削除する対象を登録し、削除を行うスレッドを開始します。
+        削除は書き込みのたびではなく、 `PURGE_INTERVAL` 秒ごとにバックグラウンドで行います。
+
+        Args:
+            data_dir (Path): データディレクトリ
             logger (logging.Logger): ロガー
-            redis_cli (redis_client.RedisClient): Redisクライアント
+            dbkey (Tuple): 書き込み先のデータベースを示すキー
+            retention_period_days (int): 監査を保存する日数
+        """
+        if retention_period_days is None or retention_period_days <= 0:
+            return
+        with AuditWrite._purge_lock:
+            AuditWrite._purge_targets[dbkey] = (data_dir, logger, retention_period_days)
+            if AuditWrite._purge_thread is None or not AuditWrite._purge_thread.is_alive():
+                AuditWrite._purge_thread = threading.Thread(target=self._purge_loop, daemon=True)
+                AuditWrite._purge_thread.start()
 
-        Returns:
-            int: レスポンスコード
+    def _purge_loop(self) -> None:
         """
-        try:
+        保存期間を過ぎた監査ログを定期的に削除します。
+        """
+        while True:
+            with AuditWrite._purge_lock:
+                targets = list(AuditWrite._purge_targets.items())
+            for dbkey, (data_dir, logger, retention_period_days) in targets:
+                try:
+                    self.purge(data_dir, logger, dbkey, retention_period_days)
+                except Exception as e:
+                    logger.warning(f"Failed to purge audit: {e}", exc_info=True)
+            time.sleep(self.PURGE_INTERVAL)
+
+    def purge(self, data_dir:Path, logger:logging.Logger, dbkey:Tuple, retention_period_days:int) -> None:
+        """
+        保存期間を過ぎた監査ログを削除します
+
+        Args:
+            data_dir (Path): データディレクトリ
+            logger (logging.Logger): ロガー
+            dbkey (Tuple): 書き込み先のデータベースを示すキー
+            retention_period_days (int): 監査を保存する日数
+        """
+        pg_enabled, pg_host, pg_port, pg_user, pg_password, pg_dbname = dbkey
+        with self.get_context(data_dir, logger, pg_enabled, pg_host, pg_port, pg_user, pg_password, pg_dbname) as conn:
             cursor = conn.cursor()
             try:
-                svmsg_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S') + common.get_tzoffset_str()
                 if not pg_enabled:
-                    cursor.execute('''
-                        INSERT INTO audit (audit_type, clmsg_id, clmsg_date, clmsg_src, clmsg_title, clmsg_user, clmsg_body, clmsg_tag, 
-                                        svmsg_id, svmsg_date)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (audit_type, clmsg_id, clmsg_date, clmsg_src, clmsg_title, clmsg_user, clmsg_body, clmsg_tags, svmsg_id, svmsg_date))
-                    if retention_period_days is not None and retention_period_days > 0:
-                        cursor.execute('DELETE FROM audit WHERE svmsg_date < datetime(CURRENT_TIMESTAMP, ?)',
-                                        (f'-{retention_period_days} days',))
+                    cursor.execute('DELETE FROM audit WHERE svmsg_date < datetime(CURRENT_TIMESTAMP, ?)',
+                                    (f'-{retention_period_days} days',))
                 else:
-                    cursor.execute('''
-                        INSERT INTO audit (audit_type, clmsg_id, clmsg_date, clmsg_src, clmsg_title, clmsg_user, clmsg_body, clmsg_tag, 
-                                        svmsg_id, svmsg_date)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ''', (audit_type, clmsg_id, clmsg_date, clmsg_src, clmsg_title, clmsg_user, clmsg_body, clmsg_tags, svmsg_id, svmsg_date))
-                    if retention_period_days is not None and retention_period_days > 0:
-                        cursor.execute("DELETE FROM audit WHERE svmsg_date < CURRENT_TIMESTAMP + %s ",
-                                        (f'-{retention_period_days} day',))
+                    cursor.execute("DELETE FROM audit WHERE svmsg_date < CURRENT_TIMESTAMP + %s ",
+                                    (f'-{retention_period_days} day',))
                 conn.commit()
-                rescode, msg = (self.RESP_SUCCESS, dict(success=True))
-                redis_cli.rpush(reskey, msg)
-                return rescode
             finally:
                 cursor.close()
-        except Exception as e:
-            logger.warning(f"Failed to write: {e}", exc_info=True)
-            redis_cli.rpush(reskey, dict(warn=f"Failed to write: {e}"))
-            return self.RESP_WARN
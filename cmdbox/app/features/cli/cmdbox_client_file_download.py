@@ -83,6 +83,12 @@ class ClientFileDownload(feature.OneshotEdgeFeature, validator.Validator, limite
                 dict(opt="meta", type=Options.T_DICT, default=None, required=False, multi=True, hide=False, choice=None,
                      description_ja="メタデータを指定します。",
                      description_en="Specify the metadata."),
+                dict(opt="chunk_size", type=Options.T_INT, default=4194304, required=False, multi=False, hide=True, choice=None,
+                     description_ja="ファイルを分割して転送する時の1回あたりのバイト数を指定します。0以下を指定すると分割せずに転送します。",
+                     description_en="Specifies the number of bytes per transfer when the file is split. If less than or equal to 0 is specified, the file is transferred without splitting."),
+                dict(opt="resume", type=Options.T_BOOL, default=False, required=False, multi=False, hide=True, choice=[True, False],
+                     description_ja="前回中断した転送の続きから再開します。",
+                     description_en="Resumes the previously interrupted transfer from where it left off."),
                 dict(opt="retry_count", type=Options.T_INT, default=3, required=False, multi=False, hide=True, choice=None,
                      description_ja="Redisサーバーへの再接続回数を指定します。0以下を指定すると永遠に再接続を行います。",
                      description_en="Specifies the number of reconnections to the Redis server.If less than 0 is specified, reconnection is forever."),
@@ -122,6 +128,7 @@ class ClientFileDownload(feature.OneshotEdgeFeature, validator.Validator, limite
         rjpaths = [str(p).replace('"','') for p in args.rjpath] if args.rjpath is not None else []
         ret = cl.file_download(str(args.svpath).replace('"',''), download_file, scope=args.scope, client_data=client_data,
                                fwpaths=fwpaths, rjpaths=rjpaths, meta=args.meta, etag=args.etag, rpath=args.rpath, img_thumbnail=args.img_thumbnail,
+                               chunk_size=getattr(args, 'chunk_size', client.Client.CHUNK_SIZE), resume=getattr(args, 'resume', False),
                                retry_count=args.retry_count, retry_interval=args.retry_interval, timeout=args.timeout)
         common.print_format(ret, args.format, tm, args.output_json, args.output_json_append, pf=pf)
 
@@ -180,6 +187,10 @@ class ClientFileDownload(feature.OneshotEdgeFeature, validator.Validator, limite
             img_thumbnail = 0.0
         else:
             img_thumbnail = float(img_thumbnail)
+        if payload.get("chunked", False):
+            return self.file_download_chunk(msg[1], svpath, int(payload.get("offset", 0)), int(payload.get("chunk_size", 0)),
+                                            fwpaths, rjpaths, meta, etag, data_dir, logger, redis_cli,
+                                            transfer_id=payload.get("transfer_id"))
         st = self.file_download(msg[1], svpath, img_thumbnail, fwpaths, rjpaths, meta, etag, data_dir, logger, redis_cli, sessions)
         return st
 
@@ -207,12 +218,58 @@ class ClientFileDownload(feature.OneshotEdgeFeature, validator.Validator, limite
         """
         try:
             f = filer.Filer(data_dir, logger)
-            rescode, msg = f.file_download(current_path, img_thumbnail, fwpaths=fwpaths, rjpaths=rjpaths, meta=meta, etag=etag)
-            redis_cli.rpush(reskey, msg)
+            rescode, msg = f.file_download(current_path, img_thumbnail, fwpaths=fwpaths, rjpaths=rjpaths, meta=meta, etag=etag, raw=True)
+            data = msg['success'].get('data') if 'success' in msg else None
+            if isinstance(data, bytes) and len(data) > 0:
+                # ファイルデータはBase64にせずバイナリフレームに添付して返す
+                del msg['success']['data']
+                redis_cli.rpush(reskey, msg, data=data)
+            else:
+                if isinstance(data, bytes):
+                    msg['success']['data'] = ""
+                redis_cli.rpush(reskey, msg)
             return rescode
         except Exception as e:
             logger.warning(f"Failed to download file: {e}", exc_info=True)
             redis_cli.rpush(reskey, dict(warn=f"Failed to download file: {e}"))
             return self.RESP_WARN
 
+    def file_download_chunk(self, reskey:str, current_path:str, offset:int, chunk_size:int,
+                            fwpaths:List[str], rjpaths:List[str], meta:Dict[str, Any], etag:str,
+                            data_dir:Path, logger:logging.Logger, redis_cli:redis_client.RedisClient, transfer_id:str=None) -> int:
+        """
+        ファイルを分割してダウンロードする
+
+        Args:
+            reskey (str): レスポンスキー
+            current_path (str): ファイルパス
+            offset (int): 読み込みを開始する位置
+            chunk_size (int): 読み込むサイズ
+            fwpaths (List[str]): 範囲内かどうかを示すパスのリスト
+            rjpaths (List[str]): 範囲外かどうかを示すパスのリスト
+            meta (Dict[str, Any]): メタデータ
+            etag (str): 転送中のファイルのETag
+            data_dir (Path): データディレクトリ
+            logger (logging.Logger): ロガー
+            redis_cli (redis_client.RedisClient): Redisクライアント
+            transfer_id (str, optional): 転送ID. Defaults to None.
 
+        Returns:
+            int: レスポンスコード
+        """
+        try:
+            f = filer.Filer(data_dir, logger)
+            rescode, msg = f.file_download_chunk(current_path, offset, chunk_size, fwpaths=fwpaths, rjpaths=rjpaths, meta=meta, etag=etag,
+                                                 transfer_id=transfer_id)
+            data = msg['success'].pop('data', None) if 'success' in msg else None
+            if data:
+                redis_cli.rpush(reskey, msg, data=data)
+            else:
+                if 'success' in msg:
+                    msg['success']['data'] = ""
+                redis_cli.rpush(reskey, msg)
+            return rescode
+        except Exception as e:
+            logger.warning(f"Failed to download file: {e}", exc_info=True)
+            redis_cli.rpush(reskey, dict(warn=f"Failed to download file: {e}"))
+            return self.RESP_WARN
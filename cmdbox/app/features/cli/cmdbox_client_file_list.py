@@ -69,6 +69,12 @@ class ClientFileList(feature.OneshotResultEdgeFeature, validator.Validator):
                      description_ja="指定したパスに含まれるフォルダについて、再帰的にファイルリストを取得します。",
                      description_en="Get a list of files recursively for a folder contained in the specified path.",
                      test_true={"server":True, "client":False}),
+                dict(opt="offset", type=Options.T_INT, default=0, required=False, multi=False, hide=True, choice=None,
+                     description_ja="指定したパス直下のエントリを何件目から取得するかを指定します。",
+                     description_en="Specifies the starting position of the entries directly under the specified path."),
+                dict(opt="limit", type=Options.T_INT, default=0, required=False, multi=False, hide=True, choice=None,
+                     description_ja="指定したパス直下のエントリを取得する最大件数を指定します。0以下を指定すると全件取得します。",
+                     description_en="Specifies the maximum number of entries directly under the specified path. If less than or equal to 0 is specified, all entries are returned."),
                 dict(opt="scope", type=Options.T_STR, default="client", required=True, multi=False, hide=False, choice=["client", "current", "server"],
                      description_ja="スコープを指定します。`client` はクライアント側、`server` はサーバー側です。`current` は実行時ディレクトリです。",
                      description_en="Specify the scope. `client` refers to the client side, and `server` refers to the server side. `current` refers to the current directory.",),
@@ -108,6 +114,7 @@ class ClientFileList(feature.OneshotResultEdgeFeature, validator.Validator):
         listregs = args.listregs if args.listregs is not None else ".*"
         ret = cl.file_list(svpath=str(args.svpath).replace('"',''), recursive=args.recursive, scope=args.scope,
                            client_data=client_data, fwpaths=fwpaths, rjpaths=rjpaths, listregs=listregs,
+                           offset=getattr(args, 'offset', 0), limit=getattr(args, 'limit', 0),
                            retry_count=args.retry_count, retry_interval=args.retry_interval, timeout=args.timeout)
         common.print_format(ret, args.format, tm, args.output_json, args.output_json_append, pf=pf)
 
@@ -151,11 +158,15 @@ class ClientFileList(feature.OneshotResultEdgeFeature, validator.Validator):
         fwpaths = payload.get('fwpaths', None)
         rjpaths = payload.get('rjpaths', None)
         listregs = payload.get('listregs', ".*")
-        st = self.file_list(msg[1], svpath, recursive, fwpaths, rjpaths, listregs, data_dir, logger, redis_cli, sessions)
+        offset = int(payload.get('offset', 0) or 0)
+        limit = int(payload.get('limit', 0) or 0)
+        st = self.file_list(msg[1], svpath, recursive, fwpaths, rjpaths, listregs, data_dir, logger, redis_cli, sessions,
+                            offset=offset, limit=limit)
         return st
 
     def file_list(self, reskey:str, current_path:str, recursive:bool, fwpaths:List[str], rjpaths:List[str], listregs:str,
-                  data_dir:Path, logger:logging.Logger, redis_cli:redis_client.RedisClient, sessions:Dict[str, Dict[str, Any]]) -> int:
+                  data_dir:Path, logger:logging.Logger, redis_cli:redis_client.RedisClient, sessions:Dict[str, Dict[str, Any]],
+                  offset:int=0, limit:int=0) -> int:
         """
         ファイルリストを取得する
 
@@ -170,13 +181,15 @@ class ClientFileList(feature.OneshotResultEdgeFeature, validator.Validator):
             logger (logging.Logger): ロガー
             redis_cli (redis_client.RedisClient): Redisクライアント
             sessions (Dict[str, Dict[str, Any]]): セッション情報
+            offset (int, optional): 指定したパス直下のエントリを何件目から返すか. Defaults to 0.
+            limit (int, optional): 指定したパス直下のエントリを返す最大件数. Defaults to 0.
 
         Returns:
             int: レスポンスコード
         """
         try:
             f = filer.Filer(data_dir, logger)
-            rescode, msg = f.file_list(current_path, recursive, fwpaths, rjpaths, listregs)
+            rescode, msg = f.file_list(current_path, recursive, fwpaths, rjpaths, listregs, offset=offset, limit=limit)
             redis_cli.rpush(reskey, msg)
             return rescode
         except Exception as e:
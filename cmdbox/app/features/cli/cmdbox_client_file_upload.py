@@ -82,6 +82,12 @@ class ClientFileUpload(feature.UnsupportEdgeFeature, validator.Validator, limite
                 dict(opt="meta", type=Options.T_DICT, default=None, required=False, multi=True, hide=False, choice=None,
                      description_ja="メタデータを指定します。",
                      description_en="Specify the metadata."),
+                dict(opt="chunk_size", type=Options.T_INT, default=4194304, required=False, multi=False, hide=True, choice=None,
+                     description_ja="ファイルを分割して転送する時の1回あたりのバイト数を指定します。0以下を指定すると分割せずに転送します。",
+                     description_en="Specifies the number of bytes per transfer when the file is split. If less than or equal to 0 is specified, the file is transferred without splitting."),
+                dict(opt="resume", type=Options.T_BOOL, default=False, required=False, multi=False, hide=True, choice=[True, False],
+                     description_ja="前回中断した転送の続きから再開します。",
+                     description_en="Resumes the previously interrupted transfer from where it left off."),
                 dict(opt="retry_count", type=Options.T_INT, default=3, required=False, multi=False, hide=True, choice=None,
                      description_ja="Redisサーバーへの再接続回数を指定します。0以下を指定すると永遠に再接続を行います。",
                      description_en="Specifies the number of reconnections to the Redis server.If less than 0 is specified, reconnection is forever."),
@@ -118,6 +124,7 @@ class ClientFileUpload(feature.UnsupportEdgeFeature, validator.Validator, limite
         rjpaths = [str(p).replace('"','') for p in args.rjpath] if args.rjpath is not None else []
         ret = cl.file_upload(str(args.svpath).replace('"',''), upload_file, scope=args.scope, client_data=client_data,
                              fwpaths=fwpaths, rjpaths=rjpaths, meta=args.meta, mkdir=args.mkdir, overwrite=args.overwrite,
+                             chunk_size=getattr(args, 'chunk_size', client.Client.CHUNK_SIZE), resume=getattr(args, 'resume', False),
                              retry_count=args.retry_count, retry_interval=args.retry_interval, timeout=args.timeout)
         common.print_format(ret, args.format, tm, args.output_json, args.output_json_append, pf=pf)
 
@@ -161,12 +168,23 @@ class ClientFileUpload(feature.UnsupportEdgeFeature, validator.Validator, limite
         payload = json.loads(convert.b64str2str(msg[2]))
         svpath = payload.get("svpath")
         file_name = payload.get("file_name")
-        file_data = convert.b64str2bytes(payload.get("file_data"))
+        chunked = payload.get("chunked", False)
+        # バイナリフレームで受信した場合はファイルデータがmsgの末尾にbytesで格納されている
+        if len(msg) > 3 and isinstance(msg[3], bytes):
+            file_data = msg[3]
+        elif chunked:
+            file_data = b''
+        else:
+            file_data = convert.b64str2bytes(payload.get("file_data"))
         mkdir = payload.get("mkdir")==True or payload.get("mkdir") == 'True'
         overwrite = payload.get("overwrite", False)=='True' or payload.get("overwrite", False) is True
         fwpaths = payload.get("fwpaths")
         rjpaths = payload.get("rjpaths")
         meta = payload.get("meta", None)
+        if chunked:
+            return self.file_upload_chunk(msg[1], svpath, file_name, file_data, int(payload.get("offset", 0)), int(payload.get("total_size", 0)),
+                                          payload.get("file_hash"), mkdir, overwrite, fwpaths, rjpaths, meta, data_dir, logger, redis_cli,
+                                          transfer_id=payload.get("transfer_id"))
         st = self.file_upload(msg[1], svpath, file_name, file_data, mkdir, overwrite,
                               fwpaths, rjpaths, meta, data_dir, logger, redis_cli, sessions)
         return st
@@ -212,3 +230,44 @@ class ClientFileUpload(feature.UnsupportEdgeFeature, validator.Validator, limite
             logger.warning(f"Failed to upload file: {e}", exc_info=True)
             redis_cli.rpush(reskey, dict(warn=f"Failed to upload file: {e}"))
             return self.RESP_WARN
+
+    def file_upload_chunk(self, reskey:str, current_path:str, file_name:str, chunk:bytes, offset:int, total_size:int, file_hash:str,
+                          mkdir:bool, overwrite:bool, fwpaths:List[str], rjpaths:List[str], meta:Dict[str, Any],
+                          data_dir:Path, logger:logging.Logger, redis_cli:redis_client.RedisClient, transfer_id:str=None) -> int:
+        """
+        ファイルを分割してアップロードする
+
+        Args:
+            reskey (str): レスポンスキー
+            current_path (str): ファイルパス
+            file_name (str): ファイル名
+            chunk (bytes): チャンクのデータ
+            offset (int): チャンクのファイル内の位置
+            total_size (int): ファイル全体のサイズ
+            file_hash (str): ファイル全体のハッシュ値
+            mkdir (bool): ディレクトリを作成するかどうか
+            overwrite (bool): 上書きするかどうか
+            fwpaths (List[str]): 範囲内パスのリスト
+            rjpaths (List[str]): 範囲外パスのリスト
+            meta (Dict[str, Any]): メタデータ
+            data_dir (Path): データディレクトリ
+            logger (logging.Logger): ロガー
+            redis_cli (redis_client.RedisClient): Redisクライアント
+            transfer_id (str, optional): 転送ID. Defaults to None.
+
+        Returns:
+            int: レスポンスコード
+        """
+        try:
+            f = filer.Filer(data_dir, logger)
+            rescode, msg = f.file_upload_chunk(current_path, file_name, chunk, offset, total_size, file_hash,
+                                               mkdir, overwrite, fwpaths, rjpaths, meta, transfer_id=transfer_id)
+            if offset < 0:
+                # 再開位置の問い合わせには、分割アップロードに対応していることを示す印を付ける
+                msg = dict(msg, chunked=True)
+            redis_cli.rpush(reskey, msg)
+            return rescode
+        except Exception as e:
+            logger.warning(f"Failed to upload file: {e}", exc_info=True)
+            redis_cli.rpush(reskey, dict(warn=f"Failed to upload file: {e}"))
+            return self.RESP_WARN
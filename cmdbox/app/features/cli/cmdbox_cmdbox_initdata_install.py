@@ -189,7 +189,7 @@ class CmdboxInitdataInstall(cmdbox_base.CmdboxBase, validator.Validator):
                 with lock:
                     if processing_size + file_size <= concurrent_max_bytes:
                         processing_size += file_size
-                        future = executor.submit(upload_task, svp, file_path, file_size)
+                        future = common.submit_with_context(executor, upload_task, svp, file_path, file_size)
                         futures[future] = (svp, file_path, file_size)
                         queue_index += 1
                     else:
@@ -210,7 +210,7 @@ class CmdboxInitdataInstall(cmdbox_base.CmdboxBase, validator.Validator):
                     with lock:
                         if processing_size + file_size <= concurrent_max_bytes:
                             processing_size += file_size
-                            future = executor.submit(upload_task, svp, file_path, file_size)
+                            future = common.submit_with_context(executor, upload_task, svp, file_path, file_size)
                             futures[future] = (svp, file_path, file_size)
                             queue_index += 1
                             break
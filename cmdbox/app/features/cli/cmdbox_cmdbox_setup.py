@@ -6,7 +6,6 @@ from pathlib import Path
 from typing import Dict, Any, Tuple, List, Union
 import argparse
 import logging
-import threading
 import pydantic
 import yaml
 
@@ -99,7 +98,7 @@ class CmdboxSetup(feature.OneshotEdgeFeature, validator.Validator):
         server_count = args.server_count
         sv_start_threads = []
         for i in range(server_count):
-            sv_thread = threading.Thread(target=self.server_start.apprun, args=(logger, args, tm, pf))
+            sv_thread = common.context_thread(self.server_start.apprun, args=(logger, args, tm, pf))
             sv_thread.start()
             sv_start_threads.append(sv_thread)
         
@@ -168,7 +167,7 @@ class CmdboxSetup(feature.OneshotEdgeFeature, validator.Validator):
             return self.RESP_ERROR, ret, None
         finally:
             # すべてのサーバーが停止するまで待つ
-            sv_stop = threading.Thread(target=self.server_stop.apprun, args=(logger, args, tm, pf))
+            sv_stop = common.context_thread(self.server_stop.apprun, args=(logger, args, tm, pf))
             sv_stop.start()
             sv_stop.join()
             # すべてのサーバー停止スレッドの完了を待つ
@@ -60,7 +60,6 @@ class DatasourceDataDelete(datasource_base.DatasourceBase, validator.Validator):
         )
 
     def _do_run(self, data_dir: Path, payload: Dict[str, Any], logger: logging.Logger) -> Dict[str, Any]:
-        conn = None
         try:
             schema = payload.get('schema') or None
             tblname = self.validate_identifier(payload['tblname'])
@@ -77,12 +76,6 @@ class DatasourceDataDelete(datasource_base.DatasourceBase, validator.Validator):
         except Exception as e:
             logger.warning(f"{self.get_mode()}_{self.get_cmd()}: {e}", exc_info=True)
             return dict(warn=f"{self.get_mode()}_{self.get_cmd()}: {e}")
-        finally:
-            if conn is not None:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
 
     @validator.apprun_check
     def apprun(self, logger: logging.Logger, args: argparse.Namespace, tm: float, pf: List[Dict[str, float]] = []) -> Tuple[int, Dict[str, Any], Any]:
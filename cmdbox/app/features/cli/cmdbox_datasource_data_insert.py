@@ -60,7 +60,6 @@ class DatasourceDataInsert(datasource_base.DatasourceBase, validator.Validator,
         )
 
     def _do_run(self, data_dir: Path, payload: Dict[str, Any], logger: logging.Logger) -> Dict[str, Any]:
-        conn = None
         try:
             schema = payload.get('schema') or None
             tblname = self.validate_identifier(payload['tblname'])
@@ -78,12 +77,6 @@ class DatasourceDataInsert(datasource_base.DatasourceBase, validator.Validator,
         except Exception as e:
             logger.warning(f"{self.get_mode()}_{self.get_cmd()}: {e}", exc_info=True)
             return dict(warn=f"{self.get_mode()}_{self.get_cmd()}: {e}")
-        finally:
-            if conn is not None:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
 
     @limiter.apprun_check_limit
     @validator.apprun_check
@@ -116,7 +109,6 @@ class DatasourceDataInsert(datasource_base.DatasourceBase, validator.Validator,
         return self.RESP_SUCCESS if 'success' in ret else self.RESP_WARN
 
     def svrun_registrations(self, data_dir, logger, payload, msg):
-        conn = None
         try:
             schema = payload.get('schema') or None
             tblname = self.validate_identifier(payload['tblname'])
@@ -131,9 +123,3 @@ class DatasourceDataInsert(datasource_base.DatasourceBase, validator.Validator,
         except Exception as e:
             logger.warning(f"{self.get_mode()}_{self.get_cmd()}: {e}", exc_info=True)
             return 0
-        finally:
-            if conn is not None:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
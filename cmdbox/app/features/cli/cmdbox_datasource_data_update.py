@@ -63,13 +63,12 @@ class DatasourceDataUpdate(datasource_base.DatasourceBase, validator.Validator,
         )
 
     def _do_run(self, data_dir: Path, payload: Dict[str, Any], logger: logging.Logger) -> Dict[str, Any]:
-        conn = None
         try:
             schema = payload.get('schema') or None
             tblname = self.validate_identifier(payload['tblname'])
             data: Dict[str, Any] = payload['update_data']
             where_data: Dict[str, Any] = payload['where_data'] if payload.get('where_data') else {}
-            with self.get_connection(payload) as (conn, dbtype):
+            with self.get_context(payload) as (conn, dbtype):
                 qualified_tbl = self.qualified_name(schema, tblname, dbtype)
                 placeholder = '%s' if dbtype == self.DBTYPE_PG else '?'
                 set_parts = [f"{self.validate_identifier(k)} = {placeholder}" for k in data]
@@ -85,12 +84,6 @@ class DatasourceDataUpdate(datasource_base.DatasourceBase, validator.Validator,
         except Exception as e:
             logger.warning(f"{self.get_mode()}_{self.get_cmd()}: {e}", exc_info=True)
             return dict(warn=f"{self.get_mode()}_{self.get_cmd()}: {e}")
-        finally:
-            if conn is not None:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
 
     @limiter.apprun_check_limit
     @validator.apprun_check
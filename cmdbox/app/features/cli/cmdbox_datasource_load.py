@@ -78,6 +78,9 @@ class DatasourceLoad(datasource_base.DatasourceBase, validator.Validator):
             db_password: Union[str, None] = pydantic.Field(default=None, description="データベースパスワード")
             db_name: Union[str, None] = pydantic.Field(default=None, description="データベース名")
             db_timeout: Union[int, None] = pydantic.Field(default=None, description="データベース接続のタイムアウト（秒）")
+            db_pool_min_size: Union[int, None] = pydantic.Field(default=None, description="接続プールの最小接続数")
+            db_pool_max_size: Union[int, None] = pydantic.Field(default=None, description="接続プールの最大接続数")
+            db_pool_max_idle: Union[float, None] = pydantic.Field(default=None, description="使用されていない接続を閉じるまでの秒数")
             db_path: Union[str, None] = pydantic.Field(default=None, description="SQLiteデータベースファイルパス")
         class Data(resdata.Data):
             data: Union[Configure, None] = pydantic.Field(default=None, description="処理結果のデータ")
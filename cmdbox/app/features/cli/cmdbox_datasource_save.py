@@ -50,7 +50,8 @@ class DatasourceSave(datasource_base.DatasourceBase, validator.Validator, limite
                 dict(opt="dbtype", type=Options.T_STR, default="sqlite", required=True, multi=False, hide=False,
                      choice=["postgresql", "sqlite"],
                      choice_show=dict(
-                         postgresql=["db_host", "db_port", "db_user", "db_password", "db_name", "db_timeout"],
+                         postgresql=["db_host", "db_port", "db_user", "db_password", "db_name", "db_timeout",
+                                     "db_pool_min_size", "db_pool_max_size", "db_pool_max_idle"],
                          sqlite=["db_path"],
                      ),
                      description_ja="データベースの種類を指定します。",
@@ -76,6 +77,15 @@ class DatasourceSave(datasource_base.DatasourceBase, validator.Validator, limite
                 dict(opt="db_timeout", type=Options.T_INT, default=120, required=False, multi=False, hide=False, choice=None,
                      description_ja="データベース接続のタイムアウトを指定します（PostgreSQL用）。",
                      description_en="Specify the database connection timeout (for PostgreSQL)."),
+                dict(opt="db_pool_min_size", type=Options.T_INT, default=1, required=False, multi=False, hide=True, choice=None,
+                     description_ja="接続プールの最小接続数を指定します（PostgreSQL用）。",
+                     description_en="Specify the minimum number of connections in the connection pool (for PostgreSQL)."),
+                dict(opt="db_pool_max_size", type=Options.T_INT, default=10, required=False, multi=False, hide=True, choice=None,
+                     description_ja="接続プールの最大接続数を指定します（PostgreSQL用）。",
+                     description_en="Specify the maximum number of connections in the connection pool (for PostgreSQL)."),
+                dict(opt="db_pool_max_idle", type=Options.T_FLOAT, default=300.0, required=False, multi=False, hide=True, choice=None,
+                     description_ja="使用されていない接続を閉じるまでの秒数を指定します（PostgreSQL用）。",
+                     description_en="Specify the number of seconds before an unused connection is closed (for PostgreSQL)."),
                 dict(opt="db_path", type=Options.T_FILE, default=None, required=False, multi=False, hide=False, choice=None, fileio="out",
                      description_ja="SQLiteのデータベースファイルのパスを指定します（SQLite用）。",
                      description_en="Specify the path to the SQLite database file (for SQLite)."),
@@ -104,6 +114,9 @@ class DatasourceSave(datasource_base.DatasourceBase, validator.Validator, limite
             db_password=args.db_password if hasattr(args, 'db_password') else None,
             db_name=args.db_name if hasattr(args, 'db_name') else None,
             db_timeout=args.db_timeout if hasattr(args, 'db_timeout') else None,
+            db_pool_min_size=args.db_pool_min_size if hasattr(args, 'db_pool_min_size') else None,
+            db_pool_max_size=args.db_pool_max_size if hasattr(args, 'db_pool_max_size') else None,
+            db_pool_max_idle=args.db_pool_max_idle if hasattr(args, 'db_pool_max_idle') else None,
             db_path=args.db_path if hasattr(args, 'db_path') else None,
             save_mode=args.save_mode if hasattr(args, 'save_mode') else None,
         )
@@ -151,6 +164,9 @@ class DatasourceSave(datasource_base.DatasourceBase, validator.Validator, limite
                 db_password=payload.get('db_password'),
                 db_name=payload.get('db_name'),
                 db_timeout=payload.get('db_timeout'),
+                db_pool_min_size=payload.get('db_pool_min_size'),
+                db_pool_max_size=payload.get('db_pool_max_size'),
+                db_pool_max_idle=payload.get('db_pool_max_idle'),
                 db_path=payload.get('db_path'),
             )
             result = dict(success=dict(data=f"Datasource configuration '{payload['dsname']}' saved successfully."))
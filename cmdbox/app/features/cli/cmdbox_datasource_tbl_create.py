@@ -69,7 +69,6 @@ class DatasourceTblCreate(datasource_base.DatasourceBase, validator.Validator):
         )
 
     def _do_run(self, data_dir: Path, payload: Dict[str, Any], logger: logging.Logger) -> Dict[str, Any]:
-        conn = None
         try:
             schema = payload.get('schema') or None
             tblname = self.validate_identifier(payload['tblname'])
@@ -79,7 +78,7 @@ class DatasourceTblCreate(datasource_base.DatasourceBase, validator.Validator):
                 raise ValueError("At least one column definition is required.")
             col_parts = [self._build_col_def(c) for c in col_defs]
             ine_clause = 'IF NOT EXISTS ' if if_not_exists else ''
-            with self.get_connection(payload) as (conn, dbtype):
+            with self.get_context(payload) as (conn, dbtype):
                 qualified_tbl = self.qualified_name(schema, tblname, dbtype)
                 sql = f"CREATE TABLE {ine_clause}{qualified_tbl} ({', '.join(col_parts)})"
                 with conn.cursor() as cur:
@@ -89,12 +88,6 @@ class DatasourceTblCreate(datasource_base.DatasourceBase, validator.Validator):
         except Exception as e:
             logger.warning(f"{self.get_mode()}_{self.get_cmd()}: {e}", exc_info=True)
             return dict(warn=f"{self.get_mode()}_{self.get_cmd()}: {e}")
-        finally:
-            if conn is not None:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
 
     @validator.apprun_check
     def apprun(self, logger: logging.Logger, args: argparse.Namespace, tm: float, pf: List[Dict[str, float]] = []) -> Tuple[int, Dict[str, Any], Any]:
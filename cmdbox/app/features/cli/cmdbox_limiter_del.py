@@ -1,5 +1,5 @@
 from cmdbox.app import common, client, feature
-from cmdbox.app.commons import convert, redis_client, resdata, validator
+from cmdbox.app.commons import convert, limiter, redis_client, resdata, validator
 from cmdbox.app.options import Options
 from pathlib import Path
 from typing import Dict, Any, Tuple, List, Union
@@ -75,6 +75,7 @@ class LimiterDel(feature.OneshotResultEdgeFeature, validator.Validator):
                 common.print_format(result, args.format, tm, args.output_json, args.output_json_append, pf=pf)
                 return self.RESP_WARN, result, None
             configure_path.unlink()
+            limiter.notify_client_config_changed(logger, args)
             out = dict(success=f"Limiter configuration '{args.limiter_name}' deleted from '{configure_path}'.")
             common.print_format(out, args.format, tm, args.output_json, args.output_json_append, pf=pf)
             return self.RESP_SUCCESS, out, None
@@ -118,6 +119,7 @@ class LimiterDel(feature.OneshotResultEdgeFeature, validator.Validator):
                 return self.RESP_WARN
 
             configure_path.unlink()
+            limiter.Limiter.notify_config_changed(redis_cli)
             result = dict(success=dict(data=f"Limiter configuration '{limiter_name}' deleted from '{configure_path}'.")) 
             redis_cli.rpush(reskey, result)
             return self.RESP_SUCCESS
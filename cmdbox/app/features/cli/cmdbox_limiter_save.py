@@ -1,5 +1,5 @@
 from cmdbox.app import common, client, feature
-from cmdbox.app.commons import convert, redis_client, resdata, validator
+from cmdbox.app.commons import convert, limiter, redis_client, resdata, validator
 from cmdbox.app.options import Options
 from cmdbox.app.features.cli import cmdbox_limiter_plan_load
 from pathlib import Path
@@ -207,6 +207,7 @@ class LimiterSave(feature.OneshotResultEdgeFeature, validator.Validator):
             if not chk:
                 return self.RESP_WARN, msg, None
             common.save_file(configure_path, lambda f: json.dump(configure, f, indent=4), encoding='utf-8', nolock=False)
+            limiter.notify_client_config_changed(logger, args)
             out = dict(success=f"Limiter configuration saved to '{str(configure_path)}'.")
             common.print_format(out, args.format, tm, args.output_json, args.output_json_append, pf=pf)
             return self.RESP_SUCCESS, out, None
@@ -316,6 +317,7 @@ class LimiterSave(feature.OneshotResultEdgeFeature, validator.Validator):
                         return self.RESP_WARN
 
             common.save_file(configure_path, lambda f: json.dump(configure, f, indent=4), encoding='utf-8', nolock=False)
+            limiter.Limiter.notify_config_changed(redis_cli)
             out = dict(success=f"Limiter configuration saved to '{str(configure_path)}'.")
             redis_cli.rpush(reskey, out)
             return self.RESP_SUCCESS
@@ -1,5 +1,5 @@
 from cmdbox.app import common, client, feature
-from cmdbox.app.commons import convert, limiter, redis_client, resdata, validator
+from cmdbox.app.commons import convert, embedcache, limiter, redis_client, resdata, validator
 from cmdbox.app.options import Options
 from pathlib import Path
 from typing import Dict, Any, Tuple, List, Union
@@ -141,6 +141,45 @@ class LLMEmbed(feature.OneshotResultEdgeFeature, validator.Validator, limiter.Li
         if isinstance(input_text, str):
             input_text = [input_text]
 
+        # キャッシュにないテキストのみをLLMに要求する
+        cache = embedcache.EmbedCache.get(data_dir / ".agent")
+        namespace = cache.namespace(llmname, configure)
+        keys = [cache.key(namespace, text) for text in input_text]
+        embeddings = cache.get_many(keys)
+        miss_index = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if len(miss_index) > 0:
+            # 同じ呼出し内で重複するテキストは1度だけ要求する
+            miss_first = dict()
+            for i in miss_index:
+                miss_first.setdefault(keys[i], i)
+            miss_keys = list(miss_first.keys())
+            miss_text = [input_text[i] for i in miss_first.values()]
+            miss_res = self._embed_llm(configure, miss_text)
+            miss_res = sorted(miss_res, key=lambda item: item['index'] if item.get('index') is not None else 0)
+            if len(miss_res) != len(miss_text):
+                msg = dict(warn=f"The number of embeddings ({len(miss_res)}) does not match the number of input texts ({len(miss_text)}).")
+                return self.RESP_WARN, msg
+            new_items = {k: item['embedding'] for k, item in zip(miss_keys, miss_res)}
+            cache.put_many(new_items)
+            embeddings = [embedding if embedding is not None else new_items[keys[i]] for i, embedding in enumerate(embeddings)]
+        res = [dict(index=i, embedding=embedding) for i, embedding in enumerate(embeddings)]
+        # 同じ呼出し内で重複したテキストはLLMに要求していないため、キャッシュヒットとして数える
+        miss_count = len(set(keys[i] for i in miss_index))
+        performance = [dict(key="embed_cache_hit", val=len(input_text) - miss_count),
+                       dict(key="embed_cache_miss", val=miss_count)]
+        return self.RESP_SUCCESS, dict(success=dict(data=res, performance=performance))
+
+    def _embed_llm(self, configure:Dict[str, Any], input_text:List[str]) -> List[Dict[str, Any]]:
+        """
+        LLMプロバイダーにテキストのエンベディングを要求します。
+
+        Args:
+            configure (Dict[str, Any]): LLM設定
+            input_text (List[str]): エンベディングするテキストのリスト
+
+        Returns:
+            List[Dict[str, Any]]: indexとembeddingの辞書のリスト
+        """
         import litellm
         llmprov = configure.get('llmprov', None)
         if llmprov == 'openai':
@@ -207,10 +246,16 @@ class LLMEmbed(feature.OneshotResultEdgeFeature, validator.Validator, limiter.Li
             res = [dict(index=item.get("index"), embedding=item.get("embedding")) for item in response.get("data", [])]
         else:
             raise ValueError(f"Unsupported LLM provider: {llmprov}")
-        return self.RESP_SUCCESS, dict(success=dict(data=res))
+        return res
 
     def svrun_credit(self, data_dir, logger, opt, msg):
-        data = msg.get('success', {}).get('data', [])
-        if not data:
+        if not isinstance(msg, dict):
+            return 0
+        success = msg.get('success', {})
+        if not success.get('data', []):
             return 0
-        return len(data)
+        # キャッシュから返したエンベディングはLLMを呼び出していないため、LLMに要求した件数だけを消費クレジットとする
+        for perf in success.get('performance', []):
+            if isinstance(perf, dict) and perf.get('key') == 'embed_cache_miss':
+                return int(perf.get('val') or 0)
+        return len(success['data'])
@@ -109,7 +109,7 @@ class RagBuild(rag_base.RAGBase, validator.Validator):
             store = rag_store.RagStore.create(ds_conf, logger,
                                               appcls=self.appcls, ver=self.ver, language=self.language)
             store.install()
-            store.create_tables(rag_name, embed_vector_dim=embed_vector_dim)
+            store.create_tables(rag_name, embed_vector_dim=embed_vector_dim, **self.vec_index_params(rag_conf))
 
             msg = dict(success="RAG build completed successfully.")
             redis_cli.rpush(reskey, msg)
@@ -93,6 +93,11 @@ class RagLoad(feature.OneshotResultEdgeFeature, validator.Validator):
             extract: Union[List[str], None] = pydantic.Field(default=None, description="エクストラクト設定リスト")
             llm_name: Union[str, None] = pydantic.Field(default=None, description="LLM名")
             embed_vector_dim: Union[int, None] = pydantic.Field(default=None, description="エンベッディングベクトル次元数")
+            vec_metric: Union[str, None] = pydantic.Field(default=None, description="ベクトル検索の距離尺度")
+            vec_index: Union[str, None] = pydantic.Field(default=None, description="ベクトルのインデックスの種類")
+            vec_index_m: Union[int, None] = pydantic.Field(default=None, description="HNSWインデックスの各ノードの最大接続数")
+            vec_index_ef_construction: Union[int, None] = pydantic.Field(default=None, description="HNSWインデックス作成時の候補リストのサイズ")
+            vec_index_lists: Union[int, None] = pydantic.Field(default=None, description="IVFFlatインデックスのリスト数")
         class Result(resdata.Result):
             success: Union[Data, None] = pydantic.Field(default=None, description="成功した場合の結果")
         return Result
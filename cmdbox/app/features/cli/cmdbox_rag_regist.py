@@ -1,7 +1,9 @@
 from cmdbox.app import common, client
 from cmdbox.app.commons import limiter, resdata, validator
-from cmdbox.app.features.cli.rag import rag_base, rag_store
+from cmdbox.app.features.cli.rag import rag_base, rag_manifest, rag_store
 from cmdbox.app.options import Options
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 from typing import Dict, Any, Tuple, List, Union
 import argparse
@@ -11,6 +13,9 @@ import re
 
 
 class RagRegist(rag_base.RAGBase, validator.Validator, limiter.LimitedFeature):
+    # Extract設定のハッシュに含めない実行時のオプション
+    RUNTIME_OPTS = ['loadpath', 'data', 'signin_file', 'groups', 'host', 'port', 'password', 'svname', 'client_data',
+                    'format', 'output_json', 'output_json_append', 'svpath', 'listregs']
 
     def get_mode(self) -> Union[str, List[str]]:
         """
@@ -66,6 +71,18 @@ class RagRegist(rag_base.RAGBase, validator.Validator, limiter.LimitedFeature):
                 dict(opt="rag_name", type=Options.T_STR, default=None, required=True, multi=False, hide=False, choice=None,
                      description_ja="登録に使用するRAG設定の名前を指定します。",
                      description_en="Specify the name of the RAG configuration to use for registration."),
+                dict(opt="extract_workers", type=Options.T_INT, default=4, required=False, multi=False, hide=False, choice=None,
+                     description_ja="並列に実行するExtractコマンドの数を指定します。",
+                     description_en="Specify the number of extract commands to run in parallel."),
+                dict(opt="embed_concurrency", type=Options.T_INT, default=4, required=False, multi=False, hide=False, choice=None,
+                     description_ja="同時に実行するEmbeddingの要求数の上限を指定します。",
+                     description_en="Specify the maximum number of embedding requests in flight at the same time."),
+                dict(opt="doc_bcount", type=Options.T_INT, default=50, required=False, multi=False, hide=False, choice=None,
+                     description_ja="1回のEmbeddingの要求及びRAGストアへの一括登録で扱うドキュメント数を指定します。",
+                     description_en="Specify the number of documents per embedding request and per bulk insert into the RAG store."),
+                dict(opt="incremental", type=Options.T_BOOL, default=False, required=False, multi=False, hide=False, choice=[True, False],
+                     description_ja="前回の登録から変更されたファイルのみを登録し、削除されたファイルのドキュメントを削除します。RAG設定の `savetype` が `per_doc` の場合のみ有効です。",
+                     description_en="Register only files changed since the last registration and delete documents of removed files. Effective only when the RAG configuration `savetype` is `per_doc`."),
                 dict(opt="data", type=Options.T_DIR, default=self.default_data, required=True, multi=False, hide=False, choice=None, web="mask",
                      description_ja=f"省略した時は `$HONE/.{self.ver.__appid__}` を使用します。",
                      description_en=f"When omitted, `$HONE/.{self.ver.__appid__}` is used."),
@@ -121,12 +138,19 @@ class RagRegist(rag_base.RAGBase, validator.Validator, limiter.LimitedFeature):
             store = rag_store.RagStore.create(ds_config, logger,
                                               appcls=self.appcls, ver=self.ver, language=self.language)
 
+            # 登録済みファイルの指紋
+            manifest = rag_manifest.RagManifest(Path(str(args.data).replace('"','')))
+            incremental = bool(getattr(args, 'incremental', False)) and args.savetype == 'per_doc'
+            skip_count = 0
+
             # Extract結果のRAGストアへの登録
             with store.connect() as conn:
                 conn.autocommit = False
                 if args.savetype == 'per_service':
                     self.put_resqueue(args, dict(process=dict(message=f"Deleting existing RAG documents...servicename={args.rag_name}")))
                     store.delete_doc(connection=conn, servicename=args.rag_name,)
+                    manifest.remove(args.rag_name)
+                candidates = []
                 for extract_name in extract_names:
                     # Extract設定の取得
                     self.put_resqueue(args, dict(process=dict(message=f"Loading extract configuration...extract_name={extract_name}")))
@@ -166,76 +190,55 @@ class RagRegist(rag_base.RAGBase, validator.Validator, limiter.LimitedFeature):
                         self.put_resqueue(args, msg)
                         return st, file_list, cl
 
-                    # ファイル一覧に対してExtractコマンドの実行とRAGストアへの登録を実施
+                    # ファイル一覧からExtractコマンドの実行対象を作成
+                    extract_hash = manifest.hash_obj(dict(llm_name=rag_config.get('llm_name'),
+                                                          extract={k:v for k, v in marge_opt.items() if k not in self.RUNTIME_OPTS}))
+                    listed_paths = set()
                     for k, v in file_list.items():
                         if not isinstance(v, dict) or v.get('children', None) is None:
                             continue
-                        children_count = len(v['children'])
-                        children_index = 0
                         for kc, kv in v['children'].items():
-                            children_index += 1
                             if not isinstance(kv, dict) or kv.get('path', None) is None or kv.get('is_dir', None) is None:
                                 continue
                             if kv['is_dir']:
                                 continue
                             if not kv['path'].startswith(marge_opt['loadpath']):
                                 continue
-                            marge_opt['loadpath'] = kv['path']
-                            marge_args = argparse.Namespace(**marge_opt)
-                            # Extractコマンドの実行の実行
-                            self.put_resqueue(args, dict(process=dict(message=f"({children_index}/{children_count}) Executing extract command...file={kv['path']}",
-                                                                      count=children_count, index=children_index, filename=Path(kv['path']).name)))
-                            st, extract_res, _ = self.exec_extract_cmd(extract_feat, marge_args, options, args, tm, pf, logger)
-                            if st != self.RESP_SUCCESS:
-                                msg = dict(warn=f"Failed to execute extract command for file '{kv['path']}'. Skipping registration for this file.", res=extract_res)
-                                common.print_format(msg, args.format, tm, args.output_json, args.output_json_append, pf=pf)
-                                self.put_resqueue(args, msg)
-                                continue
-                            # save_typeの処理
-                            if args.savetype == 'per_doc':
-                                self.put_resqueue(args, dict(process=dict(message=f"Deleting existing documents for file '{marge_opt['loadpath']}'",
-                                                                          filename=Path(marge_opt['loadpath']).name)))
-                                store.delete_doc(connection=conn, servicename=args.rag_name, origin_name=marge_opt['loadpath'],)
+                            listed_paths.add(kv['path'])
+                            fingerprint = dict(extract_name=extract_name, path=kv['path'], size=kv.get('size'), mtime_ns=kv.get('mtime_ns'),
+                                               extract_hash=extract_hash)
+                            job_opt = marge_opt.copy()
+                            job_opt['loadpath'] = kv['path']
+                            unchanged = incremental and manifest.unchanged(args.rag_name, fingerprint)
+                            candidates.append((unchanged, (extract_name, extract_feat, argparse.Namespace(**job_opt), fingerprint)))
+
+                    # 削除されたファイルのドキュメントを削除
+                    if incremental:
+                        removed_paths = sorted(manifest.paths(args.rag_name, extract_name) - listed_paths)
+                        for removed_path in removed_paths:
+                            self.put_resqueue(args, dict(process=dict(message=f"Deleting documents of removed file '{removed_path}'",
+                                                                      filename=Path(removed_path).name)))
+                            store.delete_doc(connection=conn, servicename=args.rag_name, origin_name=removed_path,)
+                        conn.commit()
+                        manifest.remove(args.rag_name, removed_paths, extract_name=extract_name)
 
-                            # チャンク毎に登録実施
-                            doc_count = len(extract_res)
-                            doc_index = 0
-                            doc_bcount = 50
-                            for i in range(0, len(extract_res), doc_bcount):
-                                docs = extract_res[i:i+doc_bcount]
-                                doc_index += len(docs)
-                                if len([doc for doc in docs if 'content' not in doc]) > 0:
-                                    msg = dict(warn=f"Extracted document does not contain 'content' field.")
-                                    common.print_format(msg, args.format, tm, args.output_json, args.output_json_append, pf=pf)
-                                    continue
-                                if len([doc for doc in docs if 'metadata' not in doc]) > 0:
-                                    msg = dict(warn=f"Extracted document does not contain 'metadata' field.")
-                                    common.print_format(msg, args.format, tm, args.output_json, args.output_json_append, pf=pf)
-                                    self.put_resqueue(args, msg)
-                                    continue
+                # ドキュメントはパス単位で削除するため、同じパスを複数のExtractで登録する場合は
+                # いずれかが変更されていれば全てのExtractを実行し直す
+                changed_paths = set(job[2].loadpath for unchanged, job in candidates if not unchanged)
+                jobs = []
+                for unchanged, job in candidates:
+                    if unchanged and job[2].loadpath not in changed_paths:
+                        skip_count += 1
+                        continue
+                    jobs.append(job)
 
-                                # Embeddingの実行
-                                self.put_resqueue(args, dict(process=dict(message=f"({doc_index}/{doc_count}) Executing embedding for extracted document...file={marge_opt['loadpath']}",
-                                                                          count=doc_count, index=doc_index, filename=Path(marge_opt['loadpath']).name)))
-                                st, embed_res, _ = self.embedding(rag_config, [doc['content'] for doc in docs], args, cl, tm, pf, logger)
-                                if st != self.RESP_SUCCESS:
-                                    msg = dict(warn=f"Failed to execute embedding for extracted document from file '{kv['path']}'.", res=embed_res)
-                                    common.print_format(msg, args.format, tm, args.output_json, args.output_json_append, pf=pf)
-                                    self.put_resqueue(args, msg)
-                                    return st, embed_res, cl
-                                # RAGストアへの登録
-                                self.put_resqueue(args, dict(process=dict(message=f"({doc_index}/{doc_count}) Registering extracted document to RAG store...file={marge_opt['loadpath']}",
-                                                                          count=doc_count, index=doc_index, filename=Path(marge_opt['loadpath']).name)))
-                                for embed_i, embed_data in enumerate(embed_res.get('data', [])):
-                                    vev_list = embed_data['embedding']
-                                    store.insert_doc(connection=conn,
-                                                    servicename=args.rag_name,
-                                                    content_text=docs[embed_i]['content'],
-                                                    origin_name=marge_opt['loadpath'],
-                                                    metadata=docs[embed_i]['metadata'],
-                                                    vec_model=rag_config.get('llm_name'),
-                                                    vec_data=vev_list)
-                                conn.commit()
+                # Extract、Embedding、RAGストアへの登録を並行して実施
+                if skip_count > 0:
+                    self.put_resqueue(args, dict(process=dict(message=f"Skipped {skip_count} unchanged files.")))
+                st, res = self.regist_pipeline(store, conn, jobs, rag_config, options, args, cl, tm, pf, logger,
+                                               manifest=manifest if args.savetype == 'per_doc' else None, incremental=incremental)
+                if st != self.RESP_SUCCESS:
+                    return st, res, cl
 
             ret = dict(success="RAG registration completed successfully.")
             common.print_format(ret, args.format, tm, args.output_json, args.output_json_append, pf=pf)
@@ -250,6 +253,166 @@ class RagRegist(rag_base.RAGBase, validator.Validator, limiter.LimitedFeature):
             common.print_format(msg, args.format, tm, args.output_json, args.output_json_append, pf=pf)
             return self.RESP_WARN, msg, cl
 
+    def regist_pipeline(self, store:rag_store.RagStore, conn:Any, jobs:List[Tuple[str, Any, argparse.Namespace, Dict[str, Any]]], rag_config:Dict[str, Any],
+                        options:Options, args:argparse.Namespace, cl:client.Client, tm:float, pf, logger:logging.Logger,
+                        manifest:rag_manifest.RagManifest=None, incremental:bool=False) -> Tuple[int, Dict[str, Any]]:
+        """
+        Extractコマンドの実行、Embedding、RAGストアへの登録を並行して実施します。
+        Extractコマンドは `extract_workers` 個のスレッドでファイルごとに並列に実行し、
+        抽出したドキュメントは `doc_bcount` 件ずつ最大 `embed_concurrency` 件の要求を同時にEmbeddingします。
+        RAGストアへの削除と登録はこのスレッドで行い、Embeddingが完了したバッチごとに一括で登録してコミットします。
+        manifestを指定した場合は全てのドキュメントを登録したファイルの指紋を保存し、
+        incrementalがTrueの場合は抽出したドキュメントが前回の登録時と同じファイルの登録を省略します。
+        登録の進捗はExtract設定名とファイルの組ごとに管理します。
+        `per_doc` の場合の既存ドキュメントの削除はファイルごとに最初の抽出結果を受け取った時に1度だけ行うため、
+        同じファイルを複数のExtractで登録しても、削除は常にそのファイルの登録より前に行われます。
+
+        Args:
+            store (rag_store.RagStore): RAGストア
+            conn (Any): データベース接続オブジェクト
+            jobs (List[Tuple[str, Any, argparse.Namespace, Dict[str, Any]]]): Extract設定名、Extractコマンドの機能、引数、ファイルの指紋のリスト
+            rag_config (Dict[str, Any]): RAG設定
+            options (Options): オプション
+            args (argparse.Namespace): 引数
+            cl (client.Client): クライアント
+            tm (float): 実行開始時間
+            pf: パフォーマンス情報
+            logger (logging.Logger): ロガー
+            manifest (rag_manifest.RagManifest, optional): 登録済みファイルの指紋. Defaults to None.
+            incremental (bool, optional): 変更されていないファイルの登録を省略する場合はTrue. Defaults to False.
+        Returns:
+            Tuple[int, Dict[str, Any]]: 終了コード, 結果
+        """
+        extract_workers = max(1, int(getattr(args, 'extract_workers', None) or 4))
+        embed_concurrency = max(1, int(getattr(args, 'embed_concurrency', None) or 4))
+        doc_bcount = max(1, int(getattr(args, 'doc_bcount', None) or 50))
+        job_count = len(jobs)
+        pending_jobs = deque(enumerate(jobs, start=1))
+        pending_batches = deque()
+        extracting:Dict[Future, Tuple[int, str, argparse.Namespace, Dict[str, Any]]] = dict()
+        embedding:Dict[Future, Tuple[Tuple[str, str], List[Dict[str, Any]], int, int]] = dict()
+        # (Extract設定名, ファイル) ごとの登録済みドキュメント数
+        file_counts:Dict[Tuple[str, str], List[int]] = dict()
+        # (Extract設定名, ファイル) ごとの登録が完了していないバッチの数と、完了時に保存する指紋
+        file_batches:Dict[Tuple[str, str], List[Any]] = dict()
+        # ファイルごとのExtractの数と、既存ドキュメントを削除済みのファイル
+        path_jobs = Counter(extract_args.loadpath for _, _, extract_args, _ in jobs)
+        deleted_paths = set()
+
+        def _submit(executor:ThreadPoolExecutor, func, *func_args) -> Future:
+            # サインイン情報などのコンテキスト変数をワーカースレッドに引き継ぐ
+            return common.submit_with_context(executor, func, *func_args)
+
+        extract_pool = ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix=f"rag_extract_{args.rag_name}")
+        embed_pool = ThreadPoolExecutor(max_workers=embed_concurrency, thread_name_prefix=f"rag_embed_{args.rag_name}")
+        try:
+            while pending_jobs or pending_batches or extracting or embedding:
+                if self.is_cancelled(args):
+                    msg = dict(warn=f"RAG registration was cancelled because the client disconnected. servicename={args.rag_name}")
+                    logger.warning(msg['warn'])
+                    return self.RESP_WARN, msg
+                # Embedding待ちのバッチが溜まっている間はExtractを投入しない
+                while pending_jobs and len(extracting) < extract_workers and len(pending_batches) < embed_concurrency * 2:
+                    job_index, (extract_name, extract_feat, extract_args, fingerprint) = pending_jobs.popleft()
+                    self.put_resqueue(args, dict(process=dict(message=f"({job_index}/{job_count}) Executing extract command...file={extract_args.loadpath}",
+                                                              count=job_count, index=job_index, filename=Path(extract_args.loadpath).name)))
+                    future = _submit(extract_pool, self.exec_extract_cmd, extract_feat, extract_args, options, args, tm, pf, logger)
+                    extracting[future] = (job_index, extract_name, extract_args, fingerprint)
+                while pending_batches and len(embedding) < embed_concurrency:
+                    file_key, docs, doc_index, doc_count = pending_batches.popleft()
+                    loadpath = file_key[1]
+                    self.put_resqueue(args, dict(process=dict(message=f"({doc_index}/{doc_count}) Executing embedding for extracted document...file={loadpath}",
+                                                              count=doc_count, index=doc_index, filename=Path(loadpath).name)))
+                    future = _submit(embed_pool, self.embedding, rag_config, [doc['content'] for doc in docs], args, cl, tm, pf, logger)
+                    embedding[future] = (file_key, docs, doc_index, doc_count)
+                if not extracting and not embedding:
+                    continue
+                done, _ = wait(list(extracting.keys()) + list(embedding.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in extracting:
+                        job_index, extract_name, extract_args, fingerprint = extracting.pop(future)
+                        loadpath = extract_args.loadpath
+                        file_key = (extract_name, loadpath)
+                        st, extract_res, _ = future.result()
+                        if st != self.RESP_SUCCESS:
+                            msg = dict(warn=f"Failed to execute extract command for file '{loadpath}'. Skipping registration for this file.", res=extract_res)
+                            common.print_format(msg, args.format, tm, args.output_json, args.output_json_append, pf=pf)
+                            self.put_resqueue(args, msg)
+                            continue
+                        # 抽出したドキュメントが前回の登録時と同じ場合は登録を省略
+                        # 複数のExtractで登録するファイルは他のExtractの削除で消えるため省略しない
+                        if manifest is not None and fingerprint is not None:
+                            fingerprint = dict(fingerprint, content_hash=manifest.hash_obj(extract_res))
+                            stored = manifest.get(args.rag_name, extract_name, loadpath) if incremental and path_jobs[loadpath] <= 1 else None
+                            if stored is not None and stored['content_hash'] == fingerprint['content_hash'] \
+                                and stored['extract_hash'] == fingerprint['extract_hash']:
+                                self.put_resqueue(args, dict(process=dict(message=f"Skipping unchanged documents for file '{loadpath}'",
+                                                                          filename=Path(loadpath).name)))
+                                manifest.put(args.rag_name, fingerprint)
+                                continue
+                        # save_typeの処理
+                        if args.savetype == 'per_doc' and loadpath not in deleted_paths:
+                            deleted_paths.add(loadpath)
+                            self.put_resqueue(args, dict(process=dict(message=f"Deleting existing documents for file '{loadpath}'",
+                                                                      filename=Path(loadpath).name)))
+                            store.delete_doc(connection=conn, servicename=args.rag_name, origin_name=loadpath,)
+                            conn.commit()
+                        # チャンク毎にEmbedding待ちのバッチを作成
+                        doc_count = len(extract_res)
+                        doc_index = 0
+                        for i in range(0, doc_count, doc_bcount):
+                            docs = extract_res[i:i+doc_bcount]
+                            doc_index += len(docs)
+                            if len([doc for doc in docs if 'content' not in doc]) > 0:
+                                msg = dict(warn=f"Extracted document does not contain 'content' field.")
+                                common.print_format(msg, args.format, tm, args.output_json, args.output_json_append, pf=pf)
+                                continue
+                            if len([doc for doc in docs if 'metadata' not in doc]) > 0:
+                                msg = dict(warn=f"Extracted document does not contain 'metadata' field.")
+                                common.print_format(msg, args.format, tm, args.output_json, args.output_json_append, pf=pf)
+                                self.put_resqueue(args, msg)
+                                continue
+                            pending_batches.append((file_key, docs, doc_index, doc_count))
+                            file_batches.setdefault(file_key, [0, None])[0] += 1
+                        # 全てのバッチの登録後に指紋を保存する
+                        if manifest is not None and fingerprint is not None:
+                            if file_key in file_batches:
+                                file_batches[file_key][1] = fingerprint
+                            else:
+                                manifest.put(args.rag_name, fingerprint)
+                    else:
+                        file_key, docs, doc_index, doc_count = embedding.pop(future)
+                        loadpath = file_key[1]
+                        st, embed_res, _ = future.result()
+                        if st != self.RESP_SUCCESS:
+                            msg = dict(warn=f"Failed to execute embedding for extracted document from file '{loadpath}'.", res=embed_res)
+                            common.print_format(msg, args.format, tm, args.output_json, args.output_json_append, pf=pf)
+                            self.put_resqueue(args, msg)
+                            return st, embed_res
+                        # RAGストアへの登録
+                        counts = file_counts.setdefault(file_key, [0, doc_count])
+                        counts[0] += len(docs)
+                        self.put_resqueue(args, dict(process=dict(message=f"({counts[0]}/{doc_count}) Registering extracted document to RAG store...file={loadpath}",
+                                                                  count=doc_count, index=counts[0], filename=Path(loadpath).name)))
+                        store.insert_docs(connection=conn, servicename=args.rag_name,
+                                          docs=[dict(content_text=docs[embed_i]['content'],
+                                                     origin_name=loadpath,
+                                                     metadata=docs[embed_i]['metadata'],
+                                                     vec_model=rag_config.get('llm_name'),
+                                                     vec_data=embed_data['embedding'])
+                                                for embed_i, embed_data in enumerate(embed_res.get('data', []))])
+                        conn.commit()
+                        batches = file_batches[file_key]
+                        batches[0] -= 1
+                        if batches[0] <= 0:
+                            del file_batches[file_key]
+                            if manifest is not None and batches[1] is not None:
+                                manifest.put(args.rag_name, batches[1])
+            return self.RESP_SUCCESS, None
+        finally:
+            extract_pool.shutdown(wait=True, cancel_futures=True)
+            embed_pool.shutdown(wait=True, cancel_futures=True)
+
     def output_schema(self) -> type:
         class Data(resdata.Data):
             data: Union[str, None] = pydantic.Field(default=None, description="処理結果のデータ")
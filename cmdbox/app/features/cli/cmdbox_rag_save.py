@@ -98,6 +98,21 @@ class RagSave(feature.OneshotResultEdgeFeature, validator.Validator, limiter.Lim
                 dict(opt="embed_vector_dim", type=Options.T_INT, default=256, required=False, multi=False, hide=False, choice=None,
                      description_ja="Embed時のベクトル次元数を指定します。",
                      description_en="Specify the vector dimension for embedding."),
+                dict(opt="vec_metric", type=Options.T_STR, default=None, required=False, multi=False, hide=False, choice=["", "cosine", "l2", "ip"],
+                     description_ja="ベクトル検索の距離尺度を指定します。 `cosine` :コサイン距離、 `l2` :ユークリッド距離、 `ip` :内積。省略した場合はデータソースの既定値（PostgreSQLは `cosine` 、SQLiteは `l2` ）を使用します。",
+                     description_en="Specify the distance metric for vector search. `cosine` :cosine distance, `l2` :Euclidean distance, `ip` :inner product. If omitted, the data source default is used ( `cosine` for PostgreSQL, `l2` for SQLite)."),
+                dict(opt="vec_index", type=Options.T_STR, default="ivfflat", required=False, multi=False, hide=False, choice=["ivfflat", "hnsw"],
+                     description_ja="ベクトルのインデックスの種類を指定します。SQLiteのデータソースでは常にIVFインデックスを使用します。",
+                     description_en="Specify the type of vector index. For SQLite data sources, an IVF index is always used."),
+                dict(opt="vec_index_m", type=Options.T_INT, default=16, required=False, multi=False, hide=False, choice=None,
+                     description_ja="HNSWインデックスの各ノードの最大接続数を指定します。",
+                     description_en="Specify the maximum number of connections per node in the HNSW index."),
+                dict(opt="vec_index_ef_construction", type=Options.T_INT, default=64, required=False, multi=False, hide=False, choice=None,
+                     description_ja="HNSWインデックス作成時の候補リストのサイズを指定します。",
+                     description_en="Specify the size of the candidate list when building the HNSW index."),
+                dict(opt="vec_index_lists", type=Options.T_INT, default=None, required=False, multi=False, hide=False, choice=None,
+                     description_ja="IVFFlatインデックスのリスト数を指定します。省略した場合、PostgreSQLでは100、SQLiteではドキュメント数の平方根を使用します。",
+                     description_en="Specify the number of lists in the IVFFlat index. If omitted, 100 is used for PostgreSQL and the square root of the number of documents for SQLite."),
                 dict(opt="savetype", type=Options.T_STR, default="per_doc", required=False, multi=False, hide=False, choice=["per_doc", "per_service", "add_only"],
                     description_ja="保存パターンを指定します。 `per_doc` :ドキュメント単位、 `per_service` :サービス単位、 `add_only` :追加のみ",
                     description_en="Specify the storage pattern. `per_doc` :per document, `per_service` :per service, `add_only` :add only",),
@@ -115,6 +130,11 @@ class RagSave(feature.OneshotResultEdgeFeature, validator.Validator, limiter.Lim
             extract=list(set(args.extract)) if hasattr(args, 'extract') and args.extract is not None else None,
             llm_name=args.llm_name if hasattr(args, 'llm_name') else None,
             embed_vector_dim=args.embed_vector_dim if hasattr(args, 'embed_vector_dim') else None,
+            vec_metric=args.vec_metric if hasattr(args, 'vec_metric') else None,
+            vec_index=args.vec_index if hasattr(args, 'vec_index') else None,
+            vec_index_m=args.vec_index_m if hasattr(args, 'vec_index_m') else None,
+            vec_index_ef_construction=args.vec_index_ef_construction if hasattr(args, 'vec_index_ef_construction') else None,
+            vec_index_lists=args.vec_index_lists if hasattr(args, 'vec_index_lists') else None,
             save_mode=args.save_mode if hasattr(args, 'save_mode') else None,
         )
 
@@ -91,6 +91,12 @@ class RagSearch(rag_base.RAGBase, validator.Validator):
                 dict(opt="sort_dict", type=Options.T_DICT, default=None, required=False, multi=True, hide=False, choice=['', 'ASC', 'DESC'],
                      description_ja="queryを指定しないときのソート条件を指定します。cmetaの項目名とソート順（ `ASC` (昇順) 又は `DESC` (降順)）を複数指定できます。",
                      description_en="Specifies the sort conditions when no query is specified. Multiple cmeta field names and sort orders (`ASC` (ascending) or `DESC` (descending)) can be specified."),
+                dict(opt="ef_search", type=Options.T_INT, default=None, required=False, multi=False, hide=True, choice=None,
+                     description_ja="HNSWインデックスで検索する際の候補リストのサイズを指定します。大きくすると精度が上がり、検索が遅くなります。",
+                     description_en="Specify the size of the candidate list when searching the HNSW index. Larger values improve recall but slow down the search."),
+                dict(opt="probes", type=Options.T_INT, default=None, required=False, multi=False, hide=True, choice=None,
+                     description_ja="IVFインデックスで検索するリストの数を指定します。大きくすると精度が上がり、検索が遅くなります。",
+                     description_en="Specify the number of lists to search in the IVF index. Larger values improve recall but slow down the search."),
                 dict(opt="data", type=Options.T_DIR, default=self.default_data, required=True, multi=False, hide=False, choice=None, web="mask",
                      description_ja=f"省略した時は `$HONE/.{self.ver.__appid__}` を使用します。",
                      description_en=f"When omitted, `$HONE/.{self.ver.__appid__}` is used."),
@@ -154,7 +160,10 @@ class RagSearch(rag_base.RAGBase, validator.Validator):
                 # 検索
                 recodes = store.select_doc(connection=conn, select=args.select,
                                            servicename=args.rag_name, origin_name=args.filter_origin_name,
-                                           vec_data=vec_data, kcount=args.kcount, metadata=filter_dict)
+                                           vec_data=vec_data, kcount=args.kcount, metadata=filter_dict,
+                                           vec_metric=rag_config.get('vec_metric'),
+                                           ef_search=args.ef_search if hasattr(args, 'ef_search') else None,
+                                           probes=args.probes if hasattr(args, 'probes') else None)
                 res = [record for record in recodes]
                 ret = dict(success=res)
                 common.print_format(ret, args.format, tm, args.output_json, args.output_json_append, pf=pf)
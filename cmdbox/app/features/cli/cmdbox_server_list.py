@@ -84,6 +84,10 @@ class ServerList(feature.OneshotResultEdgeFeature, validator.Validator):
             success_cnt: Union[int, None] = pydantic.Field(default=None, description="成功件数")
             warn_cnt: Union[int, None] = pydantic.Field(default=None, description="警告件数")
             error_cnt: Union[int, None] = pydantic.Field(default=None, description="エラー件数")
+            queue_depth: Union[int, None] = pydantic.Field(default=None, description="待ち行列の長さ")
+            pool_active: Union[int, None] = pydantic.Field(default=None, description="実行中のワーカー数")
+            pool_max: Union[int, None] = pydantic.Field(default=None, description="ワーカーの最大数")
+            db_pools: Union[List[Dict[str, Any]], None] = pydantic.Field(default=None, description="データベース接続プールの統計情報")
         class Data(resdata.Data):
             data: Union[List[ServerRecord], None] = pydantic.Field(default=None, description="処理結果のデータ")
         class Result(resdata.Result):
@@ -60,6 +60,12 @@ class ServerStart(feature.UnsupportEdgeFeature, validator.Validator):
                 dict(opt="retry_interval", type=Options.T_INT, default=5, required=False, multi=False, hide=True, choice=None,
                      description_ja="Redisサーバーに再接続までの秒数を指定します。",
                      description_en="Specifies the number of seconds before reconnecting to the Redis server."),
+                dict(opt="max_workers", type=Options.T_INT, default=100, required=False, multi=False, hide=True, choice=None,
+                     description_ja="コマンドを同時に実行するワーカーの最大数を指定します。ワーカーが埋まっている間、受信メッセージはRedisに残されます。",
+                     description_en="Specifies the maximum number of workers that execute commands concurrently. While all workers are busy, incoming messages are left in Redis."),
+                dict(opt="max_svcmd_workers", type=Options.T_INT, default=0, required=False, multi=False, hide=True, choice=None,
+                     description_ja="同じコマンドを同時に実行するワーカーの最大数を指定します。0以下を指定すると制限しません。",
+                     description_en="Specifies the maximum number of workers that execute the same command concurrently. If less than or equal to 0 is specified, there is no limit."),
             ]
         )
 
@@ -77,7 +83,8 @@ class ServerStart(feature.UnsupportEdgeFeature, validator.Validator):
         Returns:
             Tuple[int, Dict[str, Any], Any]: 終了コード, 結果, オブジェクト
         """
-        sv = server.Server(Path(args.data), logger, redis_host=args.host, redis_port=args.port, redis_password=args.password, svname=args.svname)
+        sv = server.Server(Path(args.data), logger, redis_host=args.host, redis_port=args.port, redis_password=args.password, svname=args.svname,
+                           max_workers=getattr(args, 'max_workers', 100), max_svcmd_workers=getattr(args, 'max_svcmd_workers', 0))
         sv.start_server(args.retry_count, args.retry_interval)
 
         return self.RESP_SUCCESS, dict(success=dict(data=f"server stoped. svname={sv.svname}")), sv
@@ -1,11 +1,12 @@
 from cmdbox.app import client as _cli_client, common, feature
-from cmdbox.app.commons import convert as _convert
+from cmdbox.app.commons import convert as _convert, dbpool
+from contextlib import contextmanager
 from pathlib import Path
-from psycopg_pool import ConnectionPool
 from typing import Any, Dict, List, Tuple
 import argparse
 import json
 import logging
+import psycopg
 import re
 import sqlite3
 import sqlite_vec
@@ -75,7 +76,8 @@ class DatasourceBase(feature.ResultEdgeFeature):
         return ret
 
     def save_datasource(self, data_dir:Path, *, dsname:str, dbtype:str, scope:str='client', client_data:str=None,
-                        db_host:str, db_port:int, db_user:str, db_password:str, db_name:str, db_timeout:int=None, db_path:str) -> None:
+                        db_host:str, db_port:int, db_user:str, db_password:str, db_name:str, db_timeout:int=None, db_path:str,
+                        db_pool_min_size:int=None, db_pool_max_size:int=None, db_pool_max_idle:float=None) -> None:
         """
         データソース設定をファイルに保存します。
         Args:
@@ -91,6 +93,9 @@ class DatasourceBase(feature.ResultEdgeFeature):
             db_name: データベース名（PostgreSQLの場合）
             db_timeout: データベース接続のタイムアウト（秒）（PostgreSQLの場合）
             db_path: SQLiteのデータベースファイルパス（SQLiteの場合）
+            db_pool_min_size: 接続プールの最小接続数（PostgreSQLの場合）
+            db_pool_max_size: 接続プールの最大接続数（PostgreSQLの場合）
+            db_pool_max_idle: 使用されていない接続を閉じるまでの秒数（PostgreSQLの場合）
         Raises:
             ValueError: dbtype がサポートされていない場合
             IOError: データソース設定ファイルの書き込みに失敗した場合
@@ -116,6 +121,9 @@ class DatasourceBase(feature.ResultEdgeFeature):
             db_password=db_password,
             db_name=db_name,
             db_timeout=db_timeout,
+            db_pool_min_size=db_pool_min_size,
+            db_pool_max_size=db_pool_max_size,
+            db_pool_max_idle=db_pool_max_idle,
             db_path=db_path,
             db_fullpath=db_fullpath,
         )
@@ -124,10 +132,13 @@ class DatasourceBase(feature.ResultEdgeFeature):
     def get_context(self, dsconfig: Dict[str, Any]) -> Any:
         """
         データソース設定に基づいてデータベース接続を取得し、コンテキストマネージャーとして使用できるようにします。
+        PostgreSQLの場合は接続先ごとの接続プールから接続を取得します。
+        接続プールの大きさは dsconfig の db_pool_min_size, db_pool_max_size, db_pool_max_idle で変更できます。
+        SQLiteの場合はスレッドごとにキャッシュした接続を使用します。
         Args:
             dsconfig: データソース設定の辞書
         Returns:
-            コンテキストマネージャーとして使用できるデータベース接続オブジェクトとデータベース種別のタプル (conn, dbtype)
+            コンテキストマネージャーとして使用でき、データベース接続とデータベース種別のタプル (conn, dbtype) を返すオブジェクト
         Raises:
             ValueError: dbtype がサポートされていない場合
         """
@@ -140,10 +151,45 @@ class DatasourceBase(feature.ResultEdgeFeature):
             pg_dbname=dsconfig.get('db_name', '')
             pg_connect_timeout=dsconfig.get('db_timeout', None)
             constr = f"host={pg_host} port={pg_port} user={pg_user} password={pg_password} dbname={pg_dbname} connect_timeout={pg_connect_timeout}"
-            
-            if not hasattr(DatasourceBase, '_pg_pool') or DatasourceBase._pg_pool is None:
-                DatasourceBase._pg_pool = ConnectionPool(constr, min_size=1, max_size=2)
-            return DatasourceBase._pg_pool.connection(), self.DBTYPE_PG
+            @contextmanager
+            def _pg_context():
+                with dbpool.pg_connection(constr, min_size=dsconfig.get('db_pool_min_size'), max_size=dsconfig.get('db_pool_max_size'),
+                                          max_idle=dsconfig.get('db_pool_max_idle')) as conn:
+                    yield conn, self.DBTYPE_PG
+            return _pg_context()
+        elif dbtype == self.DBTYPE_SQLITE:
+            db_path = dsconfig.get('db_fullpath')
+            if not db_path:
+                raise ValueError("db_path is required for SQLite dbtype.")
+            def _init(conn):
+                conn.enable_load_extension(True)
+                sqlite_vec.load(conn)
+                conn.enable_load_extension(False)
+            @contextmanager
+            def _sqlite_context():
+                with dbpool.sqlite_connection(Path(db_path), init=_init) as conn:
+                    yield _Sqlite3ConnectionWrapper(conn), self.DBTYPE_SQLITE
+            return _sqlite_context()
+        else:
+            raise ValueError(f"Unsupported dbtype: {dbtype}")
+
+    def get_connection(self, dsconfig: Dict[str, Any]) -> Tuple[Any, str]:
+        """
+        データソース設定に基づいて、接続プールを使用しないデータベース接続を取得します。
+        長時間使用する接続など、呼び出し元で接続を閉じる場合に使用します。
+        Args:
+            dsconfig: データソース設定の辞書
+        Returns:
+            コンテキストマネージャーとして使用できるデータベース接続とデータベース種別のタプル (conn, dbtype)
+        Raises:
+            ValueError: dbtype がサポートされていない場合
+        """
+        dbtype = dsconfig.get('dbtype', self.DBTYPE_SQLITE)
+        if dbtype == self.DBTYPE_PG:
+            conn = psycopg.connect(host=dsconfig.get('db_host', 'localhost'), port=int(dsconfig.get('db_port', 5432)),
+                                   user=dsconfig.get('db_user', 'postgres'), password=dsconfig.get('db_password', ''),
+                                   dbname=dsconfig.get('db_name', ''), connect_timeout=dsconfig.get('db_timeout', None))
+            return conn, self.DBTYPE_PG
         elif dbtype == self.DBTYPE_SQLITE:
             db_path = dsconfig.get('db_fullpath')
             if not db_path:
@@ -151,10 +197,12 @@ class DatasourceBase(feature.ResultEdgeFeature):
             db_path = Path(db_path)
             db_path.parent.mkdir(parents=True, exist_ok=True)
             conn = sqlite3.connect(db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
             conn.enable_load_extension(True)
             sqlite_vec.load(conn)
             conn.enable_load_extension(False)
-            return conn, self.DBTYPE_SQLITE
+            return _Sqlite3ConnectionWrapper(conn), self.DBTYPE_SQLITE
         else:
             raise ValueError(f"Unsupported dbtype: {dbtype}")
 
@@ -54,6 +54,21 @@ class RAGBase(feature.ResultEdgeFeature):
             return self.RESP_WARN, msg, cl
         return self.RESP_SUCCESS, rag_config, cl
 
+    def vec_index_params(self, rag_conf:Dict[str, Any]) -> Dict[str, Any]:
+        """
+        RAG設定からベクトルのインデックスに関する設定を取り出します
+
+        Args:
+            rag_conf (Dict[str, Any]): RAG設定
+        Returns:
+            Dict[str, Any]: `RagStore.create_tables` 及び `RagStore.reindex` に渡す引数
+        """
+        return dict(vec_metric=rag_conf.get('vec_metric'),
+                    vec_index=rag_conf.get('vec_index'),
+                    vec_index_m=rag_conf.get('vec_index_m'),
+                    vec_index_ef_construction=rag_conf.get('vec_index_ef_construction'),
+                    vec_index_lists=rag_conf.get('vec_index_lists'))
+
     def load_datasource_config(self, args:argparse.Namespace, cl:client.Client, tm:float, pf, logger:logging.Logger) -> Tuple[int, Dict[str, Any], client.Client]:
         """
         データソース接続設定の読込みを行います
@@ -0,0 +1,149 @@
+from cmdbox.app.commons import dbpool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+import hashlib
+import json
+import sqlite3
+
+
+class RagManifest:
+    """
+    RAGに登録したファイルの指紋を保存するクラス。
+    指紋は data_dir/.agent/rag_manifest.db のSQLiteにRAG名、Extract設定の名前、ファイルパスごとに保存され、
+    ファイルのサイズ、更新日時（ナノ秒）、Extract設定のハッシュ、抽出したドキュメントのハッシュを保持します。
+    """
+    DB_NAME = "rag_manifest.db"
+    # テーブル定義の版。定義を変更した場合は増やし、古い版のテーブルは作り直します
+    SCHEMA_VERSION = 2
+
+    def __init__(self, data_dir:Path):
+        """
+        コンストラクタ
+
+        Args:
+            data_dir (Path): データディレクトリ
+        """
+        self.db_path = Path(data_dir) / ".agent" / self.DB_NAME
+
+    def _init_db(self, conn:sqlite3.Connection) -> None:
+        """
+        テーブルを作成します。
+
+        Args:
+            conn (sqlite3.Connection): 接続
+        """
+        if conn.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+            # 指紋は再登録の省略にのみ使用するため、古い版のテーブルは破棄して作り直す
+            conn.execute("DROP TABLE IF EXISTS rag_manifest")
+            conn.execute(f"PRAGMA user_version = {int(self.SCHEMA_VERSION)}")
+        conn.execute("CREATE TABLE IF NOT EXISTS rag_manifest (rag_name TEXT NOT NULL, extract_name TEXT NOT NULL, path TEXT NOT NULL, "
+                     "size INTEGER, mtime_ns INTEGER, extract_hash TEXT NOT NULL, content_hash TEXT NOT NULL, "
+                     "PRIMARY KEY (rag_name, extract_name, path))")
+        conn.commit()
+
+    def _connection(self):
+        """
+        スレッドごとにキャッシュしたSQLiteの接続を返します。
+
+        Returns:
+            Iterator[sqlite3.Connection]: 接続を返すコンテキストマネージャー
+        """
+        return dbpool.sqlite_connection(self.db_path, init=self._init_db)
+
+    @staticmethod
+    def hash_obj(obj:Any) -> str:
+        """
+        JSONに変換できるオブジェクトのハッシュを返します。
+
+        Args:
+            obj (Any): オブジェクト
+
+        Returns:
+            str: ハッシュ
+        """
+        return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, rag_name:str, extract_name:str, path:str) -> Optional[Dict[str, Any]]:
+        """
+        ファイルの指紋を返します。
+
+        Args:
+            rag_name (str): RAG名
+            extract_name (str): Extract設定の名前
+            path (str): ファイルパス
+
+        Returns:
+            Optional[Dict[str, Any]]: 指紋。登録されていない場合はNone
+        """
+        with self._connection() as conn:
+            row = conn.execute("SELECT size, mtime_ns, extract_hash, content_hash FROM rag_manifest WHERE rag_name=? AND extract_name=? AND path=?",
+                               (rag_name, extract_name, path)).fetchone()
+        if row is None:
+            return None
+        return dict(extract_name=extract_name, path=path, size=row[0], mtime_ns=row[1], extract_hash=row[2], content_hash=row[3])
+
+    def unchanged(self, rag_name:str, fingerprint:Dict[str, Any]) -> bool:
+        """
+        ファイルのサイズ、更新日時、Extract設定が前回の登録時から変わっていないかどうかを返します。
+        更新日時（ナノ秒）が分からない場合は変わったものとして扱います。
+
+        Args:
+            rag_name (str): RAG名
+            fingerprint (Dict[str, Any]): extract_name、path、size、mtime_ns、extract_hashを含む指紋
+
+        Returns:
+            bool: 変わっていない場合はTrue
+        """
+        if fingerprint.get('mtime_ns') is None:
+            return False
+        stored = self.get(rag_name, fingerprint['extract_name'], fingerprint['path'])
+        if stored is None:
+            return False
+        return all(stored[k] == fingerprint.get(k) for k in ('size', 'mtime_ns', 'extract_hash'))
+
+    def put(self, rag_name:str, fingerprint:Dict[str, Any]) -> None:
+        """
+        ファイルの指紋を保存します。
+
+        Args:
+            rag_name (str): RAG名
+            fingerprint (Dict[str, Any]): extract_name、path、size、mtime_ns、extract_hash、content_hashを含む指紋
+        """
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO rag_manifest (rag_name, extract_name, path, size, mtime_ns, extract_hash, content_hash) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (rag_name, fingerprint['extract_name'], fingerprint['path'], fingerprint.get('size'), fingerprint.get('mtime_ns'),
+                          fingerprint['extract_hash'], fingerprint['content_hash']))
+
+    def paths(self, rag_name:str, extract_name:str) -> Set[str]:
+        """
+        Extract設定ごとに登録済みのファイルパスを返します。
+
+        Args:
+            rag_name (str): RAG名
+            extract_name (str): Extract設定の名前
+
+        Returns:
+            Set[str]: ファイルパスのセット
+        """
+        with self._connection() as conn:
+            rows = conn.execute("SELECT path FROM rag_manifest WHERE rag_name=? AND extract_name=?", (rag_name, extract_name)).fetchall()
+        return {row[0] for row in rows}
+
+    def remove(self, rag_name:str, paths:List[str]=None, extract_name:str=None) -> None:
+        """
+        ファイルの指紋を削除します。
+
+        Args:
+            rag_name (str): RAG名
+            paths (List[str], optional): ファイルパスのリスト。Noneの場合はRAG名の全ての指紋を削除します. Defaults to None.
+            extract_name (str, optional): Extract設定の名前。Noneの場合は全てのExtract設定の指紋を削除します. Defaults to None.
+        """
+        with self._connection() as conn:
+            if paths is None:
+                conn.execute("DELETE FROM rag_manifest WHERE rag_name=?", (rag_name,))
+            elif extract_name is None:
+                conn.executemany("DELETE FROM rag_manifest WHERE rag_name=? AND path=?", [(rag_name, p) for p in paths])
+            else:
+                conn.executemany("DELETE FROM rag_manifest WHERE rag_name=? AND extract_name=? AND path=?",
+                                 [(rag_name, extract_name, p) for p in paths])
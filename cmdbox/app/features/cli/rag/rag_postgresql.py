@@ -7,6 +7,17 @@ from psycopg import Connection, sql
 
 
 class RagPostgresql(rag_store.RagStore):
+    # 距離尺度の既定値。以前から検索で使用していたコサイン距離とします
+    VEC_METRIC = 'cosine'
+    # インデックスの種類と作成パラメータの既定値
+    VEC_INDEX = 'ivfflat'
+    VEC_INDEX_M = 16
+    VEC_INDEX_EF_CONSTRUCTION = 64
+    VEC_INDEX_LISTS = 100
+    # 距離尺度ごとの演算子クラスと距離演算子
+    VEC_OPS = dict(l2='vector_l2_ops', cosine='vector_cosine_ops', ip='vector_ip_ops')
+    VEC_OPERATORS = dict(l2='<->', cosine='<=>', ip='<#>')
+
     def __init__(self, dbhost:str, dbport:int, dbname:str, dbuser:str, dbpass:str, dbtimeout:int, logger:logging.Logger):
         """
         コンストラクタ
@@ -69,13 +80,20 @@ class RagPostgresql(rag_store.RagStore):
                 for record in cur:
                     self.logger.info(f"extversion={record}")
 
-    def create_tables(self, servicename:str, embed_vector_dim:int=256) -> None:
+    def create_tables(self, servicename:str, embed_vector_dim:int=256,
+                      vec_metric:str=None, vec_index:str=None, vec_index_m:int=None,
+                      vec_index_ef_construction:int=None, vec_index_lists:int=None) -> None:
         """
         テーブルを作成します
 
         Args:
             servicename (str): サービス名
             embed_vector_dim (int): 埋め込みベクトルの次元数
+            vec_metric (str): ベクトルの距離尺度。 `l2` 、 `cosine` 又は `ip` (内積)
+            vec_index (str): ベクトルのインデックスの種類。 `hnsw` 又は `ivfflat`
+            vec_index_m (int): HNSWインデックスの各ノードの最大接続数
+            vec_index_ef_construction (int): HNSWインデックス作成時の候補リストのサイズ
+            vec_index_lists (int): IVFFlatインデックスのリスト数
         """
         if servicename is None: raise ValueError("servicename is required.")
 
@@ -105,12 +123,85 @@ class RagPostgresql(rag_store.RagStore):
                 cur.execute(sql.SQL(
                     "CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} (vec_id)"
                     ).format(I(f"{table_name}_vec_id_idx"), I(table_name)))
-                cur.execute(sql.SQL(
-                    "CREATE INDEX IF NOT EXISTS {} ON {} " + \
-                    "USING ivfflat (vec_data vector_l2_ops) WITH (lists = 100)"
-                    ).format(I(f"{table_name}_vec_data_idx"), I(table_name)))
+                self._create_vec_index(cur, table_name, vec_metric, vec_index, vec_index_m,
+                                       vec_index_ef_construction, vec_index_lists)
                 conn.commit()
 
+    def reindex(self, servicename:str, vec_metric:str=None, vec_index:str=None, vec_index_m:int=None,
+                vec_index_ef_construction:int=None, vec_index_lists:int=None) -> None:
+        """
+        ベクトルのインデックスを作成し直します。
+        登録済みのドキュメント数が増えた場合や、インデックスの設定を変更した場合に使用します。
+
+        Args:
+            servicename (str): サービス名
+            vec_metric (str): ベクトルの距離尺度。 `l2` 、 `cosine` 又は `ip` (内積)
+            vec_index (str): ベクトルのインデックスの種類。 `hnsw` 又は `ivfflat`
+            vec_index_m (int): HNSWインデックスの各ノードの最大接続数
+            vec_index_ef_construction (int): HNSWインデックス作成時の候補リストのサイズ
+            vec_index_lists (int): IVFFlatインデックスのリスト数
+        """
+        if servicename is None: raise ValueError("servicename is required.")
+
+        with self.connect() as conn:
+            conn.autocommit = False
+            with conn.cursor() as cur:
+                table_name = f"{self.dbuser}.{servicename}_embedding"
+                I = sql.Identifier
+                cur.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(I(f"{table_name}_vec_data_idx")))
+                self._create_vec_index(cur, table_name, vec_metric, vec_index, vec_index_m,
+                                       vec_index_ef_construction, vec_index_lists)
+                conn.commit()
+
+    def _vec_metric(self, vec_metric:str) -> str:
+        """
+        距離尺度を検証して返します
+
+        Args:
+            vec_metric (str): ベクトルの距離尺度。未指定の場合は既定値
+
+        Returns:
+            str: 距離尺度
+        """
+        vec_metric = vec_metric if vec_metric else self.VEC_METRIC
+        if vec_metric not in self.VEC_OPS:
+            raise ValueError(f"vec_metric must be one of {list(self.VEC_OPS.keys())}. ({vec_metric})")
+        return vec_metric
+
+    def _create_vec_index(self, cur:Any, table_name:str, vec_metric:str, vec_index:str, vec_index_m:int,
+                          vec_index_ef_construction:int, vec_index_lists:int) -> None:
+        """
+        ベクトルのインデックスを作成します
+
+        Args:
+            cur: カーソル
+            table_name (str): テーブル名
+            vec_metric (str): ベクトルの距離尺度
+            vec_index (str): ベクトルのインデックスの種類
+            vec_index_m (int): HNSWインデックスの各ノードの最大接続数
+            vec_index_ef_construction (int): HNSWインデックス作成時の候補リストのサイズ
+            vec_index_lists (int): IVFFlatインデックスのリスト数
+        """
+        I = sql.Identifier
+        L = sql.Literal
+        ops = sql.SQL(self.VEC_OPS[self._vec_metric(vec_metric)])
+        vec_index = vec_index if vec_index else self.VEC_INDEX
+        if vec_index == 'hnsw':
+            m = int(vec_index_m) if vec_index_m else self.VEC_INDEX_M
+            ef_construction = int(vec_index_ef_construction) if vec_index_ef_construction else self.VEC_INDEX_EF_CONSTRUCTION
+            cur.execute(sql.SQL(
+                "CREATE INDEX IF NOT EXISTS {} ON {} " + \
+                "USING hnsw (vec_data {}) WITH (m = {}, ef_construction = {})"
+                ).format(I(f"{table_name}_vec_data_idx"), I(table_name), ops, L(m), L(ef_construction)))
+        elif vec_index == 'ivfflat':
+            lists = int(vec_index_lists) if vec_index_lists else self.VEC_INDEX_LISTS
+            cur.execute(sql.SQL(
+                "CREATE INDEX IF NOT EXISTS {} ON {} " + \
+                "USING ivfflat (vec_data {}) WITH (lists = {})"
+                ).format(I(f"{table_name}_vec_data_idx"), I(table_name), ops, L(lists)))
+        else:
+            raise ValueError(f"vec_index must be 'hnsw' or 'ivfflat'. ({vec_index})")
+
     def insert_doc(self, *, connection:Connection=None, servicename:str=None,
                    vec_id:str=None, content_text:str=None, content_type:str=None, content_blob:bytes=None,
                    origin_name:str=None, origin_type:str=None, origin_url:str=None,
@@ -134,6 +225,80 @@ class RagPostgresql(rag_store.RagStore):
         """
         if connection is None: raise ValueError("connection is required.")
         if servicename is None: raise ValueError("servicename is required.")
+        with connection.cursor() as cur:
+            cur.execute(self._insert_sql(servicename), self._insert_params(
+                vec_id=vec_id, content_text=content_text, content_type=content_type, content_blob=content_blob,
+                origin_name=origin_name, origin_type=origin_type, origin_url=origin_url,
+                metadata=metadata, vec_model=vec_model, vec_data=vec_data))
+
+    def insert_docs(self, *, connection:Connection=None, servicename:str=None, docs:List[Dict[str, Any]]=None) -> int:
+        """
+        複数のドキュメントを `executemany` で一括して挿入します。
+        psycopgはexecutemanyをパイプラインで送信するため、ドキュメントごとの往復が発生しません。
+
+        Args:
+            connection: データベース接続オブジェクト
+            servicename (str): サービス名
+            docs (List[Dict[str, Any]]): `insert_doc` の引数（connection、servicenameを除く）の辞書のリスト
+
+        Returns:
+            int: 挿入したドキュメントの数
+        """
+        if connection is None: raise ValueError("connection is required.")
+        if servicename is None: raise ValueError("servicename is required.")
+        if not docs:
+            return 0
+        with connection.cursor() as cur:
+            cur.executemany(self._insert_sql(servicename), [self._insert_params(**doc) for doc in docs])
+        return len(docs)
+
+    def _insert_sql(self, servicename:str) -> sql.Composed:
+        """
+        ドキュメントを挿入するSQLを返します
+
+        Args:
+            servicename (str): サービス名
+
+        Returns:
+            sql.Composed: SQL
+        """
+        table_name = f"{self.dbuser}.{servicename}_embedding"
+        I = sql.Identifier
+        return sql.SQL(
+            "INSERT INTO {} ("
+            "vec_id, "
+            "content_text, "
+            "content_type, "
+            "content_blob, "
+            "content_size, "
+            "origin_name, "
+            "origin_type, "
+            "origin_url, "
+            "metadata, "
+            "vec_model, "
+            "vec_data) VALUES ("
+            "%(vec_id)s,"
+            "%(content_text)s,"
+            "%(content_type)s,"
+            "%(content_blob)s,"
+            "%(content_size)s,"
+            "%(origin_name)s,"
+            "%(origin_type)s,"
+            "%(origin_url)s,"
+            "%(metadata)s,"
+            "%(vec_model)s,"
+            "%(vec_data)s)"
+        ).format(I(table_name))
+
+    def _insert_params(self, vec_id:str=None, content_text:str=None, content_type:str=None, content_blob:bytes=None,
+                       origin_name:str=None, origin_type:str=None, origin_url:str=None,
+                       metadata:Dict[str, Any]=None, vec_model:str=None, vec_data:Any=None) -> Dict[str, Any]:
+        """
+        ドキュメントを挿入するSQLのパラメータを作成します
+
+        Returns:
+            Dict[str, Any]: パラメータ
+        """
         vec_id = vec_id if vec_id is not None else common.gen_uuid()
         if content_text is None: raise ValueError("content_text is required.")
         content_type = content_type if content_type is not None else metadata.get('content_type', 'text')
@@ -145,47 +310,19 @@ class RagPostgresql(rag_store.RagStore):
         if metadata is None: raise ValueError("metadata is required.")
         vec_model = vec_model if vec_model is not None else metadata.get('vec_model', 'unknown')
         if vec_data is None: raise ValueError("vec_data is required.")
-
-        with connection.cursor() as cur:
-            table_name = f"{self.dbuser}.{servicename}_embedding"
-            I = sql.Identifier
-            cur.execute(sql.SQL(
-                "INSERT INTO {} ("
-                "vec_id, "
-                "content_text, "
-                "content_type, "
-                "content_blob, "
-                "content_size, "
-                "origin_name, "
-                "origin_type, "
-                "origin_url, "
-                "metadata, "
-                "vec_model, "
-                "vec_data) VALUES ("
-                "%(vec_id)s,"
-                "%(content_text)s,"
-                "%(content_type)s,"
-                "%(content_blob)s,"
-                "%(content_size)s,"
-                "%(origin_name)s,"
-                "%(origin_type)s,"
-                "%(origin_url)s,"
-                "%(metadata)s,"
-                "%(vec_model)s,"
-                "%(vec_data)s)"
-            ).format(I(table_name)), {
-                'vec_id': vec_id,
-                'content_text': content_text,
-                'content_type': content_type,
-                'content_blob': content_blob,
-                'content_size': content_size,
-                'origin_name': origin_name,
-                'origin_type': origin_type,
-                'origin_url': origin_url,
-                'metadata': common.to_str(metadata),
-                'vec_model': vec_model,
-                'vec_data': common.to_str(vec_data)
-            })
+        return {
+            'vec_id': vec_id,
+            'content_text': content_text,
+            'content_type': content_type,
+            'content_blob': content_blob,
+            'content_size': content_size,
+            'origin_name': origin_name,
+            'origin_type': origin_type,
+            'origin_url': origin_url,
+            'metadata': common.to_str(metadata),
+            'vec_model': vec_model,
+            'vec_data': common.to_str(vec_data)
+        }
 
     def delete_doc(self, *, connection:Connection=None, servicename:str=None,
                    vec_id:str=None, content_text:str=None, content_type:str=None,
@@ -243,7 +380,8 @@ class RagPostgresql(rag_store.RagStore):
                    vec_id:str=None, content_text:str=None, content_type:str=None,
                    origin_name:str=None, origin_type:str=None, origin_url:str=None,
                    metadata:Dict[str, Any]=None, vec_model:str=None,
-                   vec_data:str=None, sort_dict:Dict[str, Any]=None, kcount:int=None,) -> Generator[Any, Any, Any]:
+                   vec_data:str=None, sort_dict:Dict[str, Any]=None, kcount:int=None,
+                   vec_metric:str=None, ef_search:int=None, probes:int=None) -> Generator[Any, Any, Any]:
         """
         ドキュメントを選択します
 
@@ -262,6 +400,9 @@ class RagPostgresql(rag_store.RagStore):
             vec_data (str): ドキュメントのベクトル表現
             sort_dict (dict): ソート条件を指定します。キーに項目名、値にソート順（ `ASC` (昇順) 又は `DESC` (降順)）を指定します。
             kcount (int): 検索結果件数
+            vec_metric (str): ベクトルの距離尺度。 `l2` 、 `cosine` 又は `ip` (内積)。インデックスと同じ距離尺度を指定してください
+            ef_search (int): HNSWインデックスで検索する際の候補リストのサイズ
+            probes (int): IVFFlatインデックスで検索するリストの数
 
         Yields:
             record: ドキュメントレコード
@@ -300,8 +441,16 @@ class RagPostgresql(rag_store.RagStore):
             if vec_model:
                 where_clauses.append("vec_model = %(vec_model)s")
                 params['vec_model'] = vec_model
+            vec_operator = None
             if vec_data:
                 params['vec_data'] = vec_data
+                vec_operator = self.VEC_OPERATORS[self._vec_metric(vec_metric)]
+                # 検索パラメータはこのトランザクション内でのみ有効にする
+                if ef_search:
+                    cur.execute(sql.SQL("SET LOCAL hnsw.ef_search = {}").format(sql.Literal(int(ef_search))))
+                if probes:
+                    cur.execute(sql.SQL("SET LOCAL ivfflat.probes = {}").format(sql.Literal(int(probes))))
+            order_sql = None
             if sort_dict is not None and len(sort_dict) > 0:
                 order_clauses = []
                 for k, v in sort_dict.items():
@@ -312,9 +461,9 @@ class RagPostgresql(rag_store.RagStore):
             select = [s for s in select if s] if select is not None and len(select) > 0 else None
             cur.execute(query=sql.SQL(
                 "SELECT {} FROM {} " + ("WHERE " + " AND ".join(where_clauses) if where_clauses else "")
-                + (" ORDER BY vec_data <=> %(vec_data)s ASC " if vec_data is not None else "")
-                + (order_sql if vec_data is None and order_sql is not None else "")
-                + (f"LIMIT {kcount}" if kcount is not None else "")
+                + (f" ORDER BY vec_data {vec_operator} %(vec_data)s ASC " if vec_operator is not None else "")
+                + (order_sql if vec_operator is None and order_sql is not None else "")
+                + (f" LIMIT {kcount}" if kcount is not None else "")
             ).format(sql.SQL(',').join(map(I, select)) if select else sql.SQL('*'),
                      I(table_name)),
                      params=params)
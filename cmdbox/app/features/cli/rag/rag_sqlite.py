@@ -1,18 +1,63 @@
 from cmdbox.app import common
 from cmdbox.app.features.cli.rag import rag_store
-from typing import Dict, Any, Generator, List
+from typing import Dict, Any, Generator, List, Optional
+import heapq
 import json
 import logging
-import sqlite3
 import math
+import numpy as np
+import sqlite3
+
+
+# ベクトル検索やインデックス作成で一度に読み込む行数
+SEARCH_BATCH = 4096
+
+
+def _pack_vec(vec: Any) -> bytes:
+    """ベクトルをfloat32のバイト列に変換します"""
+    if isinstance(vec, str):
+        vec = json.loads(vec)
+    return np.asarray(vec, dtype=np.float32).tobytes()
+
 
+def _unpack_vec(data: Any) -> np.ndarray:
+    """保存されたベクトルをfloat32の配列に変換します。JSON文字列で保存された従来のベクトルにも対応します"""
+    if isinstance(data, (bytes, memoryview)):
+        return np.frombuffer(data, dtype=np.float32)
+    return np.asarray(json.loads(data), dtype=np.float32)
 
-def _l2_distance(v1: list, v2: list) -> float:
-    """L2距離を計算します"""
-    return math.sqrt(sum((a - b) ** 2 for a, b in zip(v1, v2)))
+
+def _l2_distances(mat: np.ndarray, vec: np.ndarray) -> np.ndarray:
+    """行列の各行とベクトルのL2距離を計算します"""
+    d2 = np.einsum('ij,ij->i', mat, mat) - 2.0 * (mat @ vec) + float(vec @ vec)
+    return np.sqrt(np.maximum(d2, 0.0))
+
+
+def _distances(mat: np.ndarray, vec: np.ndarray, metric: str) -> np.ndarray:
+    """行列の各行とベクトルの距離を距離尺度に従って計算します。値が小さいほど近いことを示します"""
+    if metric == 'cosine':
+        norms = np.sqrt(np.einsum('ij,ij->i', mat, mat)) * float(np.sqrt(vec @ vec))
+        return 1.0 - (mat @ vec) / np.maximum(norms, np.finfo(np.float32).tiny)
+    if metric == 'ip':
+        return -(mat @ vec)
+    return _l2_distances(mat, vec)
+
+
+def _nearest(mat: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """行列の各行に最も近いセントロイドの番号を返します"""
+    d2 = np.einsum('ij,ij->i', centroids, centroids)[np.newaxis, :] - 2.0 * (mat @ centroids.T)
+    return np.argmin(d2, axis=1)
 
 
 class RagSqlite(rag_store.RagStore):
+    # 距離尺度の既定値
+    VEC_METRIC = 'l2'
+    VEC_METRICS = ['l2', 'cosine', 'ip']
+    # IVFインデックスで検索するリストの数
+    IVF_PROBES = 8
+    # IVFインデックス作成時のk-meansの反復回数
+    IVF_ITERATIONS = 10
+
     def __init__(self, dbpath:str, dbtimeout:int, logger:logging.Logger):
         """
         コンストラクタ
@@ -31,6 +76,8 @@ class RagSqlite(rag_store.RagStore):
         self.logger = logger
         self.dbpath = dbpath
         self.dbtimeout = dbtimeout
+        # サービス名ごとのIVFインデックスのセントロイド
+        self._ivf_cache:Dict[str, Optional[np.ndarray]] = dict()
 
     def install(self) -> None:
         """
@@ -38,13 +85,21 @@ class RagSqlite(rag_store.RagStore):
         """
         self.logger.info("SQLite does not require special installation.")
 
-    def create_tables(self, servicename:str, embed_vector_dim:int=256) -> None:
+    def create_tables(self, servicename:str, embed_vector_dim:int=256,
+                      vec_metric:str=None, vec_index:str=None, vec_index_m:int=None,
+                      vec_index_ef_construction:int=None, vec_index_lists:int=None) -> None:
         """
-        テーブルを作成します
+        テーブルを作成します。
+        SQLiteでは距離尺度は検索時に指定し、IVFインデックスは ``reindex`` で作成するため、インデックスのパラメータは参照しません。
 
         Args:
             servicename (str): サービス名
             embed_vector_dim (int): 埋め込みベクトルの次元数（SQLiteでは参照のみ）
+            vec_metric (str): ベクトルの距離尺度（SQLiteでは参照のみ）
+            vec_index (str): ベクトルのインデックスの種類（SQLiteでは参照のみ）
+            vec_index_m (int): HNSWインデックスの各ノードの最大接続数（SQLiteでは参照のみ）
+            vec_index_ef_construction (int): HNSWインデックス作成時の候補リストのサイズ（SQLiteでは参照のみ）
+            vec_index_lists (int): IVFFlatインデックスのリスト数（SQLiteでは参照のみ）
         """
         if servicename is None: raise ValueError("servicename is required.")
 
@@ -63,7 +118,8 @@ class RagSqlite(rag_store.RagStore):
                 "origin_url TEXT, "
                 "metadata TEXT, "
                 "vec_model TEXT NOT NULL, "
-                "vec_data TEXT NOT NULL, "
+                "vec_data BLOB NOT NULL, "
+                "ivf_list INTEGER, "
                 "update_dt DATETIME DEFAULT CURRENT_TIMESTAMP, "
                 "created_dt DATETIME DEFAULT CURRENT_TIMESTAMP"
                 ")"
@@ -71,8 +127,154 @@ class RagSqlite(rag_store.RagStore):
             conn.execute(
                 f"CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_vec_id_idx ON {table_name} (vec_id)"
             )
+            # 従来のテーブルにIVFインデックスのリスト番号の列を追加する
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+            if 'ivf_list' not in columns:
+                conn.execute(f"ALTER TABLE {table_name} ADD COLUMN ivf_list INTEGER")
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table_name}_ivf_list_idx ON {table_name} (ivf_list)"
+            )
+            self._migrate_vec_data(conn, table_name)
             conn.commit()
 
+    def reindex(self, servicename:str, vec_metric:str=None, vec_index:str=None, vec_index_m:int=None,
+                vec_index_ef_construction:int=None, vec_index_lists:int=None) -> None:
+        """
+        IVFインデックスを作成し直します。
+        SQLiteではインデックスの種類に関わらずIVFインデックスを作成し、 ``vec_index_lists`` をリストの数とします。
+
+        Args:
+            servicename (str): サービス名
+            vec_metric (str): ベクトルの距離尺度（SQLiteでは参照のみ）
+            vec_index (str): ベクトルのインデックスの種類（SQLiteでは参照のみ）
+            vec_index_m (int): HNSWインデックスの各ノードの最大接続数（SQLiteでは参照のみ）
+            vec_index_ef_construction (int): HNSWインデックス作成時の候補リストのサイズ（SQLiteでは参照のみ）
+            vec_index_lists (int): IVFインデックスのリスト数。未指定の場合はドキュメント数の平方根
+        """
+        if servicename is None: raise ValueError("servicename is required.")
+
+        with self.connect() as conn:
+            lists = self.build_index(connection=conn, servicename=servicename, lists=vec_index_lists)
+            conn.commit()
+        self.logger.info(f"Rebuilt IVF index. servicename={servicename}, lists={lists}")
+
+    def _migrate_vec_data(self, connection:Any, table_name:str) -> None:
+        """
+        JSON文字列で保存されているベクトルをfloat32のBLOBに変換します
+
+        Args:
+            connection: データベース接続オブジェクト
+            table_name (str): テーブル名
+        """
+        last_id = 0
+        while True:
+            rows = connection.execute(
+                f"SELECT id, vec_data FROM {table_name} WHERE typeof(vec_data) = 'text' AND id > ? ORDER BY id LIMIT ?",
+                (last_id, SEARCH_BATCH)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            updates = []
+            for row_id, vec_data in rows:
+                try:
+                    updates.append((_pack_vec(vec_data), row_id))
+                except Exception:
+                    self.logger.warning(f"Failed to convert vec_data of id={row_id} in {table_name}.")
+            connection.executemany(f"UPDATE {table_name} SET vec_data = ? WHERE id = ?", updates)
+
+    def _ivf_centroids(self, connection:Any, servicename:str) -> Optional[np.ndarray]:
+        """
+        IVFインデックスのセントロイドを返します
+
+        Args:
+            connection: データベース接続オブジェクト
+            servicename (str): サービス名
+
+        Returns:
+            np.ndarray: セントロイドの行列。IVFインデックスが作成されていない場合はNone
+        """
+        if servicename in self._ivf_cache:
+            return self._ivf_cache[servicename]
+        ivf_table = f"{servicename}_embedding_ivf"
+        centroids = None
+        row = connection.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (ivf_table,)).fetchone()
+        if row is not None:
+            rows = connection.execute(f"SELECT centroid FROM {ivf_table} ORDER BY id").fetchall()
+            if rows:
+                centroids = np.vstack([_unpack_vec(r[0]) for r in rows])
+        self._ivf_cache[servicename] = centroids
+        return centroids
+
+    def build_index(self, *, connection:Any=None, servicename:str=None, lists:int=None, sample_size:int=None) -> int:
+        """
+        IVFインデックスを作成します。
+        サンプリングしたベクトルをk-meansで ``lists`` 個のリストに分割し、各ドキュメントを最も近いリストに割り当てます。
+        作成後は ``insert_doc`` で追加したドキュメントもリストに割り当てられ、
+        ``select_doc`` は問い合わせベクトルに近い ``IVF_PROBES`` 個のリストだけを検索します。
+
+        Args:
+            connection: データベース接続オブジェクト
+            servicename (str): サービス名
+            lists (int): リストの数。未指定の場合はドキュメント数の平方根
+            sample_size (int): k-meansに使用するベクトルの数。未指定の場合はリストの数の50倍
+
+        Returns:
+            int: リストの数。ドキュメントがない場合は0
+        """
+        if connection is None: raise ValueError("connection is required.")
+        if servicename is None: raise ValueError("servicename is required.")
+        table_name = f"{servicename}_embedding"
+        ivf_table = f"{servicename}_embedding_ivf"
+        total = connection.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        if total <= 0:
+            return 0
+        lists = int(lists) if lists else max(1, min(4096, int(math.sqrt(total))))
+        sample_size = int(sample_size) if sample_size else lists * 50
+        rows = connection.execute(f"SELECT vec_data FROM {table_name} ORDER BY RANDOM() LIMIT ?", (sample_size,)).fetchall()
+        vecs = [_unpack_vec(r[0]) for r in rows]
+        dim = vecs[0].shape[0]
+        sample = np.vstack([v for v in vecs if v.shape[0] == dim])
+        lists = min(lists, len(sample))
+        rng = np.random.default_rng(0)
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(self.IVF_ITERATIONS):
+            assign = np.concatenate([_nearest(sample[i:i+SEARCH_BATCH], centroids) for i in range(0, len(sample), SEARCH_BATCH)])
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=lists)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled][:, np.newaxis]
+
+        connection.execute(f"DROP TABLE IF EXISTS {ivf_table}")
+        connection.execute(f"CREATE TABLE {ivf_table} (id INTEGER PRIMARY KEY, centroid BLOB NOT NULL)")
+        connection.executemany(f"INSERT INTO {ivf_table} (id, centroid) VALUES (?, ?)",
+                               [(i, c.tobytes()) for i, c in enumerate(centroids)])
+        last_id = 0
+        while True:
+            rows = connection.execute(f"SELECT id, vec_data FROM {table_name} WHERE id > ? ORDER BY id LIMIT ?",
+                                      (last_id, SEARCH_BATCH)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            ids, mat, others = [], [], []
+            for row_id, vec_data in rows:
+                vec = _unpack_vec(vec_data)
+                if vec.shape[0] == dim:
+                    ids.append(row_id)
+                    mat.append(vec)
+                else:
+                    # 次元数が異なるベクトルはリストに割り当てず、常に検索対象とする
+                    others.append((row_id,))
+            if ids:
+                assign = _nearest(np.vstack(mat), centroids)
+                connection.executemany(f"UPDATE {table_name} SET ivf_list = ? WHERE id = ?",
+                                       [(int(a), row_id) for a, row_id in zip(assign, ids)])
+            if others:
+                connection.executemany(f"UPDATE {table_name} SET ivf_list = NULL WHERE id = ?", others)
+        connection.commit()
+        self._ivf_cache[servicename] = centroids
+        return lists
+
     def insert_doc(self, *, connection:Any=None, servicename:str=None,
                    vec_id:str=None, content_text:str=None, content_type:str=None, content_blob:bytes=None,
                    origin_name:str=None, origin_type:str=None, origin_url:str=None,
@@ -97,6 +299,58 @@ class RagSqlite(rag_store.RagStore):
         """
         if connection is None: raise ValueError("connection is required.")
         if servicename is None: raise ValueError("servicename is required.")
+        table_name = f"{servicename}_embedding"
+        connection.execute(self._insert_sql(table_name), self._insert_params(
+            connection, servicename, vec_id=vec_id, content_text=content_text, content_type=content_type,
+            content_blob=content_blob, origin_name=origin_name, origin_type=origin_type, origin_url=origin_url,
+            metadata=metadata, vec_model=vec_model, vec_data=vec_data))
+
+    def insert_docs(self, *, connection:Any=None, servicename:str=None, docs:List[Dict[str, Any]]=None) -> int:
+        """
+        複数のドキュメントを `executemany` で一括して挿入します
+
+        Args:
+            connection: データベース接続オブジェクト
+            servicename (str): サービス名
+            docs (List[Dict[str, Any]]): `insert_doc` の引数（connection、servicenameを除く）の辞書のリスト
+
+        Returns:
+            int: 挿入したドキュメントの数
+        """
+        if connection is None: raise ValueError("connection is required.")
+        if servicename is None: raise ValueError("servicename is required.")
+        if not docs:
+            return 0
+        table_name = f"{servicename}_embedding"
+        connection.executemany(self._insert_sql(table_name),
+                               [self._insert_params(connection, servicename, **doc) for doc in docs])
+        return len(docs)
+
+    def _insert_sql(self, table_name:str) -> str:
+        """
+        ドキュメントを挿入するSQLを返します
+
+        Args:
+            table_name (str): テーブル名
+
+        Returns:
+            str: SQL
+        """
+        return (f"INSERT INTO {table_name} ("
+                "vec_id, content_text, content_type, content_blob, content_size, "
+                "origin_name, origin_type, origin_url, metadata, vec_model, vec_data, ivf_list"
+                ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+    def _insert_params(self, connection:Any, servicename:str,
+                       vec_id:str=None, content_text:str=None, content_type:str=None, content_blob:bytes=None,
+                       origin_name:str=None, origin_type:str=None, origin_url:str=None,
+                       metadata:Dict[str, Any]=None, vec_model:str=None, vec_data:Any=None) -> tuple:
+        """
+        ドキュメントを挿入するSQLのパラメータを作成します
+
+        Returns:
+            tuple: パラメータ
+        """
         vec_id = vec_id if vec_id is not None else common.gen_uuid()
         if content_text is None: raise ValueError("content_text is required.")
         content_type = content_type if content_type is not None else (metadata.get('content_type', 'text') if metadata else 'text')
@@ -109,25 +363,24 @@ class RagSqlite(rag_store.RagStore):
         vec_model = vec_model if vec_model is not None else metadata.get('vec_model', 'unknown')
         if vec_data is None: raise ValueError("vec_data is required.")
 
-        table_name = f"{servicename}_embedding"
-        connection.execute(
-            f"INSERT INTO {table_name} ("
-            "vec_id, content_text, content_type, content_blob, content_size, "
-            "origin_name, origin_type, origin_url, metadata, vec_model, vec_data"
-            ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                vec_id,
-                content_text,
-                content_type,
-                content_blob,
-                content_size,
-                origin_name,
-                origin_type,
-                origin_url,
-                common.to_str(metadata),
-                vec_model,
-                common.to_str(vec_data),
-            )
+        vec = np.asarray(json.loads(vec_data) if isinstance(vec_data, str) else vec_data, dtype=np.float32)
+        ivf_list = None
+        centroids = self._ivf_centroids(connection, servicename)
+        if centroids is not None and centroids.shape[1] == vec.shape[0]:
+            ivf_list = int(_nearest(vec[np.newaxis, :], centroids)[0])
+        return (
+            vec_id,
+            content_text,
+            content_type,
+            content_blob,
+            content_size,
+            origin_name,
+            origin_type,
+            origin_url,
+            common.to_str(metadata),
+            vec_model,
+            vec.tobytes(),
+            ivf_list,
         )
 
     def delete_doc(self, *, connection:Any=None, servicename:str=None,
@@ -191,7 +444,8 @@ class RagSqlite(rag_store.RagStore):
                    vec_id:str=None, content_text:str=None, content_type:str=None,
                    origin_name:str=None, origin_type:str=None, origin_url:str=None,
                    metadata:Dict[str, Any]=None, vec_model:str=None,
-                   vec_data:str=None, sort_dict:Dict[str, Any]=None, kcount:int=None,) -> Generator[Any, Any, Any]:
+                   vec_data:str=None, sort_dict:Dict[str, Any]=None, kcount:int=None,
+                   vec_metric:str=None, ef_search:int=None, probes:int=None) -> Generator[Any, Any, Any]:
         """
         ドキュメントを選択します
 
@@ -210,12 +464,18 @@ class RagSqlite(rag_store.RagStore):
             vec_data (str): ドキュメントのベクトル表現
             sort_dict (dict): ソート条件を指定します。キーに項目名、値にソート順（ `ASC` (昇順) 又は `DESC` (降順)）を指定します。
             kcount (int): 検索結果件数
+            vec_metric (str): ベクトルの距離尺度。 `l2` 、 `cosine` 又は `ip` (内積)。未指定の場合は `l2`
+            ef_search (int): HNSWインデックスで検索する際の候補リストのサイズ（SQLiteでは参照のみ）
+            probes (int): IVFインデックスで検索するリストの数。未指定の場合は ``IVF_PROBES``
 
         Yields:
             record: ドキュメントレコード
         """
         if connection is None: raise ValueError("connection is required.")
         if servicename is None: raise ValueError("servicename is required.")
+        vec_metric = vec_metric if vec_metric else self.VEC_METRIC
+        if vec_metric not in self.VEC_METRICS:
+            raise ValueError(f"vec_metric must be one of {self.VEC_METRICS}. ({vec_metric})")
 
         table_name = f"{servicename}_embedding"
         where_clauses = []
@@ -259,39 +519,133 @@ class RagSqlite(rag_store.RagStore):
                 order_clauses.append(f"{k} {v.upper()}")
             order_sql = " ORDER BY " + ", ".join(order_clauses)
 
-        # vec_data がある場合は全件取得してPythonでソートする
-        fetch_limit = ""
-        if vec_data is None and kcount is not None:
-            fetch_limit = f" LIMIT {kcount}"
+        if vec_data is not None:
+            yield from self._search_vec(connection, servicename, table_name, where_clauses, params,
+                                        select_cols, vec_data, kcount, vec_metric=vec_metric, probes=probes)
+            return
 
         query = f"SELECT {select_sql} FROM {table_name}"
         if where_clauses:
             query += " WHERE " + " AND ".join(where_clauses)
-        query += order_sql + fetch_limit
+        query += order_sql
+        if kcount is not None:
+            query += f" LIMIT {kcount}"
 
         cur = connection.execute(query, params)
         colnames = [desc[0] for desc in cur.description]
+        for row in cur:
+            yield self._decode_record(dict(zip(colnames, row)), select_cols)
 
-        if vec_data is not None:
-            # Pythonサイド L2距離でソートして上位kcount件を返す
-            try:
-                query_vec = json.loads(vec_data) if isinstance(vec_data, str) else list(vec_data)
-            except Exception:
-                query_vec = list(vec_data)
-            rows = []
-            for row in cur:
-                record = dict(zip(colnames, row))
+    def _decode_record(self, record:Dict[str, Any], select_cols:List[str]) -> Dict[str, Any]:
+        """
+        レコードのベクトルを従来と同じJSON文字列に変換します
+
+        Args:
+            record (dict): レコード
+            select_cols (List[str]): 取得する項目。Noneの場合はすべての項目
+
+        Returns:
+            dict: レコード
+        """
+        vec_data = record.get('vec_data')
+        if isinstance(vec_data, (bytes, memoryview)):
+            record['vec_data'] = common.to_str(_unpack_vec(vec_data).tolist())
+        if select_cols is None:
+            record.pop('ivf_list', None)
+        return record
+
+    def _search_vec(self, connection:Any, servicename:str, table_name:str, where_clauses:List[str], params:List[Any],
+                    select_cols:List[str], vec_data:Any, kcount:int,
+                    vec_metric:str='l2', probes:int=None) -> Generator[Any, Any, Any]:
+        """
+        問い合わせベクトルとの距離が近い順にドキュメントを返します。
+        ベクトルは ``SEARCH_BATCH`` 行ずつまとめて距離を計算し、上位 ``kcount`` 件のみをヒープで保持します。
+        IVFインデックスがある場合は、問い合わせベクトルに ``vec_metric`` で近いリストとリスト未割り当てのドキュメントのみを検索します。
+
+        Args:
+            connection: データベース接続オブジェクト
+            servicename (str): サービス名
+            table_name (str): テーブル名
+            where_clauses (List[str]): 検索条件
+            params (List[Any]): 検索条件のパラメータ
+            select_cols (List[str]): 取得する項目。Noneの場合はすべての項目
+            vec_data (Any): 問い合わせベクトル
+            kcount (int): 検索結果件数
+            vec_metric (str): ベクトルの距離尺度
+            probes (int): IVFインデックスで検索するリストの数
+
+        Yields:
+            record: ドキュメントレコード
+        """
+        if kcount is not None and kcount <= 0:
+            return
+        query_vec = np.asarray(json.loads(vec_data) if isinstance(vec_data, str) else list(vec_data), dtype=np.float32)
+        dim = query_vec.shape[0]
+        where_clauses = list(where_clauses)
+        params = list(params)
+        centroids = self._ivf_centroids(connection, servicename)
+        if centroids is not None and centroids.shape[1] == dim:
+            probes = min(len(centroids), int(probes) if probes else self.IVF_PROBES)
+            # セントロイドも検索と同じ距離尺度で順位付けし、距離尺度ごとに近いリストを検索する
+            lists = np.argsort(_distances(centroids, query_vec, vec_metric))[:probes]
+            where_clauses.append(f"(ivf_list IN ({', '.join('?' * len(lists))}) OR ivf_list IS NULL)")
+            params += [int(l) for l in lists]
+        query = f"SELECT id, vec_data FROM {table_name}"
+        if where_clauses:
+            query += " WHERE " + " AND ".join(where_clauses)
+        cur = connection.execute(query, params)
+
+        # (-距離, -id) の最小ヒープで距離が小さい上位kcount件を保持する。同じ距離の場合はidが小さい方を優先する
+        heap = []
+        invalid_ids = []
+        while True:
+            rows = cur.fetchmany(SEARCH_BATCH)
+            if not rows:
+                break
+            ids, mat = [], []
+            for row_id, data in rows:
                 try:
-                    stored_vec = json.loads(record.get('vec_data', '[]'))
-                    dist = _l2_distance(query_vec, stored_vec)
+                    vec = _unpack_vec(data)
                 except Exception:
-                    dist = float('inf')
-                rows.append((dist, record))
-            rows.sort(key=lambda x: x[0])
-            if kcount is not None:
-                rows = rows[:kcount]
-            for _, record in rows:
-                yield record
-        else:
+                    vec = None
+                if vec is None or vec.shape[0] != dim:
+                    invalid_ids.append(row_id)
+                    continue
+                ids.append(row_id)
+                mat.append(vec)
+            if not ids:
+                continue
+            dists = _distances(np.vstack(mat), query_vec, vec_metric)
+            if kcount is not None and len(dists) > kcount:
+                candidates = np.argpartition(dists, kcount - 1)[:kcount]
+            else:
+                candidates = range(len(dists))
+            for i in candidates:
+                item = (-float(dists[i]), -ids[i])
+                if kcount is None or len(heap) < kcount:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+        # 距離を計算できないドキュメントは末尾に並べる
+        result_ids = [-row_id for _, row_id in sorted(heap, reverse=True)] + invalid_ids
+        if kcount is not None:
+            result_ids = result_ids[:kcount]
+
+        fetch_cols = "*"
+        if select_cols:
+            fetch_cols = ", ".join(select_cols if 'id' in select_cols else ['id'] + select_cols)
+        records = dict()
+        for i in range(0, len(result_ids), 500):
+            chunk = result_ids[i:i+500]
+            cur = connection.execute(f"SELECT {fetch_cols} FROM {table_name} WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            colnames = [desc[0] for desc in cur.description]
             for row in cur:
-                yield dict(zip(colnames, row))
+                record = dict(zip(colnames, row))
+                records[record['id']] = record
+        for row_id in result_ids:
+            record = records.get(row_id)
+            if record is None:
+                continue
+            if select_cols and 'id' not in select_cols:
+                record.pop('id', None)
+            yield self._decode_record(record, select_cols)
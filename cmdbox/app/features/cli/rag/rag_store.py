@@ -43,16 +43,39 @@ class RagStore:
         """
         raise NotImplementedError("install method is not implemented.")
 
-    def create_tables(self, servicename:str, embed_vector_dim:int=256) -> None:
+    def create_tables(self, servicename:str, embed_vector_dim:int=256,
+                      vec_metric:str=None, vec_index:str=None, vec_index_m:int=None,
+                      vec_index_ef_construction:int=None, vec_index_lists:int=None) -> None:
         """
         テーブルを作成します
 
         Args:
             servicename (str): サービス名
             embed_vector_dim (int): 埋め込みベクトルの次元数
+            vec_metric (str): ベクトルの距離尺度。 `l2` 、 `cosine` 又は `ip` (内積)
+            vec_index (str): ベクトルのインデックスの種類。 `hnsw` 又は `ivfflat`
+            vec_index_m (int): HNSWインデックスの各ノードの最大接続数
+            vec_index_ef_construction (int): HNSWインデックス作成時の候補リストのサイズ
+            vec_index_lists (int): IVFFlatインデックスのリスト数
         """
         raise NotImplementedError("create_tables method is not implemented.")
 
+    def reindex(self, servicename:str, vec_metric:str=None, vec_index:str=None, vec_index_m:int=None,
+                vec_index_ef_construction:int=None, vec_index_lists:int=None) -> None:
+        """
+        ベクトルのインデックスを作成し直します。
+        登録済みのドキュメント数が増えた場合や、インデックスの設定を変更した場合に使用します。
+
+        Args:
+            servicename (str): サービス名
+            vec_metric (str): ベクトルの距離尺度。 `l2` 、 `cosine` 又は `ip` (内積)
+            vec_index (str): ベクトルのインデックスの種類。 `hnsw` 又は `ivfflat`
+            vec_index_m (int): HNSWインデックスの各ノードの最大接続数
+            vec_index_ef_construction (int): HNSWインデックス作成時の候補リストのサイズ
+            vec_index_lists (int): IVFFlatインデックスのリスト数
+        """
+        raise NotImplementedError("reindex method is not implemented.")
+
     def connect(self) -> Any:
         """
         データベースに接続します
@@ -83,6 +106,23 @@ class RagStore:
         """
         raise NotImplementedError("insert_doc method is not implemented.")
 
+    def insert_docs(self, *, connection:Any=None, servicename:str=None, docs:List[Dict[str, Any]]=None) -> int:
+        """
+        複数のドキュメントを一括して挿入します。
+        既定の実装では `insert_doc` を繰り返し呼び出します。
+
+        Args:
+            connection: データベース接続オブジェクト
+            servicename (str): サービス名
+            docs (List[Dict[str, Any]]): `insert_doc` の引数（connection、servicenameを除く）の辞書のリスト
+
+        Returns:
+            int: 挿入したドキュメントの数
+        """
+        for doc in docs or []:
+            self.insert_doc(connection=connection, servicename=servicename, **doc)
+        return len(docs) if docs else 0
+
     def delete_doc(self, *, connection:Any=None, servicename:str=None,
                    vec_id:str=None, content_text:str=None, content_type:str=None,
                    origin_name:str=None, origin_type:str=None, origin_url:str=None,
@@ -108,7 +148,8 @@ class RagStore:
                    vec_id:str=None, content_text:str=None, content_type:str=None,
                    origin_name:str=None, origin_type:str=None, origin_url:str=None,
                    metadata:Dict[str, Any]=None, vec_model:str=None,
-                   vec_data:str=None, sort_dict:Dict[str, Any]=None, kcount:int=None,) -> Generator[Any, Any, Any]:
+                   vec_data:str=None, sort_dict:Dict[str, Any]=None, kcount:int=None,
+                   vec_metric:str=None, ef_search:int=None, probes:int=None) -> Generator[Any, Any, Any]:
         """
         ドキュメントを選択します
 
@@ -127,6 +168,9 @@ class RagStore:
             vec_data (str): ドキュメントのベクトル表現
             sort_dict (dict): ソート条件を指定します。キーに項目名、値にソート順（ `ASC` (昇順) 又は `DESC` (降順)）を指定します。
             kcount (int): 検索結果件数
+            vec_metric (str): ベクトルの距離尺度。 `l2` 、 `cosine` 又は `ip` (内積)。未指定の場合はストアの既定値
+            ef_search (int): HNSWインデックスで検索する際の候補リストのサイズ
+            probes (int): IVFFlatインデックスで検索するリストの数
 
         Yields:
             record: ドキュメントレコード
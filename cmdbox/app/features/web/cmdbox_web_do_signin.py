@@ -50,7 +50,7 @@ class DoSignin(cmdbox_web_signin.Signin):
                 except Exception as e:
                     raise HTTPException(status_code=400, detail='Invalid token format.')
                 name = token['user']
-                user = [u for u in signin_data['users'] if u['name'] == name]
+                user = web.signin.get_index(signin_data).users_by_name(name)
                 if len(user) <= 0:
                     raise HTTPException(status_code=401, detail='Unauthorized')
                 user = copy.deepcopy(user[0])
@@ -69,7 +69,7 @@ class DoSignin(cmdbox_web_signin.Signin):
                 if name == '' or passwd == '':
                     web.options.audit_exec(req, res, web, body=dict(msg='signin failed.'), audit_type='auth')
                     return RedirectResponse(url=f'/signin/{next}?error=1')
-                user = [u for u in signin_data['users'] if u['name'] == name and u['hash'] != 'oauth2' and u['hash'] != 'saml']
+                user = [u for u in web.signin.get_index(signin_data).users_by_name(name) if u['hash'] != 'oauth2' and u['hash'] != 'saml']
                 if len(user) <= 0:
                     web.options.audit_exec(req, res, web, body=dict(msg='signin failed.'), audit_type='auth', user=name)
                     return RedirectResponse(url=f'/signin/{next}?error=1')
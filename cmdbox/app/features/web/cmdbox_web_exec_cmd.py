@@ -4,6 +4,7 @@ from cmdbox.app.commons import convert
 from cmdbox.app.features.cli import cmdbox_audit_search, cmdbox_audit_write
 from cmdbox.app.features.web import cmdbox_web_load_cmd
 from cmdbox.app.web import Web
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from fastapi import FastAPI, Depends, Request, Response, HTTPException
 from fastapi.responses import PlainTextResponse, StreamingResponse
@@ -20,7 +21,49 @@ import traceback
 import sys
 
 
+class AsyncResQueue(queue.Queue):
+    """
+    コマンドを実行するスレッドから、イベントループ上のasyncio.Queueに結果を渡すキュー。
+    queue.Queueと同じ put / put_nowait で格納でき、格納した結果は ``aqueue`` から await で取り出します。
+    クライアントが切断されると ``closed`` がTrueになり、以降の結果は捨てられます。
+    実行中のコマンドは ``Feature.is_cancelled`` でこれを確認して処理を打ち切ることができます。
+    """
+    def __init__(self, loop:asyncio.AbstractEventLoop):
+        super().__init__()
+        self.loop = loop
+        self.aqueue:asyncio.Queue = asyncio.Queue()
+        self.closed = False
+
+    def put(self, item, block=True, timeout=None):
+        if self.closed:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.aqueue.put_nowait, item)
+        except RuntimeError:
+            # 接続が切れてイベントループが終了している場合は結果を捨てる
+            self.closed = True
+
 class ExecCmd(cmdbox_web_load_cmd.LoadCmd):
+    # SSEで実行するコマンドの同時実行数
+    SSE_MAX_WORKERS:int = 32
+    # SSEで結果を待つ秒数
+    SSE_TIMEOUT:int = 600
+    _sse_executor:ThreadPoolExecutor = None
+    _sse_executor_lock = threading.Lock()
+
+    def get_sse_executor(self) -> ThreadPoolExecutor:
+        """
+        SSEで実行するコマンドのスレッドプールを取得します
+
+        Returns:
+            ThreadPoolExecutor: スレッドプール
+        """
+        if ExecCmd._sse_executor is None:
+            with ExecCmd._sse_executor_lock:
+                if ExecCmd._sse_executor is None:
+                    ExecCmd._sse_executor = ThreadPoolExecutor(max_workers=self.SSE_MAX_WORKERS, thread_name_prefix="exec_sse_cmd")
+        return ExecCmd._sse_executor
+
     def route(self, web:Web, app:FastAPI) -> None:
         """
         webモードのルーティングを設定します
@@ -58,18 +101,33 @@ class ExecCmd(cmdbox_web_load_cmd.LoadCmd):
                 if options.Options.getInstance().get_cmd_attr(opt['mode'], opt['cmd'], "nouse_webmode"):
                     return dict(warn=f'Command "{title}" failed. This command is not available in web mode.')
                 async def sse_event_generator(req:Request, res:Response, title:str=None, opt:Dict[str, Any]=None):
-                    resqueue = queue.Queue()
-                    th = threading.Thread(target=lambda: asyncio.run(self.exec_cmd(req, res, web, title, opt, True, None, resqueue)), daemon=True)
-                    th.start()
+                    resqueue = AsyncResQueue(asyncio.get_running_loop())
+                    def _run():
+                        # 実行を待っている間にクライアントが切断された場合は実行しない
+                        if resqueue.closed:
+                            return
+                        asyncio.run(self.exec_cmd(req, res, web, title, opt, True, None, resqueue))
+                    # コマンドは上限付きのスレッドプールで実行し、結果はイベントループのキューで受け取る
+                    future = asyncio.get_running_loop().run_in_executor(self.get_sse_executor(), _run)
+                    def _done(f):
+                        # 実行が例外で終了した場合も結果の待機を終了させる
+                        if not f.cancelled(): f.exception()
+                        resqueue.put(None)
+                    future.add_done_callback(_done)
                     try:
                         while True:
-                            output = resqueue.get(timeout=600)
+                            output = await asyncio.wait_for(resqueue.aqueue.get(), timeout=self.SSE_TIMEOUT)
                             if output is None:
                                 break
                             res_val = common.to_str(output)
                             yield f"data: {res_val}\n\n"
-                    except queue.Empty:
+                    except asyncio.TimeoutError:
                         yield f"data: {common.to_str(dict(warn='Command execution timed out.'))}\n\n"
+                    finally:
+                        resqueue.closed = True
+                        if not future.done():
+                            # クライアントが切断された場合、実行待ちのコマンドは取り消す
+                            future.cancel()
                 return StreamingResponse(sse_event_generator(req, res, title, opt), media_type='text/event-stream')
             except HTTPException as e:
                 web.logger.warning(f"HTTPException: {e.detail}", exc_info=True)
@@ -255,11 +313,8 @@ class ExecCmd(cmdbox_web_load_cmd.LoadCmd):
                     return output
 
                 output_raw = 'output_raw' in opt and opt['output_raw']
-                opt['output_raw'] = False
-                opt_list, file_dict = web.options.mk_opt_list(opt)
+                cmd_opt = {**opt, 'output_raw':False}
                 opt['output_raw'] = True
-                old_stdout = sys.stdout
-                old_stdin = sys.stdin
                 if 'capture_stdout' in opt and opt['capture_stdout'] and 'stdin' in opt and opt['stdin'] and _stdin_body is None:
                     output = dict(warn=f'The "stdin" and "capture_stdout" options cannot be enabled at the same time. This is because it may cause a memory squeeze.')
                     self.put_queue(resqueue, output)
@@ -268,13 +323,12 @@ class ExecCmd(cmdbox_web_load_cmd.LoadCmd):
                     return output
                 ret_main = {}
                 logsize = 1024
-                console = common.create_console(file=old_stdout)
+                console = common.create_console(file=sys.stdout)
 
                 try:
-                    if _stdin_body is not None:
-                        sys.stdin = io.BytesIO(_stdin_body)
-                    if 'capture_stdout' in opt and opt['capture_stdout']:
-                        sys.stdout = captured_output = io.StringIO()
+                    # 標準入出力はこのリクエストのコンテキストだけで切り替える
+                    captured_output = io.StringIO() if 'capture_stdout' in opt and opt['capture_stdout'] else None
+                    stdin = io.BytesIO(_stdin_body) if _stdin_body is not None else None
                     capture_maxsize = opt['capture_maxsize'] if 'capture_maxsize' in opt else self.DEFAULT_CAPTURE_MAXSIZE
                     def to_json(o):
                         res_json = json.loads(o)
@@ -284,8 +338,8 @@ class ExecCmd(cmdbox_web_load_cmd.LoadCmd):
                             res_json["output_image"] = convert.bytes2b64str(img_bytes)
                             res_json['output_image_name'] = f"{res_json['output_image_name'].strip()}.png"
                         return res_json
-                    status, ret_main, obj = cmdbox_app.main(args_list=[common.chopdq(o) for o in opt_list],
-                                                            file_dict=file_dict, webcall=True, resqueue=resqueue)
+                    with common.redirect_stdio(stdout=captured_output, stdin=stdin):
+                        status, ret_main, obj = cmdbox_app.dispatch(cmd_opt, resqueue=resqueue)
                     web.logger.disabled = False # ログ出力を有効にする
                     if isinstance(obj, server.Server):
                         cmdbox_app.sv = obj
@@ -311,7 +365,7 @@ class ExecCmd(cmdbox_web_load_cmd.LoadCmd):
                     else:
                         output = [dict(warn='capture_stdout is off.')]
                     if web.logger.level == logging.DEBUG:
-                        old_stdout.write(f'EXEC OUTPUT => {output}'[:logsize]+'\n') # コマンド実行時のアウトプットはカラーリングしない
+                        sys.stdout.write(f'EXEC OUTPUT => {output}'[:logsize]+'\n') # コマンド実行時のアウトプットはカラーリングしない
                 except Exception as e:
                     msg = f'exec_cmd error. {traceback.format_exc()}'
                     common.console_log(console, message=f'EXEC  - {msg}'[:logsize], highlight=(len(msg)<logsize-10))
@@ -319,8 +373,6 @@ class ExecCmd(cmdbox_web_load_cmd.LoadCmd):
                     output = [dict(warn=f'<pre>{html.escape(traceback.format_exc())}</pre>')]
                 finally:
                     web.logger.disabled = False # ログ出力を有効にする
-                    sys.stdout = old_stdout
-                    sys.stdin = old_stdin
                 if 'capture_stdout' in opt and opt['capture_stdout']:
                     self.callback_console_modal_log_func(web, output)
                 try:
@@ -1,4 +1,5 @@
 from cmdbox.app import common, feature, options, web as _web
+from cmdbox.app.auth import signin as _signin
 from cmdbox.app.commons import convert
 from cmdbox.app.features.web import cmdbox_web_load_pipe, cmdbox_web_raw_pipe
 from cmdbox.app.web import Web
@@ -6,6 +7,7 @@ from fastapi import FastAPI, Request, Response, HTTPException
 from pathlib import Path
 from starlette.datastructures import UploadFile
 from typing import Dict, Any, List
+import contextvars
 import gevent
 import html
 import json
@@ -32,6 +34,8 @@ class ExecPipe(cmdbox_web_load_pipe.LoadPipe, cmdbox_web_raw_pipe.RawPipe):
                 signin = web.signin.check_signin(req, res)
                 if signin is not None:
                     raise HTTPException(status_code=401, detail=self.DEFAULT_401_MESSAGE)
+                # 実行結果の配信先をサインインユーザーに限定するため、リクエストスコープを設定する
+                _signin.set_request_scope(dict(req=req, res=res, websocket=None, web=web))
                 opt = None
                 content_type = req.headers.get('content-type')
                 def _marge_opt(opt, param):
@@ -189,7 +193,9 @@ class ExecPipe(cmdbox_web_load_pipe.LoadPipe, cmdbox_web_raw_pipe.RawPipe):
             return _exec_pipe(title, opt, web.container, True, capture_stdin)
         if web.pipe_th is not None:
             web.pipe_th.raise_exception()
-        web.pipe_th = _web.RaiseThread(target=_exec_pipe, args=(title, opt, web.container, False, capture_stdin))
+        # リクエストスコープを引き継いでスレッドで実行する
+        web.pipe_th = _web.RaiseThread(target=contextvars.copy_context().run,
+                                       args=(_exec_pipe, title, opt, web.container, False, capture_stdin))
         web.pipe_th.start()
         #gevent.spawn(_exec_pipe, title, opt, self.container, False, capture_stdin)
         return dict(success='start_pipe')
@@ -1,5 +1,6 @@
 from cmdbox import version
 from cmdbox.app import common, feature
+from cmdbox.app.auth.signin import get_request_user
 from cmdbox.app.web import Web
 from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
@@ -131,7 +132,7 @@ class Gui(feature.WebFeature):
         if web.logger.level == logging.DEBUG:
             output_str = common.to_str(output, slise=100)
             web.logger.debug(f"web.callback_console_modal_log_func: output={output_str}")
-        web.cb_queue.put(('js_console_modal_log_func', None, output))
+        web.cb_hub.publish('js_console_modal_log_func', None, output, owner=get_request_user())
 
     def callback_return_cmd_exec_func(self, web:Web, title:str, output:Dict[str, Any]):
         """
@@ -145,7 +146,7 @@ class Gui(feature.WebFeature):
         if web.logger.level == logging.DEBUG:
             output_str = common.to_str(output, slise=100)
             web.logger.debug(f"web.callback_return_cmd_exec_func: output={output_str}")
-        web.cb_queue.put(('js_return_cmd_exec_func', title, output))
+        web.cb_hub.publish('js_return_cmd_exec_func', title, output, owner=get_request_user())
 
     def callback_return_pipe_exec_func(self, web:Web, title:str, output:Dict[str, Any]):
         """
@@ -159,7 +160,7 @@ class Gui(feature.WebFeature):
         if web.logger.level == logging.DEBUG:
             output_str = common.to_str(output, slise=100)
             web.logger.debug(f"web.callback_return_pipe_exec_func: title={title}, output={output_str}")
-        web.cb_queue.put(('js_return_pipe_exec_func', title, output))
+        web.cb_hub.publish('js_return_pipe_exec_func', title, output, owner=get_request_user())
 
     def callback_return_stream_log_func(self, web:Web, output:Dict[str, Any]):
         """
@@ -172,7 +173,7 @@ class Gui(feature.WebFeature):
         if web.logger.level == logging.DEBUG:
             output_str = common.to_str(output, slise=100)
             web.logger.debug(f"web.callback_return_stream_log_func: output={output_str}")
-        web.cb_queue.put(('js_return_stream_log_func', None, output))
+        web.cb_hub.publish('js_return_stream_log_func', None, output, owner=get_request_user())
 
     def mk_curl_fileup(self, web:Web, cmd_opt:Dict[str, Any]) -> str:
         """
@@ -1,10 +1,11 @@
 from cmdbox.app import common, feature
 from cmdbox.app.web import Web
-from fastapi import FastAPI, HTTPException, WebSocket
+from cmdbox.app.auth.signin import get_request_user
+from fastapi import FastAPI, HTTPException, Response, WebSocket
 from starlette.websockets import WebSocketDisconnect
+import asyncio
 import logging
 import json
-import queue
 
 
 class GuiCallback(feature.WebFeature):
@@ -21,26 +22,39 @@ class GuiCallback(feature.WebFeature):
         async def gui_callback(websocket: WebSocket=None):
             if websocket is None:
                 raise HTTPException(status_code=200, detail='ok.')
+            # サインインしていない接続は拒否し、購読はサインインユーザーのイベントに限定する
+            signin = web.signin.check_signin(websocket, Response())
+            if signin is not None:
+                web.logger.warning(f"web.gui_callback: websocket rejected. Not signed in.")
+                await websocket.close(code=1008)
+                return
             await websocket.accept()
-            # コマンドの実行結果をキューから取り出してブラウザに送信する
+            # コマンドの実行結果を購読し、発生したらすぐにブラウザに送信する
             web.logger.info(f"web.gui_callback: connected")
-            if not websocket:
-                raise HTTPException(status_code=400, detail='Expected WebSocket request.')
-            while True:
-                outputs = None
-                try:
-                    await websocket.receive_text() # これを行わねば非同期処理にならない。。
-                    cmd, title, output = web.cb_queue.get(block=True, timeout=0.001)
+            sub = web.cb_hub.subscribe(owner=get_request_user(websocket))
+            async def _receive():
+                # ブラウザからのpingを読み捨てて切断を検知する
+                while True:
+                    await websocket.receive_text()
+            async def _send():
+                while True:
+                    cmd, title, output = await sub.get()
                     if web.logger.level == logging.DEBUG:
                         output_str = common.to_str(output, slise=100)
                         web.logger.debug(f"web.gui_callback: cmd={cmd}, title={title}, output={output_str}")
                     outputs = dict(cmd=cmd, title=title, output=output)
                     await websocket.send_text(json.dumps(outputs, default=common.default_json_enc))
-                except queue.Empty:
-                    pass
-                except WebSocketDisconnect:
-                    web.logger.warning('web.gui_callback: websocket disconnected.')
-                    break
-                except Exception as e:
-                    web.logger.warning(f'web.gui_callback: websocket error. {e}')
-                    raise HTTPException(status_code=400, detail='Expected WebSocket request.')
+            tasks = [asyncio.create_task(_receive()), asyncio.create_task(_send())]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    t.result()
+            except WebSocketDisconnect:
+                web.logger.warning('web.gui_callback: websocket disconnected.')
+            except Exception as e:
+                web.logger.warning(f'web.gui_callback: websocket error. {e}')
+                raise HTTPException(status_code=400, detail='Expected WebSocket request.')
+            finally:
+                for t in tasks:
+                    t.cancel()
+                web.cb_hub.unsubscribe(sub)
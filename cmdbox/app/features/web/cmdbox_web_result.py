@@ -1,4 +1,5 @@
 from cmdbox.app import feature
+from cmdbox.app.auth.signin import get_request_user
 from cmdbox.app.web import Web
 from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.responses import HTMLResponse
@@ -37,7 +38,7 @@ class Result(feature.WebFeature):
                 output = json.loads(output)
             except:
                 pass
-            web.cb_queue.put(('js_return_cmd_exec_func', title, output))
+            web.cb_hub.publish('js_return_cmd_exec_func', title, output, owner=get_request_user(req))
             return dict(success="result put to queue.")
 
         @app.post('/result', response_class=HTMLResponse, responses=feature.WebFeature.DEFAULT_RESPONCE_STATES)
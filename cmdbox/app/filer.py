@@ -1,24 +1,43 @@
 from cmdbox.app import common
-from cmdbox.app.commons import convert
+from cmdbox.app.commons import convert, dirindex, pathmatcher
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 import logging
 import datetime
+import hashlib
 import mimetypes
 import re
 import shutil
 import os
+import threading
 
 class Filer(object):
     RESP_SUCCESS:int = 0
     RESP_WARN:int = 1
     RESP_ERROR:int = 2
-    def __init__(self, data_dir: Path, logger: logging.Logger,):
+    # 分割転送中のハッシュ値の計算状態を保持する転送の最大数。超えた場合は古い転送から破棄する
+    MAX_TRANSFERS:int = 1024
+    # 転送IDとして使用できる文字
+    _TRANSFER_ID = re.compile(r'^[0-9A-Za-z_-]{1,64}$')
+    # 分割転送ごとの (転送済みのサイズ, SHA-256の計算状態)。Filerはリクエストごとに作成されるためクラスで共有する
+    _transfers:'OrderedDict[str, Tuple[int, Any]]' = OrderedDict()
+    _transfers_lock = threading.Lock()
+    def __init__(self, data_dir: Path, logger: logging.Logger, index_db:Path=None):
+        """
+        データフォルダ配下のファイルを操作するクラス
+
+        Args:
+            data_dir (Path): データフォルダ
+            logger (logging.Logger): ロガー
+            index_db (Path, optional): ディレクトリインデックスを保存するSQLiteファイルのパス。省略時はメモリ上にのみ保持する. Defaults to None.
+        """
         if not data_dir:
             raise ValueError("data_dir is required.")
         self.data_dir = data_dir.resolve() if isinstance(data_dir, Path) else Path(data_dir).resolve()
         self.logger = logger
         common.mkdirs(self.data_dir)
+        self.dir_index = dirindex.DirIndex.get(self.data_dir, db_path=index_db)
 
     def _normalize_path(self, path: Path) -> Path:
         """
@@ -90,19 +109,22 @@ class Filer(object):
         rpath = f"{rpath}/" if from_abspath.is_dir() and not rpath.endswith('/') else rpath # ディレクトリパスの末尾にスラッシュを付与
         if fwpaths is None:
             return False, dict(warn=f"fwpaths is None.")
-        if not any(from_abspath.is_relative_to(self._file_exists(fwpath)[1]) for fwpath in fwpaths):
+        matcher = pathmatcher.PathMatcher.get(fwpaths, rjpaths)
+        # fwpathsのシンボリックリンクの変更などに追従するため、絶対パスへの変換はキャッシュせずに呼び出しごとに行う
+        if not any(from_abspath.is_relative_to(self._file_exists(fwpath)[1]) for fwpath in matcher.fwpaths):
             return False, dict(warn=f"The specified path ( {rpath} ) is out of bounds.")
-        rjpaths = rjpaths if isinstance(rjpaths, list) else [rjpaths] if rjpaths is not None and rjpaths != "********" else []
-        if rjpaths is not None and any(re.match(rjpath, rpath) for rjpath in rjpaths):
+        if matcher.is_rejected(rpath):
             return False, dict(warn=f"The specified path ( {rpath} ) is rejected.")
-        if re.search(r'\.meta/', rpath):
+        if matcher.is_meta(rpath, dir_only=True):
             return False, dict(warn=f"The specified path ( {rpath} ) is rejected.")
         return True, None
 
     def file_list(self, current_path:str, recursive:bool=False,
-                  fwpaths:List[str]=None, rjpaths:List[str]=None, listregs:str=".*") -> Tuple[int, Dict[str, Any]]:
+                  fwpaths:List[str]=None, rjpaths:List[str]=None, listregs:str=".*",
+                  offset:int=0, limit:int=0) -> Tuple[int, Dict[str, Any]]:
         """
-        ファイルリストを取得する
+        ファイルリストを取得する。
+        ディレクトリ配下のエントリ情報は `DirIndex` にキャッシュされたものを使用する。
 
         Args:
             path (str): ファイルパス
@@ -110,6 +132,8 @@ class Filer(object):
             fwpaths (List[str], optional): 範囲内かどうかを示すパスのリスト, by default None
             rjpaths (List[str], optional): 範囲外かどうかを示すパスのリスト, by default None
             listregs (str, optional): リストアップするgrep条件, by default ".*"
+            offset (int, optional): 指定したパス直下のエントリを何件目から返すか, by default 0
+            limit (int, optional): 指定したパス直下のエントリを返す最大件数。0以下の場合は全件, by default 0
     
         Returns:
             int: レスポンスコード
@@ -136,7 +160,7 @@ class Filer(object):
         path_tree = {}
         data_dir_len = len(str(self.data_dir))
 
-        def _path_tree(file_list:Path, cpart:str, i, listregs_pt:re.Pattern, recursive:bool=False):
+        def _path_tree(file_list:Path, cpart:str, i, listregs_pt:re.Pattern, recursive:bool=False, page:bool=False):
             children = dict()
             if not file_list.is_dir():
                 tparts = str(file_list)[data_dir_len:].replace("\\","/").split("/")
@@ -148,9 +172,7 @@ class Filer(object):
                 cpart = '/' if cpart=='' else cpart
                 if not file_list.exists():
                     return tpath_key, None
-                if any(fwpath.startswith(tpath) or tpath.startswith(fwpath) for fwpath in fwpaths) \
-                    and not any(re.match(rjpath, tpath) for rjpath in rjpaths) \
-                    and not re.search(r'\.meta/', tpath) and not re.search(r'\.meta$', tpath):
+                if matcher.allowed(tpath):
                     if not listregs_pt.match(file_list.name):
                         return tpath_key, None
                     return tpath_key, dict(name=cpart,
@@ -159,37 +181,41 @@ class Filer(object):
                                     children=children,
                                     size=file_list.stat().st_size,
                                     last=_ts2str(file_list.stat().st_mtime),
+                                    mtime_ns=file_list.stat().st_mtime_ns,
                                     meta=common.load_meta(file_list),
                                     depth=len(tparts))
-            for f in sorted(list(file_list.iterdir())):
+            total = 0
+            for ent in self.dir_index.list_dir(file_list):
+                f = file_list / ent['name']
                 parts = str(f)[data_dir_len:].replace("\\","/").split("/")
                 path = "/".join(parts[0:i+2])
                 path = f'.{path}' if current_path_parts[0] == '.' else path
                 key = common.safe_fname(path)
                 if key in children:
                     continue
-                mime_type, encoding = mimetypes.guess_type(str(f))
-                if recursive and f.is_dir():
-                    _, path_tree = _path_tree(f, f.name, i+1, listregs_pt, recursive)
+                if recursive and ent['is_dir']:
+                    pass
+                elif not matcher.allowed(path) or not listregs_pt.match(ent['name']):
+                    continue
+                # ページングの範囲外のエントリは件数だけ数えて、再帰的な取得を行わない
+                total += 1
+                if page and (total <= offset or (limit > 0 and total > offset + limit)):
+                    continue
+                if recursive and ent['is_dir']:
+                    _, path_tree = _path_tree(f, ent['name'], i+1, listregs_pt, recursive)
                     if path_tree is None:
                         continue
                     children[key] = path_tree
                     continue
-                if not f.exists():
-                    continue
-                if any(fwpath.startswith(path) or path.startswith(fwpath) for fwpath in fwpaths) \
-                    and not any(re.match(rjpath, path) for rjpath in rjpaths) \
-                    and not re.search(r'\.meta/', path) and not re.search(r'\.meta$', path):
-                    if not listregs_pt.match(f.name):
-                        continue
-                    children[key] = dict(name=f.name,
-                                        is_dir=f.is_dir(),
-                                        path=path,
-                                        mime_type=mime_type,
-                                        size=f.stat().st_size,
-                                        last=_ts2str(f.stat().st_mtime),
-                                        meta=common.load_meta(f),
-                                        depth=len(parts))
+                children[key] = dict(name=ent['name'],
+                                    is_dir=ent['is_dir'],
+                                    path=path,
+                                    mime_type=ent['mime_type'],
+                                    size=ent['size'],
+                                    last=_ts2str(ent['mtime']),
+                                    mtime_ns=ent.get('mtime_ns'),
+                                    meta=dict(ent['meta']),
+                                    depth=len(parts))
 
             tparts = str(file_list)[data_dir_len:].replace("\\","/").split("/")
             tpath = "/".join(tparts[0:i+1])
@@ -198,18 +224,28 @@ class Filer(object):
             tpath = '/' if tpath=='' else tpath
             tpath_key = common.safe_fname(tpath)
             cpart = '/' if cpart=='' else cpart
-            return tpath_key, dict(name=cpart,
-                                   is_dir=True,
-                                   path=tpath,
-                                   children=children,
-                                   size=0,
-                                   last="",
-                                   depth=len(tparts))
+            node = dict(name=cpart,
+                        is_dir=True,
+                        path=tpath,
+                        children=children,
+                        size=0,
+                        last="",
+                        depth=len(tparts))
+            if page:
+                node['total'] = total
+                node['offset'] = offset
+                node['limit'] = limit
+            return tpath_key, node
         listregs_pt = re.compile(listregs)
+        matcher = pathmatcher.PathMatcher.get(fwpaths, rjpaths)
+        offset = 0 if offset is None or offset < 0 else offset
+        limit = 0 if limit is None else limit
         for i, cpart in enumerate(current_path_parts):
             cpath = '/'.join(current_path_parts[1:i+1])
             file_list:Path = self.data_dir / cpath
-            tpath_key, pt = _path_tree(file_list, cpart, i, listregs_pt, recursive if i+1==len(current_path_parts) else False)
+            is_target = i+1==len(current_path_parts)
+            tpath_key, pt = _path_tree(file_list, cpart, i, listregs_pt, recursive if is_target else False,
+                                       page=is_target and (offset > 0 or limit > 0))
             if pt is None:
                 continue
             path_tree[tpath_key] = pt
@@ -238,6 +274,7 @@ class Filer(object):
 
         try:
             abspath.mkdir(parents=True, exist_ok=exist_ok)
+            self.dir_index.invalidate(abspath)
             ret_path = str(Path(current_path).parent).replace("\\","/")
             return self.RESP_SUCCESS, dict(success=dict(path=f"{ret_path}",msg=f"Created {abspath}"))
         except Exception as e:
@@ -270,6 +307,7 @@ class Filer(object):
 
         try:
             common.rmdirs(abspath, ignore_errors=notexist_ok)
+            self.dir_index.invalidate(abspath)
             ret_path = str(Path(current_path).parent).replace("\\","/")
             return self.RESP_SUCCESS, dict(success=dict(path=f"{ret_path}",msg=f"Removed {abspath}"))
         except Exception as e:
@@ -277,7 +315,8 @@ class Filer(object):
             return self.RESP_WARN, dict(warn=f"Failed to remove {abspath}. {e}")
 
     def file_download(self, current_path:str, img_thumbnail:float=0.0,
-                      fwpaths:List[str]=None, rjpaths:List[str]=None, meta:Dict[str, Any]=None, etag:str=None) -> Tuple[int, Dict[str, Any]]:
+                      fwpaths:List[str]=None, rjpaths:List[str]=None, meta:Dict[str, Any]=None, etag:str=None,
+                      raw:bool=False) -> Tuple[int, Dict[str, Any]]:
         """
         ファイルをダウンロードする
 
@@ -288,6 +327,7 @@ class Filer(object):
             rjpaths (List[str], optional): 範囲外かどうかを示すパスのリスト. Defaults to None.
             meta (Dict[str, Any], optional): メタデータ. Defaults to None.
             etag (str, optional): ETag. Defaults to None.
+            raw (bool, optional): ファイルの内容をBase64文字列ではなくbytesで返すかどうか. Defaults to False.
 
         Returns:
             int: レスポンスコード
@@ -313,6 +353,8 @@ class Filer(object):
                     img = convert.imgbytes2thumbnail(fd, (img_thumbnail, img_thumbnail))
                     fd = convert.img2byte(img, "jpeg")
                     #fname = f"{fname}.thumbnail.jpg"
+                if raw:
+                    return fd
                 data = convert.bytes2b64str(fd)
                 return data
             file_etag = str(abspath.stat().st_mtime_ns)
@@ -321,11 +363,122 @@ class Filer(object):
             else:
                 data = common.load_file(abspath, _r, mode='rb', nolock=True)
                 meta = common.save_meta(abspath, meta)
+                self.dir_index.invalidate(abspath)
             return self.RESP_SUCCESS, dict(success=dict(name=fname, data=data, mime_type=mime_type, etag=file_etag, not_modified=False, meta=meta))
         except Exception as e:
             self.logger.warning(f"Failed to download {abspath}. {e}")
             return self.RESP_WARN, dict(warn=f"Failed to download {abspath}. {e}")
 
+    def _transfer_hasher(self, key:str, offset:int, rebuild:Path=None) -> Optional[Any]:
+        """
+        分割転送のハッシュ値の計算状態を、offsetまで計算済みの状態で取り出す
+
+        Args:
+            key (str): 転送を識別するキー
+            offset (int): 転送済みのサイズ
+            rebuild (Path, optional): 計算状態が無い場合に、先頭からoffsetまでを読み込んで計算し直すファイル. Defaults to None.
+
+        Returns:
+            Optional[Any]: SHA-256の計算状態。計算状態が無く作り直せない場合はNone
+        """
+        with self._transfers_lock:
+            state = self._transfers.pop(key, None)
+        if state is not None and state[0] == offset:
+            return state[1]
+        if offset == 0:
+            return hashlib.sha256()
+        if rebuild is None:
+            return None
+        hasher = hashlib.sha256()
+        with open(rebuild, 'rb') as f:
+            while f.tell() < offset:
+                block = f.read(min(1024 * 1024, offset - f.tell()))
+                if not block:
+                    return None
+                hasher.update(block)
+        return hasher
+
+    def _transfer_save(self, key:str, size:int, hasher:Any) -> None:
+        """
+        分割転送のハッシュ値の計算状態を保存する
+
+        Args:
+            key (str): 転送を識別するキー
+            size (int): 転送済みのサイズ
+            hasher (Any): SHA-256の計算状態
+        """
+        with self._transfers_lock:
+            self._transfers[key] = (size, hasher)
+            self._transfers.move_to_end(key)
+            while len(self._transfers) > self.MAX_TRANSFERS:
+                self._transfers.popitem(last=False)
+
+    def file_download_chunk(self, current_path:str, offset:int, chunk_size:int,
+                            fwpaths:List[str]=None, rjpaths:List[str]=None, meta:Dict[str, Any]=None, etag:str=None,
+                            transfer_id:str=None) -> Tuple[int, Dict[str, Any]]:
+        """
+        ファイルを分割してダウンロードする。
+        指定された位置からchunk_size分だけを読み込むため、ファイルサイズに関わらずメモリ使用量は一定になる。
+        最後のチャンクではファイル全体のSHA-256ハッシュ値を返す。
+        ハッシュ値は転送IDごとに送信したチャンクから計算し、計算状態が無い場合のみファイル全体を読み込んで計算する。
+
+        Args:
+            current_path (str): ファイルパス
+            offset (int): 読み込みを開始する位置
+            chunk_size (int): 読み込むサイズ
+            fwpaths (List[str], optional): 範囲内かどうかを示すパスのリスト. Defaults to None.
+            rjpaths (List[str], optional): 範囲外かどうかを示すパスのリスト. Defaults to None.
+            meta (Dict[str, Any], optional): メタデータ. Defaults to None.
+            etag (str, optional): 転送中のファイルのETag。指定した場合、ファイルが変更されていればエラーにする. Defaults to None.
+            transfer_id (str, optional): 転送ID. Defaults to None.
+
+        Returns:
+            int: レスポンスコード
+            dict: メッセージ。dataにはチャンクのbytesが格納される
+        """
+        chk, abspath, msg = self._file_exists(current_path)
+        if not chk:
+            return self.RESP_WARN, msg
+        chk, msg = self.check_fwpath(current_path, fwpaths, rjpaths)
+        if not chk:
+            return self.RESP_WARN, msg
+        if abspath.is_dir():
+            self.logger.warning(f"Path {abspath} is directory.")
+            return self.RESP_WARN, dict(warn=f"Path {abspath} is directory.")
+        if chunk_size is None or chunk_size <= 0:
+            return self.RESP_WARN, dict(warn=f"chunk_size must be greater than 0. chunk_size={chunk_size}")
+        if transfer_id is not None and not self._TRANSFER_ID.match(str(transfer_id)):
+            return self.RESP_WARN, dict(warn=f"transfer_id is invalid. transfer_id={transfer_id}")
+
+        try:
+            mime_type, encoding = mimetypes.guess_type(str(abspath))
+            stat = abspath.stat()
+            file_etag = str(stat.st_mtime_ns)
+            if etag is not None and etag != file_etag:
+                self.logger.warning(f"File {abspath} was modified during transfer.")
+                return self.RESP_WARN, dict(warn=f"File {abspath} was modified during transfer.")
+            with open(abspath, 'rb') as f:
+                f.seek(offset)
+                data = f.read(chunk_size)
+            eof = offset + len(data) >= stat.st_size
+            res = dict(name=abspath.name, data=data, mime_type=mime_type, etag=file_etag, not_modified=False,
+                       offset=offset, total_size=stat.st_size, eof=eof)
+            if offset == 0:
+                res['meta'] = common.save_meta(abspath, meta)
+                self.dir_index.invalidate(abspath)
+            key = f"download:{abspath}:{file_etag}:{transfer_id}" if transfer_id is not None else None
+            hasher = self._transfer_hasher(key, offset) if key is not None else None
+            if hasher is not None:
+                hasher.update(data)
+            if eof:
+                res['hash'] = hasher.hexdigest() if hasher is not None else common.hash_file(abspath)
+            elif hasher is not None:
+                self._transfer_save(key, offset + len(data), hasher)
+            return self.RESP_SUCCESS, dict(success=res)
+        except Exception as e:
+            self.logger.warning(f"Failed to download {abspath}. {e}")
+            return self.RESP_WARN, dict(warn=f"Failed to download {abspath}. {e}")
+
     def file_upload(self, current_path:str, file_name:str, file_data:bytes, mkdir:bool,
                     overwrite:bool, fwpaths:List[str]=None, rjpaths:List[str]=None,
                     meta: Dict[str, Any]=None) -> Tuple[int, Dict[str, Any]]:
@@ -347,35 +500,136 @@ class Filer(object):
             dict: メッセージ
             meta (Dict[str, Any], optional): メタデータ. Defaults to None.
         """
+        st, save_path, msg = self._upload_path(current_path, file_name, overwrite, fwpaths, rjpaths)
+        if st != self.RESP_SUCCESS:
+            return st, msg
+        try:
+            if mkdir:
+                save_path.parent.mkdir(parents=True, exist_ok=True)
+            def _w(f):
+                f.write(file_data)
+            self._update_meta_user(meta)
+            common.save_file(Path(save_path), _w, mode='wb', nolock=False, meta=meta)
+            self.dir_index.invalidate(save_path)
+            return self.RESP_SUCCESS, dict(success=f"Uploaded {save_path}")
+        except Exception as e:
+            self.logger.warning(f"Failed to upload {save_path}. {e}")
+            return self.RESP_WARN, dict(warn=f"Failed to upload {save_path}. {e}")
+
+    def _upload_path(self, current_path:str, file_name:str, overwrite:bool,
+                     fwpaths:List[str]=None, rjpaths:List[str]=None) -> Tuple[int, Path, Dict[str, Any]]:
+        """
+        アップロード先のファイルパスを決定する
+
+        Args:
+            current_path (str): ファイルパス
+            file_name (str): ファイル名
+            overwrite (bool): 上書きするかどうか
+            fwpaths (List[str], optional): 範囲内かどうかを示すパスのリスト. Defaults to None.
+            rjpaths (List[str], optional): 範囲外かどうかを示すパスのリスト. Defaults to None.
+
+        Returns:
+            int: レスポンスコード
+            Path: アップロード先のファイルパス
+            dict: メッセージ
+        """
         chk, abspath, msg = self._file_exists(current_path, exists_chk=False)
         if not chk:
-            return self.RESP_WARN, msg
+            return self.RESP_WARN, None, msg
         chk, msg = self.check_fwpath(current_path, fwpaths, rjpaths, exists_chk=False)
         if not chk:
-            return self.RESP_WARN, msg
+            return self.RESP_WARN, None, msg
 
         if abspath.exists():
             if abspath.is_dir():
                 abspath = abspath / file_name
             if abspath.is_file() and not overwrite:
                 self.logger.warning(f"Path {abspath} already exist. param={current_path}")
-                return self.RESP_WARN, dict(warn=f"Path {abspath} already exist. param={current_path}")
+                return self.RESP_WARN, None, dict(warn=f"Path {abspath} already exist. param={current_path}")
             save_path = abspath
         elif abspath.suffix == '':
             abspath.mkdir(parents=True, exist_ok=True)
             save_path = abspath / file_name
         else:
             save_path = abspath
+        return self.RESP_SUCCESS, save_path, None
+
+    def _update_meta_user(self, meta:Dict[str, Any]) -> None:
+        """
+        メタデータの最終アクセス情報を最終更新情報に反映する
+
+        Args:
+            meta (Dict[str, Any]): メタデータ
+        """
+        if meta and 'last_access_user' in meta and 'last_update_user' not in meta:
+            meta['last_update_user'] = meta['last_access_user']
+        if meta and 'last_access_date' in meta and 'last_update_date' not in meta:
+            meta['last_update_date'] = meta['last_access_date']
+
+    def file_upload_chunk(self, current_path:str, file_name:str, chunk:bytes, offset:int, total_size:int,
+                          file_hash:str, mkdir:bool, overwrite:bool, fwpaths:List[str]=None, rjpaths:List[str]=None,
+                          meta:Dict[str, Any]=None, transfer_id:str=None) -> Tuple[int, Dict[str, Any]]:
+        """
+        ファイルを分割してアップロードする。
+        受信したチャンクは `<ファイル名>.<転送ID>.part` に書き込み、最後のチャンクを受信した時にハッシュ値を検証してファイル名を変更する。
+        ハッシュ値は受信したチャンクから計算し、再開時など計算状態が無い場合のみ途中ファイルを読み込んで計算し直す。
+        offsetに負の値を指定した場合は書き込まずに、再開すべきoffsetを返す。
+
+        Args:
+            current_path (str): ファイルパス
+            file_name (str): ファイル名
+            chunk (bytes): チャンクのデータ
+            offset (int): チャンクのファイル内の位置
+            total_size (int): ファイル全体のサイズ
+            file_hash (str): ファイル全体のSHA-256ハッシュ値。最後のチャンクでのみ検証する
+            mkdir (bool): ディレクトリを作成するかどうか
+            overwrite (bool): 上書きするかどうか
+            fwpaths (List[str], optional): 範囲内かどうかを示すパスのリスト. Defaults to None.
+            rjpaths (List[str], optional): 範囲外かどうかを示すパスのリスト. Defaults to None.
+            meta (Dict[str, Any], optional): メタデータ. Defaults to None.
+            transfer_id (str, optional): 転送ID。省略した場合は `<ファイル名>.part` に書き込む. Defaults to None.
+
+        Returns:
+            int: レスポンスコード
+            dict: メッセージ
+        """
+        if transfer_id is not None and not self._TRANSFER_ID.match(str(transfer_id)):
+            return self.RESP_WARN, dict(warn=f"transfer_id is invalid. transfer_id={transfer_id}")
+        st, save_path, msg = self._upload_path(current_path, file_name, overwrite, fwpaths, rjpaths)
+        if st != self.RESP_SUCCESS:
+            return st, msg
+        # 同じファイルへの同時アップロードが互いの途中ファイルを壊さないよう、転送IDごとに途中ファイルを分ける
+        part_path = save_path.with_name(f"{save_path.name}.{transfer_id}.part" if transfer_id is not None else f"{save_path.name}.part")
+        key = f"upload:{part_path}"
         try:
+            part_size = part_path.stat().st_size if part_path.exists() else 0
+            if offset < 0:
+                return self.RESP_SUCCESS, dict(success=dict(offset=part_size, total_size=total_size))
+            if offset != 0 and offset != part_size:
+                self.logger.warning(f"Chunk offset mismatch. {part_path} offset={offset}, expected={part_size}")
+                return self.RESP_WARN, dict(warn=f"Chunk offset mismatch. offset={offset}, expected={part_size}", offset=part_size)
             if mkdir:
                 save_path.parent.mkdir(parents=True, exist_ok=True)
-            def _w(f):
-                f.write(file_data)
-            if meta and 'last_access_user' in meta and 'last_update_user' not in meta:
-                meta['last_update_user'] = meta['last_access_user']
-            if meta and 'last_access_date' in meta and 'last_update_date' not in meta:
-                meta['last_update_date'] = meta['last_access_date']
-            common.save_file(Path(save_path), _w, mode='wb', nolock=False, meta=meta)
+            hasher = self._transfer_hasher(key, offset, rebuild=part_path)
+            with open(part_path, 'wb' if offset == 0 else 'ab') as f:
+                f.write(chunk)
+            self.dir_index.invalidate(part_path)
+            offset += len(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+            if offset < total_size:
+                if hasher is not None:
+                    self._transfer_save(key, offset, hasher)
+                return self.RESP_SUCCESS, dict(success=dict(offset=offset, total_size=total_size))
+            part_hash = hasher.hexdigest() if hasher is not None else common.hash_file(part_path)
+            if file_hash is not None and file_hash != part_hash:
+                part_path.unlink(missing_ok=True)
+                self.logger.warning(f"File hash mismatch. {save_path}")
+                return self.RESP_WARN, dict(warn=f"File hash mismatch. {save_path}")
+            os.replace(part_path, save_path)
+            self._update_meta_user(meta)
+            common.save_meta(save_path, meta)
+            self.dir_index.invalidate(save_path)
             return self.RESP_SUCCESS, dict(success=f"Uploaded {save_path}")
         except Exception as e:
             self.logger.warning(f"Failed to upload {save_path}. {e}")
@@ -408,6 +662,7 @@ class Filer(object):
         try:
             abspath.unlink(missing_ok=notexist_ok)
             common.remove_meta(abspath)
+            self.dir_index.invalidate(abspath)
             ret_path = str(Path(current_path).parent).replace("\\","/")
             return self.RESP_SUCCESS, dict(success=dict(path=ret_path, msg=f"Removed {abspath}"))
         except Exception as e:
@@ -461,6 +716,7 @@ class Filer(object):
         else:
             self.logger.warning(f"Path {from_abspath} is not file or directory.")
             return self.RESP_WARN, dict(warn=f"Path {from_abspath} is not file or directory.")
+        self.dir_index.invalidate(to_abspath)
 
         return self.RESP_SUCCESS, dict(success=dict(path=Path(to_path).parent,
                                                     to_path=to_path,
@@ -507,6 +763,8 @@ class Filer(object):
         ret_path = shutil.move(from_abspath, to_abspath)
         common.save_meta(to_abspath, meta)
         common.remove_meta(from_abspath)
+        self.dir_index.invalidate(from_abspath)
+        self.dir_index.invalidate(to_abspath)
 
         return self.RESP_SUCCESS, dict(success=dict(path=Path(to_path).parent,
                                                     to_path=to_path,
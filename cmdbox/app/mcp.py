@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Callable, List, Dict, Any, Tuple
 import argparse
 import glob
+import hashlib
 import logging
 import time
 import os
@@ -208,6 +209,9 @@ class Mcp:
         return ToolListMiddleware()
 
 class ToolList(object):
+    # .cmdsディレクトリと言語ごとの、コマンドファイルのパスとツールの登録簿
+    _registry:Dict[Tuple, Dict[str, Dict[str, Any]]] = dict()
+
     def __init__(self, logger:logging.Logger, data:Path, *tools:List, appcls=None, ver=None, language:str=None):
         """
         ツールリストを初期化します
@@ -353,7 +357,6 @@ class ToolList(object):
             Iterator[FunctionTool]: ツールリストのイテレータ
         """
         from cmdbox.app.web import Web
-        from fastmcp.tools import FunctionTool
         options = Options.getInstance()
         ret_tools = self.tools.copy()
         web = Web.getInstance(self.logger, self.data)
@@ -365,19 +368,25 @@ class ToolList(object):
                 # 関数を抽出する場合はツールリストから関数を抽出して返す
                 return (tool.fn for tool in ret_tools if callable(tool.fn)).__iter__()
             return ret_tools.__iter__()
+        cmds_dir = Path(web.data) / ".cmds"
+        reg_key = (str(cmds_dir), str(self.data), is_japan, web.language, self.language, self.appcls, self.ver)
+        registry = ToolList._registry.get(reg_key, dict())
+        entries = dict()
         try:
             # ユーザーコマンドの読み込み
-            paths = glob.glob(str(Path(web.data) / ".cmds" / f"cmd-*.json"))
-            cmd_list = [common.loadopt(path, True) for path in paths]
-            cmd_list = sorted(cmd_list, key=lambda cmd: cmd["title"])
-            # ユーザーコマンドリストの取得(すべてのコマンドを取得するためにgroupsをadminに設定)
-            # 実行時にはユーザーのグループに応じて認可する
-            cmd_list = [dict(title=r.get('title',''), mode=r['mode'], cmd=r['cmd'],
-                        description=r.get('description','') + str(options.get_cmd_attr(r['mode'], r['cmd'], 'description_ja' if is_japan else 'description_en')),
-                        tag=r.get('tag','')) for r in cmd_list \
-                       if signin.Signin._check_cmd(signin_file_data=data, user_groups=['admin'], mode=r['mode'], cmd=r['cmd'],
-                                                   opt=r, user_name="unknown", user_session={}, logger=self.logger,
-                                                   appcls=self.appcls, ver=self.ver, language=web.language)]
+            # ファイルの更新日時とサイズ、内容のハッシュ、サインインデータの世代が変わらないコマンドは前回の結果を使用する
+            for path in glob.glob(str(cmds_dir / f"cmd-*.json")):
+                ent = registry.get(path)
+                if ent is not None and ent['signin'] is data:
+                    stamp = self._cmd_stamp(ent['files'])
+                    if stamp == ent['stamp']:
+                        entries[path] = ent
+                        continue
+                    digest = self._cmd_digest(ent['files'])
+                    if digest == ent['digest']:
+                        entries[path] = dict(ent, stamp=stamp)
+                        continue
+                entries[path] = self._load_user_cmd(path, data, options, is_japan, web.language)
         except Exception as e:
             # ユーザーコマンドの読み込みに失敗した場合は警告を出して登録済みのリストを返す
             self.logger.warning(f"Error loading user commands: {e}", exc_info=True)
@@ -386,58 +395,151 @@ class ToolList(object):
                 return (tool.fn for tool in ret_tools if callable(tool.fn)).__iter__()
             return ret_tools.__iter__()
         _tools_fns = [tool.name for tool in ret_tools]
-        # ユーザーコマンドの定義を関数として生成
-        for opt in cmd_list:
-            func_name = opt['title']
-            mode, cmd, description = opt['mode'], opt['cmd'], opt['description'] if 'description' in opt and opt['description'] else ''
-            # ユーザーコマンドもfeatures.ymlの定義に従って実行許可するかどうか。
-            #if not options.get_cmd_attr(mode, cmd, 'use_agent'):
-            #    continue
-            choices = options.get_cmd_choices(mode, cmd, False)
-            description += '\n' + str(options.get_cmd_attr(mode, cmd, 'description_ja' if is_japan else 'description_en'))
-            # 関数の定義を生成
-            if func_name:
-                opt_path = self.data / ".cmds" / f"cmd-{func_name}.json"
-                params = common.loadopt(opt_path)
-            else:
-                params = {}
-            func_txt = self._create_func_txt(func_name, mode, cmd, is_japan, options, title=opt['title'], params=params)
-            if func_txt is None: continue
-            if self.logger.level == logging.DEBUG:
-                self.logger.debug(f"generating agent tool: {func_name}")
-            func_ctx = []
-            # 関数を実行してコンテキストに追加
-            exec(func_txt,
-                dict(time=time,List=List, Path=Path, argparse=argparse, common=common, options=options, logging=logging, signin=signin,
-                     appcls=self.appcls, ver=self.ver, language=self.language),
-                dict(func_ctx=func_ctx))
-            # 関数のスキーマを生成
-            input_schema = dict(
-                type="object",
-                properties={o['opt']: self._to_schema(o, is_japan, params) for o in choices},
-                required=[],
-            )
-
-            # output_schemaを生成
-            output_schema = dict(type="object", properties=dict())
-            feat:feature.Feature = options.get_cmd_attr(mode, cmd, 'feature')
-            if feat is not None and isinstance(feat, validator.Validator):
-                schema = feat.output_schema()
-                if schema is not None:
-                    output_schema = schema.model_json_schema()
-            func_tool = FunctionTool(fn=func_ctx[0], name=func_name, title=func_name.title(), description=description, 
-                                     tags=[f"mode={mode}", f"cmd={cmd}"],
-                                     parameters=input_schema, output_schema=output_schema,)
+        cmd_ents = sorted([ent for ent in entries.values() if ent['opt'] is not None], key=lambda ent: ent['opt']["title"])
+        for ent in cmd_ents:
+            if 'tool' not in ent:
+                # ユーザーコマンドの定義を関数として生成
+                ent['tool'] = self._create_user_tool(ent['opt'], options, is_japan)
+            func_tool = ent['tool']
+            if func_tool is None: continue
+            func_name = func_tool.name
             if func_name in _tools_fns:
                 # 既に同名の関数が存在する場合は差し替え
                 self.logger.warning(f"Function {func_name} already exists, replacing.")
                 ret_tools = [tool for tool in ret_tools if tool.name != func_name]
             ret_tools.append(func_tool)
+        # 削除されたコマンドファイルは登録簿から外す
+        ToolList._registry[reg_key] = entries
         if self.extract_callable:
             # 関数を抽出する場合はツールリストから関数を抽出して返す
             return (tool.fn for tool in ret_tools if callable(tool.fn)).__iter__()
         return ret_tools.__iter__()
 
+    def _cmd_stamp(self, files:List[str]) -> Tuple:
+        """
+        コマンドファイルの更新日時とサイズを返します
+
+        Args:
+            files (List[str]): コマンドファイルのリスト
+
+        Returns:
+            Tuple: ファイルごとの(更新日時, サイズ)。ファイルが無い場合はNone
+        """
+        stamp = []
+        for f in files:
+            try:
+                st = os.stat(f)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _cmd_digest(self, files:List[str]) -> str:
+        """
+        コマンドファイルの内容のハッシュを返します
+
+        Args:
+            files (List[str]): コマンドファイルのリスト
+
+        Returns:
+            str: ハッシュ
+        """
+        h = hashlib.sha256()
+        for f in files:
+            h.update(f.encode('utf-8'))
+            if os.path.isfile(f):
+                with open(f, 'rb') as fp:
+                    h.update(fp.read())
+        return h.hexdigest()
+
+    def _load_user_cmd(self, path:str, data:Dict[str, Any], options:Options, is_japan:bool, language:str) -> Dict[str, Any]:
+        """
+        ユーザーコマンドを読み込み、登録簿のエントリーを作成します
+
+        Args:
+            path (str): コマンドファイルのパス
+            data (Dict[str, Any]): サインインファイルデータ
+            options (Options): オプション
+            is_japan (bool): 日本語かどうか
+            language (str): 言語
+
+        Returns:
+            Dict[str, Any]: エントリー。認可されないコマンドの場合はoptがNone
+        """
+        files = [path]
+        stamp, digest = self._cmd_stamp(files), self._cmd_digest(files)
+        r = common.loadopt(path, True)
+        # ユーザーコマンドリストの取得(すべてのコマンドを取得するためにgroupsをadminに設定)
+        # 実行時にはユーザーのグループに応じて認可する
+        opt = None
+        if signin.Signin._check_cmd(signin_file_data=data, user_groups=['admin'], mode=r['mode'], cmd=r['cmd'],
+                                    opt=r, user_name="unknown", user_session={}, logger=self.logger,
+                                    appcls=self.appcls, ver=self.ver, language=language):
+            opt = dict(title=r.get('title',''), mode=r['mode'], cmd=r['cmd'],
+                       description=r.get('description','') + str(options.get_cmd_attr(r['mode'], r['cmd'], 'description_ja' if is_japan else 'description_en')),
+                       tag=r.get('tag',''))
+            if opt['title']:
+                # ツールの既定値はタイトルのコマンドファイルから読み込むため、更新の判定に含める
+                opt_path = str(self.data / ".cmds" / f"cmd-{opt['title']}.json")
+                if opt_path != path:
+                    files.append(opt_path)
+                    stamp, digest = self._cmd_stamp(files), self._cmd_digest(files)
+        return dict(files=files, stamp=stamp, digest=digest, signin=data, opt=opt)
+
+    def _create_user_tool(self, opt:Dict[str, Any], options:Options, is_japan:bool) -> Any:
+        """
+        ユーザーコマンドからツールを生成します
+
+        Args:
+            opt (Dict[str, Any]): ユーザーコマンドの情報
+            options (Options): オプション
+            is_japan (bool): 日本語かどうか
+
+        Returns:
+            FunctionTool: ツール。生成しないコマンドの場合はNone
+        """
+        from fastmcp.tools import FunctionTool
+        func_name = opt['title']
+        mode, cmd, description = opt['mode'], opt['cmd'], opt['description'] if 'description' in opt and opt['description'] else ''
+        # ユーザーコマンドもfeatures.ymlの定義に従って実行許可するかどうか。
+        #if not options.get_cmd_attr(mode, cmd, 'use_agent'):
+        #    return None
+        choices = options.get_cmd_choices(mode, cmd, False)
+        description += '\n' + str(options.get_cmd_attr(mode, cmd, 'description_ja' if is_japan else 'description_en'))
+        # 関数の定義を生成
+        if func_name:
+            opt_path = self.data / ".cmds" / f"cmd-{func_name}.json"
+            params = common.loadopt(opt_path)
+        else:
+            params = {}
+        func_txt = self._create_func_txt(func_name, mode, cmd, is_japan, options, title=opt['title'], params=params)
+        if func_txt is None: return None
+        if self.logger.level == logging.DEBUG:
+            self.logger.debug(f"generating agent tool: {func_name}")
+        func_ctx = []
+        # 関数を実行してコンテキストに追加
+        exec(func_txt,
+            dict(time=time,List=List, Path=Path, argparse=argparse, common=common, options=options, logging=logging, signin=signin,
+                 appcls=self.appcls, ver=self.ver, language=self.language),
+            dict(func_ctx=func_ctx))
+        # 関数のスキーマを生成
+        input_schema = dict(
+            type="object",
+            properties={o['opt']: self._to_schema(o, is_japan, params) for o in choices},
+            required=[],
+        )
+
+        # output_schemaを生成
+        output_schema = dict(type="object", properties=dict())
+        feat:feature.Feature = options.get_cmd_attr(mode, cmd, 'feature')
+        if feat is not None and isinstance(feat, validator.Validator):
+            schema = feat.output_schema()
+            if schema is not None:
+                output_schema = schema.model_json_schema()
+        return FunctionTool(fn=func_ctx[0], name=func_name, title=func_name.title(), description=description,
+                            tags=[f"mode={mode}", f"cmd={cmd}"],
+                            parameters=input_schema, output_schema=output_schema,)
+
     def _to_schema(self, o:Dict[str, Any], is_japan:bool, params:Dict[str, Any]={}) -> Dict[str, Any]:
         t, m = o["type"], o["multi"]
         title = o['opt'].title().replace('_', ' ')
@@ -8,6 +8,7 @@ from starlette.routing import Route
 from starlette.datastructures import FormData
 from typing import List, Dict, Any 
 import argparse
+import copy
 import functools
 import logging
 import re
@@ -263,7 +264,103 @@ class Options:
                 file_dict[key] = val
         return opt_list, file_dict
 
+    def mk_args(self, opt:dict, language:str=None) -> argparse.Namespace:
+        """
+        オプションの辞書からコマンドの引数を作成します。
+        ``mk_opt_list`` の引数リストを ``argparse`` で解析した場合と同じ値になりますが、
+        引数リストの作成と解析を行わずにキャッシュしたオプションの定義で検証と型変換を行います。
+
+        Args:
+            opt (dict): オプションの辞書。modeとcmdを含む
+            language (str, optional): 言語. Defaults to None.
+
+        Raises:
+            argparse.ArgumentError: オプションの値が不正な場合
+
+        Returns:
+            argparse.Namespace: コマンドの引数
+        """
+        if language not in self._args_schema:
+            args_schema = dict()
+            for key, o in self.list_options(language=language).items():
+                default = o["default"] if o["default"] is not None and o["default"] != "" else None
+                if isinstance(default, str) and o["type"] in (int, float):
+                    default = o["type"](default)
+                args_schema[key] = (o["type"], o["action"], default)
+            # useoptを指定しない場合の初期値
+            args_base = {key:common.chopdq(common.getopt(dict(), key, preval={key:default}))
+                         for key, (_, _, default) in args_schema.items()}
+            self._args_schema[language] = (args_schema, args_base)
+        args_schema, args_base = self._args_schema[language]
+        # 初期値のリストや辞書は呼出し先で変更されるとキャッシュした初期値も変わるため、複製して渡す
+        args_dict = {key:(copy.deepcopy(val) if isinstance(val, (list, dict, set)) else val) for key, val in args_base.items()}
+        args_dict['mode'] = opt['mode']
+        args_dict['cmd'] = opt['cmd']
+        changed = {'mode', 'cmd'}
+        opt_schema = {o['opt']:o for o in self.get_cmd_choices(opt['mode'], opt['cmd']) if type(o) is dict and 'opt' in o}
+        file_dict = dict()
+        for key, val in opt.items():
+            if key in ['capture_stdout', 'capture_maxsize']:
+                continue
+            schema = opt_schema.get(key)
+            if schema is None or key not in args_schema or val == '':
+                continue
+            if schema['type'] == Options.T_BOOL:
+                if val is True or str(val).lower() == 'true':
+                    args_dict[key] = True
+                continue
+            if 'fileio' in schema and schema['fileio'] == 'in' and type(val) != str:
+                file_dict[key] = val
+            if type(val) == list:
+                vals = [v for v in val if v is not None and v != '']
+            elif type(val) == dict:
+                vals = [f'{k}={v}' for k, v in val.items() if k is not None and k != '' and v is not None and v != '']
+            elif val is not None:
+                vals = [val]
+            else:
+                vals = []
+            if len(vals) == 0:
+                continue
+            otype, action, _ = args_schema[key]
+            choices = None
+            if schema.get('choice') is not None and not schema.get('choice_edit', False):
+                choices = [c['opt'] if type(c) == dict else c for c in schema['choice'] if c is not None and c != ""]
+            values = []
+            for v in vals:
+                v = common.chopdq(str(v))
+                if otype in (int, float):
+                    try:
+                        v = otype(v)
+                    except ValueError:
+                        raise argparse.ArgumentError(None, f"argument --{key}: invalid {otype.__name__} value: '{v}'")
+                if choices and v not in choices:
+                    raise argparse.ArgumentError(None, f"argument --{key}: invalid choice: {v!r} (choose from {', '.join(map(repr, choices))})")
+                values.append(v)
+            args_dict[key] = values if action == 'append' else values[-1]
+            changed.add(key)
+        # ファイルで指定されたオプションで上書きする
+        for key, val in file_dict.items():
+            args_dict[key] = val
+            changed.add(key)
+        # useoptオプションで指定されたオプションファイルを読み込み、最終的に使用するオプションにマージする
+        # useoptが無い場合は初期値のマージが済んでいるため、指定されたオプションだけをマージする
+        useopt = common.loadopt(args_dict['useopt'])
+        for key in (list(args_dict.keys()) if useopt else changed):
+            args_dict[key] = common.getopt(useopt, key, preval=args_dict, withset=True)
+            # オプションの型が辞書の場合は、文字列から辞書に変換する
+            if args_schema[key][0] is dict and isinstance(args_dict[key], list):
+                d = dict()
+                for v in args_dict[key]:
+                    kv = v.split('=')
+                    d[kv[0]] = kv[1] if len(kv) > 1 else None
+                args_dict[key] = d
+            args_dict[key] = common.chopdq(args_dict[key])
+        # featuresの初期値を適用する
+        self.load_features_args(args_dict, language=language, multi_check=True)
+        return argparse.Namespace(**args_dict)
+
     def init_options(self):
+        self._args_schema = dict()
         self._options = dict()
         self._options["version"] = dict(
             short="v", type=Options.T_BOOL, default=None, required=False, multi=False, hide=True, choice=None,
@@ -462,6 +559,7 @@ class Options:
                 if jadge == 'allow': opt['use_agent'] = True
                 if 'use_agent' not in opt: opt['use_agent'] = False
         self._package_names.append(package_name)
+        self._args_schema = dict()
         self.init_debugoption()
     
     def is_features_loaded(self, ftype:str) -> bool:
@@ -547,8 +645,12 @@ class Options:
         if 'args' not in yml or 'cli' not in yml['args']:
             return
 
-        opts = self.list_options(language=language, multi_check=multi_check)
+        opts = None
         def _cast(self, key, val):
+            # オプション一覧の作成は重いため、ルールに一致した時だけ作成する
+            nonlocal opts
+            if opts is None:
+                opts = self.list_options(language=language, multi_check=multi_check)
             for opt in opts.values():
                 if f"--{key}" in opt['opts']:
                     if opt['type'] == int:
@@ -681,6 +783,7 @@ class Options:
                     del self._options["cmd"][src_mode]
                 if len(self._options["mode"][src_mode]) == 1:
                     del self._options["mode"][src_mode]
+        self._args_schema = dict()
         self.aliases_loaded_cli = True
 
     def load_features_aliases_web(self, routes:List[Route], logger:logging.Logger):
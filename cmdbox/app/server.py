@@ -1,8 +1,9 @@
 from pathlib import Path
 from cmdbox.app import common, filer, feature, options
-from cmdbox.app.commons import redis_client
+from cmdbox.app.commons import dbpool, msgframe, redis_client
+from concurrent.futures import ThreadPoolExecutor
 from redis import exceptions
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import json
 import logging
 import redis
@@ -19,8 +20,24 @@ local new_value = current + tonumber(ARGV[2])
 redis.call('HSET', KEYS[1], ARGV[1], new_value)
 return new_value
 """
+    # Redis Luaスクリプト: 1メッセージ分の受信件数・結果件数・更新時刻をまとめて記録する
+    # KEYS[1]: hash key
+    # ARGV[1]: result field name (empty string if none), ARGV[2]: ctime
+    _RESULT_COUNT_LUA = """
+redis.call('HINCRBY', KEYS[1], 'receive_cnt', 1)
+if ARGV[1] ~= '' then
+    redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+end
+redis.call('HSET', KEYS[1], 'ctime', ARGV[2])
+return 1
+"""
+    # 同時実行数が上限のコマンドがある場合に、Redisのリストの先頭から走査するメッセージの数
+    SCAN_WINDOW = 16
+    # 同時実行数が上限のコマンドのメッセージしかない場合に、再度走査するまでの最大待機秒数
+    SCAN_INTERVAL = 0.1
 
-    def __init__(self, data_dir:Path, logger:logging.Logger, redis_host:str="localhost", redis_port:int=6379, redis_password:str=None, svname:str='server'):
+    def __init__(self, data_dir:Path, logger:logging.Logger, redis_host:str="localhost", redis_port:int=6379, redis_password:str=None, svname:str='server',
+                 max_workers:int=100, max_svcmd_workers:int=0):
         """
         Redisサーバーに接続し、クライアントからのコマンドを受信し実行する
 
@@ -31,6 +48,8 @@ return new_value
             redis_port (int): Redisポート番号, by default 6379
             redis_password (str): Redisパスワード, by default None
             svname (str, optional): サーバーのサービス名. by default 'server'
+            max_workers (int, optional): コマンドを同時に実行するワーカースレッドの最大数. by default 100
+            max_svcmd_workers (int, optional): 同じコマンドを同時に実行するワーカースレッドの最大数. 0以下の場合は制限しない. by default 0
         """
         super().__init__(data_dir, logger)
         if svname.find('-') >= 0:
@@ -45,12 +64,21 @@ return new_value
         self.is_running = False
         self.train_thread = None
         self.cleaning_interval = 60
+        if max_workers is None or max_workers <= 0:
+            raise ValueError(f"max_workers must be greater than 0. max_workers={max_workers}")
+        self.max_workers = max_workers
+        self.max_svcmd_workers = max_svcmd_workers if max_svcmd_workers is not None else 0
+        self.pool_cond = threading.Condition()
+        self.pool_active = 0
+        self.svcmd_active:Dict[str, int] = dict()
         if self.logger.level == logging.DEBUG:
             self.logger.debug(f"server init parameter: data={self.data_dir} -> {self.data_dir.absolute()}")
             self.logger.debug(f"server init parameter: redis_host={self.redis_host}")
             self.logger.debug(f"server init parameter: redis_port={self.redis_port}")
             self.logger.debug(f"server init parameter: redis_password=********")
             self.logger.debug(f"server init parameter: svname={self.svname}")
+            self.logger.debug(f"server init parameter: max_workers={self.max_workers}")
+            self.logger.debug(f"server init parameter: max_svcmd_workers={self.max_svcmd_workers}")
         self.options = options.Options.getInstance()
 
     def __enter__(self):
@@ -93,27 +121,20 @@ return new_value
         """
         Redisサーバーに残っている停止済みのサーバーキーを削除する
         """
-        hblist = self.redis_cli.keys("hb-*")
-        for hb in hblist:
-            hb = hb.decode()
-            try:
-                v = self.redis_cli.hget(hb, 'ctime')
-                if v is None:
-                    continue
-            except exceptions.ResponseError:
-                self.logger.warning(f"Failed to get ctime. {hb}", exc_info=True)
-                continue
-            tm = time.time() - float(v)
-            if tm > self.cleaning_interval:
-                self.redis_cli.delete(hb)
-                self.redis_cli.delete(hb.replace("hb-", "sv-"))
+        for org_svname, svnames in self.redis_cli.stale_servers().items():
+            for svname in svnames:
+                self.redis_cli.delete(f"hb-{svname}")
+                self.redis_cli.delete(f"sv-{svname}")
+                self.redis_cli.redis_cli.zrem(f"{self.redis_cli.SVREG_NAME}-{org_svname}", svname)
+            if self.redis_cli.redis_cli.zcard(f"{self.redis_cli.SVREG_NAME}-{org_svname}") <= 0:
+                self.redis_cli.redis_cli.srem(self.redis_cli.SVREG_NAME, org_svname)
 
     def _clean_reskey(self):
         """
         Redisサーバーに残っている停止済みのクライアントキーを削除する
         """
-        rlist = self.redis_cli.keys("cl-*")
-        for reskey in rlist:
+        # KEYSはRedis全体をブロックするため、SCANで少しずつ走査する
+        for reskey in self.redis_cli.scan_iter("cl-*"):
             try:
                 tm = int(reskey.decode().split("-")[2])
                 if time.time() - tm > self.cleaning_interval:
@@ -121,104 +142,207 @@ return new_value
             except Exception as e:
                 self.redis_cli.delete(reskey)
 
+    def _wait_worker(self, timeout:float) -> bool:
+        """
+        ワーカーに空きができるまで待機する
+
+        Args:
+            timeout (float): 最大待機秒数
+
+        Returns:
+            bool: 空きがある場合はTrue
+        """
+        with self.pool_cond:
+            return self.pool_cond.wait_for(lambda: self.pool_active < self.max_workers, timeout=timeout)
+
+    def _acquire_worker(self, svcmd:str) -> bool:
+        """
+        コマンドを実行するワーカーの枠を確保する
+
+        Args:
+            svcmd (str): サーバー側のコマンド
+
+        Returns:
+            bool: 確保できた場合はTrue
+        """
+        with self.pool_cond:
+            if self.pool_active >= self.max_workers:
+                return False
+            if self.max_svcmd_workers > 0 and self.svcmd_active.get(svcmd, 0) >= self.max_svcmd_workers:
+                return False
+            self.pool_active += 1
+            self.svcmd_active[svcmd] = self.svcmd_active.get(svcmd, 0) + 1
+            return True
+
+    def _release_worker(self, svcmd:str) -> None:
+        """
+        確保したワーカーの枠を解放する
+
+        Args:
+            svcmd (str): サーバー側のコマンド
+        """
+        with self.pool_cond:
+            self.pool_active -= 1
+            cnt = self.svcmd_active.get(svcmd, 0) - 1
+            if cnt > 0:
+                self.svcmd_active[svcmd] = cnt
+            elif svcmd in self.svcmd_active:
+                del self.svcmd_active[svcmd]
+            self.pool_cond.notify_all()
+
+    def _capped_svcmds(self) -> set:
+        """
+        同時実行数が上限に達しているコマンドを返す
+
+        Returns:
+            set: 同時実行数が上限に達しているコマンド
+        """
+        if self.max_svcmd_workers <= 0:
+            return set()
+        with self.pool_cond:
+            return {svcmd for svcmd, cnt in self.svcmd_active.items() if cnt >= self.max_svcmd_workers}
+
+    def _pop_message(self) -> Optional[Tuple[bytes, List[Any], bool]]:
+        """
+        Redisのリストからメッセージを1件取り出す。
+        同時実行数が上限のコマンドがある場合は、リストの先頭から ``SCAN_WINDOW`` 件を走査し、
+        上限でないコマンドのうち最も古いメッセージだけを取り出す。上限のコマンドのメッセージは取り出さずにRedisに残す。
+
+        Returns:
+            Optional[Tuple[bytes, List[Any], bool]]: 受信したメッセージ, 解析したメッセージ, クラスター宛のメッセージかどうか。無い場合はNone
+        """
+        capped = self._capped_svcmds()
+        if not capped:
+            # 自サーバー宛とクラスター宛のリストを1回のBLPOPで待つ。両方にある場合は自サーバー宛を優先する
+            cluster_key = f"sv-{self.org_svname}"
+            result = self.redis_cli.blpop([self.redis_cli.svname, cluster_key])
+            if result is None or len(result) <= 0:
+                return None
+            key = result[0].decode() if isinstance(result[0], bytes) else result[0]
+            # バイナリフレームと旧形式のテキストメッセージの両方を受け付ける
+            return result[1], msgframe.parse_cmd(result[1]), key == cluster_key
+        for key, to_cluster in ((self.redis_cli.svname, False), (f"sv-{self.org_svname}", True)):
+            for msg_raw in self.redis_cli.redis_cli.lrange(key, 0, self.SCAN_WINDOW - 1):
+                try:
+                    msg = msgframe.parse_cmd(msg_raw)
+                except Exception:
+                    # 解析できないメッセージは取り出して、呼び出し元でエラーとして扱う
+                    msg = None
+                if msg is not None and len(msg) > 0 and msg[0] in capped:
+                    continue
+                # 他のサーバーが先に取り出した場合は0件となるため、次のメッセージを探す
+                if self.redis_cli.redis_cli.lrem(key, 1, msg_raw) > 0:
+                    return msg_raw, msgframe.parse_cmd(msg_raw) if msg is None else msg, to_cluster
+        # 上限のコマンドのメッセージしかない場合は、ワーカーの枠が解放されるまで待機する
+        with self.pool_cond:
+            self.pool_cond.wait(timeout=self.SCAN_INTERVAL)
+        return None
+
+    def _count_result(self, redis_cli:redis_client.RedisClient, st:int) -> None:
+        """
+        1メッセージ分の処理結果をハートビートのカウンタに記録する
+
+        Args:
+            redis_cli (redis_client.RedisClient): Redisクライアント
+            st (int): 処理結果のレスポンスコード。結果がない場合はNone
+        """
+        cnt_key = {self.RESP_SUCCESS:'success_cnt', self.RESP_WARN:'warn_cnt', self.RESP_ERROR:'error_cnt'}.get(st, '')
+        try:
+            redis_cli.redis_cli.eval(self._RESULT_COUNT_LUA, 1, redis_cli.hbname, cnt_key, time.time())
+        except exceptions.RedisError as e:
+            self.logger.warning(f"Failed to count the result. {e}", exc_info=True)
+
     def _run_server(self):
         self.logger.info(f"start server. svname={self.svname}")
         ltime = time.time()
         # Luaスクリプトを使用したアトミックなカウンタ管理
-        self.redis_cli.hset(self.redis_cli.hbname, 'receive_cnt', 0)
-        self.redis_cli.hset(self.redis_cli.hbname, 'success_cnt', 0)
-        self.redis_cli.hset(self.redis_cli.hbname, 'warn_cnt', 0)
-        self.redis_cli.hset(self.redis_cli.hbname, 'error_cnt', 0)
+        self.redis_cli.redis_cli.hset(self.redis_cli.hbname, mapping=dict(receive_cnt=0, success_cnt=0, warn_cnt=0, error_cnt=0))
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"svrun_{self.svname}")
 
-        def _publish(msg_str):
+        def _publish(msg_raw:bytes):
             # 各サーバーにメッセージを配布する
-            hblist = self.redis_cli.keys(f"hb-{self.org_svname}-*")
-            for hb in hblist:
-                hb = hb.decode()
-                sv = hb.replace("hb-", "sv-")
-                self.redis_cli.rpush(sv, msg_str)
+            for svname in self.redis_cli.live_servers(self.org_svname):
+                self.redis_cli.rpush(f"sv-{svname}", msg_raw)
 
-        def _process(msg:list[str], to_cluster:bool, logger:logging.Logger,
+        def _process(msg_raw:bytes, msg:list[str], to_cluster:bool, logger:logging.Logger,
                      svname:str, data_dir:Path, redis_cli:redis_client.RedisClient, sessions:Dict[str, Dict[str, Any]]):
+            st = None
+            # バイナリフレームで届いたコマンドにのみ、バイナリフレームで応答する
+            framed = len(msg) > 1 and msgframe.is_frame(msg_raw)
+            if framed:
+                redis_cli.frame_reskeys.add(msg[1])
             try:
-                st = None
-                redis_cli.redis_cli.eval(self._COUNTER_INCREMENT_LUA, 1, redis_cli.hbname, 'receive_cnt', 1)
-                redis_cli.hset(redis_cli.hbname, 'status', 'processing')
-
                 svcmd_feature:feature.Feature = self.options.get_svcmd_feature(msg[0])
                 if svcmd_feature is not None:
                     if to_cluster and svcmd_feature.is_cluster_redirect():
-                        _publish(msg_str)
+                        _publish(msg_raw)
                         return
                     if msg[0] == 'server_stop':
                         self.is_running = False
                     if logger.level == logging.DEBUG:
-                        logger.debug(f"svname:{svname}, msg: {msg}"[:300])
+                        logger.debug(f"svname:{svname}, msg: {msgframe.to_logstr(msg)}"[:300])
                     try:
                         st = common.exec_svrun_sync(svcmd_feature.svrun, data_dir, logger, redis_cli, msg, sessions)
                     except Exception as e:
-                        redis_cli.rpush(msg[1], dict(warn=f"Unknown error occurred. {e}: {msg}."))
-                        logger.error(f"Unknown error occurred. {e}: {msg}.", exc_info=True)
+                        redis_cli.rpush(msg[1], dict(warn=f"Unknown error occurred. {e}: {msgframe.to_logstr(msg)}."))
+                        logger.error(f"Unknown error occurred. {e}: {msgframe.to_logstr(msg)}.", exc_info=True)
                         st = self.RESP_ERROR
                 else:
                     logger.warning(f"Unknown command {msg}")
                     st = self.RESP_WARN
-
-                if st==self.RESP_SUCCESS:
-                    redis_cli.redis_cli.eval(self._COUNTER_INCREMENT_LUA, 1, redis_cli.hbname, 'success_cnt', 1)
-                elif st==self.RESP_WARN:
-                    redis_cli.redis_cli.eval(self._COUNTER_INCREMENT_LUA, 1, redis_cli.hbname, 'warn_cnt', 1)
-                elif st==self.RESP_ERROR:
-                    redis_cli.redis_cli.eval(self._COUNTER_INCREMENT_LUA, 1, redis_cli.hbname, 'error_cnt', 1)
-                redis_cli.hset(redis_cli.hbname, 'ctime', time.time())
             except exceptions.TimeoutError:
                 pass
             except exceptions.ConnectionError as e:
                 logger.warning(f"Connection to the server was lost. {e}", exc_info=True)
             except OSError as e:
-                logger.warning(f"OSError. {e}. This message is not executable in the server environment. ({msg})", exc_info=True)
+                logger.warning(f"OSError. {e}. This message is not executable in the server environment. ({msgframe.to_logstr(msg)})", exc_info=True)
                 if msg is not None and len(msg) > 1:
                     redis_cli.rpush(msg[1], dict(warn=f"OSError. {e}. This message is not executable in the server environment. ({msg[0]})"))
-                redis_cli.redis_cli.eval(self._COUNTER_INCREMENT_LUA, 1, redis_cli.hbname, 'error_cnt', 1)
+                st = self.RESP_ERROR
             except IndexError as e:
-                logger.warning(f"IndexError. {e}. The message received by the server is invalid. ({msg})", exc_info=True)
+                logger.warning(f"IndexError. {e}. The message received by the server is invalid. ({msgframe.to_logstr(msg)})", exc_info=True)
                 if msg is not None and len(msg) > 1:
                     redis_cli.rpush(msg[1], dict(warn=f"IndexError. {e}. The message received by the server is invalid. ({msg[0]})"))
-                redis_cli.redis_cli.eval(self._COUNTER_INCREMENT_LUA, 1, redis_cli.hbname, 'error_cnt', 1)
+                st = self.RESP_ERROR
             except KeyboardInterrupt as e:
                 self.is_running = False
             except Exception as e:
-                logger.warning(f"Unknown error occurred. {e}. Service will be stopped due to unknown cause.({msg})", exc_info=True)
+                logger.warning(f"Unknown error occurred. {e}. Service will be stopped due to unknown cause.({msgframe.to_logstr(msg)})", exc_info=True)
+            finally:
+                if framed:
+                    redis_cli.frame_reskeys.discard(msg[1])
+                self._release_worker(msg[0])
+                self._count_result(redis_cli, st)
 
         while self.is_running:
             try:
                 msg = None
                 # ブロッキングリストから要素を取り出す
                 ctime = time.time()
-                self.redis_cli.hset(self.redis_cli.hbname, 'ctime', ctime)
-                self.redis_cli.hset(self.redis_cli.hbname, 'status', 'ready')
-                result = self.redis_cli.blpop(self.redis_cli.svname)
+                with self.pool_cond:
+                    pool_active = self.pool_active
+                self.redis_cli.heartbeat(ctime, pool_active, self.max_workers, db_pools=dbpool.stats())
                 if ctime - ltime > self.cleaning_interval:
                     self._clean_server()
                     self._clean_reskey()
                     ltime = ctime
-                to_cluster = False
-                if result is None or len(result) <= 0:
-                    # クラスター宛メッセージがあるか確認する
-                    result = self.redis_cli.blpop(f"sv-{self.org_svname}")
-                    if result is None or len(result) <= 0:
-                        time.sleep(1)
-                        continue
-                    to_cluster = True
-                msg_str = result[1].decode()
-                msg = msg_str.split(' ')
+                # ワーカーが埋まっている間はメッセージを取り出さずRedisに残しておく
+                if not self._wait_worker(timeout=1):
+                    continue
+                result = self._pop_message()
+                if result is None:
+                    continue
+                msg_raw, msg, to_cluster = result
                 if len(msg) <= 0:
                     time.sleep(1)
                     continue
 
-                th = threading.Thread(target=_process, name=f"svrun_{msg[0]}", daemon=True,
-                                      args=(msg, to_cluster, self.logger, self.svname, self.data_dir, self.redis_cli, self.sessions))
-                th.start()
+                if not self._acquire_worker(msg[0]):
+                    # 取り出した後に上限に達した場合は、取り出したリストの先頭に戻す
+                    self.redis_cli.redis_cli.lpush(f"sv-{self.org_svname}" if to_cluster else self.redis_cli.svname, msg_raw)
+                    continue
+                executor.submit(_process, msg_raw, msg, to_cluster, self.logger, self.svname, self.data_dir, self.redis_cli, self.sessions)
 
             except exceptions.TimeoutError:
                 pass
@@ -228,13 +352,13 @@ return new_value
                     self.is_running = False
                     break
             except OSError as e:
-                self.logger.warning(f"OSError. {e}. This message is not executable in the server environment. ({msg})", exc_info=True)
+                self.logger.warning(f"OSError. {e}. This message is not executable in the server environment. ({msgframe.to_logstr(msg)})", exc_info=True)
                 if msg is not None and len(msg) > 1:
                     self.redis_cli.rpush(msg[1], dict(warn=f"OSError. {e}. This message is not executable in the server environment. ({msg[0]})"))
                 self.redis_cli.redis_cli.eval(self._COUNTER_INCREMENT_LUA, 1, self.redis_cli.hbname, 'error_cnt', 1)
                 pass
             except IndexError as e:
-                self.logger.warning(f"IndexError. {e}. The message received by the server is invalid. ({msg})", exc_info=True)
+                self.logger.warning(f"IndexError. {e}. The message received by the server is invalid. ({msgframe.to_logstr(msg)})", exc_info=True)
                 if msg is not None and len(msg) > 1:
                     self.redis_cli.rpush(msg[1], dict(warn=f"IndexError. {e}. The message received by the server is invalid. ({msg[0]})"))
                 self.redis_cli.redis_cli.eval(self._COUNTER_INCREMENT_LUA, 1, self.redis_cli.hbname, 'error_cnt', 1)
@@ -243,9 +367,11 @@ return new_value
                 self.is_running = False
                 break
             except Exception as e:
-                self.logger.warning(f"Unknown error occurred. {e}. Service will be stopped due to unknown cause.({msg})", exc_info=True)
+                self.logger.warning(f"Unknown error occurred. {e}. Service will be stopped due to unknown cause.({msgframe.to_logstr(msg)})", exc_info=True)
                 self.is_running = False
                 break
+        executor.shutdown(wait=False)
+        self.redis_cli.unregist_server()
         self.redis_cli.delete(self.redis_cli.svname)
         self.redis_cli.delete(self.redis_cli.hbname)
         self.logger.info(f"stop server. svname={self.redis_cli.svname}")
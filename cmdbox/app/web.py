@@ -1,5 +1,5 @@
 from cmdbox.app import common, options
-from cmdbox.app.commons import module, redis_client
+from cmdbox.app.commons import eventhub, module, redis_client
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Response
 from pathlib import Path
@@ -169,7 +169,10 @@ class Web:
         common.mkdirs(self.agent_path)
         self.pipe_th = None
         self.img_queue = queue.Queue(1000)
-        self.cb_queue = queue.Queue(1000)
+        # コマンドの実行結果をWebSocketの接続ごとに配信する。cb_queueは互換性のための別名
+        self.cb_hub = eventhub.EventHub(logger, redis_host=redis_host, redis_port=redis_port, redis_password=redis_password,
+                                        channel=f"cmdbox:{self.svname}:callback", maxsize=1000)
+        self.cb_queue = self.cb_hub
         self.options = options.Options.getInstance()
         self.webcap_client = requests.Session()
         from cmdbox.app.auth import signin, signin_saml
@@ -272,7 +275,7 @@ class Web:
             HTTPException: パスワードが一致しない場合
             HTTPException: ユーザーが存在しない場合
         """
-        signin_data = self.signin.signin_file_data
+        signin_data = copy.deepcopy(self.signin.signin_file_data)
         if signin_data is None:
             raise ValueError(f'signin_file_data is None. ({self.signin_file})')
         if self.signin_file is None:
@@ -415,7 +418,7 @@ class Web:
         Returns:
             str: ApiKey
         """
-        signin_data = self.signin.signin_file_data
+        signin_data = copy.deepcopy(self.signin.signin_file_data)
         if signin_data is None:
             raise ValueError(f'signin_file_data is None. ({self.signin_file})')
         if self.signin_file is None:
@@ -484,7 +487,7 @@ class Web:
         Args:
             user (Dict[str, Any]): ユーザー情報
         """
-        signin_data = self.signin.signin_file_data
+        signin_data = copy.deepcopy(self.signin.signin_file_data)
         if signin_data is None:
             raise ValueError(f'signin_file_data is None. ({self.signin_file})')
         if self.signin_file is None:
@@ -527,7 +530,7 @@ class Web:
         Args:
             user (Dict[str, Any]): ユーザー情報
         """
-        signin_data = self.signin.signin_file_data
+        signin_data = copy.deepcopy(self.signin.signin_file_data)
         if signin_data is None:
             raise ValueError(f'signin_file_data is None. ({self.signin_file})')
         if self.signin_file is None:
@@ -591,7 +594,7 @@ class Web:
         Args:
             user (Dict[str, Any]): ユーザー情報
         """
-        signin_data = self.signin.signin_file_data
+        signin_data = copy.deepcopy(self.signin.signin_file_data)
         if signin_data is None:
             raise ValueError(f'signin_file_data is None. ({self.signin_file})')
         if self.signin_file is None:
@@ -656,7 +659,7 @@ class Web:
         Args:
             uid (int): ユーザーID
         """
-        signin_data = self.signin.signin_file_data
+        signin_data = copy.deepcopy(self.signin.signin_file_data)
         if signin_data is None:
             raise ValueError(f'signin_file_data is None. ({self.signin_file})')
         if self.signin_file is None:
@@ -710,7 +713,7 @@ class Web:
         Args:
             group (Dict[str, Any]): グループ情報
         """
-        signin_data = self.signin.signin_file_data
+        signin_data = copy.deepcopy(self.signin.signin_file_data)
         if signin_data is None:
             raise ValueError(f'signin_file_data is None. ({self.signin_file})')
         if self.signin_file is None:
@@ -757,7 +760,7 @@ class Web:
         Args:
             group (Dict[str, Any]): グループ情報
         """
-        signin_data = self.signin.signin_file_data
+        signin_data = copy.deepcopy(self.signin.signin_file_data)
         if signin_data is None:
             raise ValueError(f'signin_file_data is None. ({self.signin_file})')
         if self.signin_file is None:
@@ -811,7 +814,7 @@ class Web:
         Args:
             gid (str): グループID
         """
-        signin_data = self.signin.signin_file_data
+        signin_data = copy.deepcopy(self.signin.signin_file_data)
         if signin_data is None:
             raise ValueError(f'signin_file_data is None. ({self.signin_file})')
         if self.signin_file is None:
@@ -1,7 +1,8 @@
 agentView.get_datasource_form_def = async () => {
     const opts = await cmdbox.get_cmd_choices('datasource', 'save');
     const vform_names = ['dsname', 'dbtype', 'scope', 'client_data',
-                         'db_host', 'db_port', 'db_user', 'db_password', 'db_name', 'db_timeout', 'db_path'];
+                         'db_host', 'db_port', 'db_user', 'db_password', 'db_name', 'db_timeout',
+                         'db_pool_min_size', 'db_pool_max_size', 'db_pool_max_idle', 'db_path'];
     return opts.filter(o => vform_names.includes(o.opt));
 };
 
@@ -1,6 +1,6 @@
 agentView.get_rag_form_def = async () => {
     const opts = await cmdbox.get_cmd_choices('rag', 'save');
-    const vform_names = ['rag_name', 'rag_datasource', 'source_dir', 'extract', 'llm_name', 'embed_vector_dim', 'savetype',];
+    const vform_names = ['rag_name', 'rag_datasource', 'source_dir', 'extract', 'llm_name', 'embed_vector_dim', 'vec_metric', 'vec_index', 'vec_index_m', 'vec_index_ef_construction', 'vec_index_lists', 'savetype',];
     const ret = opts.filter(o => vform_names.includes(o.opt));
     return ret;
 };
@@ -0,0 +1,176 @@
+"""
+exec_sse_cmd の負荷試験です。
+
+uvicorn で exec_sse_cmd のルートを起動し、CmdBoxApp.main と同様にブロッキングで結果を返すスタブのコマンドを実行します。
+
+- 50本のSSEを同時に開いている間も、関係のないHTTPリクエスト（/ping）が遅延しないこと
+- クライアントが切断されたコマンドは実行待ちであれば取り消され、実行中であれば中断を検知できること
+
+を確認します。
+
+    python -m pytest -q tests/test_web_exec_sse_cmd.py
+"""
+from cmdbox import version
+from cmdbox.app import app as cmdbox_app, options
+from cmdbox.app.auth import signin
+from cmdbox.app.features.web import cmdbox_web_exec_cmd
+from fastapi import FastAPI
+from starlette.middleware.sessions import SessionMiddleware
+import http.client
+import logging
+import pytest
+import socket
+import statistics
+import threading
+import time
+
+
+# スタブのコマンドが結果を返す回数と間隔
+STEPS = 3
+STEP_SEC = 1.0
+# 同時に開くSSEの数
+STREAMS = 50
+# スレッドプールの大きさ
+WORKERS = 32
+# /ping の応答時間の上限（秒）
+PING_MEDIAN_SEC = 0.05
+PING_MAX_SEC = 0.5
+
+
+class _Web:
+    logger = logging.getLogger('test_web_exec_sse_cmd')
+
+class _StubExecCmd(cmdbox_web_exec_cmd.ExecCmd):
+    """
+    リクエストの前処理とコマンドの実行をスタブに置き換えた ExecCmd
+    """
+    SSE_MAX_WORKERS = WORKERS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.started = 0
+        self.finished = 0
+        self.cancelled = 0
+
+    async def _preprocess(self, web, app, req, res, title):
+        return dict(mode='client', cmd='time')
+
+    async def exec_cmd(self, req, res, web, title, opt, nothread=False, appcls=None, resqueue=None):
+        with self.lock:
+            self.started += 1
+        # CmdBoxApp.main と同様にブロッキングで実行し、結果をキューに格納する
+        for i in range(STEPS):
+            if resqueue.closed:
+                with self.lock:
+                    self.cancelled += 1
+                return
+            time.sleep(STEP_SEC)
+            resqueue.put(dict(success=dict(data=i)))
+        with self.lock:
+            self.finished += 1
+        resqueue.put(None)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+@pytest.fixture(scope='module')
+def server():
+    uvicorn = pytest.importorskip('uvicorn')
+    logger = logging.getLogger('test_web_exec_sse_cmd')
+    opts = options.Options.getInstance(cmdbox_app.CmdBoxApp, version)
+    opts._load_features_yml(version, logger=logger)
+    opts.load_features_file('cli', opts.load_svcmd, cmdbox_app.CmdBoxApp, version, 'en_US', logger)
+
+    # スレッドプールはクラス変数で共有されるため、このテストの大きさで作り直す
+    cmdbox_web_exec_cmd.ExecCmd._sse_executor = None
+    feat = _StubExecCmd(None, version, 'en_US')
+    app = FastAPI()
+    app.add_middleware(SessionMiddleware, secret_key='test')
+    feat.route(_Web(), app)
+    app.dependency_overrides[signin.create_request_scope] = lambda: None
+    @app.get('/ping')
+    async def ping():
+        return dict(success='pong')
+
+    port = _free_port()
+    sv = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='error'))
+    th = threading.Thread(target=sv.run, daemon=True)
+    th.start()
+    for _ in range(100):
+        if sv.started:
+            break
+        time.sleep(0.05)
+    yield port, feat
+    sv.should_exit = True
+    th.join(timeout=10)
+    cmdbox_web_exec_cmd.ExecCmd._sse_executor.shutdown(wait=False, cancel_futures=True)
+    cmdbox_web_exec_cmd.ExecCmd._sse_executor = None
+
+def _sse(port:int) -> int:
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        conn.request('GET', '/exec_sse_cmd/test')
+        body = conn.getresponse().read()
+    finally:
+        conn.close()
+    return body.count(b'data:')
+
+def _ping(port:int) -> float:
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        start = time.perf_counter()
+        conn.request('GET', '/ping')
+        conn.getresponse().read()
+        return time.perf_counter() - start
+    finally:
+        conn.close()
+
+def test_sse_streams_do_not_block_other_requests(server):
+    port, feat = server
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_sse(port))) for _ in range(STREAMS)]
+    start = time.perf_counter()
+    for th in threads:
+        th.start()
+    time.sleep(0.3)
+    latencies = []
+    for _ in range(20):
+        latencies.append(_ping(port))
+        time.sleep(0.1)
+    for th in threads:
+        th.join(timeout=60)
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == STREAMS
+    assert sum(results) == STREAMS * STEPS
+    # WORKERS 本ずつ実行されるため、全てのSSEは2巡分の時間で完了する
+    assert elapsed < STEPS * STEP_SEC * -(-STREAMS // WORKERS) + 5
+    assert statistics.median(latencies) < PING_MEDIAN_SEC, latencies
+    assert max(latencies) < PING_MAX_SEC, latencies
+
+def test_disconnected_streams_are_cancelled(server):
+    port, feat = server
+    with feat.lock:
+        feat.started = feat.finished = feat.cancelled = 0
+    conns = []
+    for _ in range(STREAMS):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        conn.request('GET', '/exec_sse_cmd/test')
+        conns.append(conn)
+    # レスポンスヘッダーを受け取り、コマンドの実行が始まった後に切断する
+    for conn in conns:
+        conn.getresponse()
+    time.sleep(0.5)
+    for conn in conns:
+        conn.sock.shutdown(socket.SHUT_RDWR)
+        conn.close()
+    time.sleep(STEPS * STEP_SEC + 1)
+
+    # 実行待ちだったコマンドは実行されず、実行中のコマンドは最後まで実行されない
+    assert feat.started <= WORKERS
+    assert feat.finished == 0
+    assert feat.cancelled == feat.started
+    assert _ping(port) < PING_MAX_SEC